@@ -0,0 +1,504 @@
+"""
+Financial Intelligence - 견적 HTTP API (Streamlit 없이 계산기만 제공)
+
+실행:
+    python api.py --host 0.0.0.0 --port 8000 --workers 4
+
+엔드포인트:
+    GET  /health                  상태 확인
+    POST /v1/quotes/model         금융사별 월납입금 (모델 기반)
+    POST /v1/quotes/model/batch   차량 × 조건 일괄 계산 (모델 기반)
+    POST /v1/quotes/exact         금융사별 월납입금 (견적 시트 공시값, 없는 차량은 모델 기반)
+    POST /v1/quotes/bnk/lease     BNK 운용리스
+    POST /v1/quotes/bnk/rental    BNK 렌트
+    POST /v1/budget/search        월 예산 이하 차량 검색 (모델 기반 최저 월납입금)
+    GET  /v1/cache/stats          견적 캐시 통계
+    GET  /metrics                 계측값 (Prometheus 텍스트 형식, FI_METRICS=1일 때 수집)
+"""
+
+import argparse
+import datetime
+import math
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# src 디렉토리를 Python 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ref')
+
+from calculator import PAYMENT_TYPES, get_calculator, validate_quote_condition
+from bnk_calculator import RV_COMPANIES, get_bnk_calculator
+from budget_index import get_budget_index
+from exact_quotes import get_exact_quote_index
+from calc_trace import render_steps
+import metrics
+
+
+class QuoteRequestError(ValueError):
+    """잘못된 견적 요청"""
+
+
+_REQUIRED = object()
+
+MAX_CAR_PRICE = 10_000_000_000  # 차량가격·옵션·할인 상한 (100억원)
+VEHICLE_TYPES = ('일반', 'HEV', '전기')
+
+
+def _field(body: dict, name: str, cast, default=_REQUIRED):
+    """요청 필드 조회 및 형변환"""
+    if name not in body or body[name] is None:
+        if default is _REQUIRED:
+            raise QuoteRequestError(f"필수 항목 누락: {name}")
+        return default
+    try:
+        return cast(body[name])
+    except (TypeError, ValueError, OverflowError):
+        raise QuoteRequestError(f"잘못된 값: {name}={body[name]!r}")
+
+
+def _text(value) -> str:
+    """문자열 필드 (배열·객체·숫자 거부)"""
+    if not isinstance(value, str):
+        raise TypeError(f"문자열이 아닙니다: {value!r}")
+    return value
+
+
+def _int(value) -> int:
+    """정수 필드 (불리언, 소수점이 있는 숫자 거부, 문자열 '36' 허용)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f"정수가 아닙니다: {value!r}")
+    number = int(value)
+    if isinstance(value, float) and number != value:
+        raise ValueError(f"정수가 아닙니다: {value!r}")
+    return number
+
+
+def _finite(value) -> float:
+    """유한한 숫자 형변환 (nan/inf 거부)"""
+    if isinstance(value, bool):
+        raise TypeError("불리언은 숫자가 아닙니다")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"유한한 숫자가 아닙니다: {value!r}")
+    return number
+
+
+def _price(value) -> float:
+    """차량가격 형변환 (0보다 크고 MAX_CAR_PRICE 이하)"""
+    price = _finite(value)
+    if not 0 < price <= MAX_CAR_PRICE:
+        raise ValueError(f"차량가격 범위 밖: {value!r}")
+    return price
+
+
+def _amount(value) -> float:
+    """옵션·할인 금액 형변환 (0 이상 MAX_CAR_PRICE 이하)"""
+    amount = _finite(value)
+    if not 0 <= amount <= MAX_CAR_PRICE:
+        raise ValueError(f"금액 범위 밖: {value!r}")
+    return amount
+
+
+def _percent(value) -> float:
+    """보증금/선수금 비율 형변환 (0~100%)"""
+    rate = _finite(value)
+    if not 0 <= rate <= 100:
+        raise ValueError(f"비율 범위 밖: {value!r}")
+    return rate
+
+
+def _fee_rate(value) -> float:
+    """딜러 수수료율 형변환 (0~1)"""
+    rate = _finite(value)
+    if not 0 <= rate <= 1:
+        raise ValueError(f"수수료율 범위 밖: {value!r}")
+    return rate
+
+
+def _bool(value) -> bool:
+    """JSON 불리언 형변환 (문자열 'true'/'false' 허용)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _as_of(body: dict, snapshots):
+    """기준일 필드 ('2025-11-03', 생략 시 현재 파라미터) → as_of 시점 스냅샷"""
+    as_of = _field(body, 'as_of', datetime.date.fromisoformat, None)
+    try:
+        return as_of, snapshots.at(as_of)
+    except ValueError as e:
+        raise QuoteRequestError(str(e))
+
+
+async def _read_json(request: Request) -> dict:
+    """요청 본문 JSON 파싱"""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise QuoteRequestError("요청 본문이 올바른 JSON이 아닙니다")
+    if not isinstance(body, dict):
+        raise QuoteRequestError("요청 본문은 JSON 객체여야 합니다")
+    return body
+
+
+def _model_condition(body: dict, product_type: str) -> tuple:
+    """모델 기반 견적 조건 (기간, 주행거리, 보증금비율, 결제유형) - 앱 선택 조건만 허용"""
+    period = _field(body, 'period', _int)
+    mileage = _field(body, 'mileage', _text)
+    deposit_rate = _field(body, 'deposit_rate', _percent, 0)
+    payment_type = _field(body, 'payment_type', _text, '무보증')
+    try:
+        validate_quote_condition(product_type, period, mileage, payment_type)
+    except ValueError as e:
+        raise QuoteRequestError(str(e))
+    return period, mileage, deposit_rate, payment_type
+
+
+def _model_quote(body: dict) -> dict:
+    """모델 기반 금융사별 견적 (as_of를 주면 그날 적용 중이던 파라미터로 재계산)"""
+    calculator = get_calculator()
+    as_of, snapshot = _as_of(body, calculator.history)
+    trace = _field(body, 'trace', _bool, False)
+    product_type = _field(body, 'product_type', _text)
+    period, mileage, deposit_rate, payment_type = _model_condition(body, product_type)
+    results = calculator.calculate_all_companies(
+        car_price=_field(body, 'car_price', _price),
+        product_type=product_type,
+        period=period,
+        mileage=mileage,
+        deposit_rate=deposit_rate,
+        payment_type=payment_type,
+        option_price=_field(body, 'option_price', _amount, 0),
+        dealer_discount=_field(body, 'dealer_discount', _amount, 0),
+        dealer_fee_rate=_field(body, 'dealer_fee_rate', _fee_rate, 0.01),
+        trace=trace,
+        as_of=as_of
+    )
+
+    quotes = []
+    for result in results:
+        quote = {
+            'company': result['company'],
+            'payment_type': result['payment_type'],
+            'monthly_payment': result['monthly_payment'],
+            'params_key': result['debug']['params_key'],
+            'params_provenance': result['debug']['params_provenance']
+        }
+        if trace:
+            quote['steps'] = render_steps(result['debug'])
+        quotes.append(quote)
+
+    return {'count': len(quotes), 'params_version': snapshot.content_id, 'results': quotes}
+
+
+def _exact_quote(body: dict) -> dict:
+    """견적 시트 기반 금융사별 견적 (차량 ID 필요, 차량가격 생략 시 카탈로그 가격)"""
+    index = get_exact_quote_index(DATA_DIR)
+    id_cargrade = _field(body, 'id_cargrade', _int)
+    car_price = _field(body, 'car_price', _price, None)
+    if car_price is None:
+        car = index.data_loader.get_car_info(id_cargrade)
+        if car is None:
+            raise QuoteRequestError(f"차량을 찾을 수 없습니다: {id_cargrade}")
+        try:
+            car_price = _price(car['price'])
+        except (TypeError, ValueError):
+            raise QuoteRequestError(f"차량 가격 정보가 올바르지 않습니다: {id_cargrade} ({car['price']!r})")
+
+    trace = _field(body, 'trace', _bool, False)
+    product_type = _field(body, 'product_type', _text)
+    period, mileage, deposit_rate, payment_type = _model_condition(body, product_type)
+    results = index.calculate_all_companies(
+        id_cargrade=id_cargrade,
+        car_price=car_price,
+        product_type=product_type,
+        period=period,
+        mileage=mileage,
+        deposit_rate=deposit_rate,
+        payment_type=payment_type,
+        option_price=_field(body, 'option_price', _amount, 0),
+        dealer_discount=_field(body, 'dealer_discount', _amount, 0),
+        dealer_fee_rate=_field(body, 'dealer_fee_rate', _fee_rate, 0.01),
+        trace=trace
+    )
+
+    quotes = []
+    for result in results:
+        quote = {
+            'company': result['company'],
+            'payment_type': result['payment_type'],
+            'monthly_payment': result['monthly_payment'],
+            'source': result['debug']['source'],
+            'params_key': result['debug']['params_key'],
+            'params_provenance': result['debug']['params_provenance']
+        }
+        if trace:
+            quote['steps'] = render_steps(result['debug'])
+        quotes.append(quote)
+
+    return {'count': len(quotes), 'car_price': car_price, 'results': quotes}
+
+
+def _model_batch(body: dict) -> dict:
+    """모델 기반 차량 × 조건 일괄 견적"""
+    calculator = get_calculator()
+    as_of, snapshot = _as_of(body, calculator.history)
+    car_prices = _field(body, 'car_prices', list)
+    if not car_prices:
+        raise QuoteRequestError("car_prices가 비어 있습니다")
+    try:
+        car_prices = [_price(price) for price in car_prices]
+    except (TypeError, ValueError):
+        raise QuoteRequestError(f"car_prices는 0보다 크고 {MAX_CAR_PRICE:,}원 이하인 숫자 배열이어야 합니다")
+
+    product_type = _field(body, 'product_type', _text)
+    conditions = []
+    for condition in _field(body, 'conditions', list):
+        if not isinstance(condition, dict):
+            raise QuoteRequestError("conditions 항목은 JSON 객체여야 합니다")
+        conditions.append(_model_condition(condition, product_type))
+
+    batch = calculator.calculate_batch(
+        car_prices,
+        product_type,
+        conditions,
+        option_price=_field(body, 'option_price', _amount, 0),
+        dealer_discount=_field(body, 'dealer_discount', _amount, 0),
+        dealer_fee_rate=_field(body, 'dealer_fee_rate', _fee_rate, 0.01),
+        as_of=as_of
+    )
+
+    results = []
+    for (period, mileage, deposit_rate, payment_type), (companies, matrix) in batch.items():
+        results.append({
+            'period': period,
+            'mileage': mileage,
+            'deposit_rate': deposit_rate,
+            'payment_type': payment_type,
+            'companies': companies,
+            'monthly_payments': matrix.tolist()  # 금융사 × 차량
+        })
+
+    return {'car_count': len(car_prices), 'params_version': snapshot.content_id, 'results': results}
+
+
+def _bnk_quote(body: dict, product: str) -> dict:
+    """BNK 리스/렌트 견적"""
+    bnk = get_bnk_calculator()
+    calculate = bnk.calculate_lease if product == 'lease' else bnk.calculate_rental
+    as_of, rv = _as_of(body, bnk.history)
+    trace = _field(body, 'trace', _bool, False)
+
+    # 잔가율 테이블에 있는 기간·주행거리만 허용 (as_of 시점 테이블 기준)
+    period = _field(body, 'period', _int)
+    if period not in rv.period_index:
+        raise QuoteRequestError(f"지원하지 않는 계약기간: {period!r} (가능: {rv.periods})")
+    mileage = _field(body, 'mileage', _text, '2만')
+    if mileage not in rv.mileages:
+        raise QuoteRequestError(f"지원하지 않는 주행거리: {mileage!r} (가능: {list(rv.mileages)})")
+    rv_company = _field(body, 'rv_company', _text, '최고잔가')
+    if rv_company != '최고잔가' and rv_company not in RV_COMPANIES:
+        raise QuoteRequestError(f"알 수 없는 잔가사: {rv_company!r}")
+    deposit_type = _field(body, 'deposit_type', _text, '무보증')
+    if deposit_type not in PAYMENT_TYPES:
+        raise QuoteRequestError(f"알 수 없는 보증금 유형: {deposit_type!r}")
+    vehicle_type_eco = _field(body, 'vehicle_type_eco', _text, '일반')
+    if vehicle_type_eco not in VEHICLE_TYPES:
+        raise QuoteRequestError(f"알 수 없는 차량 유형: {vehicle_type_eco!r}")
+
+    monthly, debug = calculate(
+        car_price=_field(body, 'car_price', _price),
+        option_price=_field(body, 'option_price', _amount, 0),
+        period=period,
+        rv_company=rv_company,
+        grade=_field(body, 'grade', _text, 'A'),
+        mileage=mileage,
+        deposit_type=deposit_type,
+        deposit_rate=_field(body, 'deposit_rate', _percent, 0),
+        dealer_discount=_field(body, 'dealer_discount', _amount, 0),
+        vehicle_type_eco=vehicle_type_eco,
+        is_domestic=_field(body, 'is_domestic', _bool, True),
+        trace=trace,
+        as_of=as_of
+    )
+
+    response = {
+        'product': debug['product'],
+        'monthly_payment': monthly,
+        'rv_company': debug['rv_company'],
+        'grade': debug['grade'],
+        'residual_rate': debug['residual_rate'],
+        'residual_value': debug['residual_value'],
+        'acquisition_cost': debug['acquisition_cost'],
+        'rv_tables_version': debug['rv_tables_version']
+    }
+    if trace:
+        response['steps'] = render_steps(debug)
+    return response
+
+
+def _budget_search(body: dict) -> dict:
+    """월 예산 이하 차량 검색 (앱 선택 조건만, 조건별 첫 요청은 인덱스 생성)"""
+    index = get_budget_index(DATA_DIR)
+    try:
+        matches = index.query(
+            max_payment=_field(body, 'max_payment', _finite),
+            product_type=_field(body, 'product_type', _text),
+            period=_field(body, 'period', _int),
+            mileage=_field(body, 'mileage', _text),
+            deposit_rate=_field(body, 'deposit_rate', _percent, 0),
+            payment_type=_field(body, 'payment_type', _text, '무보증'),
+            min_payment=_field(body, 'min_payment', _finite, 0),
+            limit=_field(body, 'limit', _int, 100)
+        )
+    except ValueError as e:  # 조건·구간 검증 실패 (QuoteRequestError 포함)
+        raise QuoteRequestError(str(e))
+
+    results = []
+    for match in matches:
+        car = index.data_loader.get_car_info(match['id_cargrade']) or {}
+        results.append({
+            'id_cargrade': match['id_cargrade'],
+            'brand': car.get('brand'),
+            'model': car.get('model'),
+            'grade': car.get('grade'),
+            'price': match['price'],
+            'monthly_payment': match['monthly_payment'],
+            'company': match['company']
+        })
+    return {'count': len(results), 'results': results}
+
+
+# ================ 핸들러 ================
+
+def _error(message: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({'status': 'ok'})
+
+
+async def model_quote(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        # 새 as_of의 첫 요청은 과거 스냅샷을 컴파일하므로 이벤트 루프를 막지 않도록 스레드에서 실행
+        return JSONResponse(await run_in_threadpool(_model_quote, body))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def model_batch(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        # 배치는 계산량이 크므로 이벤트 루프를 막지 않도록 스레드에서 실행
+        return JSONResponse(await run_in_threadpool(_model_batch, body))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def exact_quote(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        # 첫 요청은 견적 시트 인덱스를 만들므로 스레드에서 실행
+        return JSONResponse(await run_in_threadpool(_exact_quote, body))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def bnk_lease(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        # 새 as_of의 첫 요청은 과거 잔가율 테이블을 컴파일하므로 스레드에서 실행
+        return JSONResponse(await run_in_threadpool(_bnk_quote, body, 'lease'))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def bnk_rental(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        return JSONResponse(await run_in_threadpool(_bnk_quote, body, 'rental'))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def budget_search(request: Request) -> JSONResponse:
+    try:
+        body = await _read_json(request)
+        # 조건별 첫 요청은 전 차량 인덱스를 만들므로 (잠금 보유) 이벤트 루프를 막지 않도록 스레드에서 실행
+        return JSONResponse(await run_in_threadpool(_budget_search, body))
+    except QuoteRequestError as e:
+        return _error(str(e))
+
+
+async def cache_stats(request: Request) -> JSONResponse:
+    return JSONResponse({
+        'model': get_calculator().quote_cache.stats(),
+        'bnk': get_bnk_calculator().quote_cache.stats(),
+        'snapshots': {
+            'model_params': get_calculator().snapshots.stats(),
+            'bnk_rv_tables': get_bnk_calculator().snapshots.stats()
+        }
+    })
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(metrics.render_prometheus(),
+                             media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """워커 프로세스 시작 시 파라미터를 한 번만 로드"""
+    get_calculator()
+    get_bnk_calculator()
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/v1/quotes/model', model_quote, methods=['POST']),
+        Route('/v1/quotes/model/batch', model_batch, methods=['POST']),
+        Route('/v1/quotes/exact', exact_quote, methods=['POST']),
+        Route('/v1/quotes/bnk/lease', bnk_lease, methods=['POST']),
+        Route('/v1/quotes/bnk/rental', bnk_rental, methods=['POST']),
+        Route('/v1/budget/search', budget_search, methods=['POST']),
+        Route('/v1/cache/stats', cache_stats, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+    ],
+    lifespan=lifespan
+)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="견적 HTTP API 서버")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="워커 프로세스 수")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        'api:app',
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level='info'
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,40 @@ import pandas as pd
 # src 디렉토리를 Python 경로에 추가
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from data_loader import get_data_loader
-from calculator import get_calculator
-from bnk_calculator import get_bnk_calculator
+from data_loader import get_data_loader as _get_data_loader
+from calculator import DEPOSIT_RATES, QUOTE_MILEAGES, QUOTE_PERIODS, get_calculator as _get_calculator
+from exact_quotes import get_exact_quote_index as _get_exact_quote_index
+from bnk_calculator import get_bnk_calculator as _get_bnk_calculator
+from calc_trace import render_steps
+import metrics
+
+
+# ================ Streamlit 캐시 어댑터 ================
+# src/의 계산기/로더는 Streamlit을 import하지 않으므로, 세션 간 공유 객체는 여기서만
+# st.cache_resource로 감싼다. 원본 파일(model_params.json 등) 변경은 각 객체가 스스로 감지한다.
+
+@st.cache_resource(show_spinner=False)
+def get_data_loader(data_dir: str = "ref"):
+    """데이터 로더 (차량 정보 로드 포함)"""
+    return _get_data_loader(data_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def get_calculator():
+    """모델 기반 계산기"""
+    return _get_calculator()
+
+
+@st.cache_resource(show_spinner=False)
+def get_exact_quote_index(data_dir: str = "ref"):
+    """견적 시트 공시값 인덱스"""
+    return _get_exact_quote_index(data_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def get_bnk_calculator():
+    """BNK 계산기"""
+    return _get_bnk_calculator()
 
 
 # 페이지 설정
@@ -94,8 +125,11 @@ def initialize_session_state():
         st.session_state.option_price = 0
     if 'results' not in st.session_state:
         st.session_state.results = None
+    if 'exact_mode' not in st.session_state:
+        st.session_state.exact_mode = False
 
 
+@metrics.timed('app.render_sidebar')
 def render_sidebar():
     """사이드바 메뉴"""
     with st.sidebar:
@@ -113,6 +147,14 @@ def render_sidebar():
             st.session_state.page = 'params'
             st.rerun()
 
+        st.markdown("---")
+        exact_mode = st.toggle("📑 견적 시트 공시값 우선", value=st.session_state.exact_mode,
+                               help="lease.xlsx/rent.xlsx에 있는 차량은 금융사 공시 월대여료로 계산하고, "
+                                    "없는 차량만 모델 기반으로 계산합니다.")
+        if exact_mode != st.session_state.exact_mode:
+            st.session_state.exact_mode = exact_mode
+            st.session_state.results = None
+
         st.markdown("---")
         st.markdown("### ℹ️ 정보")
         st.info("""
@@ -129,6 +171,7 @@ def add_chat_message(role: str, message: str):
 
 # ================ 계산기 페이지 ================
 
+@metrics.timed('app.render_calculator_page')
 def render_calculator_page():
     """계산기 페이지"""
     st.markdown('<div class="main-header">🚗 Financial Intelligence</div>', unsafe_allow_html=True)
@@ -153,6 +196,7 @@ def render_calculator_page():
         render_debug_ui()
 
 
+@metrics.timed('app.render_chat_ui')
 def render_chat_ui(data_loader):
     """좌측 채팅 UI"""
     st.markdown("### 💬 차량 선택")
@@ -232,7 +276,7 @@ def render_chat_ui(data_loader):
 
     elif st.session_state.step == 'period':
         st.markdown("**계약기간은 얼마로 하시겠어요?**")
-        periods = [24, 36, 48, 60]
+        periods = QUOTE_PERIODS
         cols = st.columns(len(periods))
         for i, period in enumerate(periods):
             with cols[i]:
@@ -245,10 +289,7 @@ def render_chat_ui(data_loader):
 
     elif st.session_state.step == 'mileage':
         st.markdown("**연간 주행거리는 어느 정도 예상하시나요?**")
-        if st.session_state.product_type == 'lease':
-            mileages = ['1만km', '2만km', '3만km', '4만km']
-        else:
-            mileages = ['1만km', '2만km', '3만km', '무제한']
+        mileages = QUOTE_MILEAGES[st.session_state.product_type]
         cols = st.columns(len(mileages))
         for i, mileage in enumerate(mileages):
             with cols[i]:
@@ -262,7 +303,7 @@ def render_chat_ui(data_loader):
     elif st.session_state.step == 'deposit_rate':
         st.markdown("**보증금 또는 선납금을 설정하시겠어요?**")
         cols = st.columns(4)
-        rates = [0, 10, 20, 30]
+        rates = DEPOSIT_RATES
         for i, rate in enumerate(rates):
             with cols[i]:
                 label = "무보증 (0%)" if rate == 0 else f"{rate}%"
@@ -369,6 +410,7 @@ def render_chat_ui(data_loader):
         st.rerun()
 
 
+@metrics.timed('app.render_summary_ui')
 def render_summary_ui():
     """중앙 요약/결과 UI"""
     st.markdown("### 📋 선택 요약 및 결과")
@@ -432,6 +474,7 @@ def render_summary_ui():
         st.button("📞 상담 신청하기 (프로토타입: 비활성)", disabled=True, use_container_width=True)
 
 
+@metrics.timed('app.render_debug_ui')
 def render_debug_ui():
     """우측 디버깅 UI"""
     st.markdown("### 🔍 계산 과정 상세")
@@ -451,23 +494,49 @@ def render_debug_ui():
 차량 가격: {debug['car_price']:,.0f}원
 보증금/선납금: {debug['deposit_rate']}%
                 """)
+                provenance = debug.get('params_provenance', 'exact')
+                if debug.get('source') == 'quote_sheet':
+                    st.success(f"{debug['params_key']} 시트의 금융사 공시 월대여료로 계산했습니다.")
+                elif debug.get('source') == 'model':
+                    st.info("견적 시트에 없는 차량/조건이라 모델 기반으로 계산했습니다.")
+                if provenance in ('interpolated', 'extrapolated'):
+                    st.warning(f"요청 조건의 파라미터가 없어 보간 곡면 값을 사용했습니다 ({provenance}).")
+                elif provenance != 'exact':
+                    st.warning(f"요청 조건의 파라미터가 없어 {debug['params_key']} 조건으로 대체했습니다.")
 
                 st.markdown("**🧮 계산 단계**")
-                for step in debug['steps']:
+                for step in render_steps(debug):
                     st.text(step)
 
                 st.markdown("---")
-                st.markdown("**📄 모델 파라미터**")
+                st.markdown("**📄 견적 시트 값**" if debug.get('source') == 'quote_sheet' else "**📄 모델 파라미터**")
                 st.json(debug['params'])
 
     else:
         st.info("차량과 조건을 선택하면 상세 계산 과정이 여기에 표시됩니다.")
 
 
+@metrics.timed('app.calculate_results')
 def calculate_results():
     """계산 수행"""
     calculator = get_calculator()
 
+    if st.session_state.exact_mode:
+        st.session_state.results = get_exact_quote_index(data_dir="ref").calculate_all_companies(
+            id_cargrade=st.session_state.selected_car['id_cargrade'],
+            car_price=st.session_state.selected_car['price'],
+            product_type=st.session_state.product_type,
+            period=st.session_state.period,
+            mileage=st.session_state.mileage,
+            deposit_rate=st.session_state.deposit_rate,
+            payment_type=st.session_state.deposit_type,
+            option_price=st.session_state.option_price,
+            dealer_discount=st.session_state.dealer_discount,
+            dealer_fee_rate=st.session_state.dealer_fee_rate / 100,  # % → 소수
+            trace=True
+        )
+        return
+
     results = calculator.calculate_all_companies(
         car_price=st.session_state.selected_car['price'],
         product_type=st.session_state.product_type,
@@ -477,7 +546,8 @@ def calculate_results():
         payment_type=st.session_state.deposit_type,
         option_price=st.session_state.option_price,
         dealer_discount=st.session_state.dealer_discount,
-        dealer_fee_rate=st.session_state.dealer_fee_rate / 100  # % → 소수
+        dealer_fee_rate=st.session_state.dealer_fee_rate / 100,  # % → 소수
+        trace=True
     )
 
     st.session_state.results = results
@@ -485,6 +555,7 @@ def calculate_results():
 
 # ================ 모델 파라미터 페이지 ================
 
+@metrics.timed('app.render_params_page')
 def render_params_page():
     """모델 파라미터 대시보드"""
     st.markdown('<div class="main-header">📊 모델 파라미터 대시보드</div>', unsafe_allow_html=True)
@@ -551,6 +622,26 @@ def render_product_params(params, product_type, product_name):
         })
         st.bar_chart(chart_data.set_index('조건'))
 
+        # 앱 선택 조건 중 없는 조건에서 견적에 쓰는 파라미터 (보간 곡면 값, 곡면 범위 밖이면 가장 가까운 조건)
+        calculator = get_calculator()
+        substitutions = []
+        for period in QUOTE_PERIODS:
+            for mileage in QUOTE_MILEAGES[product_type]:
+                resolved = calculator.resolve_company_params(product_type, selected_company, period, mileage)
+                if resolved is None or resolved.provenance == 'exact':
+                    continue
+                substitutions.append({
+                    '요청 조건': f"{period}_{mileage}",
+                    '사용 조건': resolved.key,
+                    '출처': resolved.provenance,
+                    '기본요율 (%)': f"{resolved.params['base_rate']:.4f}",
+                    '옵션계수': f"{resolved.params['option_coefficient']:.6f}",
+                    '잔가율 (%)': f"{resolved.params['residual_rate']*100:.2f}"
+                })
+        if substitutions:
+            with st.expander(f"없는 조건의 적용 파라미터 ({len(substitutions)}건)"):
+                st.dataframe(pd.DataFrame(substitutions), use_container_width=True)
+
         # 상세 JSON
         with st.expander("전체 파라미터 (JSON)"):
             st.json(company_data)
@@ -608,6 +699,7 @@ def render_params_explanation():
 
 # ================ BNK 견적 페이지 ================
 
+@metrics.timed('app.render_bnk_page')
 def render_bnk_page():
     """BNK 견적 페이지 - 엑셀과 동일한 로직"""
     st.markdown('<div class="main-header">🏦 BNK 견적서</div>', unsafe_allow_html=True)
@@ -705,19 +797,29 @@ def render_bnk_page():
         else:
             deposit_rate = 0
 
-        # 계산 버튼
-        if st.button("💰 견적 계산", use_container_width=True, type="primary"):
+        # 계산 단계 메모 (사용자 세션별, 조건 하나만 바뀌면 그 하위 단계만 다시 계산)
+        if 'bnk_stages' not in st.session_state:
+            st.session_state.bnk_stages = {
+                'lease': bnk.stage_session('lease'),
+                'rental': bnk.stage_session('rental'),
+            }
+
+        # 계산 버튼 (한 번 계산한 뒤에는 조건을 바꿀 때마다 바로 다시 계산)
+        clicked = st.button("💰 견적 계산", use_container_width=True, type="primary")
+        if clicked or ('bnk_result' in st.session_state and car_price > 0):
             if product_type == '리스':
                 monthly, debug = bnk.calculate_lease(
                     car_price, option_price, period, rv_company, grade,
                     mileage, deposit_type, deposit_rate, dealer_discount,
-                    vehicle_type_eco, is_domestic
+                    vehicle_type_eco, is_domestic, trace=True,
+                    session=st.session_state.bnk_stages['lease']
                 )
             else:
                 monthly, debug = bnk.calculate_rental(
                     car_price, option_price, period, rv_company, grade,
                     mileage, deposit_type, deposit_rate, dealer_discount,
-                    vehicle_type_eco, is_domestic
+                    vehicle_type_eco, is_domestic, trace=True,
+                    session=st.session_state.bnk_stages['rental']
                 )
 
             st.session_state.bnk_result = (monthly, debug)
@@ -734,7 +836,7 @@ def render_bnk_page():
             # 상세 정보
             st.markdown("#### 📋 계산 상세")
             with st.expander("계산 과정 보기", expanded=True):
-                for step in debug['steps']:
+                for step in render_steps(debug):
                     st.text(step)
 
             # 잔가 정보
@@ -764,6 +866,9 @@ def main():
     elif st.session_state.page == 'params':
         render_params_page()
 
+    # FI_METRICS_FILE이 지정된 경우 계측값 저장
+    metrics.flush()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,306 @@
+"""
+계산기 핵심 경로 벤치마크
+- 단일 견적, 금융사 전체 계산, 최고잔가 탐색, 카탈로그 조회, 콜드 스타트, 전체 카탈로그 일괄 계산, 예산 검색,
+  핵심 모듈 import 시간
+- 결과를 JSON으로 저장하고, 기준값(baseline.json) 대비 느려진 항목을 회귀로 표시
+- 핵심 모듈 import는 기준값과 별개로 절대 예산(IMPORT_BUDGET)과 무거운 의존성 미사용을 검사
+
+사용법:
+    python benchmarks/run_benchmarks.py                       # 실행 후 baseline과 비교
+    python benchmarks/run_benchmarks.py --output result.json  # 결과 저장
+    python benchmarks/run_benchmarks.py --save-baseline       # 현재 결과를 baseline으로 저장
+    python benchmarks/run_benchmarks.py --only find_best_rv,catalog_get_grades
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DATA_DIR = os.path.join(ROOT_DIR, 'ref')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+sys.path.insert(0, SRC_DIR)
+
+# 계산기/로더 핵심 모듈 (배치 작업, API 워커가 import)
+CORE_MODULES = (
+    'calculator', 'bnk_calculator', 'data_loader', 'exact_quotes', 'budget_index', 'bnk_formula',
+    'catalog_snapshot', 'quote_schema', 'quote_cache', 'param_index', 'param_store', 'param_snapshot', 'param_history', 'calc_trace', 'stage_graph', 'metrics',
+)
+
+# 핵심 모듈 import 시점에 불러오면 안 되는 의존성 (사용하는 함수 안에서 import)
+HEAVY_MODULES = ('streamlit', 'pandas', 'numpy', 'openpyxl', 'pyarrow')
+
+# 핵심 모듈 전체 import 시간 예산 (초, 인터프리터 시작 시간 제외)
+IMPORT_BUDGET = 0.1
+
+
+def measure(func: Callable, number: int, repeat: int = 5) -> Dict:
+    """
+    func를 number회 실행하는 측정을 repeat번 반복
+
+    Returns:
+        {'median': 1회당 중앙값(초), 'min': 1회당 최소값(초), 'number': .., 'repeat': ..}
+    """
+    func()  # 워밍업
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'number': number,
+        'repeat': repeat
+    }
+
+
+def measure_subprocess(code: str, repeat: int = 3) -> Dict:
+    """새 인터프리터에서 code 실행 시간 측정 (콜드 스타트)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - started)
+    return {'median': statistics.median(samples), 'min': min(samples), 'number': 1, 'repeat': repeat}
+
+
+def measure_import(modules, repeat: int = 5) -> Dict:
+    """새 인터프리터에서 modules import 시간 측정 (import 후 로드된 무거운 의존성 포함)"""
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"for name in {list(modules)!r}:\n"
+        "    __import__(name)\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'heavy': [m for m in {list(HEAVY_MODULES)!r} if m in sys.modules]}}))"
+    )
+    samples = []
+    heavy = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        sample = json.loads(output)
+        samples.append(sample['elapsed'])
+        heavy.update(sample['heavy'])
+    return {'median': statistics.median(samples), 'min': min(samples), 'number': 1, 'repeat': repeat,
+            'heavy_modules': sorted(heavy)}
+
+
+def check_import_budget(result: Dict) -> List[str]:
+    """핵심 모듈 import 예산 위반 내역"""
+    violations = []
+    if result['heavy_modules']:
+        violations.append(f"핵심 모듈 import 시 무거운 의존성 로드: {', '.join(result['heavy_modules'])}")
+    if result['min'] > IMPORT_BUDGET:
+        violations.append(f"핵심 모듈 import {format_seconds(result['min'])} > 예산 {format_seconds(IMPORT_BUDGET)}")
+    return violations
+
+
+def _calibration_workload():
+    """기기 속도 보정용 순수 파이썬 작업"""
+    total = 0.0
+    table = {}
+    for i in range(2000):
+        table[i % 97] = total
+        total += i * 1.0001 / (i + 1)
+    return total
+
+
+def measure_calibration() -> float:
+    """보정 작업 1회 최소 시간 (초)"""
+    return measure(_calibration_workload, 200, repeat=7)['min']
+
+
+# ================ 벤치마크 정의 ================
+
+def build_benchmarks() -> Dict[str, Callable[[], Dict]]:
+    """벤치마크 이름 → 측정 함수"""
+    from calculator import ModelBasedCalculator
+    from bnk_calculator import BNKCalculator
+    from data_loader import DataLoader
+    from calc_trace import render_steps
+    from budget_index import BudgetIndex
+
+    calculator = ModelBasedCalculator()
+    bnk = BNKCalculator()
+    loader = DataLoader(DATA_DIR)
+    loader.load_carinfo()
+
+    company = calculator.get_available_companies('lease')[0]
+    prices = loader.carinfo['price'].to_numpy(dtype=float)
+    car_id = int(loader.carinfo['id_cargrade'].iloc[0])
+
+    def model_quote():
+        calculator.calculate_monthly_payment(55000000, 'lease', company, 36, '2만km', 10, '보증금')
+
+    def model_quote_trace():
+        _, debug = calculator.calculate_monthly_payment(55000000, 'lease', company, 36, '2만km', 10, '보증금',
+                                                        trace=True)
+        render_steps(debug)
+
+    def all_companies_uncached():
+        calculator.quote_cache.clear()
+        calculator.calculate_all_companies(55000000, 'lease', 36, '2만km', 10, '보증금')
+
+    def all_companies_cached():
+        calculator.calculate_all_companies(55000000, 'lease', 36, '2만km', 10, '보증금')
+
+    def bnk_lease_uncached():
+        bnk.quote_cache.clear()
+        bnk.calculate_lease(70000000, 0, 36, '최고잔가', 'A', '1만', '선수금', 20)
+
+    def find_best_rv():
+        bnk.find_best_rv(36, '1만')
+
+    lease_conditions = [
+        (period, mileage, rate, deposit_type)
+        for period in [24, 36, 48, 60]
+        for mileage in ['1만km', '2만km', '3만km', '4만km']
+        for deposit_type, rate in [('무보증', 0), ('보증금', 10), ('보증금', 30), ('선수금', 30)]
+    ]
+
+    def bulk_repricing():
+        calculator.calculate_batch(prices, 'lease', lease_conditions)
+
+    budget_index = BudgetIndex(loader, calculator)
+
+    def budget_query():
+        budget_index.query(800000, 'lease', 36, '2만km', 10, '보증금', limit=50)
+
+    cold_start_code = (
+        "from data_loader import DataLoader; from calculator import ModelBasedCalculator; "
+        "from bnk_calculator import BNKCalculator; "
+        f"DataLoader({DATA_DIR!r}).load_carinfo(); ModelBasedCalculator(); BNKCalculator()"
+    )
+
+    return {
+        'model_quote': lambda: measure(model_quote, 5000),
+        'model_quote_trace': lambda: measure(model_quote_trace, 1000),
+        'all_companies_uncached': lambda: measure(all_companies_uncached, 500),
+        'all_companies_cached': lambda: measure(all_companies_cached, 5000),
+        'bnk_lease_uncached': lambda: measure(bnk_lease_uncached, 2000),
+        'find_best_rv': lambda: measure(find_best_rv, 20000),
+        'catalog_get_models': lambda: measure(lambda: loader.get_models('BMW'), 20000),
+        'catalog_get_grades': lambda: measure(lambda: loader.get_grades('BMW', '1시리즈'), 20000),
+        'catalog_get_car_info': lambda: measure(lambda: loader.get_car_info(car_id), 20000),
+        'carinfo_load': lambda: measure(lambda: DataLoader(DATA_DIR).load_carinfo(), 5, repeat=3),
+        'cold_start': lambda: measure_subprocess(cold_start_code),
+        'bulk_repricing_lease': lambda: measure(bulk_repricing, 3, repeat=3),
+        'budget_query': lambda: measure(budget_query, 5000),
+        'core_import': lambda: measure_import(CORE_MODULES),
+    }
+
+
+# ================ 비교/출력 ================
+
+def compare(results: Dict, calibration: float, baseline: Dict, threshold: float) -> List[str]:
+    """
+    baseline 대비 threshold배 이상 느려진 항목
+
+    잡음이 적은 최소값(min)끼리 비교하고, 보정 작업 시간 비율로 기기/부하 속도 차이를 나눈다.
+    """
+    speed = calibration / baseline['meta']['calibration'] if baseline['meta'].get('calibration') else 1.0
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = result['min'] / (base['min'] * speed) if base['min'] else float('inf')
+        result['baseline_min'] = base['min']
+        result['ratio'] = ratio
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:,.2f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:,.2f} ms"
+    return f"{seconds:,.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="계산기 벤치마크")
+    parser.add_argument('--only', default='', help="실행할 벤치마크 이름 (쉼표 구분)")
+    parser.add_argument('--output', help="결과 JSON 저장 경로")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="비교할 기준 결과 JSON")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="기준 대비 이 배수보다 느리면 회귀로 판단")
+    parser.add_argument('--save-baseline', action='store_true', help="현재 결과를 기준으로 저장")
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks()
+    selected = [name.strip() for name in args.only.split(',') if name.strip()] or list(benchmarks)
+    unknown = [name for name in selected if name not in benchmarks]
+    if unknown:
+        parser.error(f"알 수 없는 벤치마크: {', '.join(unknown)}")
+
+    calibration = measure_calibration()
+    results = {}
+    for name in selected:
+        results[name] = benchmarks[name]()
+        print(f"{name:<28} {format_seconds(results[name]['median']):>14}  (min {format_seconds(results[name]['min'])})")
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'calibration': calibration
+        },
+        'results': results
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, calibration, baseline, args.threshold)
+        report['regressions'] = regressions
+
+        print("-" * 60)
+        for name in selected:
+            if 'ratio' in results[name]:
+                marker = "❌ 회귀" if name in regressions else "✓"
+                print(f"{name:<28} 기준 대비 {results[name]['ratio']:.2f}배 (속도 보정) {marker}")
+            else:
+                print(f"{name:<28} 기준 없음 (--save-baseline으로 기준 갱신 필요)")
+
+    violations = check_import_budget(results['core_import']) if 'core_import' in results else []
+    if violations:
+        report['import_budget_violations'] = violations
+        for violation in violations:
+            print(f"❌ {violation}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"기준 결과 저장: {args.baseline}")
+
+    if regressions:
+        print(f"회귀 {len(regressions)}건: {', '.join(regressions)}")
+    if regressions or violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+공유 계산기·카탈로그 동시성 스트레스 검사
+- 스레드 풀에서 싱글톤 getter를 동시에 처음 호출해 파일 로드·컴파일이 한 번씩만 일어나는지 확인
+- 같은 객체들을 여러 스레드에서 두드리면서 카탈로그 재로드, 파라미터 스냅샷 재빌드를 동시에 진행하고,
+  모든 결과가 단일 스레드 기준 계산기와 같은지(반쯤 바뀐 상태를 읽지 않는지) 확인
+- 격자 밖 조건을 계속 넣어 파라미터 저장소 조건 메모 한도 초과(저장소 교체)도 함께 검사
+
+사용법:
+    python benchmarks/stress_singletons.py                      # 16스레드, 5초
+    python benchmarks/stress_singletons.py --threads 32 --seconds 20
+    python benchmarks/stress_singletons.py --memo-limit 4096       # 실제 메모 한도로 실행 (기본은 교체가 자주 일어나게 축소)
+
+문제가 있으면 종료 코드 1.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+DATA_DIR = os.path.join(ROOT_DIR, 'ref')
+sys.path.insert(0, SRC_DIR)
+
+import metrics  # noqa: E402
+
+# 한 번만 일어나야 하는 로드·컴파일 계측 이름
+LOAD_SPANS = ('loader.load_carinfo', 'calculator.load_params', 'bnk.load_rv_tables', 'bnk.compile_rv_tables')
+
+PERIODS = (12, 24, 36, 42, 48, 60, 72)
+MILEAGES = ('1만km', '2만km', '3만km', '4만km', '무제한')
+BNK_MILEAGES = ('1만', '1.5만', '2만', '3만')
+
+
+class Reference:
+    """단일 스레드 기준 계산 (공유 객체와 따로 만든 계산기, 잠금으로 직렬화)"""
+
+    def __init__(self):
+        from bnk_calculator import BNKCalculator
+        from calculator import ModelBasedCalculator
+        from data_loader import DataLoader
+
+        self.calculator = ModelBasedCalculator()
+        self.bnk = BNKCalculator()
+        self.loader = DataLoader(DATA_DIR)
+        self.loader.load_carinfo()
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    def get(self, key, compute):
+        with self._lock:
+            value = self._memo.get(key)
+            if value is None:
+                value = compute(self)
+                self._memo[key] = value
+            return value
+
+
+def _random_mileage(rng: random.Random) -> str:
+    """격자 밖 조건을 만들기 위한 주행거리 (예: '2.37만km')"""
+    if rng.random() < 0.5:
+        return rng.choice(MILEAGES)
+    return f"{rng.uniform(1, 4):.2f}만km"
+
+
+def _initial_calls(threads: int) -> dict:
+    """모든 스레드가 동시에 싱글톤 getter를 처음 호출"""
+    from bnk_calculator import get_bnk_calculator
+    from budget_index import get_budget_index
+    from calculator import get_calculator
+    from data_loader import get_data_loader
+    from exact_quotes import get_exact_quote_index
+
+    barrier = threading.Barrier(threads)
+
+    def first_call(_):
+        barrier.wait()
+        return (get_data_loader(DATA_DIR), get_calculator(), get_bnk_calculator(),
+                get_budget_index(DATA_DIR), get_exact_quote_index(DATA_DIR))
+
+    with ThreadPoolExecutor(threads) as pool:
+        instances = list(pool.map(first_call, range(threads)))
+
+    distinct = [len({id(instance[i]) for instance in instances}) for i in range(5)]
+    return {'instances': instances[0], 'distinct': distinct}
+
+
+def _worker(seed: int, deadline: float, shared, reference: Reference, failures: list, counts: dict):
+    """공유 객체 조회 반복 (결과를 기준 계산과 비교)"""
+    loader, calculator, bnk, budget, _ = shared
+    rng = random.Random(seed)
+    brands = reference.loader.get_brands()
+    car_ids = list(reference.loader._get_catalog().cars_by_id)
+    done = 0
+
+    while time.monotonic() < deadline:
+        try:
+            kind = rng.randrange(6)
+            if kind == 0:
+                # 카탈로그: 브랜드 → 모델 → 등급이 한 버전 안에서 일관적인지
+                brand = rng.choice(brands)
+                models = loader.get_models(brand)
+                model = rng.choice(models)
+                grades = loader.get_grades(brand, model)
+                expected = reference.get(('grades', brand, model),
+                                         lambda ref: (ref.loader.get_models(brand), ref.loader.get_grades(brand, model)))
+                if (models, grades) != expected:
+                    failures.append(f"카탈로그 불일치: {brand}/{model}")
+            elif kind == 1:
+                car_id = rng.choice(car_ids)
+                expected = reference.get(('car', car_id), lambda ref: ref.loader.get_car_info(car_id))
+                if loader.get_car_info(car_id) != expected:
+                    failures.append(f"차량 정보 불일치: {car_id}")
+            elif kind == 2:
+                product = rng.choice(('lease', 'rent'))
+                period = rng.randint(12, 72) if rng.random() < 0.5 else rng.choice(PERIODS)
+                mileage = _random_mileage(rng)
+                price = rng.randrange(20_000_000, 200_000_000, 1_000_000)
+                companies = reference.get(('companies', product), lambda ref: ref.calculator.get_available_companies(product))
+                company = rng.choice(companies)
+                got = calculator.calculate_monthly_payment(price, product, company, period, mileage)
+                expected = reference.get(('quote', product, company, period, mileage, price),
+                                         lambda ref: ref.calculator.calculate_monthly_payment(
+                                             price, product, company, period, mileage))
+                if got[0] != expected[0] or got[1].get('params_key') != expected[1].get('params_key'):
+                    failures.append(f"단일 견적 불일치: {product}/{company}/{period}/{mileage}: {got[0]} != {expected[0]}")
+            elif kind == 3:
+                product = rng.choice(('lease', 'rent'))
+                period = rng.choice(PERIODS)
+                mileage = _random_mileage(rng)
+                price = rng.randrange(20_000_000, 200_000_000, 1_000_000)
+                got = [(r['company'], r['monthly_payment'])
+                       for r in calculator.calculate_all_companies(price, product, period, mileage)]
+                expected = reference.get(('all', product, period, mileage, price), lambda ref: [
+                    (r['company'], r['monthly_payment'])
+                    for r in ref.calculator.calculate_all_companies(price, product, period, mileage)])
+                if got != expected:
+                    failures.append(f"금융사 전체 불일치: {product}/{period}/{mileage}")
+                companies, matrix = calculator.calculate_payment_matrix([price], product, period, mileage)
+                if sorted(zip(companies, matrix[:, 0].tolist())) != sorted(expected):
+                    failures.append(f"행렬 불일치: {product}/{period}/{mileage}")
+            elif kind == 4:
+                period = rng.choice((12, 24, 36, 48, 60))
+                mileage = rng.choice(BNK_MILEAGES)
+                price = rng.randrange(20_000_000, 200_000_000, 1_000_000)
+                got = bnk.calculate_lease(price, 0, period, mileage=mileage)[0]
+                expected = reference.get(('bnk', period, mileage, price),
+                                         lambda ref: ref.bnk.calculate_lease(price, 0, period, mileage=mileage)[0])
+                if got != expected:
+                    failures.append(f"BNK 리스 불일치: {period}/{mileage}/{price}")
+            else:
+                budget.count(rng.randrange(300_000, 3_000_000), 'lease', 36, '2만km')
+            done += 1
+        except Exception:
+            failures.append(traceback.format_exc())
+
+    counts[seed] = done
+
+
+def _reloader(deadline: float, shared, counts: dict, failures: list):
+    """카탈로그 재로드와 스냅샷 재빌드를 반복 (같은 파일이므로 결과는 바뀌지 않아야 함)"""
+    loader, calculator, bnk, _, _ = shared
+    reloads = 0
+    while time.monotonic() < deadline:
+        try:
+            loader.load_carinfo()
+            calculator.snapshots.check(force=True)
+            bnk.snapshots.check(force=True)
+            reloads += 1
+        except Exception:
+            failures.append(traceback.format_exc())
+        time.sleep(0.01)
+    counts['reloads'] = reloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="공유 계산기·카탈로그 동시성 스트레스 검사")
+    parser.add_argument('--threads', type=int, default=16, help="동시 스레드 수")
+    parser.add_argument('--seconds', type=float, default=5.0, help="조회 반복 시간 (초)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memo-limit', type=int, default=64, help="파라미터 저장소 조건 메모 한도")
+    args = parser.parse_args()
+
+    import param_store
+    param_store.MAX_MEMO_SIZE = args.memo_limit
+    metrics.enable()
+    problems = []
+
+    # 1. 동시 첫 호출: 인스턴스 1개, 로드 1회
+    initial = _initial_calls(args.threads)
+    spans = metrics.snapshot()['spans']
+    load_counts = {name: spans.get(name, {}).get('count', 0) for name in LOAD_SPANS}
+    print(f"첫 호출 {args.threads}스레드: 인스턴스 수 {initial['distinct']}, 로드 횟수 {load_counts}")
+    if any(count != 1 for count in initial['distinct']):
+        problems.append(f"싱글톤 인스턴스가 여러 개 생성됨: {initial['distinct']}")
+    for name, count in load_counts.items():
+        if count != 1:
+            problems.append(f"{name}: {count}회 (1회여야 함)")
+
+    # 2. 동시 조회 + 재로드
+    reference = Reference()
+    failures = []
+    counts = {}
+    deadline = time.monotonic() + args.seconds
+    shared = initial['instances']
+    with ThreadPoolExecutor(args.threads + 1) as pool:
+        futures = [pool.submit(_reloader, deadline, shared, counts, failures)]
+        for i in range(args.threads):
+            futures.append(pool.submit(_worker, args.seed * 1000 + i, deadline, shared, reference, failures, counts))
+    for future in futures:
+        if future.exception() is not None:
+            failures.append(''.join(traceback.format_exception(future.exception())))
+
+    calls = sum(value for key, value in counts.items() if key != 'reloads')
+    renewed = metrics.snapshot()['counters'].get('calculator.param_store.renewed', 0)
+    print(f"조회 {calls:,}회, 재로드 {counts.get('reloads', 0)}회, 파라미터 저장소 교체 {renewed:g}회, 실패 {len(failures)}건")
+    for failure in failures[:10]:
+        print(failure)
+    problems.extend(failures)
+
+    if problems:
+        print(f"실패: {len(problems)}건")
+        sys.exit(1)
+    print("통과")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+전체 카탈로그 재계산 (야간 배치)
+- carinfo.xlsx 전 차량 × 금융사 × 기간 × 주행거리 × 보증금 조건 월납입금 계산
+- BNK 리스/렌트 (최고잔가) 변형 포함
+- 카탈로그를 샤드로 나눠 프로세스 풀에서 계산하고, 샤드별 파일로 바로 저장 (메모리에 누적하지 않음)
+- manifest.json 체크포인트로 중단된 실행을 이어서 재개
+
+사용법:
+    python reprice_catalog.py --output-dir out/reprice --workers 8
+    python reprice_catalog.py --output-dir out/reprice --format csv --products model
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# src 디렉토리를 Python 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from calculator import DEPOSIT_RATES, QUOTE_MILEAGES, QUOTE_PERIODS
+from data_loader import DataLoader
+
+
+# 모델 기반 조건 (앱 선택지와 같은 calculator.QUOTE_PERIODS / QUOTE_MILEAGES,
+# model_params.json에 없는 12·72개월, 1.5만km 등은 보간 곡면 값)
+MODEL_PERIODS = list(QUOTE_PERIODS)
+MODEL_MILEAGES = {product_type: list(mileages) for product_type, mileages in QUOTE_MILEAGES.items()}
+
+# BNK 조건 (BNK 견적 페이지 선택지와 동일)
+BNK_PERIODS = [12, 24, 36, 42, 44, 48, 60]
+BNK_MILEAGES = ['1만', '1.5만', '2만', '3만']
+
+# 보증금/선납금 조건 (앱 선택지와 같은 calculator.DEPOSIT_RATES)
+DEPOSIT_OPTIONS = [('무보증', 0)] + [
+    (deposit_type, rate) for deposit_type in ['보증금', '선수금'] for rate in DEPOSIT_RATES if rate
+]
+
+# 국산 브랜드 (BNK 잔존가치 기준금액 구분)
+DOMESTIC_BRANDS = {'현대', '기아', '제네시스', 'KGM', '르노코리아', '쉐보레'}
+
+OUTPUT_COLUMNS = ['id_cargrade', 'source', 'product', 'company', 'period', 'mileage',
+                  'payment_type', 'deposit_rate', 'monthly_payment']
+
+
+def vehicle_type_eco(fuel_type: str) -> str:
+    """연료 → BNK 차종 구분"""
+    if fuel_type == '전기':
+        return '전기'
+    if '하이브리드' in str(fuel_type):
+        return 'HEV'
+    return '일반'
+
+
+# ================ 워커 ================
+
+_worker_calculators = None
+
+
+def _init_worker():
+    """워커 프로세스별 계산기 1회 생성"""
+    global _worker_calculators
+    from calculator import ModelBasedCalculator
+    from bnk_calculator import BNKCalculator
+    _worker_calculators = (ModelBasedCalculator(), BNKCalculator())
+
+
+def _price_model(calculator, cars: Dict[str, np.ndarray]) -> List[pd.DataFrame]:
+    """모델 기반 일괄 계산 (조건별 금융사 × 차량 행렬 → long format)"""
+    frames = []
+    ids = cars['id_cargrade']
+
+    for product_type, mileages in MODEL_MILEAGES.items():
+        conditions = [
+            (period, mileage, rate, deposit_type)
+            for period in MODEL_PERIODS
+            for mileage in mileages
+            for deposit_type, rate in DEPOSIT_OPTIONS
+        ]
+        batch = calculator.calculate_batch(cars['price'], product_type, conditions)
+
+        for (period, mileage, rate, deposit_type), (companies, matrix) in batch.items():
+            if not companies:
+                continue
+            company_idx, car_idx = np.nonzero(matrix > 0)
+            frames.append(pd.DataFrame({
+                'id_cargrade': ids[car_idx],
+                'source': 'model',
+                'product': product_type,
+                'company': np.asarray(companies, dtype=object)[company_idx],
+                'period': period,
+                'mileage': mileage,
+                'payment_type': deposit_type,
+                'deposit_rate': rate,
+                'monthly_payment': matrix[company_idx, car_idx]
+            }, columns=OUTPUT_COLUMNS))
+
+    return frames
+
+
+def _price_bnk(bnk, cars: Dict[str, np.ndarray]) -> List[pd.DataFrame]:
+    """
+    BNK 리스/렌트 계산 (최고잔가)
+
+    최고잔가는 차량과 무관하게 기간 × 주행거리로 정해지므로, 조건마다 잔가율을 한 번 구하고
+    차종 구분·국산 여부가 같은 차량끼리 배열로 계산한다 (calculate_lease / calculate_rental과 같은 값).
+    샤드 전체는 한 잔가율 스냅샷으로 계산하고, 차량마다 다른 견적 캐시 키는 만들지 않는다.
+    """
+    ids = cars['id_cargrade']
+    prices = cars['price']
+    groups = {}
+    for i, (eco, domestic) in enumerate(zip(cars['vehicle_type_eco'], cars['is_domestic'])):
+        groups.setdefault((eco, bool(domestic)), []).append(i)
+    groups = {key: np.asarray(positions) for key, positions in groups.items()}
+
+    rv = bnk.rv_at()
+    frames = []
+    for product in ('lease', 'rental'):
+        for period in BNK_PERIODS:
+            for mileage in BNK_MILEAGES:
+                best = rv.find_best(period, mileage)
+                rv_rate = rv.residual_rate(best['company'], period, best['grade'], mileage)
+                for deposit_type, rate in DEPOSIT_OPTIONS:
+                    monthly = np.empty(len(ids))
+                    for (eco, domestic), positions in groups.items():
+                        monthly[positions] = bnk._payment_vector(
+                            product, prices[positions], 0, period, rv_rate, deposit_type, rate, 0, eco, domestic
+                        )
+                    frames.append(pd.DataFrame({
+                        'id_cargrade': ids,
+                        'source': 'bnk',
+                        'product': product,
+                        'company': best['company'],
+                        'period': period,
+                        'mileage': mileage,
+                        'payment_type': deposit_type,
+                        'deposit_rate': rate,
+                        'monthly_payment': np.rint(monthly).astype(np.int64)  # round()와 같은 짝수 반올림
+                    }, columns=OUTPUT_COLUMNS))
+
+    return frames
+
+
+def _write_frame(df: pd.DataFrame, path: str, fmt: str):
+    """샤드 파일 저장 (임시 파일에 쓴 뒤 교체)"""
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def price_shard(shard_id: int, cars: Dict[str, np.ndarray], products: Tuple[str, ...],
+                output_dir: str, fmt: str) -> Tuple[int, int, float]:
+    """
+    샤드 하나 계산 후 파일로 저장
+
+    Returns:
+        (샤드 번호, 행 수, 소요 시간)
+    """
+    started = time.perf_counter()
+    calculator, bnk = _worker_calculators
+
+    frames = []
+    if 'model' in products:
+        frames.extend(_price_model(calculator, cars))
+    if 'bnk' in products:
+        frames.extend(_price_bnk(bnk, cars))
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    _write_frame(df, shard_path(output_dir, shard_id, fmt), fmt)
+
+    return shard_id, len(df), time.perf_counter() - started
+
+
+# ================ 실행 관리 ================
+
+def shard_path(output_dir: str, shard_id: int, fmt: str) -> str:
+    return os.path.join(output_dir, f"part-{shard_id:05d}.{fmt}")
+
+
+def load_catalog(data_dir: str) -> Dict[str, np.ndarray]:
+    """카탈로그 → 컬럼 배열"""
+    carinfo = DataLoader(data_dir).load_carinfo()
+    return {
+        'id_cargrade': carinfo['id_cargrade'].to_numpy(),
+        'price': carinfo['price'].to_numpy(dtype=np.float64),
+        'vehicle_type_eco': np.array([vehicle_type_eco(f) for f in carinfo['fuel_type']], dtype=object),
+        'is_domestic': carinfo['brand'].isin(DOMESTIC_BRANDS).to_numpy(),
+    }
+
+
+def run_fingerprint(catalog: Dict[str, np.ndarray], products: Tuple[str, ...],
+                    shard_size: int, fmt: str) -> str:
+    """재개 가능 여부 판단용 실행 설정 지문 (카탈로그 + 파라미터 파일 + 계산 조건 + 옵션)"""
+    digest = hashlib.sha256()
+    digest.update(catalog['id_cargrade'].tobytes())
+    digest.update(catalog['price'].tobytes())
+    for name in ('model_params.json', 'bnk_rv_tables.json'):
+        with open(os.path.join(os.path.dirname(__file__), 'src', name), 'rb') as f:
+            digest.update(f.read())
+    conditions = [MODEL_PERIODS, MODEL_MILEAGES, BNK_PERIODS, BNK_MILEAGES, DEPOSIT_OPTIONS]
+    digest.update(json.dumps([products, shard_size, fmt, conditions], ensure_ascii=False).encode())
+    return digest.hexdigest()[:16]
+
+
+def clear_stale_shards(output_dir: str, manifest: Dict, fmt: str) -> int:
+    """
+    체크포인트에 완료로 기록되지 않은 샤드 파일 삭제 (이전 실행의 남은 part-* 파일이 섞이지 않도록)
+
+    Returns:
+        삭제한 파일 수
+    """
+    keep = {os.path.basename(shard_path(output_dir, int(shard_id), fmt)) for shard_id in manifest['completed']}
+    removed = 0
+    for name in os.listdir(output_dir):
+        if name.startswith('part-') and name not in keep:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+    return removed
+
+
+def load_manifest(path: str, fingerprint: str) -> Dict:
+    """체크포인트 로드 (설정이 다르면 새로 시작)"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('fingerprint') == fingerprint:
+            return manifest
+        print("  → 설정/데이터가 바뀌어 체크포인트를 무시하고 처음부터 계산합니다")
+    return {'fingerprint': fingerprint, 'completed': {}}
+
+
+def save_manifest(path: str, manifest: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전체 카탈로그 월납입금 재계산")
+    parser.add_argument('--data-dir', default='ref')
+    parser.add_argument('--output-dir', default=os.path.join('out', 'reprice'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=64, help="샤드당 차량 수")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--products', default='model,bnk', help="model, bnk 중 쉼표 구분")
+    parser.add_argument('--limit', type=int, default=0, help="앞에서 N대만 계산 (점검용)")
+    args = parser.parse_args()
+
+    products = tuple(p.strip() for p in args.products.split(',') if p.strip())
+
+    print("=" * 60)
+    print("전체 카탈로그 재계산")
+    print("=" * 60)
+
+    catalog = load_catalog(args.data_dir)
+    if args.limit:
+        catalog = {name: values[:args.limit] for name, values in catalog.items()}
+    n_cars = len(catalog['id_cargrade'])
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, 'manifest.json')
+    fingerprint = run_fingerprint(catalog, products, args.shard_size, args.format)
+    manifest = load_manifest(manifest_path, fingerprint)
+    removed = clear_stale_shards(args.output_dir, manifest, args.format)
+    if removed:
+        print(f"  → 이전 실행의 샤드 파일 {removed}개 삭제")
+    save_manifest(manifest_path, manifest)
+
+    shards = []
+    for shard_id, start in enumerate(range(0, n_cars, args.shard_size)):
+        done = manifest['completed'].get(str(shard_id))
+        if done and os.path.exists(shard_path(args.output_dir, shard_id, args.format)):
+            continue
+        shards.append((shard_id, {name: values[start:start + args.shard_size]
+                                  for name, values in catalog.items()}))
+
+    total_shards = (n_cars + args.shard_size - 1) // args.shard_size
+    print(f"차량 {n_cars:,}대, 샤드 {total_shards}개 (남은 샤드 {len(shards)}개), 워커 {args.workers}개")
+
+    started = time.perf_counter()
+    rows_done = 0
+    cars_done = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(price_shard, shard_id, cars, products, args.output_dir, args.format): len(cars['id_cargrade'])
+            for shard_id, cars in shards
+        }
+        for future in as_completed(futures):
+            shard_id, rows, seconds = future.result()
+            rows_done += rows
+            cars_done += futures[future]
+
+            manifest['completed'][str(shard_id)] = {'rows': rows, 'seconds': round(seconds, 3)}
+            save_manifest(manifest_path, manifest)
+
+            elapsed = time.perf_counter() - started
+            print(f"  ✓ 샤드 {shard_id:05d}: {rows:,}행 ({seconds:.1f}초) | "
+                  f"진행 {len(manifest['completed'])}/{total_shards} | "
+                  f"{cars_done / elapsed:,.1f}대/초, {rows_done / elapsed:,.0f}행/초")
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(entry['rows'] for entry in manifest['completed'].values())
+    print("=" * 60)
+    print(f"완료: 총 {total_rows:,}행, 이번 실행 {rows_done:,}행 / {elapsed:.1f}초")
+    if elapsed > 0:
+        print(f"처리량: {cars_done / elapsed:,.1f}대/초, {rows_done / elapsed:,.0f}행/초")
+    print(f"출력: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,212 +1,215 @@
 """
 Excel 데이터 분석 스크립트
 - 금융사별 잔가율, 요율, 계수 추출
+- 시트별로 1st 금융사 블록을 열 단위로 한 번에 잘라 계산하고, 금융사별 통계는 행 묶음 단위로 누적
+- 시트는 프로세스 풀에서 병렬 처리
+
+사용법:
+    cd src && python analyze_data.py [--data-dir ../ref] [--output-dir ../src] [--workers N]
 """
 
-import pandas as pd
-import numpy as np
+import argparse
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 
 
-def analyze_lease_data(data_dir="../ref"):
+# 1st 금융사 컬럼 기준 오프셋 (해당 셀이 숫자로 변환되지 않는 행은 제외)
+LEASE_OFFSETS = {
+    'monthly_0': 1,            # 무보증 월대여료
+    'monthly_500': 2,          # 옵션 500만원 월대여료
+    'fee_1': 7,                # 딜러 Fee 1%
+    'deposit_monthly_0': 12,   # 보증금 월대여료
+    'deposit_monthly_500': 13,
+    'deposit_ref_0': 14,
+}
+RENT_OFFSETS = {
+    'monthly_0': 1,
+    'monthly_500': 2,
+    'fee_1': 6,
+}
+
+# 차량가격 컬럼 (엔진cc 헤더 아래, 5번째 컬럼)
+PRICE_COLUMN = 4
+
+# 한 번에 누적할 행 수
+CHUNK_ROWS = 4096
+
+
+class RunningStats:
+    """평균/표준편차 누적 (행 묶음 단위 병합, Chan et al. 병렬 분산 공식)"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, size: int):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+
+    def merge(self, count: int, mean: np.ndarray, m2: np.ndarray):
+        """다른 묶음의 (개수, 평균, 편차제곱합) 병합"""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def std(self) -> np.ndarray:
+        """모표준편차 (np.std와 동일, ddof=0)"""
+        return np.sqrt(self.m2 / self.count)
+
+
+def _float_column(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    컬럼을 float 배열로 변환
+
+    Returns:
+        (값, 변환 성공 여부) - 행 단위 float(셀)이 성공하는 경우와 같음 (빈 셀은 NaN으로 성공)
+    """
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        return values, np.ones(len(values), dtype=bool)
+    converted = pd.to_numeric(series, errors='coerce')
+    ok = converted.notna().to_numpy() | series.isna().to_numpy()
+    return converted.to_numpy(dtype=np.float64), ok
+
+
+def _find_company_column(columns) -> Optional[int]:
+    """'1st' 금융사 컬럼 위치"""
+    for i, column in enumerate(columns):
+        if '1st' in str(column):
+            return i
+    return None
+
+
+def _accumulate(stats: Dict, companies: np.ndarray, values: np.ndarray):
+    """행 묶음의 금융사별 통계를 누적 (금융사 순서는 처음 나타난 순서)"""
+    codes, uniques = pd.factorize(companies, sort=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    sums = np.stack([np.bincount(codes, weights=values[:, j], minlength=len(uniques))
+                     for j in range(values.shape[1])], axis=1)
+    means = sums / counts[:, None]
+    deviations = values - means[codes]
+    m2 = np.stack([np.bincount(codes, weights=deviations[:, j] ** 2, minlength=len(uniques))
+                   for j in range(values.shape[1])], axis=1)
+
+    for k, company in enumerate(uniques):
+        if company not in stats:
+            stats[company] = RunningStats(values.shape[1])
+        stats[company].merge(int(counts[k]), means[k], m2[k])
+
+
+def analyze_sheet(filepath: str, sheet_name: str, offsets: Dict[str, int]) -> Tuple[str, Optional[Dict]]:
+    """
+    시트 1개 분석
+
+    Returns:
+        (상태 메시지, {'period', 'mileage', 'companies': {금융사: RunningStats}} 또는 None)
+    """
+    df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
+
+    # 실제 데이터만 (NaN 행 제거)
+    if len(df.columns) == 0:
+        return "컬럼 없음, 건너뛰기", None
+
+    # 첫 번째 컬럼이 있는 행만
+    df = df[df.iloc[:, 0].notna()].reset_index(drop=True)
+    if len(df) == 0:
+        return "데이터 없음, 건너뛰기", None
+
+    # 계약기간, 주행거리 파싱
+    parts = sheet_name.split('_')
+    period = int(parts[0].replace('개월', ''))
+    mileage = parts[1]
+
+    result = {'period': period, 'mileage': mileage, 'companies': {}}
+
+    # 1st 금융사 블록 (모든 행에서 같은 위치)
+    company_idx = _find_company_column(df.columns)
+    if company_idx is None or company_idx + max(offsets.values()) >= len(df.columns):
+        return "", result
+
+    car_price, price_ok = _float_column(df.iloc[:, PRICE_COLUMN])
+    company = df.iloc[:, company_idx]
+    mask = price_ok & (car_price != 0) & ~np.isnan(car_price) & company.notna().to_numpy()
+
+    columns = {}
+    for name, offset in offsets.items():
+        columns[name], ok = _float_column(df.iloc[:, company_idx + offset])
+        mask &= ok
+
+    car_price = car_price[mask]
+    monthly_0 = columns['monthly_0'][mask]
+    monthly_500 = columns['monthly_500'][mask]
+    companies = company.to_numpy()[mask]
+
+    # 1. 기본 요율 (차량가 대비 월대여료)
+    base_rate = monthly_0 / car_price * 100
+    # 2. 옵션 계수 (500만원당 월대여료 증가액)
+    option_coefficient = (monthly_500 - monthly_0) / 5000000
+    # 3. 잔가율 추정: 1 - (월대여료 × 개월수 / 차량가), 0~1 (계산 불가(NaN)는 1)
+    residual_rate = 1 - (monthly_0 * period / car_price)
+    residual_rate = np.where(np.isnan(residual_rate), 1.0, np.clip(residual_rate, 0, 1))
+
+    # 누적 값 열 순서: base_rate, option_coefficient, residual_rate
+    values = np.column_stack([base_rate, option_coefficient, residual_rate])
+    for start in range(0, len(values), CHUNK_ROWS):
+        _accumulate(result['companies'], companies[start:start + CHUNK_ROWS], values[start:start + CHUNK_ROWS])
+
+    return "", result
+
+
+def _analyze_sheet_task(task: Tuple[str, str, Dict[str, int]]) -> Tuple[str, Optional[Dict]]:
+    return analyze_sheet(*task)
+
+
+def analyze_workbooks(jobs: List[Tuple[str, Dict[str, int]]], workers: Optional[int] = None) -> List[Dict]:
+    """
+    여러 통합문서의 모든 시트를 병렬 분석
+
+    Args:
+        jobs: (파일 경로, 오프셋) 목록
+        workers: 프로세스 수 (기본: CPU 수, 1이면 현재 프로세스에서 처리)
+
+    Returns:
+        jobs 순서대로 {조건키: 시트 분석 결과}
+    """
+    tasks = []
+    for filepath, offsets in jobs:
+        for sheet_name in pd.ExcelFile(filepath).sheet_names:
+            tasks.append((filepath, sheet_name, offsets))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        outputs = [_analyze_sheet_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            outputs = list(pool.map(_analyze_sheet_task, tasks))
+
+    results = {filepath: {} for filepath, _ in jobs}
+    for (filepath, sheet_name, _), (message, result) in zip(tasks, outputs):
+        print(f"\n분석 중: {os.path.basename(filepath)} / {sheet_name}")
+        if message:
+            print(f"  → {message}")
+        if result is not None:
+            results[filepath][f"{result['period']}_{result['mileage']}"] = result
+    return [results[filepath] for filepath, _ in jobs]
+
+
+def analyze_lease_data(data_dir="../ref", workers: Optional[int] = None):
     """리스 데이터 분석"""
-    filepath = os.path.join(data_dir, "lease.xlsx")
-    excel_file = pd.ExcelFile(filepath)
-
-    results = {}
-
-    for sheet_name in excel_file.sheet_names:
-        print(f"\n분석 중: {sheet_name}")
-        df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
-
-        # 실제 데이터만 (NaN 행 제거)
-        if len(df.columns) == 0:
-            print(f"  → 컬럼 없음, 건너뛰기")
-            continue
-
-        # 첫 번째 컬럼이 있는 행만
-        first_col = df.columns[0]
-        df = df[df[first_col].notna()].copy()
-        df = df.reset_index(drop=True)
-
-        if len(df) == 0:
-            print(f"  → 데이터 없음, 건너뛰기")
-            continue
-
-        # 계약기간, 주행거리 파싱
-        parts = sheet_name.split('_')
-        period = int(parts[0].replace('개월', ''))
-        mileage = parts[1]
-
-        key = f"{period}_{mileage}"
-        results[key] = {
-            'period': period,
-            'mileage': mileage,
-            'companies': {}
-        }
+    return analyze_workbooks([(os.path.join(data_dir, "lease.xlsx"), LEASE_OFFSETS)], workers)[0]
 
-        # 금융사별 분석 (1st만 분석)
-        for idx, row in df.iterrows():
-            # 차량가격은 엔진cc 컬럼 (4번째)
-            try:
-                car_price = float(row.iloc[4])
-            except:
-                continue
-
-            if not car_price or car_price == 0 or pd.isna(car_price):
-                continue
-
-            # 1st 금융사 데이터
-            try:
-                # 1st 컬럼 찾기
-                columns = row.index.tolist()
-                company_idx = None
-                for i, col in enumerate(columns):
-                    if '1st' in str(col):
-                        company_idx = i
-                        break
-
-                if company_idx is None:
-                    continue
-
-                company = row.iloc[company_idx]
-                if pd.isna(company):
-                    continue
-
-                # 무보증 (company_idx 기준 +1, +2, ...)
-                monthly_0 = float(row.iloc[company_idx + 1])
-                monthly_500 = float(row.iloc[company_idx + 2])
-                fee_1 = float(row.iloc[company_idx + 7])
-
-                # 보증금 (company_idx + 12, 13, 14)
-                deposit_monthly_0 = float(row.iloc[company_idx + 12])
-                deposit_monthly_500 = float(row.iloc[company_idx + 13])
-                deposit_ref_0 = float(row.iloc[company_idx + 14])
-
-                # 분석
-                # 1. 기본 요율 (차량가 대비 월대여료)
-                base_rate = monthly_0 / car_price * 100
-
-                # 2. 옵션 계수 (500만원당 월대여료 증가액)
-                option_coefficient = (monthly_500 - monthly_0) / 5000000
-
-                # 3. 잔가율 추정 (월대여료로부터 역산)
-                # 월대여료 = (차량가 - 잔가) / 개월수 + 이자 등
-                # 간단히: 잔가율 = 1 - (월대여료 * 개월수 / 차량가)
-                residual_rate = 1 - (monthly_0 * period / car_price)
-                residual_rate = max(0, min(1, residual_rate))  # 0~1 사이
-
-                # 4. 보증금 할인 계수
-                # 보증금 30% 기준으로 월대여료가 얼마나 줄어드는지
-                deposit_discount_rate = (deposit_ref_0 - deposit_monthly_0) / deposit_ref_0 * 100 if deposit_ref_0 > 0 else 0
-
-                if company not in results[key]['companies']:
-                    results[key]['companies'][company] = []
-
-                results[key]['companies'][company].append({
-                    'car_price': car_price,
-                    'base_rate': base_rate,
-                    'option_coefficient': option_coefficient,
-                    'residual_rate': residual_rate,
-                    'deposit_discount_rate': deposit_discount_rate,
-                    'monthly_0': monthly_0,
-                    'monthly_500': monthly_500,
-                    'fee_1': fee_1
-                })
-
-            except Exception as e:
-                continue
-
-    return results
-
-
-def analyze_rent_data(data_dir="../ref"):
-    """렌트 데이터 분석"""
-    filepath = os.path.join(data_dir, "rent.xlsx")
-    excel_file = pd.ExcelFile(filepath)
-
-    results = {}
-
-    for sheet_name in excel_file.sheet_names:
-        print(f"\n분석 중: {sheet_name}")
-        df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
-
-        # 실제 데이터만
-        if len(df.columns) == 0:
-            print(f"  → 컬럼 없음, 건너뛰기")
-            continue
-
-        first_col = df.columns[0]
-        df = df[df[first_col].notna()].copy()
-        df = df.reset_index(drop=True)
-
-        if len(df) == 0:
-            print(f"  → 데이터 없음, 건너뛰기")
-            continue
-
-        # 계약기간, 주행거리 파싱
-        parts = sheet_name.split('_')
-        period = int(parts[0].replace('개월', ''))
-        mileage = parts[1]
-
-        key = f"{period}_{mileage}"
-        results[key] = {
-            'period': period,
-            'mileage': mileage,
-            'companies': {}
-        }
 
-        # 금융사별 분석 (1st만)
-        for idx, row in df.iterrows():
-            try:
-                car_price = float(row.iloc[4])  # 5번째 컬럼이 가격
-                if not car_price or car_price == 0 or pd.isna(car_price):
-                    continue
-
-                # 1st 컬럼 찾기
-                columns = row.index.tolist()
-                company_idx = None
-                for i, col in enumerate(columns):
-                    if '1st' in str(col):
-                        company_idx = i
-                        break
-
-                if company_idx is None:
-                    continue
-
-                company = row.iloc[company_idx]
-                if pd.isna(company):
-                    continue
-
-                # 무보증
-                monthly_0 = float(row.iloc[company_idx + 1])
-                monthly_500 = float(row.iloc[company_idx + 2])
-                fee_1 = float(row.iloc[company_idx + 6])
-
-                # 분석
-                base_rate = monthly_0 / car_price * 100
-                option_coefficient = (monthly_500 - monthly_0) / 5000000
-                residual_rate = 1 - (monthly_0 * period / car_price)
-                residual_rate = max(0, min(1, residual_rate))
-
-                if company not in results[key]['companies']:
-                    results[key]['companies'][company] = []
-
-                results[key]['companies'][company].append({
-                    'car_price': car_price,
-                    'base_rate': base_rate,
-                    'option_coefficient': option_coefficient,
-                    'residual_rate': residual_rate,
-                    'monthly_0': monthly_0,
-                    'monthly_500': monthly_500,
-                    'fee_1': fee_1
-                })
-
-            except Exception as e:
-                continue
-
-    return results
+def analyze_rent_data(data_dir="../ref", workers: Optional[int] = None):
+    """렌트 데이터 분석"""
+    return analyze_workbooks([(os.path.join(data_dir, "rent.xlsx"), RENT_OFFSETS)], workers)[0]
 
 
 def aggregate_company_params(analysis_results):
@@ -217,26 +220,23 @@ def aggregate_company_params(analysis_results):
         period = data['period']
         mileage = data['mileage']
 
-        for company, samples in data['companies'].items():
+        for company, stats in data['companies'].items():
             if company not in aggregated:
                 aggregated[company] = {}
 
             condition_key = f"{period}_{mileage}"
-
-            # 평균 계산
-            base_rates = [s['base_rate'] for s in samples]
-            option_coeffs = [s['option_coefficient'] for s in samples]
-            residual_rates = [s['residual_rate'] for s in samples]
+            mean = stats.mean
+            std = stats.std()
 
             aggregated[company][condition_key] = {
                 'period': period,
                 'mileage': mileage,
-                'base_rate': np.mean(base_rates),
-                'base_rate_std': np.std(base_rates),
-                'option_coefficient': np.mean(option_coeffs),
-                'residual_rate': np.mean(residual_rates),
-                'residual_rate_std': np.std(residual_rates),
-                'sample_count': len(samples)
+                'base_rate': float(mean[0]),
+                'base_rate_std': float(std[0]),
+                'option_coefficient': float(mean[1]),
+                'residual_rate': float(mean[2]),
+                'residual_rate_std': float(std[2]),
+                'sample_count': stats.count
             }
 
     return aggregated
@@ -264,25 +264,32 @@ def save_model_params(lease_params, rent_params, output_dir="../src"):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="리스/렌트 견적 데이터에서 모델 파라미터 추출")
+    parser.add_argument('--data-dir', default="../ref")
+    parser.add_argument('--output-dir', default="../src")
+    parser.add_argument('--workers', type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("금융 데이터 분석 시작")
     print("=" * 60)
 
-    # 리스 데이터 분석
-    print("\n[1/4] 리스 데이터 분석 중...")
-    lease_analysis = analyze_lease_data()
-    lease_params = aggregate_company_params(lease_analysis)
-    print(f"✓ 리스 금융사 수: {len(lease_params)}")
+    # 리스/렌트 시트를 한 프로세스 풀에서 함께 분석
+    print("\n[1/4] 리스/렌트 데이터 분석 중...")
+    lease_analysis, rent_analysis = analyze_workbooks([
+        (os.path.join(args.data_dir, "lease.xlsx"), LEASE_OFFSETS),
+        (os.path.join(args.data_dir, "rent.xlsx"), RENT_OFFSETS),
+    ], args.workers)
 
-    # 렌트 데이터 분석
-    print("\n[2/4] 렌트 데이터 분석 중...")
-    rent_analysis = analyze_rent_data()
+    print("\n[2/4] 금융사별 파라미터 집계 중...")
+    lease_params = aggregate_company_params(lease_analysis)
     rent_params = aggregate_company_params(rent_analysis)
+    print(f"✓ 리스 금융사 수: {len(lease_params)}")
     print(f"✓ 렌트 금융사 수: {len(rent_params)}")
 
     # 파라미터 저장
     print("\n[3/4] 모델 파라미터 저장 중...")
-    output_path = save_model_params(lease_params, rent_params)
+    output_path = save_model_params(lease_params, rent_params, args.output_dir)
 
     # 요약 출력
     print("\n[4/4] 분석 요약")
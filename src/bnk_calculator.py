@@ -2,21 +2,496 @@
 BNK 계산기 - 엑셀과 완전 동일한 로직
 """
 import json
+import math
 import os
-from typing import Dict, Tuple, Optional
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
+
+import metrics
+from param_history import AsOf, AsOfSnapshots, content_id, history_for
+from param_snapshot import SnapshotManager, is_finite_number
+from quote_cache import QuoteCache, normalize_quote_key
+from stage_graph import Section, Stage, StageGraph, StageSession
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 잔가사 목록 (최고잔가 탐색 순서)
+RV_COMPANIES = ['웨스트_통합', '웨스트_수입', '큐브_수입', '무카_국산',
+                '태양_수입', '조이_수입', '코렉트', 'ADB']
+
+# 잔가율 테이블 기준 주행거리
+BASE_MILEAGE = '2만'
+
+RV_TABLES_PATH = os.path.join(os.path.dirname(__file__), "bnk_rv_tables.json")
+
+
+def _bisect_first_true(predicate, lo: 'np.ndarray', hi: 'np.ndarray') -> 'np.ndarray':
+    """
+    배치 정수 이분 탐색
+
+    predicate(lo)가 False, predicate(hi)가 True인 단조 구간에서 predicate가 처음 True가 되는 정수.
+    predicate는 정수 배열을 받아 같은 길이의 bool 배열을 반환한다.
+    """
+    import numpy as np
+
+    lo = np.asarray(lo, dtype=np.int64).copy()
+    hi = np.asarray(hi, dtype=np.int64).copy()
+    while True:
+        active = hi - lo > 1
+        if not active.any():
+            return hi
+        mid = (lo + hi) // 2
+        ok = predicate(mid)
+        hi = np.where(active & ok, mid, hi)
+        lo = np.where(active & ~ok, mid, lo)
+
+
+# ================ 리스/렌트 계산 단계 ================
+# _compute_lease / _compute_rental의 계산 단계. 단계는 앞 단계 중간값만 읽으므로,
+# 보증금 비율만 바뀌면 최종 월대여료 단계만, 주행거리만 바뀌면 최고잔가 → 잔가 이후 단계만 다시 계산한다.
+
+FINANCE_COST_RATE = 0.06 / 12  # 월 금리 0.5% (간이 계산)
+
+
+def _stage_residual(is_domestic, acquisition_cost, base_price, dealer_discount, rv_rate):
+    # 잔존가치 기준금액 (엑셀 B62) - 국산: 취득원가, 수입: 기본가격 - 딜러할인
+    if is_domestic:
+        rv_base_amount = acquisition_cost
+    else:
+        rv_base_amount = base_price - dealer_discount
+
+    # 잔가액 (엑셀 B68, B70)
+    return rv_base_amount, rv_base_amount * rv_rate
+
+
+def _stage_base_monthly(acquisition_cost, residual_value, period):
+    # 감가상각액 및 월감가
+    depreciation = acquisition_cost - residual_value
+    monthly_depreciation = depreciation / period
+
+    # 금융비용 (간이 계산)
+    average_balance = (acquisition_cost + residual_value) / 2
+    monthly_finance_cost = average_balance * FINANCE_COST_RATE
+
+    return (depreciation, monthly_depreciation, average_balance, monthly_finance_cost,
+            monthly_depreciation + monthly_finance_cost)
+
+
+def _stage_payment(deposit_type, deposit_rate, acquisition_cost, period, base_monthly):
+    # 보증금/선수금 효과
+    deposit_discount = 0
+    deposit_amount = 0
+    if deposit_type == '보증금' and deposit_rate > 0:
+        deposit_amount = acquisition_cost * (deposit_rate / 100)
+        deposit_discount = deposit_amount * FINANCE_COST_RATE
+
+    elif deposit_type == '선수금' and deposit_rate > 0:
+        deposit_amount = acquisition_cost * (deposit_rate / 100)
+        deposit_discount = deposit_amount / period
+
+    # 최종 월대여료 (딜러할인은 이미 취득원가에 반영됨)
+    return deposit_amount, deposit_discount, base_monthly - deposit_discount
+
+
+def _stage_rental(car_price, monthly_payment):
+    # 렌트 특성: 보험료, 세금 포함 (간소화, 월 0.5%)
+    insurance_tax = car_price * 0.005
+    monthly = round(monthly_payment)
+    return insurance_tax, monthly, monthly + insurance_tax
+
+
+def _trace_acquisition(steps, car_price, option_price, base_price, dealer_discount, price_for_tax,
+                       registration_tax, acquisition_tax, acquisition_cost):
+    steps.add("=== 1. 차량 정보 ===")
+    steps.add("차량 가격: {:,.0f}원", car_price)
+    steps.add("옵션 가격: {:,.0f}원", option_price)
+    steps.add("기본가격: {:,.0f}원", base_price)
+    if dealer_discount > 0:
+        steps.add("딜러 할인: {:,.0f}원", dealer_discount)
+        steps.add("할인 후 가격: {:,.0f}원", price_for_tax)
+
+    steps.blank()
+    steps.add("=== 2. 취득세/등록세 ===")
+    steps.add("공급가액: {:,.0f}원 (VAT 제외)", price_for_tax / 1.1)
+    steps.add("등록세 ({:.1f}%): {:,.0f}원", registration_tax / (price_for_tax / 1.1) * 100, registration_tax)
+    steps.add("취득세 (2.0%): {:,.0f}원", acquisition_tax)
+
+    steps.blank()
+    steps.add("=== 3. 취득원가 ===")
+    if dealer_discount > 0:
+        steps.add("{:,.0f} + {:,.0f} + {:,.0f} - {:,.0f} = {:,.0f}원",
+                  base_price, registration_tax, acquisition_tax, dealer_discount, acquisition_cost)
+    else:
+        steps.add("{:,.0f} + {:,.0f} + {:,.0f} = {:,.0f}원",
+                  base_price, registration_tax, acquisition_tax, acquisition_cost)
+
+
+def _trace_residual(steps, is_domestic, base_price, dealer_discount, rv_base_amount, best_rv_info,
+                    rv_company, grade, period, mileage, rv_rate, residual_value):
+    steps.blank()
+    if is_domestic:
+        steps.add("=== 4. 잔존가치 기준금액 (국산) ===")
+        steps.add("취득원가 기준: {:,.0f}원", rv_base_amount)
+    else:
+        steps.add("=== 4. 잔존가치 기준금액 (수입) ===")
+        if dealer_discount > 0:
+            steps.add("기본가격 - 딜러할인: {:,.0f} - {:,.0f} = {:,.0f}원",
+                      base_price, dealer_discount, rv_base_amount)
+        else:
+            steps.add("기본가격 기준: {:,.0f}원", rv_base_amount)
+
+    steps.blank()
+    steps.add("=== 5. 잔가 정보 (최고잔가 적용) ===")
+    if best_rv_info:
+        steps.add("✨ 최고 잔가사: {} (등급: {})", rv_company, grade)
+        steps.add("✨ 최고 잔가율: {:.2f}%", rv_rate * 100)
+        steps.blank()
+        steps.add("📊 상위 5개 잔가율:")
+        for i, (company, grd, rate) in enumerate(best_rv_info['all_rates'][:5], 1):
+            marker = "👉" if company == rv_company and grd == grade else "  "
+            steps.add("{} {}. {} {}등급: {:.2f}%", marker, i, company, grd, rate * 100)
+    else:
+        steps.add("잔가사: {}", rv_company)
+        steps.add("등급: {}, 기간: {}개월, 주행: {}KM", grade, period, mileage)
+        steps.add("잔가율: {:.2f}%", rv_rate * 100)
+    steps.blank()
+    steps.add("잔가금액: {:,.0f} × {:.4f} = {:,.0f}원", rv_base_amount, rv_rate, residual_value)
+
+
+def _trace_base_monthly(steps, acquisition_cost, residual_value, depreciation, period, monthly_depreciation,
+                        average_balance, monthly_finance_cost, base_monthly):
+    steps.blank()
+    steps.add("=== 6. 감가상각 ===")
+    steps.add("감가상각: {:,.0f} - {:,.0f} = {:,.0f}원", acquisition_cost, residual_value, depreciation)
+    steps.add("월감가: {:,.0f} ÷ {}개월 = {:,.0f}원", depreciation, period, monthly_depreciation)
+
+    steps.blank()
+    steps.add("=== 7. 금융비용 ===")
+    steps.add("평균 잔액: {:,.0f}원", average_balance)
+    steps.add("월금융비용: {:,.0f}원 (연 6% 가정)", monthly_finance_cost)
+
+    steps.blank()
+    steps.add("=== 8. 기본 월대여료 ===")
+    steps.add("{:,.0f} + {:,.0f} = {:,.0f}원", monthly_depreciation, monthly_finance_cost, base_monthly)
+
+
+def _trace_payment(steps, deposit_type, deposit_rate, deposit_amount, deposit_discount, base_monthly,
+                   monthly_payment, dealer_discount):
+    if deposit_type == '보증금' and deposit_rate > 0:
+        steps.blank()
+        steps.add("=== 9. 보증금 효과 ===")
+        steps.add("보증금: {:,.0f}원 ({}%)", deposit_amount, deposit_rate)
+        steps.add("월대여료 할인: {:,.0f}원", deposit_discount)
+    elif deposit_type == '선수금' and deposit_rate > 0:
+        steps.blank()
+        steps.add("=== 9. 선수금 효과 ===")
+        steps.add("선수금: {:,.0f}원 ({}%)", deposit_amount, deposit_rate)
+        steps.add("월납입 감소: {:,.0f}원", deposit_discount)
+
+    steps.blank()
+    steps.add("=== 10. 최종 월대여료 ===")
+    if deposit_discount > 0:
+        steps.add("{:,.0f} - {:,.0f} = {:,.0f}원", base_monthly, deposit_discount, monthly_payment)
+    else:
+        steps.add("{:,.0f}원", monthly_payment)
+
+    if dealer_discount > 0:
+        steps.add("(딜러할인 {:,.0f}원은 이미 취득원가에 반영되어 감가상각액이 감소함)", dealer_discount)
+
+
+def _trace_rental(steps, insurance_tax, monthly_lease, monthly_rental):
+    steps.blank()
+    steps.add("=== 렌트 추가비용 ===")
+    steps.add("보험료+세금: {:,.0f}원", insurance_tax)
+    steps.blank()
+    steps.add("=== 최종 렌트료 ===")
+    steps.add("{:,.0f} + {:,.0f} = {:,.0f}원", monthly_lease, insurance_tax, monthly_rental)
+
+
+LEASE_SECTIONS = (
+    Section('acquisition', ('car_price', 'option_price', 'base_price', 'dealer_discount', 'price_for_tax',
+                            'registration_tax', 'acquisition_tax', 'acquisition_cost'), _trace_acquisition),
+    Section('residual', ('is_domestic', 'base_price', 'dealer_discount', 'rv_base_amount', 'best_rv_info',
+                         'rv_company', 'grade', 'period', 'mileage', 'rv_rate', 'residual_value'),
+            _trace_residual),
+    Section('base_monthly', ('acquisition_cost', 'residual_value', 'depreciation', 'period',
+                             'monthly_depreciation', 'average_balance', 'monthly_finance_cost', 'base_monthly'),
+            _trace_base_monthly),
+    Section('payment', ('deposit_type', 'deposit_rate', 'deposit_amount', 'deposit_discount', 'base_monthly',
+                        'monthly_payment', 'dealer_discount'), _trace_payment),
+)
+
+RENTAL_STAGES = (
+    Stage('rental', ('car_price', 'monthly_payment'), ('insurance_tax', 'monthly_lease', 'monthly_rental'),
+          _stage_rental),
+)
+
+RENTAL_SECTIONS = (
+    Section('rental', ('insurance_tax', 'monthly_lease', 'monthly_rental'), _trace_rental),
+)
+
+# debug에 그대로 옮기는 값 (기존 상세정보 키 순서)
+DEBUG_INPUTS = ('car_price', 'option_price', 'period', 'rv_company', 'grade', 'mileage', 'deposit_type',
+                'deposit_rate', 'dealer_discount', 'vehicle_type_eco', 'is_domestic', 'best_rv_info')
+
+
+def validate_rv_tables(tables: Dict):
+    """
+    bnk_rv_tables.json 검증 (스냅샷 교체 전)
+
+    Raises:
+        ValueError: 주행거리 조정이나 잔가사 테이블이 없거나, 잔가율이 0~1 숫자가 아닌 경우
+    """
+    adjustments = tables.get('주행거리_조정')
+    if not isinstance(adjustments, dict) or not all(is_finite_number(value) for value in adjustments.values()):
+        raise ValueError("bnk_rv_tables.json: 주행거리_조정이 없거나 숫자가 아닙니다")
+
+    found = False
+    for company in RV_COMPANIES:
+        for table_key, table in tables.items():
+            if not table_key.startswith(f"{company}_"):
+                continue
+            found = True
+            for period, period_data in table.items():
+                if not period.isdigit():
+                    raise ValueError(f"{table_key}: 기간 {period}이 정수가 아닙니다")
+                for grade, rate in period_data.items():
+                    if not is_finite_number(rate) or not 0 <= rate <= 1:
+                        raise ValueError(f"{table_key}/{period}/{grade}: 잔가율 {rate!r}이 0~1 숫자가 아닙니다")
+    if not found:
+        raise ValueError("bnk_rv_tables.json: 잔가사 테이블이 없습니다")
+
+
+class RVTables:
+    """
+    bnk_rv_tables.json 1개 버전의 잔가율 스냅샷 (잔가사 × 기간 × 등급 배열로 컴파일)
+
+    계산 단계 그래프에는 이 객체가 입력으로 들어가므로, 스냅샷이 교체되면 잔가 단계만 다시 계산되고
+    진행 중인 견적은 시작할 때 받은 스냅샷으로 끝난다. 만든 뒤에는 조회 메모 외에는 바뀌지 않는다.
+    """
+
+    def __init__(self, tables: Dict, version: int = 1):
+        """
+        Args:
+            tables: bnk_rv_tables.json 내용
+            version: 스냅샷 번호 (이력에서 읽은 과거 버전은 0)
+
+        Raises:
+            ValueError: 테이블 검증 실패 (validate_rv_tables)
+        """
+        validate_rv_tables(tables)
+        self.tables = tables
+        self.version = version
+        self.content_id = content_id('bnk_rv_tables', tables)  # 파라미터 이력 버전 ID (견적 캐시 키)
+        self._compile()
+
+    @metrics.timed('bnk.compile_rv_tables')
+    def _compile(self):
+        """
+        잔가율 테이블을 잔가사 × 기간 × 등급 배열로 컴파일
+
+        주행거리별로 배열을 만들고 (주행거리 조정 포함), 기간 × 주행거리별 최고잔가 결과를 미리 계산한다.
+        등급 축은 테이블에 처음 나타난 순서이므로, 동률일 때 순위는 잔가사 → 등급 순회 순서와 같다.
+        """
+        periods = set()
+        grades = {}
+        mileages = [BASE_MILEAGE] + [m for m in self.tables.get('주행거리_조정', {}) if m != BASE_MILEAGE]
+        for company in RV_COMPANIES:
+            for table_key, table in self.tables.items():
+                if not table_key.startswith(f"{company}_"):
+                    continue
+                mileage = table_key[len(company) + 1:]
+                if mileage not in mileages:
+                    mileages.append(mileage)
+                for period, period_data in table.items():
+                    periods.add(int(period))
+                    for grade in period_data:
+                        grades.setdefault(grade, len(grades))
+
+        self.periods = sorted(periods)
+        self.period_index = {period: i for i, period in enumerate(self.periods)}
+        self.grades = list(grades)
+        self.grade_index = grades
+        self.company_index = {company: i for i, company in enumerate(RV_COMPANIES)}
+        # 조정값이나 전용 테이블이 있는 주행거리 (그 밖의 주행거리는 기준 주행거리와 같은 잔가율)
+        self.mileages = tuple(mileages)
+
+        self._tensors = {}  # {주행거리: (잔가율 배열, 잔가사별 테이블 존재 여부)}
+        self._best = {}     # {(기간, 주행거리): 최고잔가 결과}
+
+        for mileage in self.mileages:
+            tensor = self.tensor(mileage)
+            for period in self.periods:
+                self._best[(period, mileage)] = self._rank(tensor[0], period)
+
+    def tensor(self, mileage: str) -> Tuple['np.ndarray', 'np.ndarray']:
+        """주행거리별 잔가율 배열 (잔가사 × 기간 × 등급, 없는 등급은 NaN)"""
+        import numpy as np
+
+        cached = self._tensors.get(mileage)
+        if cached is not None:
+            return cached
+        if mileage not in self.mileages:
+            # 테이블에 없는 주행거리는 기준 배열을 그대로 사용 (입력값별로 메모를 늘리지 않음)
+            return self.tensor(BASE_MILEAGE)
+
+        rates = np.full((len(RV_COMPANIES), len(self.periods), len(self.grades)), np.nan)
+        present = np.zeros(len(RV_COMPANIES), dtype=bool)
+
+        adjustment = 0.0
+        if mileage != BASE_MILEAGE and mileage in self.tables['주행거리_조정']:
+            adjustment = self.tables['주행거리_조정'][mileage]
+
+        for ci, company in enumerate(RV_COMPANIES):
+            table_key = f"{company}_{mileage}"
+            if table_key not in self.tables:
+                table_key = f"{company}_{BASE_MILEAGE}"
+            if table_key not in self.tables:
+                continue
+
+            present[ci] = True
+            for period, period_data in self.tables[table_key].items():
+                pi = self.period_index[int(period)]
+                for grade, rate in period_data.items():
+                    rates[ci, pi, self.grade_index[grade]] = rate + adjustment
+
+        self._tensors[mileage] = (rates, present)
+        return rates, present
+
+    def _rank(self, rates: 'np.ndarray', period: int) -> Dict:
+        """특정 기간의 잔가율 순위 (상위 10개)"""
+        import numpy as np
+
+        pi = self.period_index.get(period)
+        if pi is None:
+            return {'company': None, 'grade': None, 'rate': 0, 'all_rates': []}
+
+        flat = rates[:, pi, :].ravel()
+        valid = np.flatnonzero(~np.isnan(flat))
+        order = valid[np.argsort(-flat[valid], kind='stable')]
+
+        n_grades = len(self.grades)
+        all_rates = [
+            (RV_COMPANIES[i // n_grades], self.grades[i % n_grades], float(flat[i]))
+            for i in order[:10]
+        ]
+
+        if all_rates and all_rates[0][2] > 0:
+            best_company, best_grade, best_rate = all_rates[0]
+        else:
+            best_company, best_grade, best_rate = None, None, 0
+
+        return {
+            'company': best_company,
+            'grade': best_grade,
+            'rate': best_rate,
+            'all_rates': all_rates
+        }
+
+    def find_best(self, period: int, mileage: str) -> Dict:
+        """최고잔가 (BNKCalculator.find_best_rv 참고)"""
+        if mileage not in self.mileages:
+            mileage = BASE_MILEAGE  # 기준 주행거리와 같은 잔가율
+        key = (period, mileage)
+        best = self._best.get(key)
+        if best is None:
+            # 컴파일 시 모든 (기간, 주행거리)를 채우므로 테이블에 없는 기간만 여기로 옴 (메모하지 않음)
+            metrics.incr('bnk.find_best_rv.uncompiled')
+            best = self._rank(self.tensor(mileage)[0], period)
+
+        return {
+            'company': best['company'],
+            'grade': best['grade'],
+            'rate': best['rate'],
+            'all_rates': list(best['all_rates'])  # 상위 10개만
+        }
+
+    def residual_rate(self, rv_company: str, period: int, grade: str, mileage: str) -> float:
+        """잔가율 (BNKCalculator.get_residual_rate 참고)"""
+        ci = self.company_index.get(rv_company)
+        if ci is None:
+            return 0.5  # 기본값
+
+        rates, present = self.tensor(mileage)
+        if not present[ci]:
+            return 0.5  # 기본값
+
+        rv_rate = math.nan
+        pi = self.period_index.get(period)
+        gi = self.grade_index.get(grade)
+        if pi is not None and gi is not None:
+            rv_rate = float(rates[ci, pi, gi])
+
+        if math.isnan(rv_rate):
+            # 테이블에 없는 등급은 기본 잔가율 0.5 + 주행거리 조정 (기본 2만km 기준)
+            rv_rate = 0.5
+            if mileage != BASE_MILEAGE and mileage in self.tables['주행거리_조정']:
+                rv_rate += self.tables['주행거리_조정'][mileage]
+            return rv_rate
+
+        return rv_rate
+
 
 class BNKCalculator:
     """BNK 엑셀 견적서와 동일한 계산 로직"""
 
-    def __init__(self):
-        """BNK 잔가율 테이블 로드"""
-        self.rv_tables = self._load_rv_tables()
+    def __init__(self, watch: bool = False):
+        """
+        BNK 잔가율 테이블 로드 및 컴파일
+
+        Args:
+            watch: True면 bnk_rv_tables.json 변경을 백그라운드 스레드에서 감시해 스냅샷 교체
+                   (False면 견적·역산 호출 시 확인)
+        """
+        self.quote_cache = QuoteCache(maxsize=2048)
+        self.param_history = history_for(RV_TABLES_PATH)  # 같은 디렉토리의 param_history/ (버전 이력)
+        self.snapshots = SnapshotManager('bnk', [RV_TABLES_PATH], self._build_snapshot)
+        self.snapshots.subscribe(lambda snapshot: self.quote_cache.invalidate())
+        # as_of 견적용 과거 버전 (처음 요청될 때 이력에서 읽어 컴파일)
+        self.history = AsOfSnapshots('bnk_rv_tables', self.snapshots, lambda tables: RVTables(tables, 0),
+                                     self.param_history)
+        if watch:
+            self.snapshots.start()
+
+        # 계산 단계 그래프 (잔가율 스냅샷이 입력이므로 교체되면 잔가 단계 메모가 무효화됨)
+        self.lease_graph = StageGraph('bnk.lease', self._lease_stages(), LEASE_SECTIONS)
+        self.rental_graph = StageGraph('bnk.rental', self._lease_stages() + RENTAL_STAGES,
+                                       LEASE_SECTIONS + RENTAL_SECTIONS)
+        self._sessions = threading.local()
 
     def _load_rv_tables(self) -> Dict:
         """잔가율 테이블 로드"""
-        rv_path = os.path.join(os.path.dirname(__file__), "bnk_rv_tables.json")
-        with open(rv_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with metrics.span('bnk.load_rv_tables'):
+            with open(RV_TABLES_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+    def _build_snapshot(self, version: int) -> RVTables:
+        # 읽기 전용 (이력 기록은 param_history.py record --effective-from으로만)
+        return RVTables(self._load_rv_tables(), version)
+
+    def _refresh_rv_tables(self):
+        """bnk_rv_tables.json 변경 확인 (감시 스레드가 없을 때만, 교체되면 견적 캐시도 비워짐)"""
+        self.snapshots.poll()
+
+    @property
+    def rv(self) -> RVTables:
+        """현재 잔가율 스냅샷"""
+        return self.snapshots.current
+
+    @property
+    def rv_tables(self) -> Dict:
+        """현재 스냅샷의 bnk_rv_tables.json 내용"""
+        return self.snapshots.current.tables
+
+    def rv_at(self, as_of: Optional[AsOf] = None) -> RVTables:
+        """
+        as_of 시점에 적용 중이던 잔가율 스냅샷 (None이면 현재 파일)
+
+        Raises:
+            ValueError: as_of 이전에 기록된 잔가율 테이블 버전이 없는 경우
+        """
+        return self.history.at(as_of)
 
     def calculate_acquisition_tax(
         self,
@@ -56,66 +531,30 @@ class BNKCalculator:
     def find_best_rv(
         self,
         period: int,
-        mileage: str = '2만'
+        mileage: str = '2만',
+        as_of: Optional[AsOf] = None
     ) -> Dict:
         """
-        모든 잔가사에서 최고 잔가율 찾기
+        모든 잔가사에서 최고 잔가율 찾기 (컴파일된 결과 조회)
 
         Args:
             period: 계약기간 (12, 24, 36, 42, 44, 48, 60)
             mileage: 주행거리 ('1만', '1.5만', '2만', '3만')
+            as_of: 기준일 (이 날 적용 중이던 잔가율 테이블, None이면 현재 파일)
 
         Returns:
             {'company': 잔가사, 'grade': 등급, 'rate': 잔가율, 'all_rates': [(잔가사, 등급, 잔가율), ...]}
         """
-        all_companies = ['웨스트_통합', '웨스트_수입', '큐브_수입', '무카_국산',
-                        '태양_수입', '조이_수입', '코렉트', 'ADB']
-
-        all_rates = []
-        best_rate = 0
-        best_company = None
-        best_grade = None
-
-        for company in all_companies:
-            table_key = f"{company}_{mileage}"
-            if table_key not in self.rv_tables:
-                table_key = f"{company}_2만"
-
-            if table_key not in self.rv_tables:
-                continue
-
-            period_data = self.rv_tables[table_key].get(str(period), {})
-
-            for grade, rate in period_data.items():
-                # 주행거리 조정
-                adjusted_rate = rate
-                if mileage != '2만' and mileage in self.rv_tables['주행거리_조정']:
-                    adjustment = self.rv_tables['주행거리_조정'][mileage]
-                    adjusted_rate += adjustment
-
-                all_rates.append((company, grade, adjusted_rate))
-
-                if adjusted_rate > best_rate:
-                    best_rate = adjusted_rate
-                    best_company = company
-                    best_grade = grade
-
-        # 정렬 (높은 순)
-        all_rates.sort(key=lambda x: x[2], reverse=True)
-
-        return {
-            'company': best_company,
-            'grade': best_grade,
-            'rate': best_rate,
-            'all_rates': all_rates[:10]  # 상위 10개만
-        }
+        rv = self.snapshots.current if as_of is None else self.history.at(as_of)
+        return rv.find_best(period, mileage)
 
     def get_residual_rate(
         self,
         rv_company: str,
         period: int,
         grade: str,
-        mileage: str = '2만'
+        mileage: str = '2만',
+        as_of: Optional[AsOf] = None
     ) -> float:
         """
         잔가율 조회
@@ -126,29 +565,106 @@ class BNKCalculator:
             period: 계약기간 (12, 24, 36, 42, 44, 48, 60)
             grade: 차량 등급 (S, A, B, C, ...)
             mileage: 주행거리 ('1만', '1.5만', '2만', '3만')
+            as_of: 기준일 (None이면 현재 파일)
 
         Returns:
             잔가율 (0~1)
         """
-        table_key = f"{rv_company}_{mileage}"
+        rv = self.snapshots.current if as_of is None else self.history.at(as_of)
+        return rv.residual_rate(rv_company, period, grade, mileage)
+
+    def _lease_stages(self) -> Tuple[Stage, ...]:
+        """리스 계산 단계 (잔가율 테이블을 읽는 단계는 잔가율 스냅샷을 입력으로 받음)"""
+        return (
+            Stage('best_rv', ('requested_rv_company', 'requested_grade', 'period', 'mileage', 'rv_tables'),
+                  ('rv_company', 'grade', 'best_rv_info'), self._stage_best_rv),
+            Stage('acquisition', ('car_price', 'option_price', 'dealer_discount', 'vehicle_type_eco'),
+                  ('base_price', 'price_for_tax', 'acquisition_tax', 'registration_tax', 'acquisition_cost'),
+                  self._stage_acquisition),
+            Stage('rv_rate', ('rv_company', 'period', 'grade', 'mileage', 'rv_tables'),
+                  ('rv_rate',), self._stage_rv_rate),
+            Stage('residual', ('is_domestic', 'acquisition_cost', 'base_price', 'dealer_discount', 'rv_rate'),
+                  ('rv_base_amount', 'residual_value'), _stage_residual),
+            Stage('base_monthly', ('acquisition_cost', 'residual_value', 'period'),
+                  ('depreciation', 'monthly_depreciation', 'average_balance', 'monthly_finance_cost',
+                   'base_monthly'), _stage_base_monthly),
+            Stage('payment', ('deposit_type', 'deposit_rate', 'acquisition_cost', 'period', 'base_monthly'),
+                  ('deposit_amount', 'deposit_discount', 'monthly_payment'), _stage_payment),
+        )
+
+    def _stage_best_rv(self, rv_company, grade, period, mileage, rv_tables):
+        # 최고 잔가 자동 선택
+        if rv_company == '최고잔가':
+            best_rv_info = rv_tables.find_best(period, mileage)
+            return best_rv_info['company'], best_rv_info['grade'], best_rv_info
+        return rv_company, grade, None
 
-        if table_key not in self.rv_tables:
-            table_key = f"{rv_company}_2만"  # 기본은 2만km
+    def _stage_acquisition(self, car_price, option_price, dealer_discount, vehicle_type_eco):
+        # 기본가격 (옵션 포함)
+        base_price = car_price + option_price
 
-        if table_key not in self.rv_tables:
-            return 0.5  # 기본값
+        # 취득세/등록세 계산 (할인 후 가격 기준)
+        price_for_tax = base_price - dealer_discount
+        acquisition_tax, registration_tax = self.calculate_acquisition_tax(price_for_tax, vehicle_type_eco)
 
-        period_data = self.rv_tables[table_key].get(str(period), {})
-        rv_rate = period_data.get(grade, 0.5)
+        # 취득원가 = 차량가격 + 취득세 + 등록세 - 할인가 (공채는 생략)
+        acquisition_cost = base_price + registration_tax + acquisition_tax - dealer_discount
+        return base_price, price_for_tax, acquisition_tax, registration_tax, acquisition_cost
 
-        # 주행거리 조정 (기본 2만km 기준)
-        if mileage != '2만' and mileage in self.rv_tables['주행거리_조정']:
-            adjustment = self.rv_tables['주행거리_조정'][mileage]
-            rv_rate += adjustment
+    def _stage_rv_rate(self, rv_company, period, grade, mileage, rv_tables):
+        # 잔가율 조회 (엑셀 B56)
+        return (rv_tables.residual_rate(rv_company, period, grade, mileage),)
 
-        return rv_rate
+    def stage_session(self, product: str = 'lease') -> StageSession:
+        """
+        what-if 탐색용 계산 단계 메모 (calculate_lease / calculate_rental의 session 인자)
 
-    def calculate_lease(
+        입력 하나만 바꿔 다시 계산하면 그 입력의 하위 단계와 계산 과정 구간만 다시 계산한다.
+        사용자 세션마다 하나씩 만들어 쓴다 (스레드 간 공유 불가).
+
+        Args:
+            product: 'lease' 또는 'rental'
+        """
+        return self._stage_graph(product).session()
+
+    def _stage_graph(self, product: str) -> StageGraph:
+        if product == 'lease':
+            return self.lease_graph
+        if product == 'rental':
+            return self.rental_graph
+        raise ValueError(f"알 수 없는 상품: {product}")
+
+    def _run_stages(self, product: str, inputs: Dict, trace: bool, session: Optional[StageSession],
+                    rv: Optional[RVTables] = None) -> Tuple[Dict, Dict]:
+        """계산 단계 실행 후 상세정보 생성 (session이 없으면 스레드별 메모, rv가 없으면 현재 스냅샷 사용)"""
+        graph = self._stage_graph(product)
+        if session is None:
+            sessions = getattr(self._sessions, 'by_product', None)
+            if sessions is None:
+                sessions = self._sessions.by_product = {}
+            session = sessions.get(product)
+            if session is None:
+                session = sessions[product] = graph.session()
+        elif session.graph is not graph:
+            raise ValueError(f"{product} 계산에 다른 상품의 단계 세션을 넘겼습니다")
+
+        inputs['rv_tables'] = rv if rv is not None else self.snapshots.current
+        values, steps = session.run(inputs, trace)
+
+        debug = {'product': product}
+        for name in DEBUG_INPUTS:
+            debug[name] = values[name]
+        if steps is not None:
+            debug['trace'] = steps
+        debug['acquisition_cost'] = values['acquisition_cost']
+        debug['residual_value'] = values['residual_value']
+        debug['residual_rate'] = values['rv_rate']
+        debug['acquisition_tax'] = values['acquisition_tax']
+        debug['registration_tax'] = values['registration_tax']
+        debug['rv_tables_version'] = inputs['rv_tables'].content_id
+        return values, debug
+
+    def _compute_lease(
         self,
         car_price: float,
         option_price: float,
@@ -160,7 +676,10 @@ class BNKCalculator:
         deposit_rate: float = 0,
         dealer_discount: float = 0,
         vehicle_type_eco: str = '일반',
-        is_domestic: bool = True
+        is_domestic: bool = True,
+        trace: bool = False,
+        session: Optional[StageSession] = None,
+        rv: Optional[RVTables] = None
     ) -> Tuple[float, Dict]:
         """
         운용리스 계산 (BNK 엑셀 로직 완전 구현)
@@ -177,172 +696,121 @@ class BNKCalculator:
             dealer_discount: 딜러 할인
             vehicle_type_eco: '일반', 'HEV', '전기'
             is_domestic: 국산 여부
+            trace: True면 계산 단계를 debug['trace']에 기록 (텍스트는 render_steps로 생성)
+            session: 계산 단계 메모 (stage_session('lease'), 없으면 스레드별 메모)
+            rv: 잔가율 스냅샷 (없으면 현재 스냅샷, as_of 견적은 rv_at(as_of))
 
         Returns:
             (월대여료, 상세정보)
         """
-        # 최고 잔가 자동 선택
-        best_rv_info = None
-        if rv_company == '최고잔가':
-            best_rv_info = self.find_best_rv(period, mileage)
-            rv_company = best_rv_info['company']
-            grade = best_rv_info['grade']
-
-        debug = {
-            'product': 'lease',
+        values, debug = self._run_stages('lease', {
             'car_price': car_price,
             'option_price': option_price,
             'period': period,
-            'rv_company': rv_company,
-            'grade': grade,
+            'requested_rv_company': rv_company,
+            'requested_grade': grade,
             'mileage': mileage,
             'deposit_type': deposit_type,
             'deposit_rate': deposit_rate,
             'dealer_discount': dealer_discount,
             'vehicle_type_eco': vehicle_type_eco,
             'is_domestic': is_domestic,
-            'best_rv_info': best_rv_info,
-            'steps': []
-        }
+        }, trace, session, rv)
 
-        # 1. 기본가격 (옵션 포함)
-        base_price = car_price + option_price
+        return round(values['monthly_payment']), debug
 
-        debug['steps'].append(f"=== 1. 차량 정보 ===")
-        debug['steps'].append(f"차량 가격: {car_price:,.0f}원")
-        debug['steps'].append(f"옵션 가격: {option_price:,.0f}원")
-        debug['steps'].append(f"기본가격: {base_price:,.0f}원")
-        if dealer_discount > 0:
-            debug['steps'].append(f"딜러 할인: {dealer_discount:,.0f}원")
-            debug['steps'].append(f"할인 후 가격: {base_price - dealer_discount:,.0f}원")
+    def _compute_rental(
+        self,
+        car_price: float,
+        option_price: float,
+        period: int,
+        rv_company: str = '최고잔가',
+        grade: str = 'A',
+        mileage: str = '2만',
+        deposit_type: str = '무보증',
+        deposit_rate: float = 0,
+        dealer_discount: float = 0,
+        vehicle_type_eco: str = '일반',
+        is_domestic: bool = True,
+        trace: bool = False,
+        session: Optional[StageSession] = None,
+        rv: Optional[RVTables] = None
+    ) -> Tuple[float, Dict]:
+        """
+        렌트 계산 (리스 + 보험료/세금 포함, session은 stage_session('rental'))
+        """
+        values, debug = self._run_stages('rental', {
+            'car_price': car_price,
+            'option_price': option_price,
+            'period': period,
+            'requested_rv_company': rv_company,
+            'requested_grade': grade,
+            'mileage': mileage,
+            'deposit_type': deposit_type,
+            'deposit_rate': deposit_rate,
+            'dealer_discount': dealer_discount,
+            'vehicle_type_eco': vehicle_type_eco,
+            'is_domestic': is_domestic,
+        }, trace, session, rv)
 
-        # 2. 취득세/등록세 계산 (할인 후 가격 기준)
-        price_for_tax = base_price - dealer_discount
-        acquisition_tax, registration_tax = self.calculate_acquisition_tax(
-            price_for_tax, vehicle_type_eco
-        )
+        return round(values['monthly_rental']), debug
 
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 2. 취득세/등록세 ===")
-        debug['steps'].append(f"공급가액: {price_for_tax/1.1:,.0f}원 (VAT 제외)")
-        debug['steps'].append(f"등록세 ({registration_tax/(price_for_tax/1.1)*100:.1f}%): {registration_tax:,.0f}원")
-        debug['steps'].append(f"취득세 (2.0%): {acquisition_tax:,.0f}원")
+    def _cached_quote(self, compute, product: str, args: Tuple, trace: bool,
+                      session: Optional[StageSession] = None,
+                      as_of: Optional[AsOf] = None) -> Tuple[float, Dict]:
+        """정규화된 입력 키로 견적 캐시 조회 후 없으면 계산 (스냅샷은 한 번만 정해 계산 끝까지 사용)"""
+        self._refresh_rv_tables()
+        rv = self.history.at(as_of)
 
-        # 3. 취득원가 = 차량가격 + 취득세 + 등록세 - 할인가
-        # 공채는 생략 (간소화)
-        acquisition_cost = base_price + registration_tax + acquisition_tax - dealer_discount
+        (car_price, option_price, period, rv_company, grade, mileage,
+         deposit_type, deposit_rate, dealer_discount, vehicle_type_eco, is_domestic) = args
+        if rv_company == '최고잔가':
+            grade = None  # 최고잔가는 등급을 자동 선택하므로 입력 등급은 무관
+        cache_key = normalize_quote_key(
+            product, rv.content_id, car_price, option_price, dealer_discount, period, mileage,
+            rv_company, grade, deposit_type, deposit_rate, vehicle_type_eco, is_domestic, trace
+        )
 
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 3. 취득원가 ===")
-        if dealer_discount > 0:
-            debug['steps'].append(f"{base_price:,.0f} + {registration_tax:,.0f} + {acquisition_tax:,.0f} - {dealer_discount:,.0f} = {acquisition_cost:,.0f}원")
-        else:
-            debug['steps'].append(f"{base_price:,.0f} + {registration_tax:,.0f} + {acquisition_tax:,.0f} = {acquisition_cost:,.0f}원")
-
-        # 4. 잔존가치 기준금액 (엑셀 B62)
-        # 국산: 취득원가, 수입: 기본가격 - 딜러할인
-        if is_domestic:
-            rv_base_amount = acquisition_cost
-            debug['steps'].append(f"")
-            debug['steps'].append(f"=== 4. 잔존가치 기준금액 (국산) ===")
-            debug['steps'].append(f"취득원가 기준: {rv_base_amount:,.0f}원")
-        else:
-            rv_base_amount = base_price - dealer_discount
-            debug['steps'].append(f"")
-            debug['steps'].append(f"=== 4. 잔존가치 기준금액 (수입) ===")
-            if dealer_discount > 0:
-                debug['steps'].append(f"기본가격 - 딜러할인: {base_price:,.0f} - {dealer_discount:,.0f} = {rv_base_amount:,.0f}원")
-            else:
-                debug['steps'].append(f"기본가격 기준: {rv_base_amount:,.0f}원")
-
-        # 5. 잔가율 조회 및 잔가액 계산 (엑셀 B56, B68, B70)
-        rv_rate = self.get_residual_rate(rv_company, period, grade, mileage)
-        residual_value = rv_base_amount * rv_rate
+        cached = self.quote_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 5. 잔가 정보 (최고잔가 적용) ===")
-        if best_rv_info:
-            debug['steps'].append(f"✨ 최고 잔가사: {rv_company} (등급: {grade})")
-            debug['steps'].append(f"✨ 최고 잔가율: {rv_rate*100:.2f}%")
-            debug['steps'].append(f"")
-            debug['steps'].append(f"📊 상위 5개 잔가율:")
-            for i, (company, grd, rate) in enumerate(best_rv_info['all_rates'][:5], 1):
-                marker = "👉" if company == rv_company and grd == grade else "  "
-                debug['steps'].append(f"{marker} {i}. {company} {grd}등급: {rate*100:.2f}%")
-        else:
-            debug['steps'].append(f"잔가사: {rv_company}")
-            debug['steps'].append(f"등급: {grade}, 기간: {period}개월, 주행: {mileage}KM")
-            debug['steps'].append(f"잔가율: {rv_rate*100:.2f}%")
-        debug['steps'].append(f"")
-        debug['steps'].append(f"잔가금액: {rv_base_amount:,.0f} × {rv_rate:.4f} = {residual_value:,.0f}원")
-
-        # 6. 감가상각액 및 월감가
-        depreciation = acquisition_cost - residual_value
-        monthly_depreciation = depreciation / period
-
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 6. 감가상각 ===")
-        debug['steps'].append(f"감가상각: {acquisition_cost:,.0f} - {residual_value:,.0f} = {depreciation:,.0f}원")
-        debug['steps'].append(f"월감가: {depreciation:,.0f} ÷ {period}개월 = {monthly_depreciation:,.0f}원")
-
-        # 7. 금융비용 (간이 계산)
-        finance_cost_rate = 0.06 / 12  # 월 금리 0.5%
-        average_balance = (acquisition_cost + residual_value) / 2
-        monthly_finance_cost = average_balance * finance_cost_rate
-
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 7. 금융비용 ===")
-        debug['steps'].append(f"평균 잔액: {average_balance:,.0f}원")
-        debug['steps'].append(f"월금융비용: {monthly_finance_cost:,.0f}원 (연 6% 가정)")
-
-        # 8. 기본 월대여료
-        base_monthly = monthly_depreciation + monthly_finance_cost
-
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 8. 기본 월대여료 ===")
-        debug['steps'].append(f"{monthly_depreciation:,.0f} + {monthly_finance_cost:,.0f} = {base_monthly:,.0f}원")
-
-        # 9. 보증금/선수금 효과
-        deposit_discount = 0
-        if deposit_type == '보증금' and deposit_rate > 0:
-            deposit_amount = acquisition_cost * (deposit_rate / 100)
-            deposit_discount = deposit_amount * finance_cost_rate
-
-            debug['steps'].append(f"")
-            debug['steps'].append(f"=== 9. 보증금 효과 ===")
-            debug['steps'].append(f"보증금: {deposit_amount:,.0f}원 ({deposit_rate}%)")
-            debug['steps'].append(f"월대여료 할인: {deposit_discount:,.0f}원")
-
-        elif deposit_type == '선수금' and deposit_rate > 0:
-            advance_amount = acquisition_cost * (deposit_rate / 100)
-            deposit_discount = advance_amount / period
-
-            debug['steps'].append(f"")
-            debug['steps'].append(f"=== 9. 선수금 효과 ===")
-            debug['steps'].append(f"선수금: {advance_amount:,.0f}원 ({deposit_rate}%)")
-            debug['steps'].append(f"월납입 감소: {deposit_discount:,.0f}원")
-
-        # 10. 최종 월대여료 (딜러할인은 이미 취득원가에 반영됨)
-        monthly_payment = base_monthly - deposit_discount
-
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 10. 최종 월대여료 ===")
-        if deposit_discount > 0:
-            debug['steps'].append(f"{base_monthly:,.0f} - {deposit_discount:,.0f} = {monthly_payment:,.0f}원")
-        else:
-            debug['steps'].append(f"{monthly_payment:,.0f}원")
+        result = compute(*args, trace, session, rv)
+        self.quote_cache.put(cache_key, result)
+        return result
 
-        if dealer_discount > 0:
-            debug['steps'].append(f"(딜러할인 {dealer_discount:,.0f}원은 이미 취득원가에 반영되어 감가상각액이 감소함)")
+    @metrics.timed('bnk.calculate_lease')
+    def calculate_lease(
+        self,
+        car_price: float,
+        option_price: float,
+        period: int,
+        rv_company: str = '최고잔가',
+        grade: str = 'A',
+        mileage: str = '2만',
+        deposit_type: str = '무보증',
+        deposit_rate: float = 0,
+        dealer_discount: float = 0,
+        vehicle_type_eco: str = '일반',
+        is_domestic: bool = True,
+        trace: bool = False,
+        session: Optional[StageSession] = None,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[float, Dict]:
+        """
+        운용리스 계산 (견적 캐시 적용, 인자는 _compute_lease와 동일)
 
-        debug['acquisition_cost'] = acquisition_cost
-        debug['residual_value'] = residual_value
-        debug['residual_rate'] = rv_rate
-        debug['acquisition_tax'] = acquisition_tax
-        debug['registration_tax'] = registration_tax
+        Args:
+            as_of: 기준일 (이 날 적용 중이던 잔가율 테이블로 재계산, None이면 현재 파일)
 
-        return round(monthly_payment), debug
+        Returns:
+            (월대여료, 상세정보) - 상세정보는 캐시와 공유되므로 수정하지 말 것
+        """
+        args = (car_price, option_price, period, rv_company, grade, mileage,
+                deposit_type, deposit_rate, dealer_discount, vehicle_type_eco, is_domestic)
+        return self._cached_quote(self._compute_lease, 'lease', args, trace, session, as_of)
 
+    @metrics.timed('bnk.calculate_rental')
     def calculate_rental(
         self,
         car_price: float,
@@ -355,41 +823,221 @@ class BNKCalculator:
         deposit_rate: float = 0,
         dealer_discount: float = 0,
         vehicle_type_eco: str = '일반',
-        is_domestic: bool = True
+        is_domestic: bool = True,
+        trace: bool = False,
+        session: Optional[StageSession] = None,
+        as_of: Optional[AsOf] = None
     ) -> Tuple[float, Dict]:
         """
-        렌트 계산 (리스 + 보험료/세금 포함)
+        렌트 계산 (견적 캐시 적용, 인자는 _compute_rental과 동일)
+
+        Args:
+            as_of: 기준일 (이 날 적용 중이던 잔가율 테이블로 재계산, None이면 현재 파일)
+
+        Returns:
+            (월렌트료, 상세정보) - 상세정보는 캐시와 공유되므로 수정하지 말 것
         """
-        monthly, debug = self.calculate_lease(
-            car_price, option_price, period, rv_company, grade,
-            mileage, deposit_type, deposit_rate, dealer_discount,
-            vehicle_type_eco, is_domestic
-        )
+        args = (car_price, option_price, period, rv_company, grade, mileage,
+                deposit_type, deposit_rate, dealer_discount, vehicle_type_eco, is_domestic)
+        return self._cached_quote(self._compute_rental, 'rental', args, trace, session, as_of)
+
+    # ================ 역산 (목표 월대여료 → 조건) ================
+    # 취득세/등록세의 10원 단위 반올림 때문에 월대여료가 계단형이므로 닫힌 식 대신
+    # 잔가사 전체를 한 번에 정수 이분 탐색한다. 결과는 반올림 전 월대여료가 목표 이하가 되는 값.
+
+    def _payment_vector(
+        self,
+        product: str,
+        car_price,
+        option_price,
+        period: int,
+        rv_rate,
+        deposit_type: str,
+        deposit_rate,
+        dealer_discount,
+        vehicle_type_eco: str,
+        is_domestic: bool
+    ) -> 'np.ndarray':
+        """_compute_lease / _compute_rental의 반올림 전 월대여료 (배열 브로드캐스트, 같은 연산 순서)"""
+        import numpy as np
+
+        car_price = np.asarray(car_price, dtype=np.float64)
+        base_price = car_price + option_price
+        price_for_tax = base_price - dealer_discount
+
+        supply_price = price_for_tax / 1.1
+        registration_tax_rate = 0.02 if vehicle_type_eco == '전기' else 0.05
+        acquisition_tax = np.rint(supply_price * 0.02 / 10) * 10
+        registration_tax = np.rint(supply_price * registration_tax_rate / 10) * 10
+
+        acquisition_cost = base_price + registration_tax + acquisition_tax - dealer_discount
+        rv_base_amount = acquisition_cost if is_domestic else base_price - dealer_discount
+        residual_value = rv_base_amount * rv_rate
 
-        # 렌트 특성: 보험료, 세금 포함 (간소화)
-        insurance_tax = car_price * 0.005  # 월 0.5%
+        finance_cost_rate = FINANCE_COST_RATE
+        monthly = (acquisition_cost - residual_value) / period \
+            + (acquisition_cost + residual_value) / 2 * finance_cost_rate
 
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 렌트 추가비용 ===")
-        debug['steps'].append(f"보험료+세금: {insurance_tax:,.0f}원")
+        deposit_rate = np.asarray(deposit_rate, dtype=np.float64)
+        if deposit_type == '보증금':
+            monthly = monthly - np.where(deposit_rate > 0, acquisition_cost * (deposit_rate / 100), 0) * finance_cost_rate
+        elif deposit_type == '선수금':
+            monthly = monthly - np.where(deposit_rate > 0, acquisition_cost * (deposit_rate / 100), 0) / period
 
-        monthly_rental = monthly + insurance_tax
+        if product == 'rental':
+            # 렌트는 반올림된 리스 월대여료에 보험료+세금을 더함
+            monthly = np.rint(monthly) + car_price * 0.005
+        return monthly
+
+    def _rv_rates(self, period: int, grade: str, mileage: str, as_of: Optional[AsOf] = None) -> 'np.ndarray':
+        """잔가사별 잔가율 (RV_COMPANIES 순서, 같은 스냅샷에서 조회)"""
+        import numpy as np
+
+        rv = self.history.at(as_of)
+        return np.array([rv.residual_rate(company, period, grade, mileage) for company in RV_COMPANIES])
+
+    def solve_max_car_price(
+        self,
+        target_payment: float,
+        period: int,
+        product: str = 'lease',
+        grade: str = 'A',
+        mileage: str = '2만',
+        deposit_type: str = '무보증',
+        deposit_rate: float = 0,
+        option_price: float = 0,
+        dealer_discount: float = 0,
+        vehicle_type_eco: str = '일반',
+        is_domestic: bool = True,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월대여료 이하가 되는 최대 차량 가격 (잔가사별)
+
+        Args:
+            product: 'lease' 또는 'rental'
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (잔가사 목록, 최대 차량 가격 배열 (원 단위, 불가능하면 NaN))
+        """
+        import numpy as np
+
+        self._refresh_rv_tables()
+        rv_rate = self._rv_rates(period, grade, mileage, as_of)
+
+        def too_expensive(prices):
+            return self._payment_vector(product, prices, option_price, period, rv_rate, deposit_type,
+                                        deposit_rate, dealer_discount, vehicle_type_eco, is_domestic) > target_payment
+
+        lo = np.zeros(len(RV_COMPANIES), dtype=np.int64)
+        hi = np.full(len(RV_COMPANIES), 10 ** 8, dtype=np.int64)
+        while not too_expensive(hi).all() and hi.max() < 10 ** 13:
+            hi = np.where(too_expensive(hi), hi, hi * 2)
+
+        prices = (_bisect_first_true(too_expensive, lo, hi) - 1).astype(np.float64)
+        prices[too_expensive(lo) | ~too_expensive(hi)] = np.nan
+        return list(RV_COMPANIES), prices
+
+    def solve_min_deposit_rate(
+        self,
+        target_payment: float,
+        car_price: float,
+        period: int,
+        product: str = 'lease',
+        grade: str = 'A',
+        mileage: str = '2만',
+        deposit_type: str = '보증금',
+        max_deposit_rate: float = 30,
+        option_price: float = 0,
+        dealer_discount: float = 0,
+        vehicle_type_eco: str = '일반',
+        is_domestic: bool = True,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월대여료 이하가 되는 최소 보증금/선수금 비율 (잔가사별)
+
+        Args:
+            deposit_type: '보증금' 또는 '선수금'
+            max_deposit_rate: 허용 최대 비율 (%)
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (잔가사 목록, 최소 비율 배열 (%, 0.01 단위, max_deposit_rate 초과면 NaN))
+        """
+        import numpy as np
+
+        if deposit_type not in ('보증금', '선수금'):
+            raise ValueError(f"보증금/선수금 비율은 보증금, 선수금 유형에서만 계산할 수 있습니다: {deposit_type}")
+
+        self._refresh_rv_tables()
+        rv_rate = self._rv_rates(period, grade, mileage, as_of)
+
+        def affordable(hundredths):
+            return self._payment_vector(product, car_price, option_price, period, rv_rate, deposit_type,
+                                        hundredths / 100, dealer_discount, vehicle_type_eco,
+                                        is_domestic) <= target_payment
+
+        lo = np.zeros(len(RV_COMPANIES), dtype=np.int64)
+        hi = np.full(len(RV_COMPANIES), int(round(max_deposit_rate * 100)), dtype=np.int64)
+        rates = _bisect_first_true(affordable, lo, hi) / 100
+        rates[affordable(lo)] = 0.0
+        rates[~affordable(hi)] = np.nan
+        return list(RV_COMPANIES), rates
+
+    def solve_dealer_discount(
+        self,
+        target_payment: float,
+        car_price: float,
+        period: int,
+        product: str = 'lease',
+        grade: str = 'A',
+        mileage: str = '2만',
+        deposit_type: str = '무보증',
+        deposit_rate: float = 0,
+        option_price: float = 0,
+        vehicle_type_eco: str = '일반',
+        is_domestic: bool = True,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월대여료 이하가 되는 최소 딜러 할인 (잔가사별)
+
+        Args:
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (잔가사 목록, 최소 딜러 할인 배열 (원 단위, 차량가 + 옵션가로도 안 되면 NaN))
+        """
+        import numpy as np
 
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 최종 렌트료 ===")
-        debug['steps'].append(f"{monthly:,.0f} + {insurance_tax:,.0f} = {monthly_rental:,.0f}원")
+        self._refresh_rv_tables()
+        rv_rate = self._rv_rates(period, grade, mileage, as_of)
 
-        debug['product'] = 'rental'
+        def affordable(discounts):
+            return self._payment_vector(product, car_price, option_price, period, rv_rate, deposit_type,
+                                        deposit_rate, discounts, vehicle_type_eco, is_domestic) <= target_payment
 
-        return round(monthly_rental), debug
+        lo = np.zeros(len(RV_COMPANIES), dtype=np.int64)
+        hi = np.full(len(RV_COMPANIES), int(car_price + option_price), dtype=np.int64)
+        discounts = _bisect_first_true(affordable, lo, hi).astype(np.float64)
+        discounts[affordable(lo)] = 0.0
+        discounts[~affordable(hi)] = np.nan
+        return list(RV_COMPANIES), discounts
 
 
 # 싱글톤 인스턴스
 _bnk_calculator = None
+_bnk_calculator_lock = threading.Lock()
 
 def get_bnk_calculator() -> BNKCalculator:
-    """BNK 계산기 싱글톤 인스턴스"""
+    """BNK 계산기 싱글톤 인스턴스 (bnk_rv_tables.json 변경 감시 스레드 포함, 처음 호출한 스레드만 생성)"""
     global _bnk_calculator
-    if _bnk_calculator is None:
-        _bnk_calculator = BNKCalculator()
-    return _bnk_calculator
+    calculator = _bnk_calculator
+    if calculator is None:
+        with _bnk_calculator_lock:
+            if _bnk_calculator is None:
+                _bnk_calculator = BNKCalculator(watch=True)
+            calculator = _bnk_calculator
+    return calculator
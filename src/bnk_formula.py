@@ -0,0 +1,1769 @@
+"""
+BNK 견적서 수식 컴파일러
+- BNK-25-10-V4.xlsm의 운용리스견적 산출에 필요한 셀 수식을 읽어 파이썬 평가 그래프로 변환
+- 출력 셀에서 참조를 따라 필요한 셀만 수집 → 위상 정렬 → 입력과 무관한 셀은 컴파일 시 상수로 접기
+- 입력에 의존하는 셀만 파이썬 함수로 생성하고, 생성 코드와 상수를 원본 해시 기준으로 디스크에 캐시
+- 평가 시에는 기본값(통합문서 저장값)과 달라진 입력에 의존하는 셀만 다시 계산
+- TODAY()는 기준일 입력으로 취급 (기본값은 통합문서 저장일, 평가 시 as_of 또는 오늘)
+
+지원 수식: 사칙연산, ^, &, 비교, %, 단항 -, IF, IFERROR, AND, OR, NOT, VLOOKUP, HLOOKUP, INDEX,
+MATCH, COUNTIF, SUMIF, SUM, MAX, MIN, ROUND, ROUNDUP, ROUNDDOWN, PMT, RATE, IRR, TODAY
+(그 외 함수가 필요한 셀이 있으면 컴파일 시 FormulaCompileError)
+
+사용법:
+    python src/bnk_formula.py [BNK-25-10-V4.xlsm] [--verify] [--rebuild]
+"""
+
+import datetime
+import glob
+import hashlib
+import marshal
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+from catalog_snapshot import default_cache_dir, file_hash
+
+
+# 컴파일러 버전 (생성 코드 형식이 바뀌면 올려서 캐시 무효화)
+COMPILER_VERSION = 1
+
+DEFAULT_WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BNK-25-10-V4.xlsm")
+
+# 입력 이름 → 셀 주소 (값은 시트에 입력하는 값 그대로, 순번 입력은 1부터)
+INPUTS = {
+    'special_lease': "Es1!B4",              # 특판리스 여부 (TRUE/FALSE)
+    'maker_index': "Es1!B9",                # 제조사 순번
+    'model_index': "Es1!B13",               # 1차 모델선택 순번
+    'trim_index': "Es1!B15",                # 2차 모델선택 순번
+    'registration': "Es1!B26",              # 등록명의 (1: 고객, 2: 리스사)
+    'period_index': "Es1!B39",              # 계약기간 순번 (name!G2:G6)
+    'mileage_index': "Es1!B41",             # 주행거리 순번 (Es1!G56:G60)
+    'residual_choice': "Es1!B44",           # 잔가선택 순번
+    'residual_direct': "Es1!B136",          # 잔가 직접입력 여부
+    'deposit_direct': "Es1!B137",           # 보증금 금액 직접입력 여부
+    'prepay_direct': "Es1!B138",            # 선납금 금액 직접입력 여부
+    'price_basis': "Es1!B140",              # 보증금/선납금 기준가 코드
+    'irr_index': "Es1!B154",                # IRR 순번
+    'import_index': "운용리스견적!N5",       # 국산/수입 순번
+    'base_price': "운용리스견적!N13",        # 기본가격
+    'option_price': "운용리스견적!N14",      # 옵션가격
+    'discount': "운용리스견적!N15",          # 할인금액
+    'delivery_fee': "운용리스견적!N16",      # 탁송료
+    'ev_subsidy': "운용리스견적!N18",        # 전기차 구매보조금
+    'residual_rate': "운용리스견적!N34",     # 잔가 직접입력 (%)
+    'deposit_rate': "운용리스견적!N36",      # 보증금 (%)
+    'deposit_amount': "운용리스견적!N37",    # 보증금 금액
+    'prepay_rate': "운용리스견적!N38",       # 선납금 (%)
+    'prepay_amount': "운용리스견적!N39",     # 선납금 금액
+    'ag_fee_rate': "운용리스견적!N41",       # AG Fee (%)
+    'cm_fee_rate': "운용리스견적!N42",       # CM Fee (%)
+    'irr_adjust': "운용리스견적!U45",        # IRR 추가 입력
+    'partnership': "운용리스견적!N68",       # 제휴조건
+}
+
+# 출력 이름 → 셀 주소
+OUTPUTS = {
+    'monthly_payment': "운용리스견적!N51",   # 월 리스료 (계)
+    'base_lease': "Es1!B168",               # 기본리스료
+    'irr': "Es1!B166",                      # IRR 적용
+    'effective_rate': "Es1!B167",           # 적용금리
+    'period': "Es1!B40",                    # 계약기간 (개월)
+    'acquisition_cost': "Es1!B134",         # 취득원가
+    'residual_ratio': "Es1!B56",            # 실적용 잔가율
+    'residual_value': "Es1!B139",           # 실질잔가액
+    'deposit': "Es1!B143",                  # 보증금
+    'prepayment': "Es1!B146",               # 선납금
+    'total_fee': "Es1!B150",                # Total Fee
+}
+
+# 순번 입력의 선택지 (입력 이름 → 선택지 범위)
+INPUT_CHOICES = {
+    'period_index': "name!G2:G6",
+    'mileage_index': "Es1!G56:G60",
+}
+
+
+class FormulaCompileError(ValueError):
+    """수식을 평가 그래프로 변환할 수 없음 (미지원 함수/참조, 순환 참조 등)"""
+
+
+# ================ 런타임 (Excel 값 규칙) ================
+
+ERROR_CODES = ('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A')
+
+
+class ExcelError(Exception):
+    """Excel 오류 값 (#N/A 등). 수식 평가 중에는 예외로 전파되고, 셀 값으로는 인스턴스로 저장"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+    def __str__(self):
+        return self.code
+
+    def __repr__(self):
+        return f"ExcelError({self.code!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+
+def _raise(code: str):
+    raise ExcelError(code)
+
+
+def _r(value):
+    """셀 값 읽기 (오류 값이면 예외로 전파)"""
+    if isinstance(value, ExcelError):
+        raise ExcelError(value.code)
+    return value
+
+
+def _z(value):
+    """수식 결과가 빈 셀 참조이면 0 (Excel 표시값)"""
+    return 0 if value is None else value
+
+
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def _serial(value) -> float:
+    """날짜/시간 → Excel 일련번호"""
+    if isinstance(value, datetime.datetime):
+        delta = value - _EXCEL_EPOCH
+    elif isinstance(value, datetime.date):
+        delta = datetime.datetime(value.year, value.month, value.day) - _EXCEL_EPOCH
+    else:  # datetime.time
+        return (value.hour * 3600 + value.minute * 60 + value.second) / 86400
+    return delta.days + delta.seconds / 86400
+
+
+def _num(value):
+    """산술 연산용 숫자 변환 (빈 셀 0, TRUE 1, 숫자 문자열 허용)"""
+    kind = type(value)
+    if kind is int or kind is float:
+        return value
+    if value is None:
+        return 0
+    if kind is bool:
+        return int(value)
+    if kind is str:
+        try:
+            return float(value)
+        except ValueError:
+            raise ExcelError('#VALUE!')
+    if isinstance(value, ExcelError):
+        raise ExcelError(value.code)
+    raise ExcelError('#VALUE!')
+
+
+def _text(value) -> str:
+    """문자열 연결용 변환"""
+    kind = type(value)
+    if kind is str:
+        return value
+    if value is None:
+        return ""
+    if kind is bool:
+        return "TRUE" if value else "FALSE"
+    if kind is float:
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.15g}"
+    if isinstance(value, ExcelError):
+        raise ExcelError(value.code)
+    return str(value)
+
+
+def _truth(value) -> bool:
+    """조건 판정 (빈 셀 FALSE, 숫자는 0이 아니면 TRUE)"""
+    kind = type(value)
+    if kind is bool:
+        return value
+    if value is None:
+        return False
+    if kind is int or kind is float:
+        return value != 0
+    if kind is str:
+        upper = value.upper()
+        if upper == "TRUE":
+            return True
+        if upper == "FALSE":
+            return False
+    raise ExcelError('#VALUE!')
+
+
+# 비교 시 타입 순서: 숫자 < 문자열 < 논리값
+def _rank(value) -> int:
+    kind = type(value)
+    if kind is bool:
+        return 2
+    if kind is str:
+        return 1
+    return 0
+
+
+def _compare(a, b) -> int:
+    """Excel 비교 (-1/0/1): 빈 셀은 상대 타입의 빈 값, 문자열은 대소문자 무시"""
+    if a is None:
+        a = "" if type(b) is str else (False if type(b) is bool else 0)
+    if b is None:
+        b = "" if type(a) is str else (False if type(a) is bool else 0)
+    rank_a, rank_b = _rank(a), _rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        a, b = a.lower(), b.lower()
+    elif rank_a == 0 and a != b and abs(a - b) <= 1e-15 * max(abs(a), abs(b)):
+        # 15자리 정밀도 안의 차이는 같은 값
+        return 0
+    return (a > b) - (a < b)
+
+
+def _eq(a, b):
+    return _compare(a, b) == 0
+
+
+def _ne(a, b):
+    return _compare(a, b) != 0
+
+
+def _lt(a, b):
+    return _compare(a, b) < 0
+
+
+def _le(a, b):
+    return _compare(a, b) <= 0
+
+
+def _gt(a, b):
+    return _compare(a, b) > 0
+
+
+def _ge(a, b):
+    return _compare(a, b) >= 0
+
+
+def _add(a, b):
+    return _num(a) + _num(b)
+
+
+def _sub(a, b):
+    return _num(a) - _num(b)
+
+
+def _mul(a, b):
+    return _num(a) * _num(b)
+
+
+def _div(a, b):
+    divisor = _num(b)
+    if divisor == 0:
+        raise ExcelError('#DIV/0!')
+    return _num(a) / divisor
+
+
+def _pow(a, b):
+    base, exponent = _num(a), _num(b)
+    if base == 0 and exponent < 0:
+        raise ExcelError('#DIV/0!')
+    try:
+        result = float(base) ** exponent
+    except OverflowError:
+        raise ExcelError('#NUM!')
+    if isinstance(result, complex):
+        raise ExcelError('#NUM!')
+    return result
+
+
+def _cat(a, b):
+    return _text(a) + _text(b)
+
+
+def _neg(a):
+    return -_num(a)
+
+
+def _pct(a):
+    return _num(a) / 100
+
+
+class CellRange:
+    """
+    사각 범위 값 (행 우선 2차원 리스트)
+
+    상수 범위(cacheable)는 정확 일치 조회/COUNTIF 인덱스를 처음 사용할 때 만들어 재사용한다.
+    """
+
+    __slots__ = ('rows', 'nrows', 'ncols', 'cacheable', '_indexes')
+
+    def __init__(self, rows: List[List], cacheable: bool = False):
+        self.rows = rows
+        self.nrows = len(rows)
+        self.ncols = len(rows[0]) if rows else 0
+        self.cacheable = cacheable
+        self._indexes = {}
+
+    def __getstate__(self):
+        return (self.rows, self.cacheable)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def values(self) -> List:
+        return [value for row in self.rows for value in row]
+
+    def vector(self, axis: int, position: int) -> List:
+        """axis 0: position번째 열, axis 1: position번째 행"""
+        if axis == 1:
+            return self.rows[position]
+        return [row[position] for row in self.rows]
+
+    def line(self) -> List:
+        """1차원 범위 값 (행 또는 열 하나가 아니면 #N/A)"""
+        if self.nrows == 1:
+            return self.rows[0]
+        if self.ncols == 1:
+            return [row[0] for row in self.rows]
+        raise ExcelError('#N/A')
+
+    def exact_position(self, vector_key, vector: List, lookup) -> Optional[int]:
+        """정확 일치 첫 위치 (상수 범위는 해시 인덱스)"""
+        key = _lookup_key(lookup)
+        if key is None:
+            return None
+        if not self.cacheable:
+            for position, value in enumerate(vector):
+                if _lookup_key(value) == key:
+                    return position
+            return None
+        index = self._indexes.get(vector_key)
+        if index is None:
+            index = {}
+            for position, value in enumerate(vector):
+                value_key = _lookup_key(value)
+                if value_key is not None and value_key not in index:
+                    index[value_key] = position
+            self._indexes[vector_key] = index
+        return index.get(key)
+
+    def value_counts(self) -> Dict:
+        """값별 개수 (같음 조건 COUNTIF용)"""
+        counts = self._indexes.get('counts') if self.cacheable else None
+        if counts is None:
+            counts = {}
+            for value in self.values():
+                key = _lookup_key(value)
+                counts[key] = counts.get(key, 0) + 1
+            if self.cacheable:
+                self._indexes['counts'] = counts
+        return counts
+
+
+def _one(value) -> CellRange:
+    """단일 셀 참조를 범위로 (범위 인자 자리)"""
+    return CellRange([[value]])
+
+
+def _bind(v: List, spec: Tuple) -> CellRange:
+    """입력 의존 셀이 포함된 범위: 상수 틀에 현재 셀 값을 채움"""
+    template, members = spec
+    rows = [row[:] for row in template]
+    for r, c, cell_id in members:
+        rows[r][c] = v[cell_id]
+    return CellRange(rows)
+
+
+def _lookup_key(value):
+    """정확 일치 비교 키 (타입 구분, 문자열 대소문자 무시, 빈 셀/오류는 None)"""
+    kind = type(value)
+    if kind is int or kind is float:
+        return (0, float(value))
+    if kind is str:
+        return (1, value.lower())
+    if kind is bool:
+        return (2, value)
+    return None
+
+
+def _wildcard(pattern: str):
+    """Excel 와일드카드(*, ?, ~) → 정규식"""
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == '~':
+            escaped = True
+        elif char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts) + r'\Z', re.IGNORECASE | re.DOTALL)
+
+
+def _has_wildcard(value) -> bool:
+    return type(value) is str and ('*' in value or '?' in value or '~' in value)
+
+
+def _exact_match(table: CellRange, vector_key, vector: List, lookup) -> int:
+    if _has_wildcard(lookup):
+        pattern = _wildcard(lookup)
+        for position, value in enumerate(vector):
+            if type(value) is str and pattern.match(value):
+                return position
+        raise ExcelError('#N/A')
+    position = table.exact_position(vector_key, vector, lookup)
+    if position is None:
+        raise ExcelError('#N/A')
+    return position
+
+
+def _approximate_match(vector: List, lookup, descending: bool = False) -> int:
+    """정렬된 벡터에서 근사 일치 (오름차순: lookup 이하 마지막, 내림차순: lookup 이상 마지막)"""
+    lookup_rank = _rank(lookup)
+    found = None
+    for position, value in enumerate(vector):
+        if value is None or isinstance(value, ExcelError) or _rank(value) != lookup_rank:
+            continue
+        order = _compare(value, lookup)
+        if (order > 0) if not descending else (order < 0):
+            break
+        found = position
+    if found is None:
+        raise ExcelError('#N/A')
+    return found
+
+
+def _fn_vlookup(lookup, table, column, approximate=True):
+    return _table_lookup(lookup, table, column, approximate, axis=0)
+
+
+def _fn_hlookup(lookup, table, row, approximate=True):
+    return _table_lookup(lookup, table, row, approximate, axis=1)
+
+
+def _table_lookup(lookup, table, offset, approximate, axis: int):
+    lookup = _r(lookup)
+    if not isinstance(table, CellRange):
+        raise ExcelError('#N/A')
+    offset = int(_num(offset))
+    size = table.ncols if axis == 0 else table.nrows
+    if offset < 1:
+        raise ExcelError('#VALUE!')
+    if offset > size:
+        raise ExcelError('#REF!')
+    # 빈 인자(,)는 FALSE
+    approximate = False if approximate is None else _truth(approximate)
+    vector = table.vector(axis, 0)
+    if approximate:
+        position = _approximate_match(vector, lookup)
+    else:
+        position = _exact_match(table, (axis, 0), vector, lookup)
+    if axis == 0:
+        return _r(table.rows[position][offset - 1])
+    return _r(table.rows[offset - 1][position])
+
+
+def _fn_match(lookup, table, match_type=1):
+    lookup = _r(lookup)
+    if not isinstance(table, CellRange):
+        raise ExcelError('#N/A')
+    match_type = 0 if match_type is None else _num(match_type)
+    vector = table.line()
+    if match_type == 0:
+        axis = 1 if table.nrows == 1 else 0
+        return _exact_match(table, (axis, 0), vector, lookup) + 1
+    return _approximate_match(vector, lookup, descending=match_type < 0) + 1
+
+
+def _fn_index(table, row, column=None):
+    if not isinstance(table, CellRange):
+        table = _one(table)
+    row = int(_num(row))
+    if column is None:
+        # 1행 범위는 두 번째 인자가 열 번호
+        if table.nrows == 1 and table.ncols > 1:
+            row, column = 1, row
+        else:
+            column = 0
+    else:
+        column = int(_num(column))
+    if row < 0 or column < 0 or row > table.nrows or column > table.ncols:
+        raise ExcelError('#REF!')
+    if row == 0:
+        if table.nrows != 1:
+            raise ExcelError('#VALUE!')
+        row = 1
+    if column == 0:
+        if table.ncols != 1:
+            raise ExcelError('#VALUE!')
+        column = 1
+    return _r(table.rows[row - 1][column - 1])
+
+
+_CRITERIA_OPERATORS = ('<=', '>=', '<>', '<', '>', '=')
+
+
+def _criteria(criteria) -> Tuple[str, Any]:
+    """COUNTIF 조건 → (연산자, 비교값)"""
+    criteria = _r(criteria)
+    if type(criteria) is not str:
+        return '=', (0 if criteria is None else criteria)
+    for operator in _CRITERIA_OPERATORS:
+        if criteria.startswith(operator):
+            operand = criteria[len(operator):]
+            break
+    else:
+        operator, operand = '=', criteria
+    if operand != "":
+        try:
+            operand = float(operand)
+        except ValueError:
+            if operand.upper() in ("TRUE", "FALSE"):
+                operand = operand.upper() == "TRUE"
+    return operator, operand
+
+
+def _criteria_predicate(operator: str, operand) -> Callable[[Any], bool]:
+    if operand == "" and type(operand) is str:
+        if operator == '=':
+            return lambda value: value is None or value == ""
+        if operator == '<>':
+            return lambda value: value is not None and value != ""
+    if type(operand) is str and operator in ('=', '<>') and _has_wildcard(operand):
+        pattern = _wildcard(operand)
+        if operator == '=':
+            return lambda value: type(value) is str and pattern.match(value) is not None
+        return lambda value: not (type(value) is str and pattern.match(value) is not None)
+
+    operand_rank = _rank(operand)
+
+    def predicate(value):
+        if value is None or isinstance(value, ExcelError):
+            return operator == '<>'
+        if _rank(value) != operand_rank:
+            return operator == '<>'
+        order = _compare(value, operand)
+        if operator == '=':
+            return order == 0
+        if operator == '<>':
+            return order != 0
+        if operator == '<':
+            return order < 0
+        if operator == '<=':
+            return order <= 0
+        if operator == '>':
+            return order > 0
+        return order >= 0
+
+    return predicate
+
+
+def _fn_countif(table, criteria):
+    if not isinstance(table, CellRange):
+        raise ExcelError('#VALUE!')
+    operator, operand = _criteria(criteria)
+    if operator == '=' and not (type(operand) is str and (operand == "" or _has_wildcard(operand))):
+        return table.value_counts().get(_lookup_key(operand), 0)
+    predicate = _criteria_predicate(operator, operand)
+    return sum(1 for value in table.values() if predicate(value))
+
+
+def _fn_sumif(table, criteria, sum_table=None):
+    if not isinstance(table, CellRange):
+        raise ExcelError('#VALUE!')
+    sum_table = table if sum_table is None else sum_table
+    if not isinstance(sum_table, CellRange):
+        raise ExcelError('#VALUE!')
+    predicate = _criteria_predicate(*_criteria(criteria))
+    total = 0
+    for r, row in enumerate(table.rows):
+        for c, value in enumerate(row):
+            if predicate(value) and r < sum_table.nrows and c < sum_table.ncols:
+                target = sum_table.rows[r][c]
+                if isinstance(target, ExcelError):
+                    raise ExcelError(target.code)
+                if type(target) is int or type(target) is float:
+                    total += target
+    return total
+
+
+def _numbers(args) -> List:
+    """SUM/MAX 인자 → 숫자 목록 (범위 안의 문자열/논리값/빈 셀은 무시, 직접 인자는 변환)"""
+    numbers = []
+    for arg in args:
+        if isinstance(arg, CellRange):
+            for value in arg.values():
+                kind = type(value)
+                if kind is int or kind is float:
+                    numbers.append(value)
+                elif isinstance(value, ExcelError):
+                    raise ExcelError(value.code)
+        elif arg is not None:
+            numbers.append(_num(arg))
+    return numbers
+
+
+def _fn_sum(*args):
+    return sum(_numbers(args))
+
+
+def _fn_max(*args):
+    numbers = _numbers(args)
+    return max(numbers) if numbers else 0
+
+
+def _fn_min(*args):
+    numbers = _numbers(args)
+    return min(numbers) if numbers else 0
+
+
+def _logicals(args) -> List[bool]:
+    """AND/OR 인자 → 논리값 목록 (범위 안의 문자열/빈 셀은 무시)"""
+    flags = []
+    for arg in args:
+        if isinstance(arg, CellRange):
+            for value in arg.values():
+                kind = type(value)
+                if kind is bool:
+                    flags.append(value)
+                elif kind is int or kind is float:
+                    flags.append(value != 0)
+                elif isinstance(value, ExcelError):
+                    raise ExcelError(value.code)
+        elif arg is not None:
+            flags.append(_truth(arg))
+    if not flags:
+        raise ExcelError('#VALUE!')
+    return flags
+
+
+def _fn_and(*args):
+    return all(_logicals(args))
+
+
+def _fn_or(*args):
+    return any(_logicals(args))
+
+
+def _fn_not(value):
+    return not _truth(value)
+
+
+def _iferror(value: Callable, fallback: Callable):
+    try:
+        return value()
+    except ExcelError:
+        return fallback()
+
+
+def _rounding(value, digits, method: Callable[[float], float]):
+    value, digits = _num(value), int(_num(digits))
+    sign = -1 if value < 0 else 1
+    scaled = abs(value) * 10 ** digits if digits >= 0 else abs(value) / 10 ** -digits
+    # 이진 부동소수 오차 제거 (Excel 15자리 정밀도)
+    scaled = method(float(f"{scaled:.15g}"))
+    return sign * (scaled / 10 ** digits if digits >= 0 else scaled * 10 ** -digits)
+
+
+def _fn_round(value, digits):
+    return _rounding(value, digits, lambda x: math.floor(x + 0.5))
+
+
+def _fn_roundup(value, digits):
+    return _rounding(value, digits, math.ceil)
+
+
+def _fn_rounddown(value, digits):
+    return _rounding(value, digits, math.floor)
+
+
+def _fn_pmt(rate, nper, pv, fv=0, due=0):
+    rate, nper, pv = _num(rate), _num(nper), _num(pv)
+    fv, due = _num(fv), _num(due)
+    if nper == 0:
+        raise ExcelError('#NUM!')
+    if rate == 0:
+        return -(pv + fv) / nper
+    growth = (1 + rate) ** nper
+    return -(rate * (pv * growth + fv)) / ((growth - 1) * (1 + rate * (1 if due else 0)))
+
+
+def _newton(f: Callable[[float], float], guess: float) -> float:
+    """뉴턴법 근 (Excel RATE/IRR과 같은 방식, 수렴 실패 시 #NUM!)"""
+    x = guess
+    for _ in range(100):
+        try:
+            y = f(x)
+            step = 1e-7 * max(1.0, abs(x))
+            slope = (f(x + step) - y) / step
+        except (OverflowError, ZeroDivisionError):
+            raise ExcelError('#NUM!')
+        if slope == 0:
+            break
+        next_x = x - y / slope
+        if abs(next_x - x) < 1e-12:
+            return next_x
+        x = next_x
+    raise ExcelError('#NUM!')
+
+
+def _fn_rate(nper, pmt, pv, fv=0, due=0, guess=0.1):
+    nper, pmt, pv = _num(nper), _num(pmt), _num(pv)
+    fv, due = _num(fv), 1 if _num(due) else 0
+    guess = 0.1 if guess is None else _num(guess)
+
+    def balance(rate):
+        if abs(rate) < 1e-12:
+            return pv + pmt * nper + fv
+        growth = (1 + rate) ** nper
+        return pv * growth + pmt * (1 + rate * due) * (growth - 1) / rate + fv
+
+    return _newton(balance, guess)
+
+
+def _fn_irr(values, guess=0.1):
+    flows = _numbers([values])
+    if not any(flow > 0 for flow in flows) or not any(flow < 0 for flow in flows):
+        raise ExcelError('#NUM!')
+    guess = 0.1 if guess is None else _num(guess)
+
+    def npv(rate):
+        return sum(flow / (1 + rate) ** i for i, flow in enumerate(flows))
+
+    return _newton(npv, guess)
+
+
+# 순환 묶음 평가 상태
+_PENDING = object()
+_ACTIVE = object()
+
+
+def _settle(v: List, functions: Dict[int, Callable], cell_id: int):
+    """순환 묶음 셀을 필요할 때 계산 (오류는 값으로 저장)"""
+    value = v[cell_id]
+    if value is _PENDING:
+        v[cell_id] = _ACTIVE
+        try:
+            value = functions[cell_id](v)
+        except ExcelError as e:
+            value = e
+        v[cell_id] = value
+    elif value is _ACTIVE:
+        # 분기로도 끊기지 않는 실제 순환 참조
+        raise ExcelError('#REF!')
+    return value
+
+
+def _pull(v: List, functions: Dict[int, Callable], cell_id: int):
+    return _r(_settle(v, functions, cell_id))
+
+
+# 생성 코드 실행 네임스페이스
+_RUNTIME = {
+    name: value for name, value in globals().items()
+    if name.startswith('_') and callable(value) and not name.startswith('__')
+}
+_RUNTIME['ExcelError'] = ExcelError
+_RUNTIME['_PENDING'] = _PENDING
+
+
+# ================ 수식 파서 ================
+
+# 이항 연산자 우선순위 (높을수록 먼저)
+_BINARY = {
+    '=': (1, '_eq'), '<>': (1, '_ne'), '<': (1, '_lt'), '<=': (1, '_le'), '>': (1, '_gt'), '>=': (1, '_ge'),
+    '&': (2, '_cat'),
+    '+': (3, '_add'), '-': (3, '_sub'),
+    '*': (4, '_mul'), '/': (4, '_div'),
+    '^': (5, '_pow'),
+}
+
+# 함수 → 범위를 그대로 받는 인자 위치 (None: 모든 인자)
+_RANGE_ARGS = {
+    'VLOOKUP': {1}, 'HLOOKUP': {1}, 'INDEX': {0}, 'MATCH': {1},
+    'COUNTIF': {0}, 'SUMIF': {0, 2}, 'IRR': {0},
+    'SUM': None, 'MAX': None, 'MIN': None, 'AND': None, 'OR': None,
+}
+
+# 일반 함수 → (최소 인자 수, 최대 인자 수)
+_FUNCTION_ARITY = {
+    'VLOOKUP': (3, 4), 'HLOOKUP': (3, 4), 'INDEX': (2, 3), 'MATCH': (2, 3),
+    'COUNTIF': (2, 2), 'SUMIF': (2, 3), 'SUM': (1, 255), 'MAX': (1, 255), 'MIN': (1, 255),
+    'AND': (1, 255), 'OR': (1, 255), 'NOT': (1, 1),
+    'ROUND': (2, 2), 'ROUNDUP': (2, 2), 'ROUNDDOWN': (2, 2),
+    'PMT': (3, 5), 'RATE': (3, 6), 'IRR': (1, 2),
+}
+
+_REFERENCE = re.compile(r"^(?:(?:'((?:[^']|'')+)'|([^'!]+))!)?([^!]+)$")
+
+
+class _Parser:
+    """
+    openpyxl 토크나이저 토큰 → 구문 트리
+
+    노드: ('num', 값) ('str', 값) ('bool', 값) ('err', 코드) ('blank',) ('ref', 참조 문자열)
+          ('call', 함수명, [인자]) ('neg', x) ('pct', x) ('bin', 연산자, a, b)
+    """
+
+    def __init__(self, formula: str):
+        from openpyxl.formula.tokenizer import Tokenizer
+
+        self.formula = formula
+        self.tokens = [token for token in Tokenizer(formula).items if token.type != 'WHITE-SPACE']
+        self.position = 0
+
+    def parse(self):
+        node = self.expression(0)
+        if self.position != len(self.tokens):
+            raise self.error("수식 끝에 해석하지 못한 토큰")
+        return node
+
+    def error(self, message: str) -> FormulaCompileError:
+        return FormulaCompileError(f"{message}: {self.formula}")
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def advance(self):
+        token = self.peek()
+        if token is None:
+            raise self.error("수식이 끝나지 않음")
+        self.position += 1
+        return token
+
+    def expression(self, min_precedence: int):
+        node = self.prefix()
+        while True:
+            token = self.peek()
+            if token is None:
+                return node
+            if token.type == 'OPERATOR-POSTFIX':
+                self.advance()
+                node = ('pct', node)
+                continue
+            if token.type != 'OPERATOR-INFIX':
+                return node
+            if token.value not in _BINARY:
+                raise self.error(f"미지원 연산자 {token.value!r}")
+            precedence = _BINARY[token.value][0]
+            if precedence < min_precedence:
+                return node
+            self.advance()
+            node = ('bin', token.value, node, self.expression(precedence + 1))
+
+    def prefix(self):
+        token = self.advance()
+        if token.type == 'OPERATOR-PREFIX':
+            operand = self.prefix()
+            return ('neg', operand) if token.value == '-' else operand
+        if token.type == 'OPERAND':
+            if token.subtype == 'NUMBER':
+                number = float(token.value)
+                return ('num', int(number) if number.is_integer() and 'e' not in token.value.lower() else number)
+            if token.subtype == 'TEXT':
+                return ('str', token.value[1:-1].replace('""', '"'))
+            if token.subtype == 'LOGICAL':
+                return ('bool', token.value.upper() == 'TRUE')
+            if token.subtype == 'ERROR':
+                return ('err', token.value)
+            return ('ref', token.value)
+        if token.type == 'PAREN' and token.subtype == 'OPEN':
+            node = self.expression(0)
+            closing = self.advance()
+            if closing.type != 'PAREN':
+                raise self.error("괄호가 닫히지 않음")
+            return node
+        if token.type == 'FUNC' and token.subtype == 'OPEN':
+            name = token.value[:-1].upper()
+            if name.startswith('_XLFN.'):
+                name = name[len('_XLFN.'):]
+            return ('call', name, self.arguments())
+        raise self.error(f"예상하지 못한 토큰 {token.value!r}")
+
+    def arguments(self) -> List:
+        args = []
+        token = self.peek()
+        if token is not None and token.type == 'FUNC' and token.subtype == 'CLOSE':
+            self.advance()
+            return args
+        while True:
+            token = self.peek()
+            if token is not None and (token.type == 'SEP' or (token.type == 'FUNC' and token.subtype == 'CLOSE')):
+                args.append(('blank',))
+            else:
+                args.append(self.expression(0))
+            token = self.advance()
+            if token.type == 'FUNC' and token.subtype == 'CLOSE':
+                return args
+            if token.type != 'SEP' or token.subtype != 'ARG':
+                raise self.error(f"함수 인자 구분자 대신 {token.value!r}")
+
+
+def parse_formula(formula: str):
+    """수식 문자열(= 포함) → 구문 트리"""
+    return _Parser(formula).parse()
+
+
+def _walk(node):
+    yield node
+    if node[0] == 'call':
+        for arg in node[2]:
+            yield from _walk(arg)
+    elif node[0] in ('neg', 'pct'):
+        yield from _walk(node[1])
+    elif node[0] == 'bin':
+        yield from _walk(node[2])
+        yield from _walk(node[3])
+
+
+# ================ 컴파일러 ================
+
+Cell = Tuple[str, int, int]  # (시트명, 행, 열)
+
+# TODAY() 기준일 자리 (실제 셀 아님)
+TODAY_CELL = ("", 0, 0)
+
+
+def _address(cell: Cell) -> str:
+    from openpyxl.utils.cell import get_column_letter
+
+    if cell == TODAY_CELL:
+        return "TODAY()"
+    return f"{cell[0]}!{get_column_letter(cell[2])}{cell[1]}"
+
+
+def _parse_address(address: str) -> Cell:
+    from openpyxl.utils.cell import coordinate_to_tuple
+
+    sheet, coordinate = address.rsplit('!', 1)
+    row, column = coordinate_to_tuple(coordinate.replace('$', ''))
+    return sheet.strip("'"), row, column
+
+
+def _constant(cell):
+    """수식이 아닌 셀 값 → 평가 값 (날짜는 일련번호, 오류 셀은 ExcelError)"""
+    value = cell.value
+    if cell.data_type == 'e' or (type(value) is str and value in ERROR_CODES):
+        return ExcelError(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return _serial(value)
+    return value
+
+
+def _literal(value) -> str:
+    """상수 값 → 파이썬 식 (스칼라 자리, 오류는 예외 발생)"""
+    if isinstance(value, ExcelError):
+        return f"_raise({value.code!r})"
+    return repr(value)
+
+
+def _value_literal(value) -> str:
+    """상수 값 → 파이썬 식 (범위 자리, 오류도 값으로)"""
+    if isinstance(value, ExcelError):
+        return f"ExcelError({value.code!r})"
+    return repr(value)
+
+
+class _Compiler:
+    """통합문서 1개 → 평가 그래프 (수집 → 정렬 → 컴파일 시 평가 → 상수 접기 → 코드 생성)"""
+
+    def __init__(self, workbook, inputs: Dict[str, str], outputs: Dict[str, str]):
+        self.workbook = workbook
+        self.input_cells = {name: _parse_address(address) for name, address in inputs.items()}
+        self.output_cells = {name: _parse_address(address) for name, address in outputs.items()}
+
+        self.ids = {}            # {Cell: id} 수식 셀과 입력 셀
+        self.cells = []          # id → Cell
+        self.trees = {}          # {id: 구문 트리} 수식 셀
+        self.cell_deps = {}      # {id: [id, ...]} 단일 셀 참조 의존
+        self.range_deps = {}     # {id: [범위 번호, ...]}
+        self.ranges = {}         # {(시트, r1, c1, r2, c2): 범위 번호}
+        self.range_specs = []    # 범위 번호 → (상수 틀, [(r, c, id), ...] 수식/입력 셀)
+        self._sheet_columns = {}  # {시트: {열: 정렬된 행 목록}}
+        self._cycle = set()      # 코드 생성 중인 순환 묶음
+
+        for cell in self.input_cells.values():
+            self._id(cell)
+        # TODAY() 기준일 (입력과 같은 방식으로 v에 저장)
+        self.today_id = self._id(TODAY_CELL)
+
+    # ---------- 수집 ----------
+
+    def _sheet(self, name: str):
+        if name not in self.workbook.sheetnames:
+            raise FormulaCompileError(f"시트 없음: {name}")
+        return self.workbook[name]
+
+    def _raw(self, cell: Cell):
+        return self._sheet(cell[0])._cells.get((cell[1], cell[2]))
+
+    def _is_formula(self, raw) -> bool:
+        return raw is not None and raw.data_type == 'f'
+
+    def _id(self, cell: Cell) -> int:
+        cell_id = self.ids.get(cell)
+        if cell_id is None:
+            cell_id = len(self.cells)
+            self.ids[cell] = cell_id
+            self.cells.append(cell)
+        return cell_id
+
+    def _formula_text(self, raw, cell: Cell) -> str:
+        value = raw.value
+        if type(value) is str:
+            return value
+        text = getattr(value, 'text', None)
+        if text is None:
+            raise FormulaCompileError(f"미지원 수식 형식 ({type(value).__name__}): {_address(cell)}")
+        return text if text.startswith('=') else "=" + text
+
+    def collect(self):
+        """출력 셀에서 참조를 따라 필요한 수식 셀 수집"""
+        input_set = set(self.input_cells.values())
+        pending = [cell for cell in self.output_cells.values()]
+        while pending:
+            cell = pending.pop()
+            if cell in input_set:
+                continue
+            raw = self._raw(cell)
+            if not self._is_formula(raw):
+                continue
+            cell_id = self._id(cell)
+            if cell_id in self.trees:
+                continue
+            formula = self._formula_text(raw, cell)
+            try:
+                tree = self._resolve(parse_formula(formula), cell[0], pending)
+            except FormulaCompileError as e:
+                raise FormulaCompileError(f"{_address(cell)}: {e}")
+            self.trees[cell_id] = tree
+            cells, ranges = set(), set()
+            for node in _walk(tree):
+                if node[0] == 'cell':
+                    cells.add(node[1])
+                elif node[0] == 'range':
+                    ranges.add(node[1])
+                elif node[0] == 'call' and node[1] == 'TODAY':
+                    cells.add(self.today_id)
+            self.cell_deps[cell_id] = sorted(cells)
+            self.range_deps[cell_id] = sorted(ranges)
+
+    def _resolve(self, node, sheet: str, pending: List):
+        """참조 노드 → ('cell', id) / ('const', 값) / ('range', 번호), 필요한 셀은 pending에 추가"""
+        kind = node[0]
+        if kind == 'ref':
+            return self._reference(node[1], sheet, pending)
+        if kind == 'call':
+            if node[1] not in _FUNCTION_ARITY and node[1] not in ('IF', 'IFERROR', 'TODAY'):
+                raise FormulaCompileError(f"미지원 함수 {node[1]}")
+            args = node[2]
+            if node[1] in ('VLOOKUP', 'HLOOKUP') and len(args) >= 3 and args[1][0] == 'ref' \
+                    and args[2][0] == 'num':
+                # 열(행) 번호가 상수면 조회 열과 결과 열만 의존 (나머지 셀은 읽지 않음)
+                lines = (0 if node[1] == 'VLOOKUP' else 1, tuple(sorted({0, int(args[2][1]) - 1})))
+                table = self._reference(args[1][1], sheet, pending, lines)
+                return ('call', node[1], [self._resolve(args[0], sheet, pending), table]
+                        + [self._resolve(arg, sheet, pending) for arg in args[2:]])
+            return ('call', node[1], [self._resolve(arg, sheet, pending) for arg in args])
+        if kind in ('neg', 'pct'):
+            return (kind, self._resolve(node[1], sheet, pending))
+        if kind == 'bin':
+            return ('bin', node[1], self._resolve(node[2], sheet, pending), self._resolve(node[3], sheet, pending))
+        return node
+
+    def _reference(self, text: str, sheet: str, pending: List, lines: Optional[Tuple] = None):
+        """
+        참조 문자열 → ('cell', id) / ('const', 값) / ('range', 번호)
+
+        Args:
+            lines: (축, 위치들) 범위 중 읽는 열(축 0) 또는 행(축 1)만 의존으로 수집
+        """
+        from openpyxl.utils.cell import range_boundaries
+
+        match = _REFERENCE.match(text)
+        if match is None or text.startswith('['):
+            raise FormulaCompileError(f"미지원 참조 {text}")
+        name = match.group(1).replace("''", "'") if match.group(1) else (match.group(2) or sheet)
+        worksheet = self._sheet(name)
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(match.group(3).replace('$', ''))
+        except ValueError:
+            raise FormulaCompileError(f"미지원 참조 (이름 정의 등) {text}")
+        min_row, min_col = min_row or 1, min_col or 1
+        max_row = max_row or worksheet.max_row
+        max_col = max_col or worksheet.max_column
+
+        if (min_row, min_col) == (max_row, max_col):
+            cell = (name, min_row, min_col)
+            if cell in self.ids or self._is_formula(self._raw(cell)):
+                pending.append(cell)
+                return ('cell', self._id(cell))
+            raw = self._raw(cell)
+            return ('const', None if raw is None else _constant(raw))
+
+        key = (name, min_row, min_col, max_row, max_col, lines)
+        number = self.ranges.get(key)
+        if number is None:
+            number = len(self.range_specs)
+            self.ranges[key] = number
+            self.range_specs.append(self._range_spec(key, pending))
+        return ('range', number)
+
+    def _columns(self, name: str) -> Dict[int, List[int]]:
+        columns = self._sheet_columns.get(name)
+        if columns is None:
+            columns = {}
+            for row, column in self._sheet(name)._cells:
+                columns.setdefault(column, []).append(row)
+            for rows in columns.values():
+                rows.sort()
+            self._sheet_columns[name] = columns
+        return columns
+
+    def _range_spec(self, key: Tuple, pending: List) -> Tuple[List[List], List[Tuple[int, int, int]]]:
+        name, min_row, min_col, max_row, max_col, lines = key
+        worksheet = self._sheet(name)
+        columns = self._columns(name)
+        template = [[None] * (max_col - min_col + 1) for _ in range(max_row - min_row + 1)]
+        members = []
+        for column in range(min_col, max_col + 1):
+            if lines is not None and lines[0] == 0 and column - min_col not in lines[1]:
+                continue
+            rows = columns.get(column, ())
+            for row in rows[bisect_left(rows, min_row):bisect_right(rows, max_row)]:
+                if lines is not None and lines[0] == 1 and row - min_row not in lines[1]:
+                    continue
+                cell = (name, row, column)
+                raw = worksheet._cells[(row, column)]
+                if cell in self.ids or self._is_formula(raw):
+                    pending.append(cell)
+                    members.append((row - min_row, column - min_col, self._id(cell)))
+                else:
+                    template[row - min_row][column - min_col] = _constant(raw)
+        return template, members
+
+    # ---------- 정렬 / 의존 ----------
+
+    def _children(self, node: int) -> List[int]:
+        """그래프 노드의 의존 노드 (셀 id >= 0, 범위는 -(번호+1))"""
+        if node >= 0:
+            if node not in self.trees:
+                return []
+            return self.cell_deps[node] + [-(number + 1) for number in self.range_deps[node]]
+        return [cell_id for _, _, cell_id in self.range_specs[-node - 1][1]]
+
+    def order(self) -> List[Tuple[int, ...]]:
+        """
+        수식 셀 평가 순서 (Tarjan 강한 연결 요소, 의존 셀이 먼저)
+
+        서로 참조하는 셀 묶음(IF 분기로만 끊기는 순환 참조)은 한 단계로 묶어 평가 시 필요한 셀만 계산한다.
+
+        Returns:
+            [(셀 id, ...), ...] 단계별 셀 (대부분 1개)
+        """
+        index, low = {}, {}
+        stack, on_stack = [], set()
+        groups = []
+        for root in self.trees:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self._children(root)))]
+            while work:
+                node, remaining = work[-1]
+                child = next(remaining, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self._children(child))))
+                    elif child in on_stack:
+                        low[node] = min(low[node], index[child])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] != index[node]:
+                    continue
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    members.append(member)
+                    if member == node:
+                        break
+                if any(member < 0 for member in members) and len(members) > 1:
+                    where = ", ".join(_address(self.cells[m]) for m in members if m >= 0)
+                    raise FormulaCompileError(f"범위를 거치는 순환 참조: {where}")
+                cells = tuple(sorted(m for m in members if m >= 0 and m in self.trees))
+                if cells:
+                    groups.append(cells)
+        return groups
+
+    def is_cycle(self, group: Tuple[int, ...]) -> bool:
+        return len(group) > 1 or group[0] in self.cell_deps[group[0]]
+
+    def masks(self, groups: List[Tuple[int, ...]], today_bit: int) -> Tuple[Dict[int, int], List[int]]:
+        """셀별 입력 의존 비트 (입력 순서대로 1 << i, 기준일은 today_bit, 순환 묶음은 합집합)"""
+        cell_masks = {self.today_id: today_bit}
+        for bit, cell in enumerate(self.input_cells.values()):
+            cell_masks[self.ids[cell]] = cell_masks.get(self.ids[cell], 0) | (1 << bit)
+        range_masks = [None] * len(self.range_specs)
+
+        def range_mask(number):
+            mask = range_masks[number]
+            if mask is None:
+                mask = 0
+                for _, _, cell_id in self.range_specs[number][1]:
+                    mask |= cell_masks.get(cell_id, 0)
+                range_masks[number] = mask
+            return mask
+
+        for group in groups:
+            mask = 0
+            for cell_id in group:
+                for dep in self.cell_deps[cell_id]:
+                    mask |= cell_masks.get(dep, 0)
+                for number in self.range_deps[cell_id]:
+                    mask |= range_mask(number)
+            for cell_id in group:
+                cell_masks[cell_id] = mask
+        return cell_masks, [range_mask(number) for number in range(len(self.range_specs))]
+
+    # ---------- 코드 생성 ----------
+
+    def emit(self, node, scalar: bool, folded: Optional[Dict[int, Any]], range_code: Callable[[int], str]) -> str:
+        """
+        구문 트리 → 파이썬 식
+
+        Args:
+            scalar: False면 범위 인자 자리 (셀 참조를 CellRange로)
+            folded: {id: 값} 상수로 접힌 셀 (None이면 모든 셀을 v에서 읽음)
+            range_code: 범위 번호 → 범위 식
+        """
+        kind = node[0]
+        if kind == 'cell':
+            cell_id = node[1]
+            if folded is not None and cell_id in folded:
+                value = folded[cell_id]
+                return _literal(value) if scalar else f"_one({_value_literal(value)})"
+            if cell_id not in self.trees:
+                # 입력 셀
+                return f"v[{cell_id}]" if scalar else f"_one(v[{cell_id}])"
+            if cell_id in self._cycle:
+                # 같은 순환 묶음: 실제로 평가되는 분기에서만 계산
+                return f"_pull(v, _G, {cell_id})" if scalar else f"_one(_settle(v, _G, {cell_id}))"
+            return f"_r(v[{cell_id}])" if scalar else f"_one(v[{cell_id}])"
+        if kind == 'const':
+            return _literal(node[1]) if scalar else f"_one({_value_literal(node[1])})"
+        if kind == 'range':
+            if scalar:
+                raise FormulaCompileError("범위를 단일 값 자리에서 사용 (암시적 교차 미지원)")
+            return range_code(node[1])
+        if kind in ('num', 'str', 'bool'):
+            return repr(node[1])
+        if kind == 'err':
+            return f"_raise({node[1]!r})"
+        if kind == 'blank':
+            return "None"
+        if kind == 'neg':
+            return f"_neg({self.emit(node[1], True, folded, range_code)})"
+        if kind == 'pct':
+            return f"_pct({self.emit(node[1], True, folded, range_code)})"
+        if kind == 'bin':
+            function = _BINARY[node[1]][1]
+            left = self.emit(node[2], True, folded, range_code)
+            right = self.emit(node[3], True, folded, range_code)
+            return f"{function}({left}, {right})"
+
+        name, args = node[1], node[2]
+        if name == 'IF':
+            if not 1 <= len(args) <= 3:
+                raise FormulaCompileError("IF 인자 수")
+            condition = self.emit(args[0], True, folded, range_code)
+            then = self.emit(args[1], True, folded, range_code) if len(args) > 1 else "True"
+            otherwise = self.emit(args[2], True, folded, range_code) if len(args) > 2 else "False"
+            # 빈 인자 IF(x,,y)는 0
+            then = "0" if then == "None" else then
+            otherwise = "0" if otherwise == "None" else otherwise
+            return f"({then} if _truth({condition}) else {otherwise})"
+        if name == 'IFERROR':
+            if len(args) != 2:
+                raise FormulaCompileError("IFERROR 인자 수")
+            value = self.emit(args[0], True, folded, range_code)
+            fallback = self.emit(args[1], True, folded, range_code)
+            return f"_iferror(lambda: {value}, lambda: {fallback})"
+        if name == 'TODAY':
+            return f"v[{self.today_id}]"
+
+        low, high = _FUNCTION_ARITY[name]
+        if not low <= len(args) <= high:
+            raise FormulaCompileError(f"{name} 인자 수 {len(args)}")
+        range_positions = _RANGE_ARGS.get(name, set())
+        codes = []
+        for position, arg in enumerate(args):
+            as_range = range_positions is None or position in range_positions
+            codes.append(self.emit(arg, not (as_range and arg[0] in ('cell', 'const', 'range')),
+                                   folded, range_code))
+        return f"_fn_{name.lower()}({', '.join(codes)})"
+
+    def source(self, groups: Sequence[Tuple[int, ...]], folded: Optional[Dict[int, Any]],
+               range_code: Callable[[int], str]) -> Tuple[str, List[Tuple[int, str]]]:
+        """
+        셀마다 함수 1개 (_c<id>(v) → 셀 값), 순환 묶음은 묶음 함수 _g<id>(v)
+
+        Returns:
+            (소스, [(값을 저장할 셀 id, 단계 함수 이름), ...])
+        """
+        lines = []
+        steps = []
+        for group in groups:
+            cyclic = self.is_cycle(group)
+            self._cycle = set(group) if cyclic else set()
+            for cell_id in group:
+                try:
+                    expression = self.emit(self.trees[cell_id], True, folded, range_code)
+                except FormulaCompileError as e:
+                    raise FormulaCompileError(f"{_address(self.cells[cell_id])}: {e}")
+                lines.append(f"def _c{cell_id}(v):\n    return _z({expression})\n")
+            self._cycle = set()
+            if not cyclic:
+                steps.append((group[0], f"_c{group[0]}"))
+                continue
+            members = ", ".join(str(cell_id) for cell_id in group)
+            lines.append(
+                f"_G.update({{{', '.join(f'{cell_id}: _c{cell_id}' for cell_id in group)}}})\n"
+                f"def _g{group[0]}(v):\n"
+                f"    for i in ({members},):\n        v[i] = _PENDING\n"
+                f"    for i in ({members},):\n        _settle(v, _G, i)\n"
+                f"    return v[{group[0]}]\n"
+            )
+            steps.append((group[0], f"_g{group[0]}"))
+        return "\n".join(lines), steps
+
+
+def _run(steps: Sequence[Tuple[int, Callable]], v: List):
+    for cell_id, function in steps:
+        try:
+            v[cell_id] = function(v)
+        except ExcelError as e:
+            v[cell_id] = e
+
+
+def _compile(workbook, inputs: Dict[str, str], outputs: Dict[str, str]) -> Tuple[Dict, _Compiler, List]:
+    """
+    평가 그래프 산출물 생성
+
+    Returns:
+        (산출물, 컴파일러, 기본 입력에서 평가한 전체 셀 값)
+    """
+    compiler = _Compiler(workbook, inputs, outputs)
+    with metrics.span('bnk_formula.collect'):
+        compiler.collect()
+        groups = compiler.order()
+
+    # 1) 전체 그래프를 기본 입력(통합문서 저장값)으로 한 번 평가
+    v = [None] * len(compiler.cells)
+    for cell in compiler.input_cells.values():
+        raw = compiler._raw(cell)
+        v[compiler.ids[cell]] = None if raw is None else _constant(raw)
+    # 저장값과 같은 결과가 나오도록 기준일은 통합문서 저장일
+    saved = workbook.properties.modified or datetime.datetime.now()
+    v[compiler.today_id] = int(_serial(saved.date()))
+
+    materialized = {}
+
+    def lazy_range(number: int) -> str:
+        return f"_L({number})"
+
+    def materialize(number: int) -> CellRange:
+        table = materialized.get(number)
+        if table is None:
+            template, members = compiler.range_specs[number]
+            table = _bind(v, (template, members))
+            materialized[number] = table
+        return table
+
+    with metrics.span('bnk_formula.fold'):
+        source, steps = compiler.source(groups, None, lazy_range)
+        namespace = dict(_RUNTIME, _L=materialize, _G={})
+        exec(compile(source, "<bnk_formula:fold>", "exec"), namespace)
+        _run([(cell_id, namespace[name]) for cell_id, name in steps], v)
+
+    # 2) 입력과 무관한 셀은 상수로 접고, 입력 의존 셀만 코드 생성
+    today_bit = 1 << len(compiler.input_cells)
+    cell_masks, range_masks = compiler.masks(groups, today_bit)
+    dependent = [group for group in groups if cell_masks[group[0]]]
+    folded = {cell_id: v[cell_id] for group in groups if not cell_masks[group[0]] for cell_id in group}
+
+    constant_ranges, dynamic_ranges = {}, {}
+
+    def runtime_range(number: int) -> str:
+        template, members = compiler.range_specs[number]
+        if range_masks[number]:
+            if number not in dynamic_ranges:
+                filled = [row[:] for row in template]
+                live = []
+                for r, c, cell_id in members:
+                    if cell_id in folded:
+                        filled[r][c] = folded[cell_id]
+                    else:
+                        live.append((r, c, cell_id))
+                dynamic_ranges[number] = (filled, live)
+            return f"_bind(v, D[{number}])"
+        if number not in constant_ranges:
+            table = materialize(number)
+            constant_ranges[number] = CellRange(table.rows, cacheable=True)
+        return f"R[{number}]"
+
+    source, steps = compiler.source(dependent, folded, runtime_range)
+    code = compile(source, "<bnk_formula>", "exec")
+
+    def choice_values(address: str) -> List:
+        table = materialize(compiler._reference(address, "", [])[1])
+        return [_z(value) for value in table.line()]
+
+    artifact = {
+        'version': COMPILER_VERSION,
+        'code': marshal.dumps(code),
+        'steps': [(cell_id, cell_masks[cell_id], name) for cell_id, name in steps],
+        'values': v,
+        'today': (compiler.today_id, today_bit),
+        'inputs': {name: compiler.ids[cell] for name, cell in compiler.input_cells.items()},
+        'outputs': {name: compiler.ids[cell] if cell in compiler.ids else _constant(compiler._raw(cell))
+                    for name, cell in compiler.output_cells.items()},
+        'ranges': constant_ranges,
+        'dynamic': dynamic_ranges,
+        'choices': {name: choice_values(address) for name, address in INPUT_CHOICES.items()
+                    if name in inputs},
+        'stats': {'cells': len(compiler.cells), 'formulas': len(compiler.trees),
+                  'dependent': sum(len(group) for group in dependent),
+                  'ranges': len(compiler.range_specs)},
+    }
+    return artifact, compiler, v
+
+
+class CompiledWorkbook:
+    """컴파일된 BNK 견적서 평가기"""
+
+    def __init__(self, artifact: Dict):
+        self.stats = artifact['stats']
+        self.choices = artifact['choices']
+        self._inputs = artifact['inputs']
+        self._outputs = artifact['outputs']
+        self._defaults = artifact['values']
+        self._today_id, self._today_bit = artifact['today']
+        self._bits = {name: 1 << bit for bit, name in enumerate(self._inputs)}
+
+        namespace = dict(_RUNTIME, R=artifact['ranges'], D=artifact['dynamic'], _G={})
+        exec(marshal.loads(artifact['code']), namespace)
+        self._steps = [(cell_id, mask, namespace[name]) for cell_id, mask, name in artifact['steps']]
+        self._plans = {}  # {변경 입력 비트: [(id, 함수), ...]}
+
+    @property
+    def input_names(self) -> List[str]:
+        return list(self._inputs)
+
+    @property
+    def output_names(self) -> List[str]:
+        return list(self._outputs)
+
+    @property
+    def saved_date(self) -> datetime.date:
+        """통합문서 저장일 (기본값 평가의 TODAY())"""
+        return (_EXCEL_EPOCH + datetime.timedelta(days=self._defaults[self._today_id])).date()
+
+    def defaults(self) -> Dict[str, Any]:
+        """입력 기본값 (통합문서 저장값)"""
+        return {name: self._defaults[cell_id] for name, cell_id in self._inputs.items()}
+
+    def choice_index(self, name: str, value) -> int:
+        """순번 입력의 선택지 값 → 순번 (예: period_index, 36 → 3)"""
+        options = self.choices.get(name)
+        if options is None:
+            raise KeyError(f"선택지가 없는 입력: {name}")
+        for position, option in enumerate(options, start=1):
+            if _lookup_key(option) == _lookup_key(value):
+                return position
+        raise ValueError(f"{name} 선택지에 없는 값: {value!r} (선택지: {options})")
+
+    def _plan(self, changed: int) -> List[Tuple[int, Callable]]:
+        plan = self._plans.get(changed)
+        if plan is None:
+            plan = [(cell_id, function) for cell_id, mask, function in self._steps if mask & changed]
+            self._plans[changed] = plan
+        return plan
+
+    def _apply(self, v: List, current: Dict[str, Any], inputs: Dict[str, Any]) -> int:
+        """입력 반영, 값이 바뀐 입력 비트 반환"""
+        changed = 0
+        for name, value in inputs.items():
+            cell_id = self._inputs.get(name)
+            if cell_id is None:
+                raise KeyError(f"알 수 없는 입력: {name} (입력: {', '.join(self._inputs)})")
+            previous = current[name]
+            if value != previous or type(value) is not type(previous):
+                v[cell_id] = value
+                current[name] = value
+                changed |= self._bits[name]
+        return changed
+
+    def _start(self, as_of: Optional[datetime.date]) -> Tuple[List, int]:
+        """기본값 복사 + 기준일 반영"""
+        v = list(self._defaults)
+        today = int(_serial(as_of or datetime.date.today()))
+        if today != v[self._today_id]:
+            v[self._today_id] = today
+            return v, self._today_bit
+        return v, 0
+
+    def _collect(self, v: List, outputs: Optional[Sequence[str]]) -> Dict[str, Any]:
+        result = {}
+        for name in outputs or self._outputs:
+            target = self._outputs[name]
+            result[name] = v[target] if type(target) is int else target
+        return result
+
+    def evaluate(self, inputs: Optional[Dict[str, Any]] = None,
+                 outputs: Optional[Sequence[str]] = None,
+                 as_of: Optional[datetime.date] = None) -> Dict[str, Any]:
+        """
+        견적 1건 평가
+
+        Args:
+            inputs: {입력 이름: 셀 값} (없는 입력은 통합문서 저장값)
+            outputs: 반환할 출력 이름 (기본: 전체)
+            as_of: TODAY() 기준일 (기본: 오늘, 견적서 사용기간이 지나면 월 리스료가 "사용기간 초과")
+
+        Returns:
+            {출력 이름: 셀 값} (Excel 오류는 ExcelError 인스턴스)
+        """
+        with metrics.span('bnk_formula.evaluate'):
+            v, changed = self._start(as_of)
+            changed |= self._apply(v, self.defaults(), inputs or {})
+            _run(self._plan(changed), v)
+            return self._collect(v, outputs)
+
+    def evaluate_batch(self, rows: Sequence[Dict[str, Any]],
+                       outputs: Optional[Sequence[str]] = None,
+                       as_of: Optional[datetime.date] = None) -> List[Dict[str, Any]]:
+        """
+        견적 여러 건 평가 (직전 행과 달라진 입력에 의존하는 셀만 다시 계산)
+
+        같은 차량·조건에서 가격이나 보증금만 바꾸는 배치는 행마다 수십 개 셀만 계산한다.
+        입력이 같은 행끼리 모이도록 정렬해 넘기면 재계산이 가장 적다.
+        """
+        with metrics.span('bnk_formula.evaluate_batch'):
+            v, changed = self._start(as_of)
+            current = self.defaults()
+            base = dict(current)
+            results = []
+            for row in rows:
+                # 행에 없는 입력은 기본값으로 되돌림
+                changed |= self._apply(v, current, {**base, **row})
+                _run(self._plan(changed), v)
+                changed = 0
+                results.append(self._collect(v, outputs))
+            return results
+
+
+def _signature(inputs: Dict[str, str], outputs: Dict[str, str]) -> str:
+    text = repr((sorted(inputs.items()), sorted(outputs.items()), sorted(INPUT_CHOICES.items())))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]
+
+
+def graph_path(source_path: str, source_hash: str, signature: str, cache_dir: Optional[str] = None) -> str:
+    """
+    평가 그래프 캐시 경로 (생성 코드가 파이썬 버전별 바이트코드라 버전 포함)
+    예: BNK-25-10-V4.xlsm -> .snapshots/BNK-25-10-V4.<해시>.v1.<입출력 서명>.py312.graph
+    """
+    cache_dir = cache_dir or default_cache_dir(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    python = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    return os.path.join(cache_dir, f"{stem}.{source_hash}.v{COMPILER_VERSION}.{signature}.{python}.graph")
+
+
+def _remove_stale_graphs(source_path: str, keep_path: str, cache_dir: str):
+    """같은 원본의 이전 평가 그래프 삭제"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    for path in glob.glob(os.path.join(cache_dir, f"{stem}.*.graph")):
+        if os.path.abspath(path) != os.path.abspath(keep_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _open_workbook(source_path: str, data_only: bool = False):
+    import warnings
+    from openpyxl import load_workbook
+
+    with warnings.catch_warnings():
+        # 데이터 유효성 검사 확장 등 미지원 기능 경고
+        warnings.simplefilter('ignore')
+        return load_workbook(source_path, data_only=data_only, keep_vba=False)
+
+
+def compile_workbook(source_path: str = DEFAULT_WORKBOOK, inputs: Optional[Dict[str, str]] = None,
+                     outputs: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    통합문서 → 평가 그래프 산출물 (캐시 없이)
+
+    Raises:
+        FormulaCompileError: 미지원 함수/참조, 순환 참조
+    """
+    with metrics.span('bnk_formula.compile'):
+        workbook = _open_workbook(source_path)
+        artifact, _, _ = _compile(workbook, inputs or INPUTS, outputs or OUTPUTS)
+        return artifact
+
+
+def load_compiled(source_path: str = DEFAULT_WORKBOOK, cache_dir: Optional[str] = None,
+                  inputs: Optional[Dict[str, str]] = None,
+                  outputs: Optional[Dict[str, str]] = None) -> CompiledWorkbook:
+    """
+    캐시 우선 로드 (원본 해시가 다르거나 캐시가 없으면 컴파일 후 저장)
+
+    Args:
+        source_path: BNK 견적서 통합문서 경로
+        cache_dir: 캐시 디렉토리 (기본: 원본 옆 .snapshots)
+        inputs, outputs: {이름: 셀 주소} (기본: INPUTS, OUTPUTS)
+    """
+    inputs = inputs or INPUTS
+    outputs = outputs or OUTPUTS
+    source_hash = file_hash(source_path)
+    target = graph_path(source_path, source_hash, _signature(inputs, outputs), cache_dir)
+
+    if os.path.exists(target):
+        try:
+            with open(target, 'rb') as f:
+                artifact = pickle.load(f)
+            if artifact.get('version') == COMPILER_VERSION:
+                metrics.incr('bnk_formula.cache.hit')
+                return CompiledWorkbook(artifact)
+        except Exception:
+            # 손상된 캐시는 다시 컴파일
+            pass
+
+    metrics.incr('bnk_formula.cache.miss')
+    artifact = compile_workbook(source_path, inputs, outputs)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, target)
+        _remove_stale_graphs(source_path, target, os.path.dirname(target))
+    except OSError:
+        # 읽기 전용 파일시스템 등: 캐시 없이 진행
+        pass
+    return CompiledWorkbook(artifact)
+
+
+def verify_workbook(source_path: str = DEFAULT_WORKBOOK, rel_tol: float = 1e-9) -> Tuple[int, List[Tuple[str, Any, Any]]]:
+    """
+    컴파일한 모든 수식 셀을 통합문서 저장 입력으로 평가해 Excel 저장값(data_only)과 비교
+
+    Returns:
+        (비교한 셀 수, [(주소, Excel 값, 평가 값), ...] 불일치 목록)
+    """
+    _, compiler, v = _compile(_open_workbook(source_path), INPUTS, OUTPUTS)
+    cached = _open_workbook(source_path, data_only=True)
+
+    mismatches = []
+    for cell_id, tree in compiler.trees.items():
+        sheet, row, column = compiler.cells[cell_id]
+        raw = cached[sheet]._cells.get((row, column))
+        expected = None if raw is None else _constant(raw)
+        got = v[cell_id]
+        if _same_value(expected, got, rel_tol):
+            continue
+        mismatches.append((_address(compiler.cells[cell_id]), expected, got))
+    return len(compiler.trees), mismatches
+
+
+def _same_value(expected, got, rel_tol: float) -> bool:
+    if expected is None:
+        # 저장값이 없는 셀 (빈 문자열 결과 등)
+        return got in (None, "", 0)
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool) \
+            and isinstance(got, (int, float)) and not isinstance(got, bool):
+        return math.isclose(expected, got, rel_tol=rel_tol, abs_tol=1e-9)
+    return expected == got and (type(expected) is bool) == (type(got) is bool)
+
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def get_bnk_formula(source_path: Optional[str] = None) -> CompiledWorkbook:
+    """컴파일된 BNK 견적서 싱글톤 인스턴스 반환 (처음 호출한 스레드만 컴파일)"""
+    global _compiled
+    compiled = _compiled
+    if compiled is None:
+        with _compiled_lock:
+            if _compiled is None:
+                _compiled = load_compiled(source_path or DEFAULT_WORKBOOK)
+            compiled = _compiled
+    return compiled
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="BNK 견적서 수식을 파이썬 평가 그래프로 컴파일")
+    parser.add_argument('workbook', nargs='?', default=DEFAULT_WORKBOOK)
+    parser.add_argument('--verify', action='store_true', help="모든 수식 셀을 Excel 저장값과 비교")
+    parser.add_argument('--rebuild', action='store_true', help="캐시를 무시하고 다시 컴파일")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BNK 견적서 수식 컴파일")
+    print("=" * 60)
+
+    if args.rebuild:
+        _remove_stale_graphs(args.workbook, "", default_cache_dir(args.workbook))
+    started = time.perf_counter()
+    compiled = load_compiled(args.workbook)
+    print(f"✓ 로드 {time.perf_counter() - started:.2f}s - 셀 {compiled.stats['cells']:,}개, "
+          f"수식 {compiled.stats['formulas']:,}개, 입력 의존 {compiled.stats['dependent']:,}개")
+
+    started = time.perf_counter()
+    result = compiled.evaluate(as_of=compiled.saved_date)
+    print(f"✓ 평가 {(time.perf_counter() - started) * 1000:.1f}ms (기준일 {compiled.saved_date}, 통합문서 저장일)")
+    for name, value in result.items():
+        print(f"  {name}: {value}")
+
+    if args.verify:
+        print("\nExcel 저장값과 비교 중...")
+        count, mismatches = verify_workbook(args.workbook)
+        print(f"✓ 수식 셀 {count:,}개 중 불일치 {len(mismatches)}개")
+        for address, expected, got in mismatches[:20]:
+            print(f"  {address}: Excel {expected!r} / 평가 {got!r}")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+예산 검색 인덱스
+- 조건(상품, 기간, 주행거리, 보증금)별로 전 차량의 최저 월납입금을 미리 계산해 정렬해 두고,
+  "월 X원 이하 차량" 질의를 이분 탐색 구간 조회로 응답
+- 파라미터가 바뀌면 해당 조건 전체를, 차량 가격만 바뀌면 바뀐 차량만 다시 계산
+- 조건마다 전 차량 인덱스를 만들어 두므로 앱 선택 조건(QUOTE_PERIODS, QUOTE_MILEAGES, PAYMENT_TYPES, DEPOSIT_RATES)만 허용
+"""
+
+import math
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from calculator import DEPOSIT_RATES, ModelBasedCalculator, get_calculator, validate_quote_condition
+from data_loader import DataLoader, get_data_loader
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class _ConditionIndex:
+    """조건 1개의 정렬된 최저 월납입금 인덱스"""
+
+    __slots__ = ('params', 'cheapest', 'company_index', 'order', 'sorted_payments', 'companies')
+
+    def __init__(self, params: Dict, companies: List[str], cheapest: 'np.ndarray', company_index: 'np.ndarray'):
+        self.params = params              # 계산에 사용한 파라미터 (변경 감지용)
+        self.companies = companies
+        self.cheapest = cheapest          # 차량별 최저 월납입금 (카탈로그 순서)
+        self.company_index = company_index  # 차량별 최저가 금융사 인덱스
+        self.sort()
+
+    def sort(self):
+        self.order = self.cheapest.argsort(kind='stable')
+        self.sorted_payments = self.cheapest[self.order]
+
+
+class BudgetIndex:
+    """조건별 최저 월납입금 정렬 인덱스"""
+
+    def __init__(self, data_loader: DataLoader, calculator: ModelBasedCalculator):
+        import numpy as np
+
+        self.data_loader = data_loader
+        self.calculator = calculator
+
+        self._carinfo = None                  # 인덱스를 만든 카탈로그 (변경 감지용)
+        self._car_ids = np.empty(0, dtype=np.int64)
+        self._prices = np.empty(0)
+        self._conditions = {}                 # {(상품, 기간, 주행거리, 보증금비율, 결제유형): _ConditionIndex}
+        # 가격 변경은 조건 인덱스를 제자리에서 고치므로 갱신과 조회를 같은 잠금으로 직렬화
+        self._lock = threading.RLock()
+
+    # ================ 카탈로그 ================
+
+    def _sync_catalog(self):
+        """카탈로그 변경 반영 (차량 구성이 바뀌면 인덱스 전체 폐기, 가격만 바뀌면 해당 차량만 갱신)"""
+        import numpy as np
+        import pandas as pd
+
+        carinfo = self.data_loader.get_carinfo()
+        if carinfo is self._carinfo:
+            return
+
+        prices = pd.to_numeric(carinfo['price'], errors='coerce').to_numpy(dtype=np.float64)
+        valid = prices > 0
+        car_ids = carinfo['id_cargrade'].to_numpy(dtype=np.int64)[valid]
+        prices = prices[valid]
+
+        same_cars = self._carinfo is not None and np.array_equal(car_ids, self._car_ids)
+        changed = np.flatnonzero(prices != self._prices) if same_cars else None
+
+        self._carinfo = carinfo
+        self._car_ids = car_ids
+        self._prices = prices
+        if changed is None:
+            self._conditions.clear()
+            return
+
+        if len(changed):
+            for key, entry in self._conditions.items():
+                _, cheapest, company_index = self._price_cars(*key, prices[changed])
+                entry.cheapest[changed] = cheapest
+                entry.company_index[changed] = company_index
+                entry.sort()
+
+    # ================ 인덱스 ================
+
+    def _price_cars(self, product_type: str, period: int, mileage: str, deposit_rate: float,
+                    payment_type: str, prices: 'np.ndarray') -> Tuple[List[str], 'np.ndarray', 'np.ndarray']:
+        """차량 가격 배열의 최저 월납입금과 금융사 인덱스"""
+        import numpy as np
+
+        companies, matrix = self.calculator.calculate_payment_matrix(
+            prices, product_type, period, mileage, deposit_rate=deposit_rate, payment_type=payment_type
+        )
+        if not companies:
+            return companies, np.full(len(prices), np.inf), np.full(len(prices), -1, dtype=np.int64)
+        company_index = matrix.argmin(axis=0)
+        cheapest = matrix[company_index, np.arange(len(prices))].astype(np.float64)
+        return companies, cheapest, company_index
+
+    @staticmethod
+    def _key(product_type: str, period: int, mileage: str, deposit_rate: float, payment_type: str) -> Tuple:
+        """
+        조건 키 검증
+
+        무보증은 보증금 비율과 무관하므로 비율을 0으로 맞춰 같은 키를 쓴다.
+
+        Raises:
+            ValueError: 앱 선택 조건이 아니거나 보증금 비율이 DEPOSIT_RATES가 아닌 경우
+        """
+        validate_quote_condition(product_type, period, mileage, payment_type)
+        if payment_type == '무보증':
+            deposit_rate = 0
+        elif deposit_rate not in DEPOSIT_RATES:
+            raise ValueError(f"지원하지 않는 보증금 비율: {deposit_rate!r} (가능: {list(DEPOSIT_RATES)})")
+        return product_type, period, mileage, deposit_rate, payment_type
+
+    @staticmethod
+    def _check_bounds(max_payment: float, min_payment: float):
+        """월납입금 구간 검증 (Raises: ValueError - 유한한 숫자가 아닌 경우)"""
+        if not (math.isfinite(max_payment) and math.isfinite(min_payment)):
+            raise ValueError(f"월납입금 구간은 유한한 숫자여야 합니다: {min_payment!r} ~ {max_payment!r}")
+
+    def _condition(self, key: Tuple) -> _ConditionIndex:
+        """조건 인덱스 조회 (없거나 파라미터가 바뀌었으면 해당 조건 전체 계산)"""
+        self._sync_catalog()
+        snapshots = self.calculator.snapshots
+        snapshots.poll()  # 감시 스레드가 없을 때만 파일 확인
+        params = snapshots.current.params
+
+        entry = self._conditions.get(key)
+        if entry is None or entry.params is not params:
+            companies, cheapest, company_index = self._price_cars(*key, self._prices)
+            entry = _ConditionIndex(params, companies, cheapest, company_index)
+            self._conditions[key] = entry
+        return entry
+
+    def warm(self, product_type: str, conditions: List[Tuple]):
+        """
+        조건 인덱스 미리 생성
+
+        Args:
+            conditions: (기간, 주행거리, 보증금비율, 결제유형) 튜플 목록
+        """
+        keys = [self._key(product_type, *condition) for condition in conditions]
+        with self._lock:
+            for key in keys:
+                self._condition(key)
+
+    def refresh(self):
+        """카탈로그·파라미터 변경을 만들어 둔 모든 조건 인덱스에 반영"""
+        with self._lock:
+            for key in list(self._conditions):
+                self._condition(key)
+
+    # ================ 조회 ================
+
+    def query(
+        self,
+        max_payment: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        min_payment: float = 0,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        월납입금 min_payment 이상 max_payment 이하인 차량 (최저 월납입금 오름차순)
+
+        Returns:
+            [{'id_cargrade', 'price', 'monthly_payment', 'company'}, ...]
+
+        Raises:
+            ValueError: 조건이 앱 선택 조건이 아니거나, 구간이 유한하지 않거나, limit이 음수인 경우
+        """
+        key = self._key(product_type, period, mileage, deposit_rate, payment_type)
+        self._check_bounds(max_payment, min_payment)
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit은 0 이상이어야 합니다: {limit!r}")
+
+        with self._lock:
+            entry = self._condition(key)
+            start = entry.sorted_payments.searchsorted(min_payment, side='left')
+            stop = entry.sorted_payments.searchsorted(max_payment, side='right')
+            if limit is not None:
+                stop = min(stop, start + limit)
+
+            positions = entry.order[start:stop]
+            car_ids = self._car_ids[positions].tolist()
+            prices = self._prices[positions].tolist()
+            payments = entry.sorted_payments[start:stop].tolist()
+            company_index = entry.company_index[positions].tolist()
+            companies = entry.companies
+
+        return [
+            {
+                'id_cargrade': car_id,
+                'price': price,
+                'monthly_payment': int(payment),
+                'company': companies[company]
+            }
+            for car_id, price, payment, company in zip(car_ids, prices, payments, company_index)
+        ]
+
+    def count(
+        self,
+        max_payment: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        min_payment: float = 0
+    ) -> int:
+        """월납입금 구간에 속하는 차량 수 (Raises: ValueError - query와 같은 조건 검증)"""
+        key = self._key(product_type, period, mileage, deposit_rate, payment_type)
+        self._check_bounds(max_payment, min_payment)
+        with self._lock:
+            entry = self._condition(key)
+            return int(entry.sorted_payments.searchsorted(max_payment, side='right')
+                       - entry.sorted_payments.searchsorted(min_payment, side='left'))
+
+
+# 싱글톤 인스턴스
+_budget_index = None
+_budget_index_lock = threading.Lock()
+
+def get_budget_index(data_dir: str = "ref") -> BudgetIndex:
+    """예산 검색 인덱스 싱글톤 인스턴스 반환"""
+    global _budget_index
+    index = _budget_index
+    if index is None:
+        with _budget_index_lock:
+            if _budget_index is None:
+                _budget_index = BudgetIndex(get_data_loader(data_dir), get_calculator())
+            index = _budget_index
+    return index
@@ -0,0 +1,46 @@
+"""
+계산 과정 추적 모듈
+- 계산 중 숫자 중간값만 기록하고, 디버깅 텍스트는 필요할 때 생성
+"""
+
+from typing import Dict, List
+
+import metrics
+
+
+class CalcTrace:
+    """계산 단계 기록 (서식 템플릿 + 숫자 인자)"""
+
+    __slots__ = ('records',)
+
+    def __init__(self):
+        self.records = []  # [(템플릿, (값, ...)), ...]
+
+    def add(self, template: str, *values):
+        """단계 기록 (서식 적용은 render 시점으로 미룸)"""
+        self.records.append((template, values))
+
+    def blank(self):
+        """빈 줄 기록"""
+        self.records.append(("", ()))
+
+    def render(self) -> List[str]:
+        """기록된 단계를 텍스트로 변환"""
+        return [template.format(*values) for template, values in self.records]
+
+
+@metrics.timed('trace.render_steps')
+def render_steps(debug: Dict) -> List[str]:
+    """
+    디버깅 정보의 계산 단계 텍스트 반환
+
+    Args:
+        debug: 계산기가 반환한 디버깅 정보
+
+    Returns:
+        계산 단계 텍스트 리스트 (trace 없이 계산했으면 빈 리스트)
+    """
+    trace = debug.get('trace')
+    if trace is None:
+        return []
+    return trace.render()
@@ -6,67 +6,249 @@
 
 import json
 import os
-from typing import Dict, List, Tuple, Optional
-import streamlit as st
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Optional
+
+import metrics
+from calc_trace import CalcTrace
+from param_history import AsOf, AsOfSnapshots, content_id, history_for
+from param_index import EXACT, EXTRAPOLATED, INTERPOLATED, ParamIndex, ResolvedParams
+from param_snapshot import SnapshotManager, is_finite_number
+from param_store import NO_ROW, ParamStore
+from quote_cache import QuoteCache, normalize_quote_key
+
+if TYPE_CHECKING:
+    import numpy as np
+    from param_surface import ParamSurface
+
+
+PARAMS_PATH = os.path.join(os.path.dirname(__file__), "model_params.json")
+
+# 앱에서 선택할 수 있는 조건 (model_params.json에 없는 조건은 보간 곡면 값)
+QUOTE_PERIODS = (12, 24, 36, 48, 60, 72)
+QUOTE_MILEAGES = {
+    'lease': ('1만km', '1.5만km', '2만km', '3만km', '4만km'),
+    'rent': ('1만km', '1.5만km', '2만km', '3만km', '무제한')
+}
+PAYMENT_TYPES = ('무보증', '보증금', '선수금')
+DEPOSIT_RATES = (0, 10, 20, 30)  # 보증금/선납금 비율 (%, 무보증은 0)
+
+AVERAGE_RESIDUAL = 0.50  # 평균 잔가율 (약 50%)
+
+
+def residual_adjustment(residual_rate):
+    """잔가율 조정 계수: 잔가율이 높을수록 월납입금이 낮아야 함 (스칼라 또는 numpy 배열)"""
+    return 1 - (residual_rate - AVERAGE_RESIDUAL) * 0.3
+
+
+def validate_quote_condition(product_type: str, period: int, mileage: str, payment_type: str = '무보증'):
+    """
+    앱 선택 조건 검증 (API, 예산 인덱스처럼 외부 입력을 받는 곳에서 사용)
+
+    Raises:
+        ValueError: 상품·계약기간·주행거리·결제유형이 앱 선택 조건이 아닌 경우
+    """
+    if product_type not in QUOTE_MILEAGES:
+        raise ValueError(f"알 수 없는 상품: {product_type!r}")
+    if period not in QUOTE_PERIODS:
+        raise ValueError(f"지원하지 않는 계약기간: {period!r} (가능: {list(QUOTE_PERIODS)})")
+    if mileage not in QUOTE_MILEAGES[product_type]:
+        raise ValueError(f"지원하지 않는 주행거리: {mileage!r} (가능: {list(QUOTE_MILEAGES[product_type])})")
+    if payment_type not in PAYMENT_TYPES:
+        raise ValueError(f"알 수 없는 결제유형: {payment_type!r}")
+
+
+def validate_params(params: Dict):
+    """
+    model_params.json 검증 (스냅샷 교체 전)
+
+    Raises:
+        ValueError: 상품·금융사가 없거나 계산에 쓰는 값이 숫자가 아니거나 범위 밖인 경우
+    """
+    products = [product_type for product_type in ('lease', 'rent') if product_type in params]
+    if not products:
+        raise ValueError("model_params.json에 lease/rent 파라미터가 없습니다")
+
+    for product_type in products:
+        companies = params[product_type]
+        if not isinstance(companies, dict) or not companies:
+            raise ValueError(f"{product_type}: 금융사 파라미터가 없습니다")
+        for company, conditions in companies.items():
+            if not isinstance(conditions, dict):
+                raise ValueError(f"{product_type}/{company}: 조건별 파라미터 형식이 아닙니다")
+            for key, condition in conditions.items():
+                for field in ('base_rate', 'option_coefficient', 'residual_rate'):
+                    if not is_finite_number(condition.get(field)):
+                        raise ValueError(f"{product_type}/{company}/{key}: {field} 값이 숫자가 아닙니다")
+                if condition['base_rate'] <= 0 or not 0 <= condition['residual_rate'] <= 1:
+                    raise ValueError(f"{product_type}/{company}/{key}: base_rate 또는 residual_rate 범위 밖")
+
+
+class ModelParams:
+    """
+    model_params.json 1개 버전의 파라미터 스냅샷
+
+    계산은 시작할 때 읽은 스냅샷 하나로 끝까지 진행한다. 파일이 바뀌면 새 스냅샷을 만들어 통째로
+    교체하므로, 만든 뒤에는 조회 메모(보간 곡면, 저장소 조건 표, 패킹 배열) 외에는 바뀌지 않는다.
+    저장소(store)는 조건 메모가 한도에 차면 새 저장소로 교체되므로, 계산 하나에서는 한 번만 읽어 쓴다.
+    """
+
+    def __init__(self, params: Dict, version: int = 1):
+        """
+        Args:
+            params: model_params.json 내용
+            version: 스냅샷 번호 (이력에서 읽은 과거 버전은 0)
+
+        Raises:
+            ValueError: 파라미터 검증 실패 (validate_params)
+        """
+        validate_params(params)
+        self.params = params
+        self.version = version
+        self.content_id = content_id('model_params', params)  # 파라미터 이력 버전 ID (견적 캐시 키)
+        self.index = ParamIndex(params)
+        self._surface = None  # 조건 대체가 처음 필요할 때 생성 (numpy 사용)
+        self._lock = threading.Lock()  # 곡면 생성, 저장소 교체
+        self.store = ParamStore(params, self.resolve, self._renew_store)
+        self.packed = {}  # {(상품, 기간, 주행거리): (금융사 목록, 파라미터 배열)}
+
+    @property
+    def surface(self) -> 'ParamSurface':
+        """기간 × 주행거리 보간 곡면 (처음 접근할 때 한 번만 생성)"""
+        surface = self._surface
+        if surface is None:
+            with self._lock:
+                if self._surface is None:
+                    from param_surface import ParamSurface
+
+                    self._surface = ParamSurface(self.params, residual_adjustment)
+                surface = self._surface
+        return surface
+
+    def _renew_store(self, full: ParamStore):
+        """조건 메모가 한도에 찬 저장소를 새 저장소로 교체 (full을 이미 읽은 계산은 그대로 진행)"""
+        with self._lock:
+            if self.store is full:
+                metrics.incr('calculator.param_store.renewed')
+                self.store = ParamStore(self.params, self.resolve, self._renew_store)
+
+    def resolve(self, product_type: str, company: str, period: int,
+                mileage: str) -> Optional[ResolvedParams]:
+        """대체 규칙·보간 곡면으로 조건 해석 (파라미터 저장소가 상품 × 조건 × 금융사마다 1회 호출)"""
+        resolved = self.index.resolve(product_type, company, period, mileage)
+        if resolved is not None and resolved.substituted:
+            resolved = self.surface.resolve(product_type, company, period, mileage) or resolved
+        return resolved
 
 
 class ModelBasedCalculator:
     """모델 기반 금융 계산기"""
 
-    def __init__(self):
-        """모델 파라미터 로드"""
-        self.params = self._load_params()
+    def __init__(self, watch: bool = False):
+        """
+        모델 파라미터 로드
+
+        Args:
+            watch: True면 model_params.json 변경을 백그라운드 스레드에서 감시해 스냅샷 교체
+                   (False면 calculate_all_companies / pack_params 호출 시 확인)
+        """
+        self.quote_cache = QuoteCache(maxsize=2048)
+        self.param_history = history_for(PARAMS_PATH)  # 같은 디렉토리의 param_history/ (버전 이력)
+        self.snapshots = SnapshotManager('calculator', [PARAMS_PATH], self._build_snapshot)
+        self.snapshots.subscribe(lambda snapshot: self.quote_cache.invalidate())
+        # as_of 견적용 과거 버전 (처음 요청될 때 이력에서 읽어 컴파일)
+        self.history = AsOfSnapshots('model_params', self.snapshots, lambda params: ModelParams(params, 0),
+                                     self.param_history)
+        if watch:
+            self.snapshots.start()
+
+    def _load_params(self) -> Dict:
+        """model_params.json 로드"""
+        with metrics.span('calculator.load_params'):
+            with open(PARAMS_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+    def _build_snapshot(self, version: int) -> ModelParams:
+        # 읽기 전용 (이력 기록은 param_history.py record --effective-from으로만)
+        return ModelParams(self._load_params(), version)
+
+    def _refresh_params(self):
+        """model_params.json 변경 확인 (감시 스레드가 없을 때만, 교체되면 견적 캐시도 비워짐)"""
+        self.snapshots.poll()
+
+    @property
+    def params(self) -> Dict:
+        """현재 스냅샷의 model_params.json 내용"""
+        return self.snapshots.current.params
+
+    @property
+    def param_index(self) -> ParamIndex:
+        return self.snapshots.current.index
+
+    @property
+    def param_store(self) -> ParamStore:
+        return self.snapshots.current.store
+
+    @property
+    def param_surface(self) -> 'ParamSurface':
+        return self.snapshots.current.surface
+
+    def params_at(self, as_of: Optional[AsOf] = None) -> ModelParams:
+        """
+        as_of 시점에 적용 중이던 파라미터 스냅샷 (None이면 현재 파일)
 
-    @st.cache_data
-    def _load_params(_self) -> Dict:
-        """model_params.json 로드 (캐싱)"""
-        params_path = os.path.join(os.path.dirname(__file__), "model_params.json")
-        with open(params_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        Raises:
+            ValueError: as_of 이전에 기록된 파라미터 버전이 없는 경우
+        """
+        return self.history.at(as_of)
 
-    def get_available_companies(self, product_type: str) -> List[str]:
+    def get_available_companies(self, product_type: str, as_of: Optional[AsOf] = None) -> List[str]:
         """이용 가능한 금융사 목록"""
-        if product_type not in self.params:
-            return []
-        return list(self.params[product_type].keys())
+        return list(self.history.at(as_of).store.companies(product_type))
 
-    def get_company_params(self, product_type: str, company: str, period: int, mileage: str) -> Optional[Dict]:
+    def resolve_company_params(self, product_type: str, company: str, period: int,
+                               mileage: str, as_of: Optional[AsOf] = None) -> Optional[ResolvedParams]:
         """
-        특정 조건의 금융사 파라미터 조회
+        특정 조건의 금융사 파라미터와 대체 여부 조회
+
+        정확한 조건이 없으면 보간 곡면 값(12~72개월, 1만~4만km)을 사용하고,
+        곡면 범위 밖이면 가장 가까운 조건으로 대체한다 (규칙은 param_index 참고).
 
         Args:
             product_type: 'lease' 또는 'rent'
             company: 금융사명
             period: 계약기간
             mileage: 주행거리
+            as_of: 기준일 (이 날 적용 중이던 파라미터로 조회, None이면 현재 파일)
 
         Returns:
-            금융사 파라미터 또는 None
+            ResolvedParams(파라미터, 사용한 조건 키, provenance) 또는 None
         """
-        if product_type not in self.params:
-            return None
-
-        if company not in self.params[product_type]:
+        store = self.history.at(as_of).store
+        row, provenance = store.lookup(product_type, company, period, mileage)
+        if row == NO_ROW:
             return None
+        if provenance != EXACT:
+            metrics.incr(f'calculator.params_fallback.{provenance}')
+        return store.resolved(row, provenance)
 
-        condition_key = f"{period}_{mileage}"
-        company_data = self.params[product_type][company]
-
-        if condition_key in company_data:
-            return company_data[condition_key]
-
-        # 정확한 조건이 없으면 가장 가까운 조건 찾기
-        available_keys = list(company_data.keys())
-        if not available_keys:
-            return None
+    def get_company_params(self, product_type: str, company: str, period: int, mileage: str,
+                           as_of: Optional[AsOf] = None) -> Optional[Dict]:
+        """
+        특정 조건의 금융사 파라미터 조회
 
-        # 같은 기간의 다른 주행거리 찾기
-        for key in available_keys:
-            if key.startswith(f"{period}_"):
-                return company_data[key]
+        Args:
+            product_type: 'lease' 또는 'rent'
+            company: 금융사명
+            period: 계약기간
+            mileage: 주행거리
+            as_of: 기준일 (None이면 현재 파일)
 
-        # 그것도 없으면 첫 번째 것 반환
-        return company_data[available_keys[0]]
+        Returns:
+            금융사 파라미터 또는 None
+        """
+        resolved = self.resolve_company_params(product_type, company, period, mileage, as_of)
+        return resolved.params if resolved is not None else None
 
     def calculate_monthly_payment(
         self,
@@ -79,7 +261,9 @@ class ModelBasedCalculator:
         payment_type: str = '무보증',
         option_price: float = 0,
         dealer_discount: float = 0,
-        dealer_fee_rate: float = 0.01
+        dealer_fee_rate: float = 0.01,
+        trace: bool = False,
+        as_of: Optional[AsOf] = None
     ) -> Tuple[float, Dict]:
         """
         월납입금 계산 (모델 기반)
@@ -95,15 +279,39 @@ class ModelBasedCalculator:
             option_price: 옵션 가격 (원)
             dealer_discount: 딜러 할인 (원)
             dealer_fee_rate: 딜러 Fee 비율 (0.01 = 1%)
+            trace: True면 계산 단계를 debug['trace']에 기록 (텍스트는 render_steps로 생성)
+            as_of: 기준일 (이 날 적용 중이던 파라미터로 재계산, None이면 현재 파일)
 
         Returns:
             (월납입금, 디버깅_정보)
+
+        Raises:
+            ValueError: as_of 이전에 기록된 파라미터 버전이 없는 경우
         """
-        # 파라미터 조회
-        params = self.get_company_params(product_type, company, period, mileage)
+        stages = metrics.stage_timer('model.quote')
 
-        if not params:
+        # 파라미터 조회
+        snapshot = self.snapshots.current if as_of is None else self.history.at(as_of)
+        store = snapshot.store
+        row, provenance = store.lookup(product_type, company, period, mileage)
+        if stages:
+            stages.mark('params')
+
+        return self._quote_row(
+            snapshot, store, row, provenance, stages, car_price, product_type, company, period, mileage,
+            deposit_rate, payment_type, option_price, dealer_discount, dealer_fee_rate, trace
+        )
+
+    def _quote_row(self, snapshot: ModelParams, store: ParamStore, row: int, provenance: str, stages,
+                   car_price: float, product_type: str, company: str, period: int, mileage: str,
+                   deposit_rate: float, payment_type: str, option_price: float, dealer_discount: float,
+                   dealer_fee_rate: float, trace: bool) -> Tuple[float, Dict]:
+        """파라미터 저장소 행으로 월납입금 계산 (calculate_monthly_payment 참고, row는 store의 행 번호)"""
+        if row == NO_ROW:
             return 0, {'error': f'파라미터를 찾을 수 없습니다: {company}, {period}개월, {mileage}'}
+        if provenance != EXACT:
+            metrics.incr(f'calculator.params_fallback.{provenance}')
+        params_key = store.row_keys[row]
 
         debug = {
             'product': product_type,
@@ -116,86 +324,108 @@ class ModelBasedCalculator:
             'dealer_discount': dealer_discount,
             'dealer_fee_rate': dealer_fee_rate,
             'deposit_rate': deposit_rate,
-            'params': params,
-            'steps': []
+            'params': store.row_params[row],
+            'params_key': params_key,
+            'params_provenance': provenance,
+            'params_version': snapshot.content_id
         }
+        steps = CalcTrace() if trace else None
 
         # 기본 계산 로직
-        base_rate = params['base_rate']
-        option_coeff = params['option_coefficient']
-        residual_rate = params['residual_rate']
-
-        # 잔가 계산
-        residual_value = car_price * residual_rate
-        depreciation = car_price - residual_value
-        monthly_depreciation = depreciation / period
-
-        debug['steps'].append(f"=== 잔가 정보 ===")
-        debug['steps'].append(f"계약종료시 잔가율: {residual_rate*100:.2f}%")
-        debug['steps'].append(f"잔가금액: {car_price:,.0f} × {residual_rate:.4f} = {residual_value:,.0f}원")
-        debug['steps'].append(f"감가상각분: {car_price:,.0f} - {residual_value:,.0f} = {depreciation:,.0f}원")
-        debug['steps'].append(f"월 감가분: {depreciation:,.0f} ÷ {period}개월 = {monthly_depreciation:,.0f}원")
-        debug['steps'].append(f"")
+        base_rate = store.base_rate[row]
+        option_coeff = store.option_coefficient[row]
+        residual_rate = store.residual_rate[row]
 
         # 1. 기본 월대여료 (차량가 × 기본요율)
         # base_rate에 이미 잔가율이 반영되어 있으므로, 추가 조정 적용
         base_monthly_raw = car_price * base_rate / 100
 
-        # 잔가율 조정: 잔가율이 높을수록 월납입금이 낮아야 함
-        # 평균 잔가율 대비 조정 (평균 약 50%)
-        average_residual = 0.50
-        residual_adjustment = 1 - (residual_rate - average_residual) * 0.3
-        base_monthly = base_monthly_raw * residual_adjustment
-
-        debug['steps'].append(f"=== 월대여료 계산 ===")
-        debug['steps'].append(f"기본 월대여료(Raw): {car_price:,.0f} × {base_rate:.4f}% = {base_monthly_raw:,.0f}원")
-        debug['steps'].append(f"잔가율 조정: {base_monthly_raw:,.0f} × {residual_adjustment:.4f} = {base_monthly:,.0f}원")
-        debug['steps'].append(f"  (잔가율 {residual_rate*100:.1f}% vs 평균 {average_residual*100:.0f}%)")
+        # 잔가율 조정: 평균 잔가율 대비
+        adjustment = residual_adjustment(residual_rate)
+        base_monthly = base_monthly_raw * adjustment
 
         # 2. 옵션 추가
         option_addition = option_coeff * (option_price - dealer_discount)
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 옵션 ===")
-        debug['steps'].append(f"옵션 추가: {option_coeff:.6f} × ({option_price:,.0f} - {dealer_discount:,.0f}) = {option_addition:,.2f}원")
 
         # 3. 보증금/선납금 할인
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 보증금/선납금 ===")
         deposit_discount = 0
+        discount_rate = 0
         if payment_type == '보증금' and deposit_rate > 0:
             # 보증금: 월대여료 할인
             # 보증금 30% 기준 6~8% 할인 추정
             discount_rate = deposit_rate / 30 * 0.07  # 30% 기준 7% 할인
             deposit_discount = base_monthly * discount_rate
-            deposit_amount = car_price * deposit_rate / 100
-            debug['steps'].append(f"보증금 {deposit_rate}%: {deposit_amount:,.0f}원")
-            debug['steps'].append(f"보증금 할인: {base_monthly:,.0f} × {discount_rate:.4f} = -{deposit_discount:,.2f}원")
 
         elif payment_type == '선수금' and deposit_rate > 0:
             # 선납금: 선납 비율만큼 월대여료 할인
             # 선납 30% 기준 월대여료 15~20% 할인 추정
             discount_rate = deposit_rate / 30 * 0.18  # 30% 기준 18% 할인
             deposit_discount = base_monthly * discount_rate
-            advance_amount = car_price * deposit_rate / 100
-            debug['steps'].append(f"선납금 {deposit_rate}%: {advance_amount:,.0f}원")
-            debug['steps'].append(f"선납금 할인: {base_monthly:,.0f} × {discount_rate:.4f} = -{deposit_discount:,.2f}원")
-        else:
-            debug['steps'].append(f"무보증 (할인 없음)")
 
         # 4. 딜러 Fee 추가
         dealer_fee = car_price * dealer_fee_rate * 0.05  # 월납입금에 미세하게 영향
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 딜러 Fee ===")
-        debug['steps'].append(f"딜러 Fee: {car_price:,.0f} × {dealer_fee_rate:.4f} × 0.05 = {dealer_fee:,.2f}원")
 
         # 최종 월납입금
         monthly_payment = base_monthly + option_addition - deposit_discount + dealer_fee
-        debug['steps'].append(f"")
-        debug['steps'].append(f"=== 최종 월납입금 ===")
-        debug['steps'].append(f"{base_monthly:,.0f} + {option_addition:,.2f} - {deposit_discount:,.2f} + {dealer_fee:,.2f} = {monthly_payment:,.0f}원")
+        if stages:
+            stages.mark('compute')
+
+        if steps is not None:
+            debug['trace'] = steps
+            residual_value = car_price * residual_rate
+            depreciation = car_price - residual_value
+
+            if provenance in (INTERPOLATED, EXTRAPOLATED):
+                steps.add("※ {}개월/{} 파라미터 없음 → 보간 곡면 값 사용 ({})",
+                          period, mileage, provenance)
+                steps.blank()
+            elif provenance != EXACT:
+                steps.add("※ {}개월/{} 파라미터 없음 → {} 조건 파라미터 사용 ({})",
+                          period, mileage, params_key, provenance)
+                steps.blank()
+
+            steps.add("=== 잔가 정보 ===")
+            steps.add("계약종료시 잔가율: {:.2f}%", residual_rate * 100)
+            steps.add("잔가금액: {:,.0f} × {:.4f} = {:,.0f}원", car_price, residual_rate, residual_value)
+            steps.add("감가상각분: {:,.0f} - {:,.0f} = {:,.0f}원", car_price, residual_value, depreciation)
+            steps.add("월 감가분: {:,.0f} ÷ {}개월 = {:,.0f}원", depreciation, period, depreciation / period)
+            steps.blank()
+
+            steps.add("=== 월대여료 계산 ===")
+            steps.add("기본 월대여료(Raw): {:,.0f} × {:.4f}% = {:,.0f}원", car_price, base_rate, base_monthly_raw)
+            steps.add("잔가율 조정: {:,.0f} × {:.4f} = {:,.0f}원", base_monthly_raw, adjustment, base_monthly)
+            steps.add("  (잔가율 {:.1f}% vs 평균 {:.0f}%)", residual_rate * 100, AVERAGE_RESIDUAL * 100)
+
+            steps.blank()
+            steps.add("=== 옵션 ===")
+            steps.add("옵션 추가: {:.6f} × ({:,.0f} - {:,.0f}) = {:,.2f}원",
+                      option_coeff, option_price, dealer_discount, option_addition)
+
+            steps.blank()
+            steps.add("=== 보증금/선납금 ===")
+            if payment_type == '보증금' and deposit_rate > 0:
+                steps.add("보증금 {}%: {:,.0f}원", deposit_rate, car_price * deposit_rate / 100)
+                steps.add("보증금 할인: {:,.0f} × {:.4f} = -{:,.2f}원", base_monthly, discount_rate, deposit_discount)
+            elif payment_type == '선수금' and deposit_rate > 0:
+                steps.add("선납금 {}%: {:,.0f}원", deposit_rate, car_price * deposit_rate / 100)
+                steps.add("선납금 할인: {:,.0f} × {:.4f} = -{:,.2f}원", base_monthly, discount_rate, deposit_discount)
+            else:
+                steps.add("무보증 (할인 없음)")
+
+            steps.blank()
+            steps.add("=== 딜러 Fee ===")
+            steps.add("딜러 Fee: {:,.0f} × {:.4f} × 0.05 = {:,.2f}원", car_price, dealer_fee_rate, dealer_fee)
+
+            steps.blank()
+            steps.add("=== 최종 월납입금 ===")
+            steps.add("{:,.0f} + {:,.2f} - {:,.2f} + {:,.2f} = {:,.0f}원",
+                      base_monthly, option_addition, deposit_discount, dealer_fee, monthly_payment)
+            if stages:
+                stages.mark('trace')
 
         return round(monthly_payment), debug
 
+    @metrics.timed('calculator.calculate_all_companies')
     def calculate_all_companies(
         self,
         car_price: float,
@@ -206,7 +436,9 @@ class ModelBasedCalculator:
         payment_type: str = '무보증',
         option_price: float = 0,
         dealer_discount: float = 0,
-        dealer_fee_rate: float = 0.01
+        dealer_fee_rate: float = 0.01,
+        trace: bool = False,
+        as_of: Optional[AsOf] = None
     ) -> List[Dict]:
         """
         모든 금융사의 월납입금 계산
@@ -221,25 +453,36 @@ class ModelBasedCalculator:
             option_price: 옵션 가격 (원)
             dealer_discount: 딜러 할인 (원)
             dealer_fee_rate: 딜러 Fee 비율 (0.01 = 1%)
+            trace: True면 금융사별 계산 단계 기록
+            as_of: 기준일 (이 날 적용 중이던 파라미터로 재계산, None이면 현재 파일)
 
         Returns:
-            계산 결과 리스트 (월납입금 순 정렬)
+            계산 결과 리스트 (월납입금 순 정렬, 캐시와 공유되므로 항목을 수정하지 말 것)
+
+        Raises:
+            ValueError: as_of 이전에 기록된 파라미터 버전이 없는 경우
         """
-        companies = self.get_available_companies(product_type)
+        self._refresh_params()
+        snapshot = self.history.at(as_of)
+        cache_key = normalize_quote_key(
+            'all_companies', snapshot.content_id, product_type, car_price, option_price, dealer_discount,
+            period, mileage, payment_type, deposit_rate, dealer_fee_rate, trace
+        )
+        cached = self.quote_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        # 조건 해석은 1회, 금융사별로는 행 번호만 읽음
+        store = snapshot.store
+        companies = store.companies(product_type)
+        rows, provenances = store.condition(product_type, period, mileage)
         results = []
 
-        for company in companies:
-            monthly, debug_info = self.calculate_monthly_payment(
-                car_price=car_price,
-                product_type=product_type,
-                company=company,
-                period=period,
-                mileage=mileage,
-                deposit_rate=deposit_rate,
-                payment_type=payment_type,
-                option_price=option_price,
-                dealer_discount=dealer_discount,
-                dealer_fee_rate=dealer_fee_rate
+        for company, row, provenance in zip(companies, rows, provenances):
+            monthly, debug_info = self._quote_row(
+                snapshot, store, row, provenance, metrics.stage_timer('model.quote'), car_price, product_type, company,
+                period, mileage, deposit_rate, payment_type, option_price, dealer_discount,
+                dealer_fee_rate, trace
             )
 
             if monthly > 0:
@@ -253,15 +496,291 @@ class ModelBasedCalculator:
         # 월납입금 순 정렬
         results.sort(key=lambda x: x['monthly_payment'])
 
+        self.quote_cache.put(cache_key, results)
+        return list(results)
+
+    def pack_params(self, product_type: str, period: int, mileage: str,
+                    as_of: Optional[AsOf] = None) -> Tuple[List[str], 'np.ndarray']:
+        """
+        조건별 금융사 파라미터를 배열로 패킹 (스냅샷별 캐싱)
+
+        Args:
+            product_type: 'lease' 또는 'rent'
+            period: 계약기간
+            mileage: 주행거리
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (금융사 목록, [base_rate, option_coefficient, residual_rate] 행렬 (금융사 수 × 3))
+        """
+        self._refresh_params()
+        snapshot = self.history.at(as_of)
+        key = (product_type, period, mileage)
+        packed = snapshot.packed.get(key)
+        if packed is not None:
+            return packed
+
+        packed = snapshot.store.pack(product_type, period, mileage,
+                                     ('base_rate', 'option_coefficient', 'residual_rate'))
+        snapshot.packed[key] = packed
+        return packed
+
+    @metrics.timed('calculator.calculate_payment_matrix')
+    def calculate_payment_matrix(
+        self,
+        car_prices,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        option_price=0,
+        dealer_discount=0,
+        dealer_fee_rate: float = 0.01,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        금융사 × 차량 월납입금 행렬 계산 (벡터화)
+
+        calculate_monthly_payment와 같은 연산 순서로 계산하므로 결과가 원 단위까지 일치한다.
+
+        Args:
+            car_prices: 차량 가격 배열 (N)
+            product_type: 'lease' 또는 'rent'
+            period: 계약기간
+            mileage: 주행거리
+            deposit_rate: 보증금/선납금 비율
+            payment_type: '무보증', '보증금', '선수금'
+            option_price: 옵션 가격 (원, 스칼라 또는 길이 N 배열)
+            dealer_discount: 딜러 할인 (원, 스칼라 또는 길이 N 배열)
+            dealer_fee_rate: 딜러 Fee 비율 (0.01 = 1%)
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (금융사 목록, 월납입금 행렬 (금융사 수 × N, int64))
+        """
+        import numpy as np
+
+        companies, packed = self.pack_params(product_type, period, mileage, as_of)
+
+        prices = np.asarray(car_prices, dtype=np.float64).reshape(1, -1)
+        base_rate = packed[:, 0:1]
+        option_coeff = packed[:, 1:2]
+        residual_rate = packed[:, 2:3]
+
+        # 월대여료 (잔가율 조정 포함)
+        base_monthly_raw = prices * base_rate / 100
+        base_monthly = base_monthly_raw * residual_adjustment(residual_rate)
+
+        # 옵션
+        option_delta = np.asarray(option_price, dtype=np.float64) - np.asarray(dealer_discount, dtype=np.float64)
+        option_addition = option_coeff * option_delta
+
+        # 보증금/선납금
+        monthly = base_monthly + option_addition
+        if payment_type == '보증금' and deposit_rate > 0:
+            monthly = monthly - base_monthly * (deposit_rate / 30 * 0.07)
+        elif payment_type == '선수금' and deposit_rate > 0:
+            monthly = monthly - base_monthly * (deposit_rate / 30 * 0.18)
+
+        # 딜러 Fee
+        monthly = monthly + prices * dealer_fee_rate * 0.05
+
+        return companies, np.rint(monthly).astype(np.int64)
+
+    def calculate_batch(
+        self,
+        car_prices,
+        product_type: str,
+        conditions: Iterable[Tuple],
+        option_price=0,
+        dealer_discount=0,
+        dealer_fee_rate: float = 0.01,
+        as_of: Optional[AsOf] = None
+    ) -> Dict[Tuple, Tuple[List[str], 'np.ndarray']]:
+        """
+        여러 금융 조건에 대한 일괄 계산
+
+        Args:
+            car_prices: 차량 가격 배열 (N)
+            product_type: 'lease' 또는 'rent'
+            conditions: (기간, 주행거리, 보증금비율, 결제유형) 튜플 목록
+            option_price: 옵션 가격 (원, 스칼라 또는 길이 N 배열)
+            dealer_discount: 딜러 할인 (원, 스칼라 또는 길이 N 배열)
+            dealer_fee_rate: 딜러 Fee 비율
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            {조건 튜플: (금융사 목록, 월납입금 행렬)}
+        """
+        import numpy as np
+
+        prices = np.asarray(car_prices, dtype=np.float64)
+        results = {}
+
+        for condition in conditions:
+            period, mileage, deposit_rate, payment_type = condition
+            results[condition] = self.calculate_payment_matrix(
+                prices, product_type, period, mileage,
+                deposit_rate=deposit_rate,
+                payment_type=payment_type,
+                option_price=option_price,
+                dealer_discount=dealer_discount,
+                dealer_fee_rate=dealer_fee_rate,
+                as_of=as_of
+            )
+
         return results
 
+    # ================ 역산 (목표 월납입금 → 조건) ================
+    # 월납입금 = 차량가 × 가격계수 + 옵션계수 × (옵션가 - 딜러할인) 로 선형이므로 닫힌 식으로 계산.
+    # 결과는 반올림 전 월납입금이 목표 이하가 되는 값이며, 불가능한 금융사는 NaN.
+
+    @staticmethod
+    def _deposit_discount_rate(payment_type: str, deposit_rate: float) -> float:
+        """보증금/선수금 할인율 (calculate_monthly_payment와 동일)"""
+        if payment_type == '보증금' and deposit_rate > 0:
+            return deposit_rate / 30 * 0.07
+        if payment_type == '선수금' and deposit_rate > 0:
+            return deposit_rate / 30 * 0.18
+        return 0.0
+
+    def _payment_terms(self, product_type: str, period: int, mileage: str, as_of: Optional[AsOf] = None
+                       ) -> Tuple[List[str], 'np.ndarray', 'np.ndarray']:
+        """
+        금융사별 선형 계수
+
+        Returns:
+            (금융사 목록, 잔가율 조정된 기본요율 (차량가 1원당 월대여료), 옵션계수)
+        """
+        companies, packed = self.pack_params(product_type, period, mileage, as_of)
+        base_coeff = packed[:, 0] / 100 * residual_adjustment(packed[:, 2])
+        return companies, base_coeff, packed[:, 1]
+
+    def solve_max_car_price(
+        self,
+        target_payment: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        option_price: float = 0,
+        dealer_discount: float = 0,
+        dealer_fee_rate: float = 0.01,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월납입금 이하가 되는 최대 차량 가격 (금융사별)
+
+        Args:
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (금융사 목록, 최대 차량 가격 배열 (원 단위 내림, 불가능하면 NaN))
+        """
+        import numpy as np
+
+        companies, base_coeff, option_coeff = self._payment_terms(product_type, period, mileage, as_of)
+        discount_rate = self._deposit_discount_rate(payment_type, deposit_rate)
+        price_coeff = base_coeff * (1 - discount_rate) + dealer_fee_rate * 0.05
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prices = np.floor((target_payment - option_coeff * (option_price - dealer_discount)) / price_coeff)
+        prices[~(prices >= 0) | ~np.isfinite(prices)] = np.nan
+        return companies, prices
+
+    def solve_min_deposit_rate(
+        self,
+        target_payment: float,
+        car_price: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        payment_type: str = '보증금',
+        max_deposit_rate: float = 30,
+        option_price: float = 0,
+        dealer_discount: float = 0,
+        dealer_fee_rate: float = 0.01,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월납입금 이하가 되는 최소 보증금/선수금 비율 (금융사별)
+
+        Args:
+            payment_type: '보증금' 또는 '선수금'
+            max_deposit_rate: 허용 최대 비율 (%)
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (금융사 목록, 최소 비율 배열 (%, 0.01 단위 올림, max_deposit_rate 초과면 NaN))
+        """
+        import numpy as np
+
+        if payment_type not in ('보증금', '선수금'):
+            raise ValueError(f"보증금/선수금 비율은 보증금, 선수금 유형에서만 계산할 수 있습니다: {payment_type}")
+
+        companies, base_coeff, option_coeff = self._payment_terms(product_type, period, mileage, as_of)
+        discount_per_rate = (0.07 if payment_type == '보증금' else 0.18) / 30
+
+        base_monthly = car_price * base_coeff
+        undiscounted = base_monthly + option_coeff * (option_price - dealer_discount) + car_price * dealer_fee_rate * 0.05
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = (undiscounted - target_payment) / (base_monthly * discount_per_rate)
+        rates = np.ceil(np.maximum(rates, 0) * 100) / 100
+        rates[~(rates <= max_deposit_rate)] = np.nan
+        return companies, rates
+
+    def solve_dealer_discount(
+        self,
+        target_payment: float,
+        car_price: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        option_price: float = 0,
+        dealer_fee_rate: float = 0.01,
+        as_of: Optional[AsOf] = None
+    ) -> Tuple[List[str], 'np.ndarray']:
+        """
+        목표 월납입금 이하가 되는 최소 딜러 할인 (금융사별)
+
+        모델 기반 계산에서 딜러 할인은 옵션계수만큼만 월납입금을 줄이므로, 필요한 할인이
+        차량가 + 옵션가를 넘으면 불가능(NaN)으로 본다.
+
+        Args:
+            as_of: 기준일 (None이면 현재 파일)
+
+        Returns:
+            (금융사 목록, 최소 딜러 할인 배열 (원 단위 올림))
+        """
+        import numpy as np
+
+        companies, base_coeff, option_coeff = self._payment_terms(product_type, period, mileage, as_of)
+        discount_rate = self._deposit_discount_rate(payment_type, deposit_rate)
+        price_coeff = base_coeff * (1 - discount_rate) + dealer_fee_rate * 0.05
+
+        excess = car_price * price_coeff + option_coeff * option_price - target_payment
+        with np.errstate(divide='ignore', invalid='ignore'):
+            discounts = np.ceil(np.maximum(excess / option_coeff, 0))
+        discounts[excess <= 0] = 0
+        discounts[~(discounts <= car_price + option_price)] = np.nan
+        return companies, discounts
+
 
 # 전역 인스턴스
 _calculator = None
+_calculator_lock = threading.Lock()
 
 def get_calculator() -> ModelBasedCalculator:
-    """계산기 싱글톤 인스턴스 반환"""
+    """계산기 싱글톤 인스턴스 반환 (model_params.json 변경 감시 스레드 포함, 처음 호출한 스레드만 생성)"""
     global _calculator
-    if _calculator is None:
-        _calculator = ModelBasedCalculator()
-    return _calculator
+    calculator = _calculator
+    if calculator is None:
+        with _calculator_lock:
+            if _calculator is None:
+                _calculator = ModelBasedCalculator(watch=True)
+            calculator = _calculator
+    return calculator
@@ -0,0 +1,473 @@
+"""
+차량 카탈로그 스냅샷 모듈
+- carinfo.xlsx, carinfo_option.xlsx를 Parquet 스냅샷으로 변환
+- 스냅샷 파일명에 원본 파일 해시를 포함하여, 원본이 바뀐 경우에만 Excel을 다시 파싱
+- lease.xlsx, rent.xlsx 같은 다중 시트 통합문서는 한 번만 스트리밍으로 읽어
+  시트별 Parquet 조각(행 묶음 단위)으로 저장
+
+사용법 (빌드 단계):
+    python src/catalog_snapshot.py [데이터 디렉토리]
+"""
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# 스냅샷 형식이 바뀌면 올려서 기존 스냅샷을 무효화
+SNAPSHOT_VERSION = 1
+
+# 스냅샷 대상 파일
+CATALOG_FILES = ["carinfo.xlsx", "carinfo_option.xlsx"]
+WORKBOOK_FILES = ["lease.xlsx", "rent.xlsx"]
+
+# 통합문서 스냅샷 조각 하나에 담는 행 수 (스트리밍 중 메모리 상한)
+WORKBOOK_CHUNK_ROWS = 5000
+
+# pd.read_excel 기본 결측 표기
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+
+def file_hash(filepath: str) -> str:
+    """파일 내용 해시 (sha256 앞 16자리)"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def default_cache_dir(source_path: str) -> str:
+    """기본 스냅샷 디렉토리 (원본과 같은 디렉토리의 .snapshots)"""
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), ".snapshots")
+
+
+def snapshot_path(source_path: str, source_hash: str, cache_dir: Optional[str] = None) -> str:
+    """
+    스냅샷 파일 경로
+    예: ref/carinfo.xlsx -> ref/.snapshots/carinfo.<해시>.v1.parquet
+    """
+    cache_dir = cache_dir or default_cache_dir(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{source_hash}.v{SNAPSHOT_VERSION}.parquet")
+
+
+def _remove_stale_snapshots(source_path: str, keep_path: str, cache_dir: str):
+    """같은 원본의 이전 스냅샷 삭제"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    for path in glob.glob(os.path.join(cache_dir, f"{stem}.*.parquet")):
+        if os.path.abspath(path) != os.path.abspath(keep_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def write_snapshot(df: 'pd.DataFrame', source_path: str, source_hash: str,
+                   cache_dir: Optional[str] = None) -> str:
+    """
+    DataFrame을 스냅샷으로 저장 (임시 파일에 쓴 뒤 교체)
+
+    Returns:
+        스냅샷 파일 경로
+    """
+    cache_dir = cache_dir or default_cache_dir(source_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    target = snapshot_path(source_path, source_hash, cache_dir)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, target)
+
+    _remove_stale_snapshots(source_path, target, cache_dir)
+    return target
+
+
+def build_snapshot(source_path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Excel 파일을 스냅샷으로 변환
+
+    Args:
+        source_path: 원본 Excel 경로
+        cache_dir: 스냅샷 디렉토리 (기본: 원본 옆 .snapshots)
+
+    Returns:
+        스냅샷 파일 경로
+    """
+    import pandas as pd
+
+    source_hash = file_hash(source_path)
+    target = snapshot_path(source_path, source_hash, cache_dir)
+    if os.path.exists(target):
+        return target
+
+    df = pd.read_excel(source_path)
+    return write_snapshot(df, source_path, source_hash, cache_dir)
+
+
+def load_table(source_path: str, cache_dir: Optional[str] = None) -> 'pd.DataFrame':
+    """
+    스냅샷 우선 로드 (원본 해시가 다르면 Excel 파싱 후 스냅샷 갱신)
+
+    Args:
+        source_path: 원본 Excel 경로
+        cache_dir: 스냅샷 디렉토리 (기본: 원본 옆 .snapshots)
+
+    Returns:
+        원본 Excel 첫 시트와 같은 DataFrame
+    """
+    import pandas as pd
+
+    source_hash = file_hash(source_path)
+    target = snapshot_path(source_path, source_hash, cache_dir)
+
+    if os.path.exists(target):
+        try:
+            df = pd.read_parquet(target)
+            metrics.incr('catalog_snapshot.hit')
+            return df
+        except Exception:
+            # 손상되었거나 Parquet 엔진이 없으면 Excel로 대체
+            pass
+
+    metrics.incr('catalog_snapshot.miss')
+    with metrics.span('catalog_snapshot.read_excel'):
+        df = pd.read_excel(source_path)
+    try:
+        write_snapshot(df, source_path, source_hash, cache_dir)
+    except Exception:
+        # 읽기 전용 파일시스템 등: 스냅샷 없이 진행
+        pass
+    return df
+
+
+# ================ 다중 시트 통합문서 ================
+
+def _cell_value(value):
+    """셀 값을 pd.read_excel과 같은 형태로 변환 (정수 실수는 정수, 결측 표기는 None)"""
+    if isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        return value
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    return value
+
+
+def iter_workbook_rows(filepath: str) -> Iterator[Tuple[str, Iterator[List]]]:
+    """
+    통합문서를 한 번만 열어 시트별 행을 스트리밍 (openpyxl 읽기 전용 모드)
+
+    시트의 행 이터레이터는 다음 시트로 넘어가기 전에 소비해야 한다.
+    끝의 빈 셀/빈 행은 pd.read_excel처럼 잘라낸다.
+
+    Yields:
+        (시트명, 행 이터레이터 - 셀 값 리스트)
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, _iter_sheet_rows(worksheet)
+    finally:
+        workbook.close()
+
+
+def _iter_sheet_rows(worksheet) -> Iterator[List]:
+    pending_blank = 0
+    for cells in worksheet.iter_rows(values_only=True):
+        row = [_cell_value(value) for value in cells]
+        while row and row[-1] is None:
+            row.pop()
+        if not row:
+            pending_blank += 1
+            continue
+        # 중간 빈 행은 유지, 끝의 빈 행은 버림
+        for _ in range(pending_blank):
+            yield []
+        pending_blank = 0
+        yield row
+
+
+def _header_names(header: List, width: int) -> List:
+    """pd.read_excel 컬럼명 규칙 (빈 칸은 'Unnamed: i', 중복은 '.1', '.2' 접미사)"""
+    names = []
+    counts = {}
+    for i in range(width):
+        name = header[i] if i < len(header) else None
+        if name is None:
+            name = f"Unnamed: {i}"
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names.append(name)
+    return names
+
+
+def _value_kind(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return 'datetime'
+    return 'string'
+
+
+# 값 종류가 섞인 컬럼을 나눠 저장할 때의 컬럼 접두사 (숫자는 기본 'c')
+_KIND_PREFIX = {'number': 'c', 'string': 's', 'datetime': 'd', 'bool': 'b'}
+
+
+def _chunk_frame(rows: List[List], width: int) -> 'pd.DataFrame':
+    """
+    행 묶음 → Parquet 저장용 DataFrame (컬럼명은 위치 'c{i}')
+
+    값 종류(숫자/문자열/날짜/불리언)가 섞인 컬럼은 종류별 컬럼('c{i}', 's{i}', 'd{i}', 'b{i}')으로
+    나눠 저장하고 읽을 때 다시 합친다 (_restore_chunk).
+    """
+    import numpy as np
+    import pandas as pd
+
+    data = {}
+    for i in range(width):
+        values = [row[i] if i < len(row) else None for row in rows]
+        kinds = [_value_kind(value) for value in values]
+        present = set(kinds)
+        present.discard(None)
+
+        if len(present) <= 1:
+            if present == {'string'}:
+                values = [None if value is None else str(value) for value in values]
+            data[f"c{i}"] = pd.Series(values, dtype=np.float64 if not present else None)
+            continue
+
+        for kind in sorted(present):
+            part = [value if value_kind == kind else None for value, value_kind in zip(values, kinds)]
+            if kind == 'number':
+                part = pd.Series(part, dtype=np.float64)
+            elif kind == 'string':
+                part = pd.Series([None if value is None else str(value) for value in part], dtype=object)
+            else:
+                part = pd.Series(part, dtype=object)
+            data[f"{_KIND_PREFIX[kind]}{i}"] = part
+    return pd.DataFrame(data)
+
+
+def _restore_chunk(df: 'pd.DataFrame', names: List) -> 'pd.DataFrame':
+    """Parquet 조각 → 원래 컬럼명/값"""
+    import numpy as np
+    import pandas as pd
+
+    columns = {}
+    for i in range(len(names)):
+        parts = [(kind, df[f"{prefix}{i}"]) for kind, prefix in _KIND_PREFIX.items() if f"{prefix}{i}" in df]
+        if not parts:
+            columns[i] = pd.Series(np.nan, index=df.index)
+            continue
+        if len(parts) == 1 and parts[0][0] == 'number':
+            columns[i] = parts[0][1]
+            continue
+
+        # 섞인 컬럼: 숫자 부분은 원래 정수였으면 정수로 (셀 값 변환 규칙과 동일)
+        merged = [None] * len(df)
+        for kind, part in parts:
+            for row, value in enumerate(part.tolist()):
+                if merged[row] is None and not pd.isna(value):
+                    if kind == 'number' and float(value).is_integer():
+                        value = int(value)
+                    elif isinstance(value, pd.Timestamp):
+                        value = value.to_pydatetime()
+                    merged[row] = value
+        columns[i] = pd.Series(merged, index=df.index, dtype=object).fillna(np.nan)
+    restored = pd.DataFrame(columns, index=df.index)
+    restored.columns = names
+    return restored
+
+
+def workbook_snapshot_dir(source_path: str, source_hash: str, cache_dir: Optional[str] = None) -> str:
+    """
+    통합문서 스냅샷 디렉토리
+    예: ref/lease.xlsx -> ref/.snapshots/lease.<해시>.v1.sheets/
+    """
+    cache_dir = cache_dir or default_cache_dir(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{source_hash}.v{SNAPSHOT_VERSION}.sheets")
+
+
+def build_workbook_snapshot(source_path: str, cache_dir: Optional[str] = None,
+                            chunk_rows: int = WORKBOOK_CHUNK_ROWS) -> str:
+    """
+    통합문서를 한 번 스트리밍해 시트별 Parquet 조각 + manifest.json으로 저장
+    (메모리에는 최대 chunk_rows 행만 유지)
+
+    Returns:
+        스냅샷 디렉토리 경로
+    """
+    source_hash = file_hash(source_path)
+    cache_dir = cache_dir or default_cache_dir(source_path)
+    target = workbook_snapshot_dir(source_path, source_hash, cache_dir)
+    if os.path.exists(os.path.join(target, "manifest.json")):
+        return target
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = f"{target}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    try:
+        sheets = []
+        for sheet_index, (sheet_name, rows) in enumerate(iter_workbook_rows(source_path)):
+            header = next(rows, [])
+            width = len(header)
+            chunks = []
+            buffer = []
+
+            def flush():
+                filename = f"{sheet_index:03d}-{len(chunks):05d}.parquet"
+                _chunk_frame(buffer, width).to_parquet(os.path.join(tmp_dir, filename), index=False)
+                chunks.append(filename)
+                buffer.clear()
+
+            for row in rows:
+                # 헤더보다 긴 행은 'Unnamed' 컬럼이 늘어남 (이전 조각에는 결측)
+                width = max(width, len(row))
+                buffer.append(row)
+                if len(buffer) >= chunk_rows:
+                    flush()
+            if buffer:
+                flush()
+
+            sheets.append({
+                'name': sheet_name,
+                'columns': _header_names(header, width),
+                'chunks': chunks,
+            })
+
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump({'source_hash': source_hash, 'version': SNAPSHOT_VERSION, 'sheets': sheets},
+                      f, ensure_ascii=False, default=str)
+
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # 다른 프로세스가 먼저 만든 경우
+            if not os.path.exists(os.path.join(target, "manifest.json")):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _remove_stale_workbook_snapshots(source_path, target, cache_dir)
+    return target
+
+
+def _remove_stale_workbook_snapshots(source_path: str, keep_dir: str, cache_dir: str):
+    """같은 원본의 이전 통합문서 스냅샷 삭제"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    for path in glob.glob(os.path.join(cache_dir, f"{stem}.*.sheets")):
+        if os.path.abspath(path) != os.path.abspath(keep_dir):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_workbook_snapshot(snapshot_dir: str) -> Dict[str, 'pd.DataFrame']:
+    """통합문서 스냅샷 → {시트명: DataFrame} (시트 순서 유지)"""
+    import pandas as pd
+
+    with open(os.path.join(snapshot_dir, "manifest.json"), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    tables = {}
+    for sheet in manifest['sheets']:
+        names = sheet['columns']
+        parts = [_restore_chunk(pd.read_parquet(os.path.join(snapshot_dir, chunk)), names)
+                 for chunk in sheet['chunks']]
+        if not parts:
+            tables[sheet['name']] = pd.DataFrame(columns=names)
+        elif len(parts) == 1:
+            tables[sheet['name']] = parts[0]
+        else:
+            tables[sheet['name']] = pd.concat(parts, ignore_index=True)
+    return tables
+
+
+def load_workbook_tables(source_path: str, cache_dir: Optional[str] = None) -> Dict[str, 'pd.DataFrame']:
+    """
+    다중 시트 통합문서 로드 (스냅샷이 있으면 Excel을 열지 않음)
+
+    Args:
+        source_path: 원본 Excel 경로
+        cache_dir: 스냅샷 디렉토리 (기본: 원본 옆 .snapshots)
+
+    Returns:
+        {시트명: pd.read_excel(sheet_name=시트명, header=0)과 같은 DataFrame}
+    """
+    import pandas as pd
+
+    source_hash = file_hash(source_path)
+    target = workbook_snapshot_dir(source_path, source_hash, cache_dir)
+
+    if os.path.exists(os.path.join(target, "manifest.json")):
+        try:
+            tables = read_workbook_snapshot(target)
+            metrics.incr('workbook_snapshot.hit')
+            return tables
+        except Exception:
+            # 손상되었거나 Parquet 엔진이 없으면 다시 생성
+            shutil.rmtree(target, ignore_errors=True)
+
+    metrics.incr('workbook_snapshot.miss')
+    try:
+        with metrics.span('workbook_snapshot.stream_excel'):
+            target = build_workbook_snapshot(source_path, cache_dir)
+        return read_workbook_snapshot(target)
+    except Exception:
+        # 읽기 전용 파일시스템 등: 스냅샷 없이 시트별로 읽기
+        with pd.ExcelFile(source_path) as excel_file:
+            return {sheet_name: excel_file.parse(sheet_name, header=0)
+                    for sheet_name in excel_file.sheet_names}
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "ref"
+
+    print("=" * 60)
+    print("카탈로그 스냅샷 생성")
+    print("=" * 60)
+
+    for filename in CATALOG_FILES:
+        source_path = os.path.join(data_dir, filename)
+        if not os.path.exists(source_path):
+            print(f"  → {filename} 없음, 건너뛰기")
+            continue
+        target = build_snapshot(source_path)
+        print(f"✓ {filename} → {target}")
+
+    for filename in WORKBOOK_FILES:
+        source_path = os.path.join(data_dir, filename)
+        if not os.path.exists(source_path):
+            print(f"  → {filename} 없음, 건너뛰기")
+            continue
+        target = build_workbook_snapshot(source_path)
+        print(f"✓ {filename} → {target}")
+
+
+if __name__ == "__main__":
+    main()
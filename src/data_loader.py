@@ -1,12 +1,89 @@
 """
 데이터 로더 모듈
 - 차량 정보, 리스/렌트 견적 데이터를 로드하고 파싱
+- 로드 결과(카탈로그, 시트 딕셔너리)는 만든 뒤 바꾸지 않고, 다시 로드하면 참조를 통째로 교체
+  (여러 스레드가 잠금 없이 읽고, 로드만 잠금으로 직렬화)
 """
 
-import pandas as pd
 import os
-from typing import Dict, List, Tuple, Optional
-import streamlit as st
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
+
+import metrics
+from catalog_snapshot import load_table, load_workbook_tables
+from quote_schema import QuoteSchema, compile_schema
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class CarRecord:
+    """차량 정보 레코드"""
+
+    __slots__ = ('id_cargrade', 'brand', 'model', 'grade', 'name', 'price',
+                 'fuel_type', 'engine_size', 'body_style')
+
+    def __init__(self, id_cargrade, brand, model, grade, name, price,
+                 fuel_type, engine_size, body_style):
+        self.id_cargrade = id_cargrade
+        self.brand = brand
+        self.model = model
+        self.grade = grade
+        self.name = name
+        self.price = price
+        self.fuel_type = fuel_type
+        self.engine_size = engine_size
+        self.body_style = body_style
+
+    def to_grade_dict(self) -> Dict:
+        """등급 목록용 딕셔너리"""
+        return {
+            'id_cargrade': self.id_cargrade,
+            'grade': self.grade,
+            'name': self.name,
+            'price': self.price,
+            'fuel_type': self.fuel_type,
+            'engine_size': self.engine_size,
+            'body_style': self.body_style
+        }
+
+    def to_dict(self) -> Dict:
+        """차량 정보 딕셔너리"""
+        return {
+            'id_cargrade': self.id_cargrade,
+            'brand': self.brand,
+            'model': self.model,
+            'grade': self.grade,
+            'name': self.name,
+            'price': self.price,
+            'fuel_type': self.fuel_type,
+            'engine_size': self.engine_size,
+            'body_style': self.body_style
+        }
+
+
+class CarCatalog:
+    """차량 정보와 브랜드 → 모델 → 등급, id_cargrade → 차량 인덱스 (만든 뒤 바뀌지 않음)"""
+
+    __slots__ = ('carinfo', 'brands', 'models', 'grades', 'cars_by_id')
+
+    def __init__(self, carinfo: 'pd.DataFrame'):
+        columns = [carinfo[field].tolist() for field in CarRecord.__slots__]
+
+        models = {}
+        grades = {}
+        cars_by_id = {}
+        for values in zip(*columns):
+            record = CarRecord(*values)
+            models.setdefault(record.brand, set()).add(record.model)
+            grades.setdefault((record.brand, record.model), []).append(record)
+            cars_by_id.setdefault(record.id_cargrade, record)
+
+        self.carinfo = carinfo
+        self.brands = tuple(sorted(models.keys()))                                  # 정렬된 브랜드 목록
+        self.models = {brand: tuple(sorted(names)) for brand, names in models.items()}  # {브랜드: 정렬된 모델 목록}
+        self.grades = {key: tuple(records) for key, records in grades.items()}       # {(브랜드, 모델): (CarRecord, ...)}
+        self.cars_by_id = cars_by_id                                                 # {id_cargrade: CarRecord}
 
 
 class DataLoader:
@@ -18,106 +95,118 @@ class DataLoader:
             data_dir: 데이터 파일이 있는 디렉토리 경로
         """
         self.data_dir = data_dir
-        self.carinfo = None
-        self.lease_data = {}  # {시트명: DataFrame}
+        self.lease_data = {}  # {시트명: DataFrame} (로드할 때 새 딕셔너리로 교체)
         self.rent_data = {}   # {시트명: DataFrame}
 
-    @st.cache_data
-    def load_all_data(_self):
-        """모든 데이터 로드 (캐싱)"""
-        _self.load_carinfo()
+        self._catalog = None  # CarCatalog (load_carinfo에서 교체)
+        self._load_lock = threading.RLock()  # 파일 로드 직렬화 (조회는 잠금 없음)
+
+        # 금융사 블록 스키마 (컬럼 배치별 1회 해석, 항목은 완성된 값으로 한 번에 넣으므로 동시 조회 시
+        # 같은 값을 두 번 만들 수는 있어도 반쯤 만든 값을 읽지는 않음)
+        self._schemas = {}      # {컬럼명 튜플: QuoteSchema}
+        self._quote_tables = {} # {(상품, 시트명): (시트 DataFrame, 긴 형식 표)}
+        self._row_positions = {}  # {(상품, 시트명): (시트 DataFrame, {겟차번호: 첫 행 위치})}
+
+    def load_all_data(self):
+        """모든 데이터 로드"""
+        self.load_carinfo()
         # lease.xlsx와 rent.xlsx는 model_params.json 추출 후 불필요
         # 계산은 calculator.py의 model_params.json을 사용
         return True
 
+    @metrics.timed('loader.load_carinfo')
     def load_carinfo(self):
-        """차량 정보 로드"""
+        """차량 정보 로드 (Parquet 스냅샷 우선, 원본 변경 시 Excel 파싱)"""
         filepath = os.path.join(self.data_dir, "carinfo.xlsx")
-        self.carinfo = pd.read_excel(filepath)
-        # 결측치 처리
-        self.carinfo = self.carinfo.fillna("")
-        return self.carinfo
-
+        with self._load_lock:
+            # 결측치 처리까지 마친 뒤 인덱스와 함께 한 번에 교체
+            carinfo = load_table(filepath).fillna("")
+            self._catalog = CarCatalog(carinfo)
+        return carinfo
+
+    def _get_catalog(self) -> CarCatalog:
+        """카탈로그 (처음 조회할 때 한 번만 로드, 이후 잠금 없이 읽음)"""
+        catalog = self._catalog
+        if catalog is None:
+            with self._load_lock:
+                if self._catalog is None:
+                    self.load_carinfo()
+                catalog = self._catalog
+        return catalog
+
+    @property
+    def carinfo(self) -> Optional['pd.DataFrame']:
+        """로드된 차량 정보 (로드 전이면 None, 수정하지 말 것)"""
+        catalog = self._catalog
+        return catalog.carinfo if catalog is not None else None
+
+    def get_carinfo(self) -> 'pd.DataFrame':
+        """차량 정보 (로드 전이면 로드, 수정하지 말 것)"""
+        return self._get_catalog().carinfo
+
+    @metrics.timed('loader.load_lease_data')
     def load_lease_data(self):
-        """리스 데이터 로드 (모든 시트)"""
+        """리스 데이터 로드 (모든 시트, 통합문서 스냅샷 우선)"""
         filepath = os.path.join(self.data_dir, "lease.xlsx")
-        excel_file = pd.ExcelFile(filepath)
-
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
-            self.lease_data[sheet_name] = df
+        with self._load_lock:
+            self.lease_data = {**self.lease_data, **load_workbook_tables(filepath)}
 
         return self.lease_data
 
+    @metrics.timed('loader.load_rent_data')
     def load_rent_data(self):
-        """렌트 데이터 로드 (모든 시트)"""
+        """렌트 데이터 로드 (모든 시트, 통합문서 스냅샷 우선)"""
         filepath = os.path.join(self.data_dir, "rent.xlsx")
-        excel_file = pd.ExcelFile(filepath)
-
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
-            self.rent_data[sheet_name] = df
+        with self._load_lock:
+            self.rent_data = {**self.rent_data, **load_workbook_tables(filepath)}
 
         return self.rent_data
 
+    def get_sheets(self, product_type: str) -> Dict:
+        """
+        상품의 견적 시트 (처음 조회할 때 한 번만 로드, 수정하지 말 것)
+
+        Args:
+            product_type: 'lease' 또는 'rent'
+
+        Returns:
+            {시트명: DataFrame}
+
+        Raises:
+            FileNotFoundError: 원본 통합문서가 없는 경우
+        """
+        data = self.lease_data if product_type == 'lease' else self.rent_data
+        if not data:
+            with self._load_lock:
+                data = self.lease_data if product_type == 'lease' else self.rent_data
+                if not data:
+                    data = self.load_lease_data() if product_type == 'lease' else self.load_rent_data()
+        return data
+
+    def clear_sheets(self):
+        """견적 시트 비우기 (다음 get_sheets에서 다시 로드, 이미 받은 딕셔너리는 그대로)"""
+        with self._load_lock:
+            self.lease_data = {}
+            self.rent_data = {}
+
     def get_brands(self) -> List[str]:
         """브랜드 목록 반환"""
-        if self.carinfo is None:
-            self.load_carinfo()
-        return sorted(self.carinfo['brand'].unique().tolist())
+        return list(self._get_catalog().brands)
 
     def get_models(self, brand: str) -> List[str]:
         """특정 브랜드의 모델 목록 반환"""
-        if self.carinfo is None:
-            self.load_carinfo()
-        models = self.carinfo[self.carinfo['brand'] == brand]['model'].unique()
-        return sorted(models.tolist())
+        return list(self._get_catalog().models.get(brand, ()))
 
     def get_grades(self, brand: str, model: str) -> List[Dict]:
         """특정 브랜드/모델의 등급 목록 반환"""
-        if self.carinfo is None:
-            self.load_carinfo()
-
-        filtered = self.carinfo[
-            (self.carinfo['brand'] == brand) &
-            (self.carinfo['model'] == model)
-        ]
-
-        grades = []
-        for _, row in filtered.iterrows():
-            grades.append({
-                'id_cargrade': row['id_cargrade'],
-                'grade': row['grade'],
-                'name': row['name'],
-                'price': row['price'],
-                'fuel_type': row['fuel_type'],
-                'engine_size': row['engine_size'],
-                'body_style': row['body_style']
-            })
-
-        return grades
+        return [record.to_grade_dict() for record in self._get_catalog().grades.get((brand, model), ())]
 
     def get_car_info(self, id_cargrade: int) -> Optional[Dict]:
         """차량 ID로 차량 정보 조회"""
-        if self.carinfo is None:
-            self.load_carinfo()
-
-        car = self.carinfo[self.carinfo['id_cargrade'] == id_cargrade]
-        if len(car) == 0:
+        record = self._get_catalog().cars_by_id.get(id_cargrade)
+        if record is None:
             return None
-
-        row = car.iloc[0]
-        return {
-            'id_cargrade': row['id_cargrade'],
-            'brand': row['brand'],
-            'model': row['model'],
-            'grade': row['grade'],
-            'name': row['name'],
-            'price': row['price'],
-            'fuel_type': row['fuel_type'],
-            'engine_size': row['engine_size'],
-            'body_style': row['body_style']
-        }
+        return record.to_dict()
 
     def parse_sheet_name(self, sheet_name: str) -> Tuple[int, str]:
         """
@@ -167,7 +256,7 @@ class DataLoader:
         return sorted(mileages)
 
     def get_finance_data(self, product_type: str, period: int, mileage: str,
-                         id_cargrade: int) -> Optional[pd.Series]:
+                         id_cargrade: int) -> Optional['pd.Series']:
         """
         특정 조건의 금융 데이터 조회
         Args:
@@ -186,133 +275,84 @@ class DataLoader:
 
         df = data[sheet_name]
 
-        # 겟차번호로 차량 찾기
-        car_data = df[df['겟차번호'] == id_cargrade]
+        # 겟차번호 → 행 위치 (시트마다 한 번 생성)
+        cached = self._row_positions.get((product_type, sheet_name))
+        if cached is None or cached[0] is not df:
+            car_ids = df['겟차번호'].tolist()
+            positions = {}
+            for position, car_id in enumerate(car_ids):
+                positions.setdefault(car_id, position)
+            cached = (df, positions)
+            self._row_positions[(product_type, sheet_name)] = cached
+
+        position = cached[1].get(id_cargrade)
+        if position is None:
+            return None
+
+        return df.iloc[position]
 
-        if len(car_data) == 0:
+    def get_quote_schema(self, columns, sheet_name: str = "") -> QuoteSchema:
+        """시트 컬럼 배치의 금융사 블록 스키마 (같은 배치는 한 번만 해석)"""
+        key = tuple(columns)
+        schema = self._schemas.get(key)
+        if schema is None:
+            schema = compile_schema(key, sheet_name)
+            self._schemas[key] = schema
+        return schema
+
+    def get_quote_table(self, product_type: str, period: int, mileage: str) -> Optional['pd.DataFrame']:
+        """
+        시트 전체의 금융사 견적 긴 형식 표 (차량 × 금융사 × 상품유형)
+        Args:
+            product_type: 'lease' 또는 'rent'
+            period: 계약기간
+            mileage: 주행거리
+        Returns:
+            quote_schema.TABLE_COLUMNS 컬럼 DataFrame, 시트가 없으면 None
+        Raises:
+            QuoteLayoutError: 금융사 블록 배치가 스키마와 다른 경우
+        """
+        sheet_name = f"{period}개월_{mileage}"
+        data = self.lease_data if product_type == 'lease' else self.rent_data
+        df = data.get(sheet_name)
+        if df is None:
             return None
 
-        return car_data.iloc[0]
+        cached = self._quote_tables.get((product_type, sheet_name))
+        if cached is not None and cached[0] is df:
+            return cached[1]
 
-    def parse_finance_companies(self, row: pd.Series, product_type: str) -> List[Dict]:
+        table = self.get_quote_schema(df.columns, sheet_name).extract(df)
+        self._quote_tables[(product_type, sheet_name)] = (df, table)
+        return table
+
+    def parse_finance_companies(self, row: 'pd.Series', product_type: str) -> List[Dict]:
         """
         금융사 데이터 파싱
         Args:
             row: 차량 데이터 행
             product_type: 'lease' 또는 'rent'
         Returns:
-            금융사 데이터 리스트
-        """
-        companies = []
-
-        # 컬럼 인덱스 찾기 (1st, 2nd, 3rd, ...)
-        columns = row.index.tolist()
-
-        # nth 회사 찾기
-        nth_indices = []
-        for i, col in enumerate(columns):
-            if isinstance(col, str) and ('1st' in col or '2nd' in col or '3rd' in col or
-                                          '4th' in col or '5th' in col or '6th' in col or
-                                          '7th' in col or '8th' in col or '9th' in col or
-                                          '10th' in col or '11th' in col or '12th' in col or
-                                          '13th' in col or '14th' in col):
-                nth_indices.append(i)
-
-        # 각 금융사 블록 파싱
-        for nth_idx in nth_indices:
-            try:
-                company_data = self._parse_company_block(row, nth_idx, columns)
-                if company_data:
-                    companies.append(company_data)
-            except Exception as e:
-                # 파싱 실패 시 건너뛰기
-                continue
-
-        return companies
-
-    def _parse_company_block(self, row: pd.Series, start_idx: int, columns: List) -> Optional[Dict]:
-        """
-        개별 금융사 블록 파싱
+            금융사별 [무보증, 보증금, 선수금 딕셔너리 중 회사명이 있는 것] 리스트
+        Raises:
+            QuoteLayoutError: 금융사 블록 배치가 스키마와 다른 경우
         """
-        # 무보증 데이터
-        no_deposit = {}
-        company_name_col = columns[start_idx]
-        company_name = row[company_name_col]
-
-        if pd.isna(company_name) or company_name == "":
-            return None
-
-        # 무보증 회사명
-        no_deposit['company'] = company_name
-        no_deposit['type'] = '무보증'
-
-        # 무보증 데이터 추출 (start_idx 기준 +1, +2, ...)
-        try:
-            no_deposit['monthly_0'] = row[columns[start_idx + 1]]  # 무보증월대여료옵션0
-            no_deposit['monthly_500'] = row[columns[start_idx + 2]]  # 무보증월대여료옵션500
-            no_deposit['dealer_offset'] = row[columns[start_idx + 3]]  # 무보증딜러오프셋
-            no_deposit['acquisition_price'] = row[columns[start_idx + 5]]  # 무보증인수가격
-            no_deposit['fee_offset'] = row[columns[start_idx + 6]]  # 무보증Fee오프셋
-            no_deposit['fee_1'] = row[columns[start_idx + 7]]  # 무보증1fee
-        except:
-            no_deposit = None
-
-        # 보증금 데이터
-        deposit = {}
-        try:
-            deposit['company'] = row[columns[start_idx + 11]]  # 보증금회사명
-            if pd.isna(deposit['company']) or deposit['company'] == "":
-                deposit = None
-            else:
-                deposit['type'] = '보증금'
-                deposit['monthly_0'] = row[columns[start_idx + 12]]  # 보증금월대여료옵션0
-                deposit['monthly_500'] = row[columns[start_idx + 13]]  # 보증금월대여료옵션500
-                deposit['monthly_0_ref'] = row[columns[start_idx + 14]]  # 월대여료옵션0ref
-                deposit['monthly_500_ref'] = row[columns[start_idx + 15]]  # 월대여료옵션500ref
-                deposit['dealer_offset'] = row[columns[start_idx + 16]]  # 보증금딜러오프셋
-                deposit['acquisition_price'] = row[columns[start_idx + 18]]  # 보증금인수가격
-                deposit['fee_offset'] = row[columns[start_idx + 19]]  # 보증금Fee오프셋
-                deposit['fee_1'] = row[columns[start_idx + 20]]  # 보증금1fee
-        except:
-            deposit = None
-
-        # 선수금 데이터
-        advance = {}
-        try:
-            advance['company'] = row[columns[start_idx + 24]]  # 선수금회사명
-            if pd.isna(advance['company']) or advance['company'] == "":
-                advance = None
-            else:
-                advance['type'] = '선수금'
-                advance['monthly_0'] = row[columns[start_idx + 25]]  # 선수금월대여료옵션0
-                advance['monthly_500'] = row[columns[start_idx + 26]]  # 선수금월대여료옵션500
-                advance['monthly_0_ref'] = row[columns[start_idx + 27]]  # 월대여료옵션0ref
-                advance['monthly_500_ref'] = row[columns[start_idx + 28]]  # 월대여료옵션500ref
-                advance['dealer_offset'] = row[columns[start_idx + 29]]  # 선수금딜러오프셋
-                advance['acquisition_price'] = row[columns[start_idx + 31]]  # 선수금인수가격
-                advance['fee_offset'] = row[columns[start_idx + 32]]  # 선수금Fee오프셋
-                advance['fee_1'] = row[columns[start_idx + 33]]  # 선수금1fee
-        except:
-            advance = None
-
-        result = []
-        if no_deposit:
-            result.append(no_deposit)
-        if deposit:
-            result.append(deposit)
-        if advance:
-            result.append(advance)
-
-        return result if result else None
+        return self.get_quote_schema(row.index).extract_row(row.to_numpy(dtype=object))
 
 
 # 전역 인스턴스
 _data_loader = None
+_data_loader_lock = threading.Lock()
 
 def get_data_loader(data_dir: str = "ref") -> DataLoader:
-    """데이터 로더 싱글톤 인스턴스 반환"""
+    """데이터 로더 싱글톤 인스턴스 반환 (처음 호출한 스레드만 로드하고 나머지는 완료를 기다림)"""
     global _data_loader
-    if _data_loader is None:
-        _data_loader = DataLoader(data_dir)
-        _data_loader.load_all_data()
-    return _data_loader
+    loader = _data_loader
+    if loader is None:
+        with _data_loader_lock:
+            if _data_loader is None:
+                loader = DataLoader(data_dir)
+                loader.load_all_data()
+                _data_loader = loader  # 로드를 마친 뒤에 공개
+            loader = _data_loader
+    return loader
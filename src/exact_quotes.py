@@ -0,0 +1,327 @@
+"""
+정확 견적 모듈
+- lease.xlsx / rent.xlsx 시트의 금융사 공시 월대여료로 월납입금을 계산 (금융계산기_개발명세서.md 계산식)
+- (상품, 차량 ID, 기간, 주행거리, 금융사, 결제유형) 인덱스를 한 번 만들어 두고 딕셔너리 조회로 응답
+- 시트에 없는 차량/조건은 ModelBasedCalculator 결과로 대체
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from calc_trace import CalcTrace
+from calculator import ModelBasedCalculator, get_calculator
+from data_loader import DataLoader, get_data_loader
+from quote_schema import VALUE_FIELDS
+import metrics
+
+
+# 결과 출처 (debug['source'])
+SOURCE_EXACT = 'quote_sheet'
+SOURCE_MODEL = 'model'
+
+PRODUCTS = ('lease', 'rent')
+
+# 옵션 500만원 기준 월대여료 차이
+OPTION_UNIT = 5000000
+
+
+def _field(quote: Dict, name: str) -> float:
+    """견적 필드 값 (빈 값은 0, 딜러오프셋/Fee오프셋은 대부분 비어 있음)"""
+    value = quote.get(name)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 0.0
+    return float(value)
+
+
+def published_payment(
+    product_type: str,
+    payment_type: str,
+    quote: Dict,
+    car_price: float,
+    deposit_rate: float = 0,
+    option_price: float = 0,
+    dealer_discount: float = 0,
+    dealer_fee_rate: float = 0.01,
+    steps: Optional[CalcTrace] = None
+) -> float:
+    """
+    공시 월대여료 → 월납입금
+
+    Args:
+        product_type: 'lease' 또는 'rent'
+        payment_type: '무보증', '보증금', '선수금'
+        quote: 견적 필드 ({monthly_0, monthly_500, monthly_0_ref, ...}, quote_schema.VALUE_FIELDS)
+        car_price: 차량 가격
+        deposit_rate: 보증금/선납금 비율 (%)
+        option_price: 옵션 가격 (원)
+        dealer_discount: 딜러 할인 (원)
+        dealer_fee_rate: 딜러 Fee 비율 (0.01 = 1%)
+        steps: 계산 단계를 기록할 CalcTrace
+
+    Returns:
+        월납입금 (반올림 전)
+
+    Raises:
+        ValueError: 차량 가격이 0 이하인 경우 (옵션·할인 비율의 분모)
+
+    명세서 선납 계산식의 옵션 항('.../옵션금액')은 옵션금액 0원에서 0이 되도록
+    옵션 500만원당 차이 × 옵션금액 × 선납율/30으로 계산한다.
+    """
+    m0 = _field(quote, 'monthly_0')
+    m500 = _field(quote, 'monthly_500')
+    ref0 = _field(quote, 'monthly_0_ref')
+    ref500 = _field(quote, 'monthly_500_ref')
+    dealer_offset = _field(quote, 'dealer_offset')
+    fee_offset = _field(quote, 'fee_offset')
+    fee_1 = _field(quote, 'fee_1')
+
+    if not car_price > 0:
+        raise ValueError(f"차량 가격은 0보다 커야 합니다: {car_price!r}")
+    gross_ratio = (car_price + option_price) / car_price
+    terms = []  # [(항목, 금액), ...]
+
+    if product_type == 'lease':
+        net_ratio = (car_price + option_price - dealer_discount) / car_price
+        if payment_type == '보증금':
+            terms.append(("월대여료옵션0ref", ref0))
+            terms.append(("옵션", (ref500 - ref0) / OPTION_UNIT * (option_price - dealer_discount)))
+            # 명세서 (차량가격+옵션금액)/(차량가격-딜러할인금액+차량가격) × (옵션금액-딜러할인금액+차량가격)/차량가격
+            # 항은 프로토타입 적용식(할인 0원에서 1)에 맞춰 (차량가격+옵션금액)/차량가격으로 계산
+            terms.append(("보증금", (m0 - ref0) / 30 * deposit_rate * gross_ratio))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * net_ratio))
+        elif payment_type == '선수금':
+            # 리스 내부계산용선납금율 = 선납금액 / (차량가격 + 옵션금액) × 100
+            advance_rate = (car_price + option_price - dealer_discount) * deposit_rate / 100 \
+                / (car_price + option_price) * 100
+            terms.append(("월대여료옵션0ref", ref0))
+            terms.append(("선납", -(ref0 - m0) / 30 * advance_rate))
+            terms.append(("옵션(ref)", (ref500 - ref0) / OPTION_UNIT * option_price * (30 - advance_rate) / 30))
+            terms.append(("옵션(선납)", (m500 - m0) / OPTION_UNIT * option_price * advance_rate / 30))
+            terms.append(("Fee오프셋", fee_offset * gross_ratio))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * gross_ratio))
+        else:
+            terms.append(("월대여료옵션0", m0))
+            terms.append(("옵션", (m500 - m0) / OPTION_UNIT * (option_price - dealer_discount)))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * net_ratio))
+    else:
+        if payment_type == '보증금':
+            terms.append(("월대여료옵션0ref", ref0))
+            terms.append(("옵션", (ref500 - ref0) / OPTION_UNIT * option_price))
+            terms.append(("보증금", (m0 - ref0) / 30 * deposit_rate * gross_ratio))
+            terms.append(("Fee오프셋", fee_offset * gross_ratio))
+            terms.append(("딜러오프셋", -dealer_offset * dealer_discount))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * gross_ratio))
+        elif payment_type == '선수금':
+            terms.append(("월대여료옵션0ref", ref0))
+            terms.append(("선납", -(ref0 - m0) / 0.3 * deposit_rate / 100))
+            terms.append(("옵션(선납)", (m500 - m0) / OPTION_UNIT * option_price * deposit_rate / 30))
+            terms.append(("옵션(ref)", (ref500 - ref0) / OPTION_UNIT * option_price
+                          * (0.3 - deposit_rate / 100) / 0.3))
+            terms.append(("딜러오프셋", -dealer_offset * dealer_discount))
+            terms.append(("Fee오프셋", fee_offset * gross_ratio))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * gross_ratio))
+        else:
+            terms.append(("월대여료옵션0", m0))
+            terms.append(("옵션", (m500 - m0) / OPTION_UNIT * (option_price - dealer_discount)))
+            terms.append(("딜러오프셋", -dealer_offset * dealer_discount))
+            terms.append(("Fee오프셋", fee_offset * gross_ratio))
+            terms.append(("1fee", fee_1 * dealer_fee_rate * gross_ratio))
+
+    monthly_payment = sum(amount for _, amount in terms)
+
+    if steps is not None:
+        steps.add("=== 공시 월대여료 기준 계산 ({}) ===", payment_type)
+        for name, amount in terms:
+            steps.add("{}: {:,.2f}원", name, amount)
+        steps.blank()
+        steps.add("=== 최종 월납입금 ===")
+        steps.add("{:,.0f}원", monthly_payment)
+    return monthly_payment
+
+
+def _car_key(car_id):
+    """겟차번호 → 인덱스 키 (정수로 표현 가능한 값은 int)"""
+    try:
+        number = float(car_id)
+    except (TypeError, ValueError):
+        return car_id
+    if math.isnan(number):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+class ExactQuoteIndex:
+    """견적 시트 기반 정확 견적 인덱스"""
+
+    def __init__(self, data_loader: DataLoader, calculator: ModelBasedCalculator):
+        self.data_loader = data_loader
+        self.calculator = calculator
+        # (offers, quotes) 한 쌍으로 교체 (조회는 잠금 없이 한 번 읽음)
+        #   offers: {(상품, 차량 ID, 기간, 주행거리, 결제유형): [(금융사, 견적 필드), ...]}
+        #   quotes: {(상품, 차량 ID, 기간, 주행거리, 금융사, 결제유형): 견적 필드}
+        self._index = None
+        self._build_lock = threading.Lock()
+
+    # ================ 인덱스 ================
+
+    def _sheets(self, product_type: str) -> Dict:
+        """상품의 시트 ({시트명: DataFrame}, 원본 파일이 없으면 빈 딕셔너리)"""
+        try:
+            return self.data_loader.get_sheets(product_type)
+        except FileNotFoundError:
+            return {}
+
+    def build(self):
+        """전 시트의 금융사 견적을 인덱스로 변환"""
+        offers = {}
+        quotes = {}
+        with metrics.span('exact_quotes.build'):
+            for product_type in PRODUCTS:
+                for sheet_name in list(self._sheets(product_type)):
+                    period, mileage = self.data_loader.parse_sheet_name(sheet_name)
+                    if period is None:
+                        continue
+                    table = self.data_loader.get_quote_table(product_type, period, mileage)
+                    if table is None or len(table) == 0:
+                        continue
+
+                    columns = [table[field].tolist() for field in VALUE_FIELDS]
+                    for car_id, company, payment_type, *values in zip(
+                            table['id_cargrade'].tolist(), table['company'].tolist(),
+                            table['type'].tolist(), *columns):
+                        car_key = _car_key(car_id)
+                        if car_key is None:
+                            continue
+                        quote = dict(zip(VALUE_FIELDS, values))
+                        quote_key = (product_type, car_key, period, mileage, company, payment_type)
+                        if quote_key in quotes:
+                            # 같은 차량이 시트에 여러 번 있으면 첫 행 사용 (get_finance_data와 같음)
+                            continue
+                        quotes[quote_key] = quote
+                        offers.setdefault((product_type, car_key, period, mileage, payment_type), []) \
+                            .append((company, quote))
+        self._index = (offers, quotes)
+
+    def _ensure(self) -> Tuple[Dict, Dict]:
+        """(offers, quotes) (처음 호출한 스레드만 만들고 나머지는 완료를 기다림)"""
+        index = self._index
+        if index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self.build()
+                index = self._index
+        return index
+
+    def refresh(self):
+        """견적 시트를 다시 읽어 인덱스 재생성 (진행 중인 조회는 이전 인덱스로 끝남)"""
+        with self._build_lock:
+            self.data_loader.clear_sheets()
+            self.build()
+
+    def has_quotes(self, product_type: str, id_cargrade, period: int, mileage: str,
+                   payment_type: str = '무보증') -> bool:
+        """시트에 해당 차량/조건 견적이 있는지"""
+        offers, _ = self._ensure()
+        return (product_type, _car_key(id_cargrade), period, mileage, payment_type) in offers
+
+    def get_quote(self, product_type: str, id_cargrade, period: int, mileage: str,
+                  company: str, payment_type: str = '무보증') -> Optional[Dict]:
+        """금융사 1곳의 견적 필드 (없으면 None)"""
+        _, quotes = self._ensure()
+        return quotes.get((product_type, _car_key(id_cargrade), period, mileage, company, payment_type))
+
+    # ================ 계산 ================
+
+    def calculate_all_companies(
+        self,
+        id_cargrade,
+        car_price: float,
+        product_type: str,
+        period: int,
+        mileage: str,
+        deposit_rate: float = 0,
+        payment_type: str = '무보증',
+        option_price: float = 0,
+        dealer_discount: float = 0,
+        dealer_fee_rate: float = 0.01,
+        trace: bool = False
+    ) -> List[Dict]:
+        """
+        모든 금융사의 월납입금 (시트 견적 우선, 없으면 모델 기반)
+
+        Args:
+            id_cargrade: 차량 ID (겟차번호)
+            나머지: ModelBasedCalculator.calculate_all_companies와 같음
+
+        Returns:
+            ModelBasedCalculator.calculate_all_companies와 같은 형식
+            (debug['source']: 'quote_sheet' 또는 'model')
+        """
+        all_offers, _ = self._ensure()
+        offers = all_offers.get((product_type, _car_key(id_cargrade), period, mileage, payment_type))
+        if not offers:
+            metrics.incr('exact_quotes.fallback')
+            results = self.calculator.calculate_all_companies(
+                car_price=car_price, product_type=product_type, period=period, mileage=mileage,
+                deposit_rate=deposit_rate, payment_type=payment_type, option_price=option_price,
+                dealer_discount=dealer_discount, dealer_fee_rate=dealer_fee_rate, trace=trace
+            )
+            # 계산기 캐시와 공유되는 항목이므로 복사해서 출처 표시
+            return [dict(result, debug=dict(result['debug'], source=SOURCE_MODEL)) for result in results]
+
+        metrics.incr('exact_quotes.hit')
+        results = []
+        for company, quote in offers:
+            steps = CalcTrace() if trace else None
+            monthly = published_payment(
+                product_type, payment_type, quote, car_price, deposit_rate=deposit_rate,
+                option_price=option_price, dealer_discount=dealer_discount,
+                dealer_fee_rate=dealer_fee_rate, steps=steps
+            )
+            if not monthly > 0:
+                continue
+
+            debug = {
+                'product': product_type,
+                'company': company,
+                'period': period,
+                'mileage': mileage,
+                'payment_type': payment_type,
+                'car_price': car_price,
+                'option_price': option_price,
+                'dealer_discount': dealer_discount,
+                'dealer_fee_rate': dealer_fee_rate,
+                'deposit_rate': deposit_rate,
+                'params': quote,
+                'params_key': f"{period}개월_{mileage}",
+                'params_provenance': 'exact',
+                'source': SOURCE_EXACT
+            }
+            if steps is not None:
+                debug['trace'] = steps
+            results.append({
+                'company': company,
+                'payment_type': payment_type,
+                'monthly_payment': round(monthly),
+                'debug': debug
+            })
+
+        results.sort(key=lambda x: x['monthly_payment'])
+        return results
+
+
+# 싱글톤 인스턴스
+_exact_quote_index = None
+_exact_quote_index_lock = threading.Lock()
+
+def get_exact_quote_index(data_dir: str = "ref") -> ExactQuoteIndex:
+    """정확 견적 인덱스 싱글톤 인스턴스 반환"""
+    global _exact_quote_index
+    index = _exact_quote_index
+    if index is None:
+        with _exact_quote_index_lock:
+            if _exact_quote_index is None:
+                _exact_quote_index = ExactQuoteIndex(get_data_loader(data_dir), get_calculator())
+            index = _exact_quote_index
+    return index
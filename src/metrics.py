@@ -0,0 +1,216 @@
+"""
+계측 모듈
+- 이름 있는 타이밍 구간(span), 단계 타이머, 카운터
+- 로컬 JSON 파일 또는 Prometheus 텍스트 형식으로 내보내기
+- 비활성 상태(기본)에서는 플래그 확인 한 번만 하고 바로 반환
+
+환경 변수:
+    FI_METRICS=1                  계측 활성화
+    FI_METRICS_FILE=metrics.json  flush() / 프로세스 종료 시 JSON 저장 경로
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+_enabled = os.environ.get('FI_METRICS', '').lower() not in ('', '0', 'false', 'no')
+_metrics_file = os.environ.get('FI_METRICS_FILE') or None
+
+_lock = threading.Lock()
+_spans = {}     # {이름: [횟수, 합계, 최소, 최대]}
+_counters = {}  # {이름: 값}
+
+
+def is_enabled() -> bool:
+    """계측 활성화 여부"""
+    return _enabled
+
+
+def enable(flag: bool = True, metrics_file: Optional[str] = None):
+    """계측 켜기/끄기"""
+    global _enabled, _metrics_file
+    _enabled = flag
+    if metrics_file:
+        _metrics_file = metrics_file
+
+
+def record(name: str, seconds: float):
+    """구간 소요 시간 기록"""
+    with _lock:
+        stat = _spans.get(name)
+        if stat is None:
+            _spans[name] = [1, seconds, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            if seconds < stat[2]:
+                stat[2] = seconds
+            if seconds > stat[3]:
+                stat[3] = seconds
+
+
+def incr(name: str, value: float = 1):
+    """카운터 증가"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Span:
+    """타이밍 구간 (with 문)"""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    """비활성 상태용 빈 구간"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    타이밍 구간
+
+    예:
+        with metrics.span('loader.load_carinfo'):
+            ...
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name: str):
+    """함수 전체를 타이밍 구간으로 감싸는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class StageTimer:
+    """
+    연속된 계산 단계 타이머 (직전 mark 이후 경과 시간을 '접두어.단계'로 기록)
+
+    예:
+        stages = metrics.stage_timer('bnk.lease')
+        ...
+        if stages: stages.mark('tax')
+    """
+
+    __slots__ = ('prefix', 'last')
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        record(f"{self.prefix}.{stage}", now - self.last)
+        self.last = now
+
+
+def stage_timer(prefix: str) -> Optional[StageTimer]:
+    """단계 타이머 (비활성 상태면 None)"""
+    if not _enabled:
+        return None
+    return StageTimer(prefix)
+
+
+# ================ 내보내기 ================
+
+def snapshot() -> Dict:
+    """현재 계측값"""
+    with _lock:
+        spans = {
+            name: {'count': count, 'total': total, 'min': low, 'max': high, 'mean': total / count}
+            for name, (count, total, low, high) in _spans.items()
+        }
+        counters = dict(_counters)
+    return {'spans': spans, 'counters': counters}
+
+
+def reset():
+    """계측값 초기화"""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def render_prometheus() -> str:
+    """Prometheus 텍스트 형식"""
+    data = snapshot()
+    lines = [
+        "# HELP fi_span_seconds Duration of instrumented spans",
+        "# TYPE fi_span_seconds summary",
+    ]
+    for name, stat in sorted(data['spans'].items()):
+        lines.append(f'fi_span_seconds_count{{span="{name}"}} {stat["count"]}')
+        lines.append(f'fi_span_seconds_sum{{span="{name}"}} {stat["total"]:.9f}')
+    lines.append("# HELP fi_span_seconds_max Slowest observation of instrumented spans")
+    lines.append("# TYPE fi_span_seconds_max gauge")
+    for name, stat in sorted(data['spans'].items()):
+        lines.append(f'fi_span_seconds_max{{span="{name}"}} {stat["max"]:.9f}')
+    lines.append("# HELP fi_events_total Instrumented event counters")
+    lines.append("# TYPE fi_events_total counter")
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'fi_events_total{{event="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: Optional[str] = None) -> Optional[str]:
+    """계측값을 JSON 파일로 저장 (임시 파일에 쓴 뒤 교체)"""
+    path = path or _metrics_file
+    if not path:
+        return None
+    data = snapshot()
+    data['written_at'] = time.time()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def flush():
+    """활성 상태이고 FI_METRICS_FILE이 지정되어 있으면 파일로 저장"""
+    if _enabled and _metrics_file:
+        write_metrics_file()
+
+
+atexit.register(flush)
@@ -0,0 +1,354 @@
+"""
+파라미터 이력 저장소
+- model_params.json, bnk_rv_tables.json의 버전별 내용을 적용 시작 시각과 함께 보관
+- 내용은 블록(금융사별 파라미터, 잔가사 테이블) 단위로 해시 주소 저장하므로, 월마다 바뀐 블록만 새로 쌓임
+- as_of 시점에 적용 중이던 버전을 찾아 같은 파라미터로 견적을 다시 계산 (재발행 재현)
+
+저장 구조 (param_history/):
+    objects/<해시 앞 2자리>/<해시>.json        블록 내용 (키 순서 유지한 JSON)
+    versions/<종류>/<적용시각>_<내용 ID>.json   버전 목록 (블록 경로 → 해시, 원본 키 순서)
+
+내용 ID는 블록 목록의 해시이므로 같은 내용이면 어느 프로세스에서 기록해도 같은 ID가 된다.
+
+계산기는 이력을 읽기만 한다. 파일 수정 시각은 체크아웃·복사 때 바뀌므로 적용 시각으로 쓰지 않고,
+새 파라미터를 배포할 때 적용일을 지정해 명시적으로 기록한다.
+
+사용법:
+    python src/param_history.py record --effective-from 2025-11-01
+    python src/param_history.py record --kind bnk_rv_tables --effective-from 2025-11-01T09:00:00
+    python src/param_history.py list
+"""
+
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import metrics
+
+
+HISTORY_DIRNAME = "param_history"
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), HISTORY_DIRNAME)
+
+# 종류 → (원본 파일, 블록 깊이)
+KINDS = {
+    'model_params': ("model_params.json", 2),    # {상품: {금융사: 블록}}
+    'bnk_rv_tables': ("bnk_rv_tables.json", 1),  # {테이블: 블록}
+}
+
+_TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+AsOf = Union[datetime.date, datetime.datetime]
+
+
+class ParamVersion(NamedTuple):
+    """기록된 파라미터 버전"""
+    kind: str
+    content_id: str                   # 내용 해시 (블록 목록 기준)
+    effective_from: datetime.datetime  # 적용 시작 시각
+    path: str                         # 버전 파일 경로
+
+
+def _dumps(value) -> bytes:
+    """키 순서를 유지한 간결한 JSON (해시 입력)"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _split_blocks(data: Dict, depth: int, prefix: Tuple[str, ...] = ()) -> List[Tuple[Tuple[str, ...], object]]:
+    """depth 단계까지 내려간 (키 경로, 블록) 목록 (빈 딕셔너리·딕셔너리가 아닌 값은 그 자리에서 블록)"""
+    blocks = []
+    for key, value in data.items():
+        path = prefix + (key,)
+        if depth > 1 and isinstance(value, dict) and value:
+            blocks.extend(_split_blocks(value, depth - 1, path))
+        else:
+            blocks.append((path, value))
+    return blocks
+
+
+def _join_blocks(blocks: List[Tuple[List[str], object]]) -> Dict:
+    """_split_blocks의 역 (블록 순서대로 키를 다시 만들어 원본 키 순서 유지)"""
+    data = {}
+    for path, value in blocks:
+        node = data
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return data
+
+
+def _hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _encode(kind: str, data: Dict) -> Tuple[str, List[Tuple[List[str], str, bytes]]]:
+    """(내용 ID, [(키 경로, 블록 해시, 블록 JSON), ...])"""
+    _, depth = KINDS[kind]
+    encoded = []
+    for path, value in _split_blocks(data, depth):
+        payload = _dumps(value)
+        encoded.append((list(path), _hash(payload), payload))
+    content_id = _hash(_dumps([[path, digest] for path, digest, _ in encoded]))[:16]
+    return content_id, encoded
+
+
+def content_id(kind: str, data: Dict) -> str:
+    """파라미터 내용 ID (기록하지 않고 계산만)"""
+    return _encode(kind, data)[0]
+
+
+def as_of_time(as_of: AsOf) -> datetime.datetime:
+    """기준일을 비교용 시각으로 (날짜만 주면 그날 마지막 시각)"""
+    if isinstance(as_of, datetime.datetime):
+        return as_of if as_of.tzinfo is None else as_of.astimezone().replace(tzinfo=None)
+    if isinstance(as_of, datetime.date):
+        return datetime.datetime.combine(as_of, datetime.time.max)
+    raise TypeError(f"as_of는 date 또는 datetime이어야 합니다: {as_of!r}")
+
+
+def _atomic_write(path: str, payload: bytes):
+    """임시 파일에 쓴 뒤 교체 (다른 프로세스가 반쯤 쓴 파일을 읽지 않도록)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class ParamHistory:
+    """해시 주소 파라미터 이력 저장소"""
+
+    def __init__(self, root: str = HISTORY_DIR):
+        """
+        Args:
+            root: 저장 디렉토리
+        """
+        self.root = root
+        self._versions = {}  # {종류: (versions 디렉토리 수정시각, [ParamVersion, ...] 적용 시각순, [적용 시각, ...])}
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.json")
+
+    def _versions_dir(self, kind: str) -> str:
+        return os.path.join(self.root, 'versions', kind)
+
+    def versions(self, kind: str) -> List[ParamVersion]:
+        """기록된 버전 목록 (적용 시각순)"""
+        return self._scan(kind)[0]
+
+    def _scan(self, kind: str) -> Tuple[List[ParamVersion], List[datetime.datetime]]:
+        """(버전 목록, 적용 시각 목록) (디렉토리가 바뀌었을 때만 다시 읽음)"""
+        directory = self._versions_dir(kind)
+        try:
+            stamp = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], []
+
+        cached = self._versions.get(kind)
+        if cached is not None and cached[0] == stamp:
+            return cached[1], cached[2]
+
+        versions = []
+        for name in os.listdir(directory):
+            stem, ext = os.path.splitext(name)
+            if ext != '.json':
+                continue
+            effective, _, version_id = stem.partition('_')
+            try:
+                effective_from = datetime.datetime.strptime(effective, _TIME_FORMAT)
+            except ValueError:
+                continue
+            versions.append(ParamVersion(kind, version_id, effective_from, os.path.join(directory, name)))
+        versions.sort(key=lambda version: (version.effective_from, version.content_id))
+        times = [version.effective_from for version in versions]
+        self._versions[kind] = (stamp, versions, times)
+        return versions, times
+
+    def resolve(self, kind: str, as_of: AsOf) -> ParamVersion:
+        """
+        as_of 시점에 적용 중이던 버전
+
+        Raises:
+            ValueError: as_of 이전에 기록된 버전이 없는 경우
+        """
+        versions, times = self._scan(kind)
+        position = bisect.bisect_right(times, as_of_time(as_of))
+        if position == 0:
+            raise ValueError(f"{kind}: {as_of} 이전에 기록된 파라미터 버전이 없습니다")
+        return versions[position - 1]
+
+    def record(self, kind: str, data: Dict, effective_from: datetime.datetime,
+               source: str = "") -> ParamVersion:
+        """
+        버전 기록 (effective_from 시점에 이미 같은 내용이 적용 중이면 기존 버전 반환)
+
+        Args:
+            kind: 'model_params' 또는 'bnk_rv_tables'
+            data: 파일 내용
+            effective_from: 적용 시작 시각 (초 단위로 저장)
+            source: 출처 메모 (예: 원본 통합문서 이름)
+        """
+        version_id, blocks = _encode(kind, data)
+        effective_from = effective_from.replace(microsecond=0)
+        try:
+            current = self.resolve(kind, effective_from)
+        except ValueError:
+            current = None
+        if current is not None and current.content_id == version_id:
+            return current
+
+        with self._lock, metrics.span('param_history.record'):
+            for _, digest, payload in blocks:
+                path = self._object_path(digest)
+                if not os.path.exists(path):
+                    _atomic_write(path, payload)
+
+            name = f"{effective_from.strftime(_TIME_FORMAT)}_{version_id}.json"
+            path = os.path.join(self._versions_dir(kind), name)
+            header = json.dumps({
+                'kind': kind,
+                'content_id': version_id,
+                'effective_from': effective_from.isoformat(),
+                'recorded_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'source': source
+            }, ensure_ascii=False, indent=1)
+            # 블록은 한 줄에 하나 (버전 간 diff가 바뀐 블록만 보이도록)
+            lines = [json.dumps([block_path, digest], ensure_ascii=False) for block_path, digest, _ in blocks]
+            manifest = header[:-2] + ',\n "blocks": [\n  ' + ',\n  '.join(lines) + '\n ]\n}\n'
+            _atomic_write(path, manifest.encode('utf-8'))
+        metrics.incr(f'param_history.recorded.{kind}')
+        return ParamVersion(kind, version_id, effective_from, path)
+
+    def load(self, version: ParamVersion) -> Dict:
+        """버전 내용 복원 (원본 파일과 같은 키 순서)"""
+        with metrics.span('param_history.load'):
+            with open(version.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            blocks = []
+            for path, digest in manifest['blocks']:
+                with open(self._object_path(digest), 'r', encoding='utf-8') as f:
+                    blocks.append((path, json.load(f)))
+        return _join_blocks(blocks)
+
+
+class AsOfSnapshots:
+    """
+    as_of 기준 스냅샷 조회
+
+    현재 파일 스냅샷(SnapshotManager.current)과 최근 사용한 과거 버전 스냅샷은 컴파일된 채로 메모리에 두고,
+    그 밖의 과거 버전은 처음 요청될 때 이력에서 읽어 컴파일한다.
+    """
+
+    def __init__(self, kind: str, manager, build: Callable[[Dict], object],
+                 history: ParamHistory, resident: int = 4):
+        """
+        Args:
+            kind: 'model_params' 또는 'bnk_rv_tables'
+            manager: 현재 파일 SnapshotManager (스냅샷은 content_id 속성 필요)
+            build: 파일 내용 → 스냅샷
+            history: 이력 저장소
+            resident: 메모리에 둘 과거 버전 수
+        """
+        self.kind = kind
+        self.manager = manager
+        self._build = build
+        self.history = history
+        self.resident = resident
+        self._loaded = OrderedDict()  # {내용 ID: 스냅샷} 최근 사용 순 (조회할 때마다 맨 뒤로)
+        self._lock = threading.Lock()        # _loaded 순서 갱신 (짧게 보유)
+        self._build_lock = threading.Lock()  # 과거 버전 컴파일 (컴파일 중에도 다른 버전 적중은 기다리지 않음)
+
+    def at(self, as_of: Optional[AsOf]):
+        """
+        as_of 시점 스냅샷 (None이면 현재 파일)
+
+        Raises:
+            ValueError: as_of 이전에 기록된 버전이 없는 경우
+        """
+        current = self.manager.current
+        if as_of is None:
+            return current
+        version = self.history.resolve(self.kind, as_of)
+        if version.content_id == current.content_id:
+            return current
+
+        snapshot = self._touch(version.content_id)
+        if snapshot is not None:
+            return snapshot
+
+        with self._build_lock:
+            snapshot = self._touch(version.content_id)
+            if snapshot is None:
+                metrics.incr(f'param_history.compiled.{self.kind}')
+                snapshot = self._build(self.history.load(version))
+                with self._lock:
+                    self._loaded[version.content_id] = snapshot
+                    while len(self._loaded) > self.resident:
+                        self._loaded.popitem(last=False)
+        return snapshot
+
+    def _touch(self, content_id: str):
+        """메모리에 둔 스냅샷 조회 (있으면 최근 사용으로 표시, 없으면 None)"""
+        with self._lock:
+            snapshot = self._loaded.get(content_id)
+            if snapshot is not None:
+                self._loaded.move_to_end(content_id)
+            return snapshot
+
+
+# 전역 인스턴스 (디렉토리별)
+_param_histories = {}
+
+def get_param_history(root: str = HISTORY_DIR) -> ParamHistory:
+    """이력 저장소 인스턴스 반환 (디렉토리마다 1개)"""
+    history = _param_histories.get(root)
+    if history is None:
+        history = _param_histories.setdefault(root, ParamHistory(root))
+    return history
+
+
+def history_for(path: str) -> ParamHistory:
+    """파라미터 파일과 같은 디렉토리의 이력 저장소"""
+    return get_param_history(os.path.join(os.path.dirname(os.path.abspath(path)), HISTORY_DIRNAME))
+
+
+def _parse_effective_from(text: str) -> datetime.datetime:
+    """'2025-11-01' 또는 '2025-11-01T09:00:00'"""
+    return datetime.datetime.fromisoformat(text)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="파라미터 이력 기록/조회")
+    parser.add_argument('command', choices=['record', 'list'])
+    parser.add_argument('--kind', choices=list(KINDS), action='append',
+                        help="대상 종류 (기본: 전체)")
+    parser.add_argument('--effective-from', type=_parse_effective_from, default=None,
+                        help="적용 시작일 (record에 필수)")
+    parser.add_argument('--source', default="", help="출처 메모 (예: BNK-25-10-V4.xlsm)")
+    parser.add_argument('--root', default=HISTORY_DIR, help="이력 디렉토리")
+    args = parser.parse_args()
+    if args.command == 'record' and args.effective_from is None:
+        parser.error("record에는 --effective-from이 필요합니다")
+
+    history = ParamHistory(args.root)
+    for kind in args.kind or list(KINDS):
+        if args.command == 'record':
+            path = os.path.join(os.path.dirname(__file__), KINDS[kind][0])
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            version = history.record(kind, data, args.effective_from, args.source or os.path.basename(path))
+            print(f"{kind}: {version.content_id} (적용 {version.effective_from.isoformat()})")
+        else:
+            for version in history.versions(kind):
+                print(f"{kind}\t{version.effective_from.isoformat()}\t{version.content_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+파라미터 조건 해석 인덱스
+- (상품, 금융사, 기간, 주행거리) → 사용할 파라미터를 로드 시점에 미리 계산
+- 정확한 조건이 없을 때의 대체 규칙을 명시하고, 대체 여부(provenance)를 함께 반환
+
+대체 규칙: 기간 차이가 가장 작은 조건 중 주행거리 차이가 가장 작은 조건
+(거리가 같으면 짧은 기간, 적은 주행거리 쪽). 결과는 다음 중 하나로 표시된다.
+    exact           요청한 기간·주행거리 그대로
+    same_period     같은 기간, 다른 주행거리
+    nearest_period  다른 기간, 같은 주행거리
+    nearest         기간·주행거리 모두 다름
+보간 곡면(param_surface)에서 얻은 값은 interpolated / extrapolated로 표시된다.
+"""
+
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+EXACT = 'exact'
+SAME_PERIOD = 'same_period'
+NEAREST_PERIOD = 'nearest_period'
+NEAREST = 'nearest'
+INTERPOLATED = 'interpolated'
+EXTRAPOLATED = 'extrapolated'
+
+# 조회된 적 없는 조건을 메모할 최대 개수 (임의 입력으로 무한히 커지지 않도록)
+MAX_MEMO_SIZE = 4096
+
+UNLIMITED_MILEAGE = float('inf')
+
+# 거리 계산 시 무제한 주행거리를 대신할 값 (가장 큰 주행거리 조건이 가장 가깝도록)
+_UNLIMITED_DISTANCE_VALUE = 1e6
+
+_MILEAGE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*만')
+
+
+def parse_mileage(mileage: str) -> Optional[float]:
+    """
+    주행거리 문자열을 만km 단위 숫자로 변환
+
+    예: '1만km' → 1.0, '1.5만' → 1.5, '무제한' → inf, 해석 불가 → None
+    """
+    if mileage is None:
+        return None
+    text = str(mileage)
+    if '무제한' in text:
+        return UNLIMITED_MILEAGE
+    match = _MILEAGE_PATTERN.match(text)
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+def parse_condition_key(key: str) -> Tuple[Optional[int], Optional[float]]:
+    """조건 키 '36_2만km' → (36, 2.0)"""
+    period, _, mileage = key.partition('_')
+    try:
+        period_value = int(period)
+    except ValueError:
+        period_value = None
+    return period_value, parse_mileage(mileage)
+
+
+class ResolvedParams(NamedTuple):
+    """해석된 파라미터"""
+    params: Dict        # 사용할 파라미터
+    key: str            # 실제 사용한 조건 키 (예: '36_2만km')
+    provenance: str     # exact / same_period / nearest_period / nearest / interpolated / extrapolated
+
+    @property
+    def substituted(self) -> bool:
+        """요청과 다른 조건으로 대체되었는지"""
+        return self.provenance != EXACT
+
+
+def _distance(a: Optional[float], b: Optional[float]) -> float:
+    """조건 값 차이 (해석 불가한 값은 모두 같은 거리로 취급)"""
+    if a is None or b is None:
+        return 0.0
+    if a == b:
+        return 0.0
+    return abs(min(a, _UNLIMITED_DISTANCE_VALUE) - min(b, _UNLIMITED_DISTANCE_VALUE))
+
+
+class ParamIndex:
+    """금융사 파라미터 조건 해석 인덱스"""
+
+    def __init__(self, params: Dict):
+        """
+        Args:
+            params: model_params.json 내용 ({상품: {금융사: {조건키: 파라미터}}})
+        """
+        self._params = params
+        self._conditions = {}  # {(상품, 금융사): [(기간, 주행거리값, 조건키), ...]}
+        self._resolved = {}    # {(상품, 금융사, 기간, 주행거리): ResolvedParams 또는 None}
+        self._build()
+
+    def _build(self):
+        """전 금융사 × 상품별 기간·주행거리 격자 조건을 미리 해석"""
+        for product_type, companies in self._params.items():
+            if product_type == 'metadata' or not isinstance(companies, dict):
+                continue
+
+            periods = set()
+            mileages = {}  # {주행거리 라벨: 값}
+            for company, company_data in companies.items():
+                conditions = []
+                for key, params in company_data.items():
+                    period, mileage_value = parse_condition_key(key)
+                    conditions.append((period, mileage_value, key))
+                    if period is not None:
+                        periods.add(period)
+                    mileage_label = key.partition('_')[2]
+                    mileages.setdefault(mileage_label, mileage_value)
+                self._conditions[(product_type, company)] = conditions
+
+            for company in companies:
+                for period in periods:
+                    for mileage in mileages:
+                        self._resolved[(product_type, company, period, mileage)] = \
+                            self._resolve_uncached(product_type, company, period, mileage)
+
+    def _resolve_uncached(self, product_type: str, company: str, period: int,
+                          mileage: str) -> Optional[ResolvedParams]:
+        """대체 규칙에 따라 조건 해석"""
+        conditions = self._conditions.get((product_type, company))
+        if not conditions:
+            return None
+
+        company_data = self._params[product_type][company]
+        condition_key = f"{period}_{mileage}"
+        if condition_key in company_data:
+            return ResolvedParams(company_data[condition_key], condition_key, EXACT)
+
+        mileage_value = parse_mileage(mileage)
+        try:
+            period_value = int(period)
+        except (TypeError, ValueError):
+            period_value = None
+
+        def sort_key(condition):
+            cond_period, cond_mileage, _ = condition
+            return (
+                _distance(cond_period, period_value),
+                _distance(cond_mileage, mileage_value),
+                cond_period if cond_period is not None else 0,
+                cond_mileage if cond_mileage is not None else 0.0
+            )
+
+        cond_period, cond_mileage, key = min(conditions, key=sort_key)
+        if period_value is not None and cond_period == period_value:
+            provenance = SAME_PERIOD
+        elif mileage_value is not None and cond_mileage == mileage_value:
+            provenance = NEAREST_PERIOD
+        else:
+            provenance = NEAREST
+        return ResolvedParams(company_data[key], key, provenance)
+
+    def resolve(self, product_type: str, company: str, period: int,
+                mileage: str) -> Optional[ResolvedParams]:
+        """
+        조건에 맞는 파라미터 조회 (O(1))
+
+        Returns:
+            ResolvedParams 또는 None (상품/금융사가 없거나 조건이 하나도 없는 경우)
+        """
+        lookup = (product_type, company, period, mileage)
+        try:
+            return self._resolved[lookup]
+        except KeyError:
+            pass
+        except TypeError:
+            # 해시 불가능한 입력
+            return self._resolve_uncached(product_type, company, period, mileage)
+
+        resolved = self._resolve_uncached(product_type, company, period, mileage)
+        if len(self._resolved) < MAX_MEMO_SIZE:
+            self._resolved[lookup] = resolved
+        return resolved
@@ -0,0 +1,143 @@
+"""
+파라미터 스냅샷 모듈
+- 파라미터 파일(model_params.json, bnk_rv_tables.json)로 만든 컴파일 결과를 버전 붙은 스냅샷으로 관리
+- 파일이 바뀌면 새 스냅샷을 만들고 검증한 뒤 참조 하나만 바꿔 끼움 (검증 실패 시 기존 스냅샷 유지)
+- 읽기 쪽은 잠금 없이 current를 한 번 읽고, 그 스냅샷으로 계산을 끝까지 진행
+
+감시 스레드(start)를 켜면 확인과 재빌드는 모두 백그라운드에서 하고, 켜지 않으면 poll()이
+check_interval마다 호출한 스레드에서 확인한다 (배치 스크립트처럼 스레드를 띄우지 않는 경우).
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import metrics
+from quote_cache import file_signature
+
+
+class SnapshotManager:
+    """파일 감시 + 스냅샷 교체"""
+
+    def __init__(self, name: str, paths: Sequence[str], build: Callable[[int], object],
+                 check_interval: float = 1.0):
+        """
+        Args:
+            name: 계측 이름 접두어 (예: 'calculator')
+            paths: 감시할 파일 목록
+            build: 버전 번호 → 새 스냅샷 (잘못된 파일이면 예외, 첫 스냅샷의 예외는 그대로 전파)
+            check_interval: 파일 변경 확인 주기 (초)
+        """
+        self.name = name
+        self.paths = tuple(paths)
+        self.check_interval = check_interval
+        self._build = build
+
+        self._build_lock = threading.Lock()  # 재빌드 직렬화 (읽기 경로는 사용하지 않음)
+        self._signature = file_signature(self.paths)
+        self._next_check = time.monotonic() + check_interval
+        self._listeners = []  # [교체 후 호출할 함수(새 스냅샷)]
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.version = 1
+        self.current = build(self.version)  # 교체는 이 참조 대입 한 번뿐
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+    def subscribe(self, listener: Callable[[object], None]):
+        """교체 후 호출할 함수 등록 (예: 견적 캐시 비우기)"""
+        self._listeners.append(listener)
+
+    def check(self, force: bool = False) -> bool:
+        """
+        파일이 바뀌었으면 새 스냅샷을 만들어 교체
+
+        다른 스레드가 이미 재빌드 중이면 기다리지 않고 바로 반환한다.
+
+        Args:
+            force: 파일이 그대로여도 다시 빌드
+
+        Returns:
+            교체했으면 True
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            signature = file_signature(self.paths)
+            if signature == self._signature and not force:
+                return False
+
+            # 같은 파일로 실패를 반복하지 않도록 서명은 결과와 관계없이 갱신
+            self._signature = signature
+            try:
+                with metrics.span(f'{self.name}.snapshot.build'):
+                    snapshot = self._build(self.version + 1)
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                metrics.incr(f'{self.name}.snapshot.failed')
+                return False
+
+            self.version += 1
+            self.current = snapshot
+            self.reloads += 1
+            metrics.incr(f'{self.name}.snapshot.swapped')
+            for listener in self._listeners:
+                listener(snapshot)
+            return True
+        finally:
+            self._build_lock.release()
+
+    def poll(self) -> bool:
+        """
+        요청 경로용 변경 확인 (감시 스레드가 돌고 있으면 아무것도 하지 않음)
+
+        Returns:
+            교체했으면 True
+        """
+        if self._thread is not None:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        return self.check()
+
+    def start(self):
+        """백그라운드 감시 스레드 시작 (이미 실행 중이면 무시)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=f'{self.name}-snapshot-watch', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """감시 스레드 종료 (이후 poll()이 다시 확인을 맡음)"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def stats(self) -> Dict:
+        """스냅샷 상태"""
+        return {
+            'version': self.version,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'watching': self._thread is not None
+        }
+
+
+def is_finite_number(value) -> bool:
+    """bool이 아닌 유한한 int/float인지 (스냅샷 검증용)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
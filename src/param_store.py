@@ -0,0 +1,254 @@
+"""
+파라미터 저장소 (구조체 배열)
+- model_params.json의 금융사 × 조건 파라미터를 필드별 연속 배열(array)에 담고 행 번호로 조회
+- 금융사는 상품별 정수 코드(model_params.json 순서), 조건(기간, 주행거리)은 정수 조건 코드로 변환
+- 조건 해석(대체 규칙, 보간 곡면)은 상품 × 조건마다 한 번만 하고, 결과는 금융사 코드별 행 번호 표로 기억
+
+행 번호 표는 조건마다 전 금융사를 한 번에 담으므로, 금융사 전체 계산은 조건 조회 1회 후
+배열 인덱싱만 하면 된다. 배열 계산은 pack / gather로 같은 행을 numpy 배열로 읽는다.
+
+여러 스레드가 공유한다. 행과 해석 결과는 추가만 하고(잠금 안에서 직렬화) 지우거나 고치지 않으므로,
+이미 해석된 조건의 조회(lookup, condition)는 잠금 없이 읽는다. 조건 메모가 한도에 차면
+on_full로 소유자에게 알려 새 저장소로 교체하게 하고, 이 저장소는 진행 중인 계산이 끝날 때까지 그대로 둔다.
+"""
+
+import threading
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+from param_index import EXACT, EXTRAPOLATED, INTERPOLATED, MAX_MEMO_SIZE, ResolvedParams
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+FLOAT_FIELDS = ('base_rate', 'option_coefficient', 'residual_rate', 'base_rate_std', 'residual_rate_std')
+
+NO_ROW = -1
+
+# 조건 해석 결과 (금융사 코드별 행 번호 (없으면 NO_ROW), 금융사 코드별 provenance)
+ConditionRows = Tuple[array, Tuple[str, ...]]
+
+
+class ParamStore:
+    """금융사 파라미터 구조체 배열"""
+
+    def __init__(self, params: Dict,
+                 resolve: Callable[[str, str, int, str], Optional[ResolvedParams]],
+                 on_full: Optional[Callable[['ParamStore'], None]] = None):
+        """
+        Args:
+            params: model_params.json 내용 ({상품: {금융사: {조건키: 파라미터}}})
+            resolve: (상품, 금융사, 기간, 주행거리) → ResolvedParams 또는 None
+                     (대체 규칙·보간 곡면 해석, 상품 × 조건 × 금융사마다 한 번만 호출)
+            on_full: 조건 메모가 한도에 찼을 때 호출 (인자: 이 저장소, 소유자가 새 저장소로 교체)
+        """
+        self._resolve = resolve
+        self._on_full = on_full
+        self._lock = threading.Lock()  # 행·조건 추가 직렬화 (해석된 조건 조회는 잠금 없음)
+        self.full = False
+
+        # 행별 필드 (행 번호로 인덱싱)
+        self.base_rate = array('d')
+        self.option_coefficient = array('d')
+        self.residual_rate = array('d')
+        self.base_rate_std = array('d')
+        self.residual_rate_std = array('d')
+        self.sample_count = array('q')
+        self.row_keys = []      # 행별 조건 키 (예: '36_2만km')
+        self.row_params = []    # 행별 원본 파라미터 딕셔너리 (계산 상세 표시용, 수정하지 말 것)
+
+        self._companies = {}      # {상품: (금융사, ...)} 위치 = 금융사 코드
+        self._company_codes = {}  # {상품: {금융사: 코드}}
+        self._source_rows = {}    # {(상품, 금융사, 조건키): 행 번호} model_params.json 조건
+        self._condition_codes = {}  # {(기간, 주행거리): 조건 코드}
+        self._tables = {}         # {상품: [조건 코드별 ConditionRows 또는 None]}
+        self._build(params)
+
+        # 여기까지가 model_params.json 격자 조건 (이후 추가분은 MAX_MEMO_SIZE까지 메모)
+        self._base_conditions = len(self._condition_codes)
+
+    def _build(self, params: Dict):
+        """model_params.json 조건을 행으로 적재하고 격자 조건에 코드 부여"""
+        for product_type, companies in params.items():
+            if product_type == 'metadata' or not isinstance(companies, dict):
+                continue
+
+            self._companies[product_type] = tuple(companies)
+            self._company_codes[product_type] = {company: code for code, company in enumerate(companies)}
+            self._tables[product_type] = []
+
+            periods = []
+            mileages = []
+            for company, company_data in companies.items():
+                for key, condition in company_data.items():
+                    self._source_rows[(product_type, company, key)] = self._append_row(key, condition)
+                    period, _, mileage = key.partition('_')
+                    if period not in periods:
+                        periods.append(period)
+                    if mileage not in mileages:
+                        mileages.append(mileage)
+
+            # ParamIndex와 같은 격자 (상품의 모든 기간 × 모든 주행거리)
+            for period in periods:
+                try:
+                    period_value = int(period)
+                except ValueError:
+                    continue
+                for mileage in mileages:
+                    self._condition_codes.setdefault((period_value, mileage), len(self._condition_codes))
+
+    def _append_row(self, key: str, params: Dict) -> int:
+        """파라미터 1행 추가 → 행 번호 (생성 중이거나 잠금 안에서만 호출)"""
+        self.base_rate.append(params['base_rate'])
+        self.option_coefficient.append(params['option_coefficient'])
+        self.residual_rate.append(params['residual_rate'])
+        self.base_rate_std.append(params.get('base_rate_std', 0.0))
+        self.residual_rate_std.append(params.get('residual_rate_std', 0.0))
+        self.sample_count.append(params.get('sample_count', 0))
+        self.row_keys.append(key)
+        self.row_params.append(params)
+        return len(self.row_keys) - 1
+
+    def _resolve_condition(self, product_type: str, period: int, mileage: str) -> ConditionRows:
+        """상품 × 조건의 전 금융사 해석 (잠금 안에서만 호출)"""
+        rows = array('i')
+        provenances = []
+        for company in self._companies.get(product_type, ()):
+            resolved = self._resolve(product_type, company, period, mileage)
+            if resolved is None or not resolved.params:
+                rows.append(NO_ROW)
+                provenances.append(EXACT)
+                continue
+            row = None
+            if resolved.provenance not in (INTERPOLATED, EXTRAPOLATED):
+                row = self._source_rows.get((product_type, company, resolved.key))
+            if row is None:
+                row = self._append_row(resolved.key, resolved.params)
+            rows.append(row)
+            provenances.append(resolved.provenance)
+        return rows, tuple(provenances)
+
+    def companies(self, product_type: str) -> Tuple[str, ...]:
+        """상품의 금융사 목록 (위치 = 금융사 코드)"""
+        return self._companies.get(product_type, ())
+
+    def company_code(self, product_type: str, company: str) -> int:
+        """금융사 코드 (없으면 -1)"""
+        codes = self._company_codes.get(product_type)
+        if codes is None:
+            return -1
+        return codes.get(company, -1)
+
+    def condition_code(self, period: int, mileage: str) -> Optional[int]:
+        """
+        조건 코드 (처음 보는 조건이면 새 코드 부여)
+
+        Returns:
+            조건 코드 또는 None (해시 불가능한 입력, 조건 메모가 한도에 찬 경우)
+        """
+        condition = (period, mileage)
+        try:
+            code = self._condition_codes.get(condition)
+        except TypeError:
+            return None
+        if code is None:
+            with self._lock:
+                code = self._condition_codes.get(condition)
+                if code is None:
+                    if len(self._condition_codes) >= self._base_conditions + MAX_MEMO_SIZE:
+                        self.full = True
+                        return None
+                    code = len(self._condition_codes)
+                    self._condition_codes[condition] = code
+        return code
+
+    def condition(self, product_type: str, period: int, mileage: str) -> ConditionRows:
+        """
+        조건의 금융사 코드별 (행 번호, provenance) (상품 × 조건마다 1회 해석)
+
+        Returns:
+            (array('i') 행 번호 (없으면 NO_ROW), provenance 튜플), 없는 상품이면 빈 표
+        """
+        table = self._tables.get(product_type)
+        if table is None:
+            return array('i'), ()
+
+        code = self.condition_code(period, mileage)
+        if code is None:
+            # 메모하지 않고 해석 (한도에 찼으면 소유자가 새 저장소로 교체)
+            if self.full and self._on_full is not None:
+                self._on_full(self)
+            with self._lock:
+                return self._resolve_condition(product_type, period, mileage)
+
+        if code < len(table):
+            entry = table[code]
+            if entry is not None:
+                return entry
+
+        with self._lock:
+            if code >= len(table):
+                table.extend([None] * (code + 1 - len(table)))
+            entry = table[code]
+            if entry is None:
+                entry = self._resolve_condition(product_type, period, mileage)
+                table[code] = entry  # 완성된 해석 결과만 공개
+        return entry
+
+    def lookup(self, product_type: str, company: str, period: int, mileage: str) -> Tuple[int, str]:
+        """
+        금융사 1곳의 (행 번호, provenance)
+
+        Returns:
+            (행 번호 또는 NO_ROW, provenance)
+        """
+        try:
+            code = self._company_codes[product_type][company]
+            entry = self._tables[product_type][self._condition_codes[(period, mileage)]]
+        except (KeyError, IndexError, TypeError):
+            entry = None
+        if entry is None:
+            code = self.company_code(product_type, company)
+            if code < 0:
+                return NO_ROW, EXACT
+            entry = self.condition(product_type, period, mileage)
+        return entry[0][code], entry[1][code]
+
+    def resolved(self, row: int, provenance: str) -> ResolvedParams:
+        """행을 ResolvedParams로 (param_index와 같은 형식)"""
+        return ResolvedParams(self.row_params[row], self.row_keys[row], provenance)
+
+    def gather(self, rows: Sequence[int], fields: Sequence[str] = FLOAT_FIELDS[:3]) -> 'np.ndarray':
+        """
+        행 번호 목록의 필드 행렬
+
+        Args:
+            rows: 행 번호 (NO_ROW 없이)
+            fields: FLOAT_FIELDS 중 읽을 필드 (열 순서)
+
+        Returns:
+            len(rows) × len(fields) float64 배열 (저장소와 메모리를 공유하지 않는 복사본)
+        """
+        import numpy as np
+
+        index = np.frombuffer(array('i', rows), dtype=np.intc)
+        matrix = np.empty((len(index), len(fields)), dtype=np.float64)
+        # frombuffer 뷰가 있는 동안 다른 스레드가 행을 추가하면 BufferError이므로 잠금 안에서 읽음
+        with self._lock:
+            for i, field in enumerate(fields):
+                matrix[:, i] = np.frombuffer(getattr(self, field), dtype=np.float64)[index]
+        return matrix
+
+    def pack(self, product_type: str, period: int, mileage: str,
+             fields: Sequence[str] = FLOAT_FIELDS[:3]) -> Tuple[List[str], 'np.ndarray']:
+        """
+        조건의 파라미터가 있는 금융사 목록과 필드 행렬
+
+        Returns:
+            (금융사 목록, 금융사 수 × len(fields) float64 배열)
+        """
+        rows, _ = self.condition(product_type, period, mileage)
+        companies = self._companies.get(product_type, ())
+        present = [(company, row) for company, row in zip(companies, rows) if row != NO_ROW]
+        return [company for company, _ in present], self.gather([row for _, row in present], fields)
@@ -0,0 +1,311 @@
+"""
+파라미터 보간 곡면 모듈
+- 금융사별 (기간, 연간 주행거리) → base_rate / option_coefficient / residual_rate 곡면
+- 로드 시점에 12~72개월(월 단위) × 1만~4만km(0.5만 단위) 격자를 한 번에 계산해 두고, 조회는 격자 인덱싱
+
+곡면 = 추세 평면 + 잔차 보간
+    추세 평면: 값 = a + b×기간 + c×주행거리 (최소제곱). 금융사 데이터로 기울기를 정할 수 없는 축은
+              같은 상품 금융사 기울기의 중앙값 사용
+    잔차 보간: 실제 조건값과 추세 평면의 차이를 주행거리 방향 → 기간 방향 순으로 선형 보간
+              (데이터 범위 밖은 가장 가까운 잔차 유지)
+따라서 model_params.json에 있는 조건에서는 원래 값과 같고, 범위 밖은 추세를 따라 외삽된다.
+
+외삽 제한 (금융사별)
+    - 각 필드는 금융사 관측값의 최소~최대로 제한
+    - 관측 범위 밖 셀의 월납입금 계수(base_rate × 잔가율 조정)는 경계 관측 조건에서 바깥으로 갈수록
+      마지막 관측 구간과 같은 방향으로만 움직이고(단조), 변화량은 그 구간 1단계 변화량 이내 (base_rate로 조정)
+    - 결과가 validate_params 범위(base_rate > 0, 0 ≤ residual_rate ≤ 1) 밖이면 곡면 값 없음 (대체 규칙 사용)
+"""
+
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from param_index import (
+    EXTRAPOLATED, INTERPOLATED, ResolvedParams, parse_condition_key, parse_mileage
+)
+
+
+SURFACE_FIELDS = ('base_rate', 'option_coefficient', 'residual_rate')
+
+# 격자 범위
+SURFACE_PERIODS = np.arange(12, 73)                 # 12~72개월
+MILEAGE_STEP = 0.5
+SURFACE_MILEAGES = np.arange(1.0, 4.0 + 1e-9, MILEAGE_STEP)  # 1만~4만km
+
+MAX_MEMO_SIZE = 4096
+
+BASE_RATE = SURFACE_FIELDS.index('base_rate')
+RESIDUAL_RATE = SURFACE_FIELDS.index('residual_rate')
+
+Adjustment = Callable[[np.ndarray], np.ndarray]  # 잔가율 → 잔가율 조정 계수 (calculator.residual_adjustment)
+
+
+def _interp_weights(x: np.ndarray, xp: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    정렬된 xp에서 x의 선형 보간 위치 (범위 밖은 양 끝으로 고정)
+
+    Returns:
+        (왼쪽 인덱스, 오른쪽 인덱스, 오른쪽 가중치)
+    """
+    if len(xp) == 1:
+        zeros = np.zeros(len(x), dtype=np.int64)
+        return zeros, zeros, np.zeros(len(x))
+    x = np.clip(x, xp[0], xp[-1])
+    hi = np.clip(np.searchsorted(xp, x, side='right'), 1, len(xp) - 1)
+    lo = hi - 1
+    weight = (x - xp[lo]) / (xp[hi] - xp[lo])
+    return lo, hi, weight
+
+
+def _bound_axis(grid: np.ndarray, axis: int, coords: np.ndarray, observed: Sequence[float],
+                adjustment: Adjustment):
+    """
+    한 축 방향으로 관측 범위 밖 셀의 월납입금 계수를 단조·1단계 이내로 제한 (grid 직접 수정)
+
+    Args:
+        grid: 기간 × 주행거리 × 필드 격자
+        axis: 0 (기간) 또는 1 (주행거리)
+        coords: 해당 축 격자 좌표
+        observed: 금융사 관측 좌표 (오름차순)
+    """
+    cells = np.moveaxis(grid, axis, 0)
+    indices = [int(np.abs(coords - value).argmin()) for value in observed]
+    inner_high = indices[-2] if len(indices) > 1 else None
+    inner_low = indices[1] if len(indices) > 1 else None
+
+    for edge, inner, outward in ((indices[-1], inner_high, range(indices[-1] + 1, len(coords))),
+                                 (indices[0], inner_low, range(indices[0] - 1, -1, -1))):
+        edge_factor = cells[edge, :, BASE_RATE] * adjustment(cells[edge, :, RESIDUAL_RATE])
+        if inner is None:
+            bound = edge_factor
+        else:
+            inner_factor = cells[inner, :, BASE_RATE] * adjustment(cells[inner, :, RESIDUAL_RATE])
+            bound = 2 * edge_factor - inner_factor
+
+        previous = edge_factor
+        for k in outward:
+            unit = adjustment(cells[k, :, RESIDUAL_RATE])
+            factor = np.clip(cells[k, :, BASE_RATE] * unit,
+                             np.minimum(previous, bound), np.maximum(previous, bound))
+            cells[k, :, BASE_RATE] = factor / unit
+            previous = factor
+
+
+class _CompanySurface:
+    """금융사 1곳의 곡면 (조건점 → 격자)"""
+
+    def __init__(self, periods: np.ndarray, mileages: np.ndarray, values: np.ndarray,
+                 default_slopes: np.ndarray):
+        """
+        Args:
+            periods, mileages: 조건점 (n)
+            values: 조건점 값 (n × 필드 수)
+            default_slopes: 기울기를 정할 수 없을 때 쓸 (기간, 주행거리) 기울기 (2 × 필드 수)
+        """
+        self.period_range = (periods.min(), periods.max())
+        self.mileage_range = (mileages.min(), mileages.max())
+
+        self.slopes = self.fit_slopes(periods, mileages, values, default_slopes)
+        trend = periods[:, None] * self.slopes[0] + mileages[:, None] * self.slopes[1]
+        self.intercept = (values - trend).mean(axis=0)
+        residuals = values - trend - self.intercept
+
+        # 기간별 잔차 행 (주행거리 오름차순)
+        self.row_periods = np.unique(periods)
+        self.rows = []
+        for period in self.row_periods:
+            mask = periods == period
+            order = np.argsort(mileages[mask])
+            self.rows.append((mileages[mask][order], residuals[mask][order]))
+
+    @staticmethod
+    def fit_slopes(periods: np.ndarray, mileages: np.ndarray, values: np.ndarray,
+                   default_slopes: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        (기간, 주행거리) 기울기 최소제곱 추정
+
+        Returns:
+            2 × 필드 수 배열. default_slopes가 None이고 정할 수 없는 축이 있으면 해당 축은 NaN
+        """
+        axes = []
+        if len(np.unique(periods)) > 1:
+            axes.append(0)
+        if len(np.unique(mileages)) > 1:
+            axes.append(1)
+
+        slopes = np.full((2, values.shape[1]), np.nan)
+        if default_slopes is not None:
+            slopes[:] = default_slopes
+
+        # 정할 수 없는 축은 고정 기울기만큼 빼고 나머지 축만 추정
+        fixed = [axis for axis in (0, 1) if axis not in axes]
+        inputs = np.column_stack([periods, mileages]).astype(np.float64)
+        target = values.astype(np.float64)
+        for axis in fixed:
+            if default_slopes is not None:
+                target = target - inputs[:, axis:axis + 1] * default_slopes[axis]
+
+        if axes:
+            design = np.column_stack([np.ones(len(periods))] + [inputs[:, axis] for axis in axes])
+            coef, _, rank, _ = np.linalg.lstsq(design, target, rcond=None)
+            if rank == design.shape[1]:
+                for i, axis in enumerate(axes):
+                    slopes[axis] = coef[i + 1]
+            elif default_slopes is None:
+                # 두 축이 같이 움직이는 경우 (예: 24_1만, 36_2만만 있음): 분리 불가
+                slopes[:] = np.nan
+        return slopes
+
+    def evaluate(self, periods: np.ndarray, mileages: np.ndarray) -> np.ndarray:
+        """조건점 목록의 곡면 값 (k × 필드 수)"""
+        trend = self.intercept + periods[:, None] * self.slopes[0] + mileages[:, None] * self.slopes[1]
+
+        # 주행거리 방향 보간 (기간 행마다)
+        row_values = np.empty((len(self.rows), len(periods), trend.shape[1]))
+        for i, (row_mileages, row_residuals) in enumerate(self.rows):
+            lo, hi, weight = _interp_weights(mileages, row_mileages)
+            row_values[i] = row_residuals[lo] * (1 - weight[:, None]) + row_residuals[hi] * weight[:, None]
+
+        # 기간 방향 보간
+        lo, hi, weight = _interp_weights(periods.astype(np.float64), self.row_periods.astype(np.float64))
+        index = np.arange(len(periods))
+        residual = row_values[lo, index] * (1 - weight[:, None]) + row_values[hi, index] * weight[:, None]
+        return trend + residual
+
+
+class ParamSurface:
+    """상품 × 금융사 파라미터 곡면"""
+
+    def __init__(self, params: Dict, adjustment: Adjustment):
+        """
+        Args:
+            params: model_params.json 내용 ({상품: {금융사: {조건키: 파라미터}}})
+            adjustment: 잔가율 조정 계수 함수 (외삽 제한의 월납입금 계수 계산용)
+        """
+        self._adjustment = adjustment
+        self._grids = {}     # {(상품, 금융사): (격자 값 (기간 × 주행거리 × 필드, 범위 밖 무효 셀은 NaN), 기간 범위, 주행거리 범위)}
+        self._resolved = {}  # {(상품, 금융사, 기간, 주행거리): ResolvedParams 또는 None}
+        self._build(params)
+
+    def _build(self, params: Dict):
+        """금융사별 곡면을 격자로 계산"""
+        grid_periods, grid_mileages = np.meshgrid(SURFACE_PERIODS.astype(np.float64), SURFACE_MILEAGES,
+                                                  indexing='ij')
+        grid_periods = grid_periods.ravel()
+        grid_mileages = grid_mileages.ravel()
+
+        for product_type, companies in params.items():
+            if product_type == 'metadata' or not isinstance(companies, dict):
+                continue
+
+            points = {}
+            for company, company_data in companies.items():
+                rows = []
+                for key, condition in company_data.items():
+                    period, mileage = parse_condition_key(key)
+                    if period is None or mileage is None or not np.isfinite(mileage):
+                        continue
+                    rows.append((period, mileage) + tuple(condition[field] for field in SURFACE_FIELDS))
+                if rows:
+                    points[company] = np.array(rows, dtype=np.float64)
+
+            # 상품 공통 기울기 (금융사별 추정값의 중앙값)
+            company_slopes = np.array([
+                _CompanySurface.fit_slopes(rows[:, 0], rows[:, 1], rows[:, 2:], None)
+                for rows in points.values()
+            ])
+            default_slopes = np.nan_to_num(np.nanmedian(company_slopes, axis=0)) \
+                if len(company_slopes) else np.zeros((2, len(SURFACE_FIELDS)))
+
+            for company, rows in points.items():
+                surface = _CompanySurface(rows[:, 0], rows[:, 1], rows[:, 2:], default_slopes)
+                values = surface.evaluate(grid_periods, grid_mileages)
+                grid = values.reshape(len(SURFACE_PERIODS), len(SURFACE_MILEAGES), len(SURFACE_FIELDS))
+                self._grids[(product_type, company)] = (self._bound(grid, rows), surface.period_range,
+                                                        surface.mileage_range)
+
+    def _bound(self, grid: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        외삽 제한 (모듈 설명 참고)
+
+        Args:
+            grid: 곡면 격자 (기간 × 주행거리 × 필드)
+            rows: 금융사 조건점 ([기간, 주행거리, 필드...] × n)
+        """
+        observed = rows[:, 2:]
+        grid = np.clip(grid, observed.min(axis=0), observed.max(axis=0))
+
+        _bound_axis(grid, 1, SURFACE_MILEAGES, np.unique(rows[:, 1]), self._adjustment)
+        _bound_axis(grid, 0, SURFACE_PERIODS.astype(np.float64), np.unique(rows[:, 0]), self._adjustment)
+
+        residual_rate = grid[:, :, RESIDUAL_RATE]
+        valid = (np.isfinite(grid).all(axis=2) & (grid[:, :, BASE_RATE] > 0)
+                 & (residual_rate >= 0) & (residual_rate <= 1))
+        grid[~valid] = np.nan
+        return grid
+
+    def lookup(self, product_type: str, company: str, period: int, mileage: float) -> Optional[np.ndarray]:
+        """
+        격자 조회 (주행거리가 격자 사이면 선형 보간)
+
+        Args:
+            mileage: 만km 단위 숫자
+
+        Returns:
+            [base_rate, option_coefficient, residual_rate] 또는 None (범위 밖, 외삽 제한 검증 실패)
+        """
+        entry = self._grids.get((product_type, company))
+        if entry is None:
+            return None
+        grid = entry[0]
+
+        period_index = int(period) - int(SURFACE_PERIODS[0])
+        if period_index != period - SURFACE_PERIODS[0] or not 0 <= period_index < len(SURFACE_PERIODS):
+            return None
+        if not SURFACE_MILEAGES[0] <= mileage <= SURFACE_MILEAGES[-1]:
+            return None
+
+        position = (mileage - SURFACE_MILEAGES[0]) / MILEAGE_STEP
+        lo = int(position)
+        weight = position - lo
+        if weight == 0 or lo + 1 >= len(SURFACE_MILEAGES):
+            values = grid[period_index, lo]
+        else:
+            values = grid[period_index, lo] * (1 - weight) + grid[period_index, lo + 1] * weight
+        return values if np.isfinite(values).all() else None
+
+    def resolve(self, product_type: str, company: str, period: int,
+                mileage: str) -> Optional[ResolvedParams]:
+        """
+        곡면에서 파라미터 조회
+
+        Returns:
+            ResolvedParams (provenance: interpolated / extrapolated) 또는 None (금융사 없음, 격자 범위 밖,
+            외삽 제한 검증 실패)
+        """
+        lookup = (product_type, company, period, mileage)
+        try:
+            return self._resolved[lookup]
+        except KeyError:
+            pass
+        except TypeError:
+            return None
+
+        resolved = None
+        mileage_value = parse_mileage(mileage)
+        if mileage_value is not None and isinstance(period, (int, float, np.integer)):
+            values = self.lookup(product_type, company, period, mileage_value)
+            if values is not None:
+                _, period_range, mileage_range = self._grids[(product_type, company)]
+                inside = (period_range[0] <= period <= period_range[1]
+                          and mileage_range[0] <= mileage_value <= mileage_range[1])
+                params = {'period': int(period), 'mileage': mileage}
+                params.update({field: float(value) for field, value in zip(SURFACE_FIELDS, values)})
+                params['sample_count'] = 0
+                resolved = ResolvedParams(params, f"{int(period)}_{mileage}",
+                                          INTERPOLATED if inside else EXTRAPOLATED)
+
+        if len(self._resolved) < MAX_MEMO_SIZE:
+            self._resolved[lookup] = resolved
+        return resolved
@@ -0,0 +1,111 @@
+"""
+견적 캐시 모듈
+- 정규화된 견적 입력을 키로 하는 LRU + TTL 캐시
+- 파라미터 스냅샷이 교체되면 무효화 (SnapshotManager.subscribe)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+def file_signature(paths: Iterable[str]) -> Tuple:
+    """파일 변경 감지용 서명 ((경로, 수정시각, 크기), ...)"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def normalize_quote_key(*values) -> Tuple:
+    """
+    견적 입력을 캐시 키로 정규화
+
+    정수/실수 표현 차이(10 vs 10.0)와 부동소수 오차(1.3 / 100)를 같은 키로 맞춘다.
+    """
+    key = []
+    for value in values:
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            key.append(value)
+        elif hasattr(value, '__float__'):
+            key.append(round(float(value), 10))
+        else:
+            key.append(value)
+    return tuple(key)
+
+
+class QuoteCache:
+    """LRU + TTL 견적 캐시 (스레드 안전)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        """
+        Args:
+            maxsize: 최대 항목 수 (초과 시 가장 오래 사용하지 않은 항목 제거)
+            ttl: 항목 유효 시간 (초)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # {키: (만료시각, 값)}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        """파라미터가 바뀌어 캐시 비우기 (통계에 무효화 횟수 기록)"""
+        self.clear()
+        self.invalidations += 1
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """캐시 조회 (없거나 만료되면 None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: object):
+        """캐시 저장"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """캐시 비우기"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """캐시 통계"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
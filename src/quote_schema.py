@@ -0,0 +1,250 @@
+"""
+견적 시트 금융사 블록 스키마
+- lease.xlsx / rent.xlsx 시트의 금융사 블록(1st, 2nd, ... 14th) 배치를 시트마다 한 번 해석·검증하고,
+  전 차량 × 금융사 × 상품유형(무보증/보증금/선수금)을 긴 형식 표로 한 번에 추출
+- 배치가 예상과 다르면 값을 조용히 버리지 않고 QuoteLayoutError 발생
+
+블록 배치 (금융사 컬럼 기준 오프셋):
+    무보증: 회사명 +0, 월대여료옵션0 +1, 옵션500 +2, 딜러오프셋 +3, 인수가격 +5, Fee오프셋 +6, 1fee +7
+    보증금: 회사명 +11, 월대여료옵션0 +12, 옵션500 +13, 0ref +14, 500ref +15, 딜러오프셋 +16,
+            인수가격 +18, Fee오프셋 +19, 1fee +20
+    선수금: 보증금 + 13
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+class QuoteLayoutError(ValueError):
+    """견적 시트의 금융사 블록 배치가 스키마와 다름"""
+
+
+# 금융사 블록 시작 컬럼 (헤더에 1st ~ 14th 포함)
+ORDINAL_PATTERN = re.compile(r'1st|2nd|3rd|1[0-4]th|[4-9]th')
+
+# 차량 키 컬럼
+CAR_ID_COLUMN = '겟차번호'
+
+# 긴 형식 표의 값 필드 (상품유형에 없는 필드는 NaN)
+VALUE_FIELDS = (
+    'monthly_0', 'monthly_500', 'monthly_0_ref', 'monthly_500_ref',
+    'dealer_offset', 'acquisition_price', 'fee_offset', 'fee_1',
+)
+
+# 상품유형별 {필드: 블록 시작 기준 오프셋} (company는 회사명 컬럼)
+SECTION_LAYOUTS = {
+    '무보증': {
+        'company': 0,
+        'monthly_0': 1,             # 무보증월대여료옵션0
+        'monthly_500': 2,           # 무보증월대여료옵션500
+        'dealer_offset': 3,         # 무보증딜러오프셋
+        'acquisition_price': 5,     # 무보증인수가격
+        'fee_offset': 6,            # 무보증Fee오프셋
+        'fee_1': 7,                 # 무보증1fee
+    },
+    '보증금': {
+        'company': 11,              # 보증금회사명
+        'monthly_0': 12,            # 보증금월대여료옵션0
+        'monthly_500': 13,          # 보증금월대여료옵션500
+        'monthly_0_ref': 14,        # 월대여료옵션0ref
+        'monthly_500_ref': 15,      # 월대여료옵션500ref
+        'dealer_offset': 16,        # 보증금딜러오프셋
+        'acquisition_price': 18,    # 보증금인수가격
+        'fee_offset': 19,           # 보증금Fee오프셋
+        'fee_1': 20,                # 보증금1fee
+    },
+    '선수금': {
+        'company': 24,              # 선수금회사명
+        'monthly_0': 25,            # 선수금월대여료옵션0
+        'monthly_500': 26,          # 선수금월대여료옵션500
+        'monthly_0_ref': 27,        # 월대여료옵션0ref
+        'monthly_500_ref': 28,      # 월대여료옵션500ref
+        'dealer_offset': 29,        # 선수금딜러오프셋
+        'acquisition_price': 31,    # 선수금인수가격
+        'fee_offset': 32,           # 선수금Fee오프셋
+        'fee_1': 33,                # 선수금1fee
+    },
+}
+
+# 블록마다 반드시 있어야 하는 상품유형
+REQUIRED_SECTION = '무보증'
+
+# 긴 형식 표 컬럼 순서
+TABLE_COLUMNS = ('row', 'id_cargrade', 'rank', 'type', 'company') + VALUE_FIELDS
+
+
+def _section_span(section: str) -> int:
+    """상품유형이 차지하는 블록 앞부분 폭"""
+    return max(SECTION_LAYOUTS[section].values()) + 1
+
+
+class QuoteSchema(NamedTuple):
+    """시트 1개 배치에서 해석한 금융사 블록 스키마"""
+    block_starts: Tuple[int, ...]        # 금융사 블록 시작 컬럼 위치 (1st, 2nd, ... 순)
+    sections: Tuple[str, ...]            # 블록 폭에 들어가는 상품유형
+    car_id_position: Optional[int]       # 겟차번호 컬럼 위치
+    width: int                           # 시트 컬럼 수
+
+    def extract(self, df: 'pd.DataFrame') -> 'pd.DataFrame':
+        """
+        시트 → 긴 형식 표 (행 = 차량 × 금융사 × 상품유형, 회사명이 빈 조합은 제외)
+
+        Returns:
+            TABLE_COLUMNS 순서의 DataFrame
+            (row: 시트 행 위치, rank: 금융사 순번 1~, 값 필드는 숫자로 변환, 변환 불가는 NaN)
+        """
+        import numpy as np
+        import pandas as pd
+
+        if df.shape[1] != self.width:
+            raise QuoteLayoutError(f"스키마 컬럼 수({self.width})와 시트 컬럼 수({df.shape[1]})가 다릅니다")
+
+        values = df.to_numpy(dtype=object)
+        n_rows, n_blocks = len(values), len(self.block_starts)
+        starts = np.asarray(self.block_starts, dtype=np.int64)
+        car_ids = values[:, self.car_id_position] if self.car_id_position is not None \
+            else np.full(n_rows, None, dtype=object)
+
+        def named(section: str) -> Tuple['np.ndarray', 'np.ndarray']:
+            companies = values[:, starts + SECTION_LAYOUTS[section]['company']]
+            return companies, ~pd.isna(companies) & (companies != "")
+
+        # 무보증 회사명이 빈 블록은 블록 전체가 빈 것으로 봄
+        _, block_present = named(REQUIRED_SECTION)
+
+        parts = []
+        for section in self.sections:
+            layout = SECTION_LAYOUTS[section]
+
+            # (행, 블록) 회사명 → 비어 있지 않은 조합만
+            companies, present = named(section)
+            rows, blocks = np.nonzero(present & block_present)
+            if len(rows) == 0:
+                continue
+
+            part = {
+                'row': rows,
+                'id_cargrade': car_ids[rows],
+                'rank': blocks + 1,
+                'type': np.full(len(rows), section, dtype=object),
+                'company': companies[rows, blocks],
+            }
+            fields = [field for field in VALUE_FIELDS if field in layout]
+            offsets = np.array([layout[field] for field in fields], dtype=np.int64)
+            # (조합, 필드) 값을 한 번에 인덱싱
+            cells = values[rows[:, None], starts[blocks][:, None] + offsets]
+            numeric = pd.to_numeric(pd.Series(cells.ravel()), errors='coerce').to_numpy(dtype=np.float64)
+            numeric = numeric.reshape(cells.shape)
+            for j, field in enumerate(fields):
+                part[field] = numeric[:, j]
+            for field in VALUE_FIELDS:
+                if field not in part:
+                    part[field] = np.full(len(rows), np.nan)
+            parts.append(pd.DataFrame(part, columns=TABLE_COLUMNS))
+
+        if not parts:
+            return pd.DataFrame({column: pd.Series(dtype=object) for column in TABLE_COLUMNS})
+
+        table = pd.concat(parts, ignore_index=True)
+        # 시트 행 → 금융사 순번 → 상품유형 순서 (행별 파싱 결과와 같은 순서)
+        section_order = {section: i for i, section in enumerate(self.sections)}
+        order = np.lexsort((table['type'].map(section_order).to_numpy(),
+                            table['rank'].to_numpy(), table['row'].to_numpy()))
+        return table.iloc[order].reset_index(drop=True)
+
+    def extract_row(self, values: Sequence) -> List[List[Dict]]:
+        """
+        차량 1행 → 금융사별 [상품유형 딕셔너리, ...] 목록 (extract와 같은 규칙, DataFrame 생성 없이)
+        """
+        import pandas as pd
+
+        if len(values) != self.width:
+            raise QuoteLayoutError(f"스키마 컬럼 수({self.width})와 행 길이({len(values)})가 다릅니다")
+
+        blocks = []
+        for start in self.block_starts:
+            entries = []
+            for section in self.sections:
+                layout = SECTION_LAYOUTS[section]
+                company = values[start + layout['company']]
+                if pd.isna(company) or company == "":
+                    if section == REQUIRED_SECTION:
+                        break
+                    continue
+                entry = {'company': company, 'type': section}
+                for field in VALUE_FIELDS:
+                    if field in layout:
+                        entry[field] = _to_float(values[start + layout[field]])
+                entries.append(entry)
+            if entries:
+                blocks.append(entries)
+        return blocks
+
+
+def _to_float(value) -> float:
+    """셀 값 → float (변환 불가는 NaN, pd.to_numeric(errors='coerce')와 같은 규칙)"""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    return float(pd.to_numeric(pd.Series([value]), errors='coerce').iloc[0])
+
+
+def _ordinal_number(label: str) -> int:
+    return int(re.match(r'\d+', ORDINAL_PATTERN.search(label).group()).group())
+
+
+def compile_schema(columns: Sequence, sheet_name: str = "") -> QuoteSchema:
+    """
+    시트 컬럼명에서 금융사 블록 배치를 해석하고 검증
+
+    Args:
+        columns: 시트 컬럼명 (pd.read_excel 헤더)
+        sheet_name: 오류 메시지용 시트명
+
+    Raises:
+        QuoteLayoutError: 블록이 없거나, 순번이 1st부터 연속되지 않거나, 블록 간격이 다르거나,
+                          블록이 무보증 폭보다 좁거나, 마지막 블록이 잘린 경우
+    """
+    where = f" ({sheet_name})" if sheet_name else ""
+    columns = list(columns)
+
+    starts = [i for i, column in enumerate(columns)
+              if isinstance(column, str) and ORDINAL_PATTERN.search(column)]
+    if not starts:
+        raise QuoteLayoutError(f"금융사 블록(1st, 2nd, ...) 컬럼이 없습니다{where}")
+
+    ordinals = [_ordinal_number(columns[i]) for i in starts]
+    if ordinals != list(range(1, len(starts) + 1)):
+        expected = list(range(1, len(starts) + 1))
+        position = next(i for i, (got, want) in enumerate(zip(ordinals, expected)) if got != want)
+        raise QuoteLayoutError(
+            f"금융사 블록 순번이 1st부터 연속되지 않습니다{where}: "
+            f"{position + 1}번째 블록 컬럼 '{columns[starts[position]]}'"
+        )
+
+    # 블록 폭: 블록 간격 (블록이 1개면 시트 끝까지)
+    strides = {b - a for a, b in zip(starts, starts[1:])}
+    if len(strides) > 1:
+        raise QuoteLayoutError(f"금융사 블록 간격이 일정하지 않습니다{where}: {sorted(strides)}")
+    stride = strides.pop() if strides else len(columns) - starts[0]
+
+    if stride < _section_span(REQUIRED_SECTION):
+        raise QuoteLayoutError(
+            f"금융사 블록 폭({stride})이 {REQUIRED_SECTION} 필드 수({_section_span(REQUIRED_SECTION)})보다 작습니다{where}"
+        )
+    sections = tuple(section for section in SECTION_LAYOUTS if _section_span(section) <= stride)
+    needed = max(_section_span(section) for section in sections)
+    if starts[-1] + needed > len(columns):
+        raise QuoteLayoutError(
+            f"마지막 금융사 블록({columns[starts[-1]]})이 잘렸습니다{where}: "
+            f"필요 {needed}개 컬럼, 남은 {len(columns) - starts[-1]}개"
+        )
+
+    car_id_position = columns.index(CAR_ID_COLUMN) if CAR_ID_COLUMN in columns else None
+    return QuoteSchema(tuple(starts), sections, car_id_position, len(columns))
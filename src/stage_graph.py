@@ -0,0 +1,209 @@
+"""
+단계 그래프 계산 모듈
+- 계산을 이름 붙은 중간값을 주고받는 단계들로 나누고, 단계마다 직전 입력과 결과를 기억
+- 입력 하나만 바뀌면 그 값을 (직접 또는 중간값을 거쳐) 읽는 단계만 다시 계산
+- 계산 과정 텍스트(CalcTrace 기록)도 구간별로 기억해, 값이 바뀐 구간만 다시 기록
+"""
+
+from itertools import chain
+from operator import itemgetter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import metrics
+from calc_trace import CalcTrace
+
+
+class Stage(NamedTuple):
+    """계산 단계 (compute(*입력값) → 출력값 튜플, 출력 순서는 outputs와 같음)"""
+    name: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    compute: Callable
+
+
+class Section(NamedTuple):
+    """계산 과정 구간 (describe(steps, *입력값)으로 CalcTrace에 기록)"""
+    name: str
+    inputs: Tuple[str, ...]
+    describe: Callable
+
+
+def _args_getter(names: Tuple[str, ...]) -> Callable:
+    """{이름: 값} → 입력값 튜플"""
+    if len(names) == 1:
+        name = names[0]
+        return lambda values: (values[name],)
+    return itemgetter(*names)
+
+
+class StageGraph:
+    """단계 목록 (정의 순서가 곧 계산 순서, 세션끼리 공유하는 불변 정의)"""
+
+    def __init__(self, prefix: str, stages: Sequence[Stage], sections: Sequence[Section] = ()):
+        """
+        Args:
+            prefix: 계측 이름 접두어 (예: 'bnk.lease')
+            stages: 계산 단계 (앞 단계 출력 또는 그래프 입력만 읽을 수 있음)
+            sections: 계산 과정 구간 (기록 순서대로)
+
+        Raises:
+            ValueError: 같은 이름을 두 번 출력하거나, 구간이 정의되지 않은 값을 읽는 경우
+        """
+        self.prefix = prefix
+        self.stages = tuple(stages)
+        self.sections = tuple(sections)
+
+        produced = set()
+        inputs = []
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in produced and name not in inputs:
+                    inputs.append(name)
+            for name in stage.outputs:
+                if name in produced or name in inputs:
+                    raise ValueError(f"단계 {stage.name}: 중간값 {name}이 이미 정의되어 있습니다")
+                produced.add(name)
+        for section in self.sections:
+            missing = [name for name in section.inputs if name not in produced and name not in inputs]
+            if missing:
+                raise ValueError(f"구간 {section.name}: 정의되지 않은 값 {missing}")
+
+        self.input_names = tuple(inputs)
+        self.all_stages = (1 << len(self.stages)) - 1
+        self.all_sections = (1 << len(self.sections)) - 1
+
+        # 입력별 하위 단계/구간 비트마스크 (비트 i = i번째 단계/구간)
+        self.input_masks = tuple(
+            (name,) + self._dirty_masks(name) for name in self.input_names
+        )
+        self._plans = {}  # {단계 비트마스크: ((단계, 입력값 조회 함수), ...)}
+        self._counter_names = (f"{prefix}.stage.computed", f"{prefix}.stage.reused")
+
+    def _dirty_masks(self, name: str) -> Tuple[int, int]:
+        """입력 1개가 바뀌면 다시 계산할 (단계, 구간) 비트마스크"""
+        dirty = {name}
+        stage_mask = 0
+        for i, stage in enumerate(self.stages):
+            if dirty.intersection(stage.inputs):
+                stage_mask |= 1 << i
+                dirty.update(stage.outputs)
+        section_mask = 0
+        for i, section in enumerate(self.sections):
+            if dirty.intersection(section.inputs):
+                section_mask |= 1 << i
+        return stage_mask, section_mask
+
+    def plan(self, stage_mask: int) -> Tuple[Tuple[Stage, Callable], ...]:
+        """비트마스크의 (단계, 입력값 튜플 조회 함수) (계산 순서, 마스크별 1회 생성)"""
+        plan = self._plans.get(stage_mask)
+        if plan is None:
+            plan = tuple(
+                (stage, _args_getter(stage.inputs))
+                for i, stage in enumerate(self.stages) if stage_mask >> i & 1
+            )
+            self._plans[stage_mask] = plan
+        return plan
+
+    def downstream(self, changed: Sequence[str]) -> List[str]:
+        """입력이 바뀌었을 때 다시 계산할 단계 이름 (계산 순서)"""
+        mask = 0
+        for name, stage_mask, _ in self.input_masks:
+            if name in changed:
+                mask |= stage_mask
+        return [stage.name for stage, _ in self.plan(mask)]
+
+    def session(self) -> 'StageSession':
+        """새 메모 세션"""
+        return StageSession(self)
+
+
+class StageSession:
+    """
+    단계 그래프 1개의 직전 입력과 중간값 메모
+
+    같은 세션을 여러 스레드가 동시에 쓰지 않는다 (사용자 세션 또는 스레드마다 하나).
+    단계는 같은 입력에 항상 같은 결과를 내야 하며, 단계 밖 상태(테이블 재로드 등)에 의존하면
+    그 상태의 버전을 그래프 입력으로 넘겨야 한다.
+    """
+
+    __slots__ = ('graph', '_inputs', '_values', '_records', '_joined', '_stale_sections', 'computed')
+
+    def __init__(self, graph: StageGraph):
+        self.graph = graph
+        self._inputs = None     # 직전 run 입력 (None이면 전체 계산)
+        self._values = {}       # {이름: 값} 입력 + 모든 중간값
+        self._records = [()] * len(graph.sections)   # 구간별 [(템플릿, 값), ...]
+        self._joined = ()       # 구간 기록을 이어 붙인 전체 기록
+        self._stale_sections = graph.all_sections    # 다시 기록해야 하는 구간 비트마스크
+        self.computed = []      # 직전 run에서 다시 계산한 단계 이름
+
+    def run(self, inputs: Dict, trace: bool = False) -> Tuple[Dict, Optional[CalcTrace]]:
+        """
+        그래프 계산 (직전 run과 다른 입력의 하위 단계만 계산)
+
+        Args:
+            inputs: {그래프 입력명: 값} (graph.input_names 전부)
+            trace: True면 계산 과정 기록도 반환
+
+        Returns:
+            ({이름: 값} 입력 + 모든 중간값 (세션 소유, 다음 run 전까지만 유효), CalcTrace 또는 None)
+        """
+        graph = self.graph
+        last = self._inputs
+        if last is None:
+            stage_mask, section_mask = graph.all_stages, graph.all_sections
+        else:
+            stage_mask = section_mask = 0
+            for name, stage_bits, section_bits in graph.input_masks:
+                # 10과 10.0처럼 값이 같아도 타입이 다르면 기록 서식이 달라지므로 바뀐 입력으로 봄
+                old, new = last[name], inputs[name]
+                if old is not new and (type(old) is not type(new) or old != new):
+                    stage_mask |= stage_bits
+                    section_mask |= section_bits
+
+        # 계산 중 예외가 나면 다음 run은 전체 계산
+        self._inputs = None
+        values = self._values
+        values.update(inputs)
+        timer = metrics.stage_timer(graph.prefix)
+        computed = []
+        for stage, args in graph.plan(stage_mask):
+            outputs = stage.compute(*args(values))
+            values.update(zip(stage.outputs, outputs))
+            computed.append(stage.name)
+            if timer:
+                timer.mark(stage.name)
+        self._inputs = dict(inputs)
+        self._stale_sections |= section_mask
+        self.computed = computed
+
+        if timer:
+            computed_name, reused_name = graph._counter_names
+            metrics.incr(computed_name, len(computed))
+            metrics.incr(reused_name, len(graph.stages) - len(computed))
+
+        if not trace:
+            return values, None
+
+        stale = self._stale_sections
+        if stale:
+            records = self._records
+            for i, section in enumerate(graph.sections):
+                if stale >> i & 1:
+                    part = CalcTrace()
+                    section.describe(part, *[values[name] for name in section.inputs])
+                    records[i] = part.records
+            self._joined = tuple(chain.from_iterable(records))
+            self._stale_sections = 0
+            if timer:
+                timer.mark('trace')
+
+        steps = CalcTrace()
+        steps.records = list(self._joined)
+        return values, steps
+
+    def clear(self):
+        """메모 비우기 (다음 run은 전체 계산)"""
+        self._inputs = None
+        self._stale_sections = self.graph.all_sections
+        self.computed = []
@@ -0,0 +1,98 @@
+"""견적 API 요청 검증 (잘못된 입력은 500이 아니라 400)"""
+
+import asyncio
+import json
+
+import pytest
+
+import api
+
+
+def _post(handler, body):
+    """핸들러를 JSON 본문으로 직접 호출 → (상태 코드, 응답 JSON)"""
+    payload = json.dumps(body).encode()
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/', 'headers': [], 'query_string': b''}
+    response = asyncio.run(handler(api.Request(scope, receive)))
+    return response.status_code, json.loads(response.body)
+
+
+MODEL = {'car_price': 50_000_000, 'product_type': 'lease', 'period': 36, 'mileage': '2만km'}
+BNK = {'car_price': 50_000_000, 'period': 36, 'mileage': '2만'}
+
+
+def test_model_quote_ok():
+    status, body = _post(api.model_quote, MODEL)
+    assert status == 200
+    assert body['count'] > 0
+    assert all(result['monthly_payment'] > 0 for result in body['results'])
+
+
+@pytest.mark.parametrize('override', [
+    {'period': 0},
+    {'period': 0, 'trace': True},
+    {'period': -36},
+    {'period': 37},
+    {'period': 36.5},
+    {'period': True},
+    {'mileage': '7만km'},
+    {'mileage': ['2만km']},
+    {'product_type': ['lease']},
+    {'payment_type': '할부'},
+    {'car_price': 1e308},
+    {'car_price': 0},
+    {'car_price': float('nan')},
+    {'deposit_rate': 150},
+    {'deposit_rate': -10},
+    {'option_price': -1},
+    {'dealer_discount': 1e308},
+    {'dealer_fee_rate': 5},
+])
+def test_model_quote_rejects(override):
+    status, body = _post(api.model_quote, {**MODEL, **override})
+    assert status == 400
+    assert 'error' in body
+
+
+def test_model_batch_rejects_huge_price_and_bad_condition():
+    status, _ = _post(api.model_batch, {'car_prices': [1e308], 'product_type': 'lease',
+                                        'conditions': [{'period': 36, 'mileage': '2만km'}]})
+    assert status == 400
+    status, _ = _post(api.model_batch, {'car_prices': [50_000_000], 'product_type': 'lease',
+                                        'conditions': [{'period': 0, 'mileage': '2만km'}]})
+    assert status == 400
+
+
+@pytest.mark.parametrize('handler', [api.bnk_lease, api.bnk_rental])
+def test_bnk_quote_ok(handler):
+    status, body = _post(handler, BNK)
+    assert status == 200
+    assert body['monthly_payment'] > 0
+
+
+@pytest.mark.parametrize('handler', [api.bnk_lease, api.bnk_rental])
+@pytest.mark.parametrize('override', [
+    {'period': 0},
+    {'period': -12},
+    {'period': 1000},
+    {'mileage': '9만'},
+    {'grade': ['a']},
+    {'rv_company': '없는잔가사'},
+    {'deposit_type': '할부'},
+    {'vehicle_type_eco': '수소'},
+    {'car_price': 1e308},
+    {'deposit_rate': 101},
+])
+def test_bnk_quote_rejects(handler, override):
+    status, body = _post(handler, {**BNK, **override})
+    assert status == 400
+    assert 'error' in body
+
+
+def test_budget_search_rejects_list_fields():
+    status, _ = _post(api.budget_search, {'max_payment': 1_000_000, 'product_type': ['lease'],
+                                          'period': 36, 'mileage': '2만km'})
+    assert status == 400
@@ -0,0 +1,60 @@
+"""
+BNK 리스/렌트 회귀 검사 (기준 커밋의 스칼라 계산 결과와 비교)
+
+tests/data/baseline_bnk_*.json은 최적화 이전 기준 버전(baseline 커밋)의
+BNKCalculator.calculate_lease / calculate_rental로 기간 × 주행거리 × 보증금 조건마다
+임의의 차량가격·잔가사·등급·차종을 계산한 값이다.
+"""
+
+import json
+import os
+
+import pytest
+
+from bnk_calculator import BNKCalculator
+from calc_trace import render_steps
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def _load(name):
+    with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def bnk():
+    return BNKCalculator()
+
+
+def _calculate(bnk, case, **kwargs):
+    product, *args = case
+    calculate = bnk.calculate_lease if product == 'lease' else bnk.calculate_rental
+    return calculate(*args, **kwargs)
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_quotes_match_baseline(bnk, cached):
+    if not cached:
+        bnk.quote_cache.clear()
+    for row in _load('baseline_bnk_quotes.json')['rows']:
+        case, (expected, rv_company, residual_rate) = row[:12], row[12:]
+        monthly, debug = _calculate(bnk, case)
+        assert (monthly, debug['rv_company'], debug['residual_rate']) == (expected, rv_company, residual_rate), case
+
+
+def test_session_reuse_matches_baseline(bnk):
+    # 같은 세션으로 이어서 계산해도 (바뀐 입력의 하위 단계만 계산) 같은 결과
+    sessions = {'lease': bnk.stage_session('lease'), 'rental': bnk.stage_session('rental')}
+    for row in _load('baseline_bnk_quotes.json')['rows']:
+        product, *args = row[:12]
+        compute = bnk._compute_lease if product == 'lease' else bnk._compute_rental
+        monthly, _ = compute(*args, session=sessions[product])
+        assert monthly == row[12], row
+
+
+def test_traces_match_baseline(bnk):
+    for golden in _load('baseline_bnk_traces.json'):
+        monthly, debug = _calculate(bnk, golden['case'], trace=True)
+        assert monthly == golden['monthly_payment']
+        assert render_steps(debug) == golden['steps'], golden['case']
@@ -0,0 +1,71 @@
+"""
+모델 기반 견적 회귀 검사 (기준 커밋의 스칼라 계산 결과와 비교)
+
+tests/data/baseline_model_*.json은 최적화 이전 기준 버전(baseline 커밋)의
+ModelBasedCalculator.calculate_monthly_payment로 model_params.json에 있는 조건 전부를 계산한 값이다.
+"""
+
+import json
+import os
+
+import pytest
+
+from calc_trace import render_steps
+from calculator import ModelBasedCalculator
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def _load(name):
+    with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return ModelBasedCalculator()
+
+
+def test_quotes_match_baseline(calculator):
+    golden = _load('baseline_model_quotes.json')
+    mismatches = []
+    for row in golden['rows']:
+        (product, company, period, mileage, price, deposit_rate, payment_type,
+         option_price, dealer_discount, expected) = row
+        monthly, debug = calculator.calculate_monthly_payment(
+            price, product, company, period, mileage, deposit_rate, payment_type, option_price, dealer_discount)
+        if monthly != expected or debug['params_provenance'] != 'exact':
+            mismatches.append((row, monthly, debug.get('params_provenance')))
+    assert not mismatches, mismatches[:5]
+
+
+def test_batch_matches_baseline(calculator):
+    golden = _load('baseline_model_quotes.json')
+    rows = [row for row in golden['rows'] if row[7] == 0 and row[8] == 0]
+    conditions = {}
+    for product, company, period, mileage, price, deposit_rate, payment_type, _, _, expected in rows:
+        conditions.setdefault(product, {})[(period, mileage, deposit_rate, payment_type, company, price)] = expected
+
+    compared = 0
+    for product, expected in conditions.items():
+        prices = sorted({key[5] for key in expected})
+        batch = calculator.calculate_batch(prices, product, sorted({key[:4] for key in expected}))
+        for condition, (companies, matrix) in batch.items():
+            for ci, company in enumerate(companies):
+                for pi, price in enumerate(prices):
+                    key = condition + (company, price)
+                    if key in expected:
+                        assert matrix[ci, pi] == expected[key], key
+                        compared += 1
+    assert compared == len(rows)
+
+
+def test_traces_match_baseline(calculator):
+    for golden in _load('baseline_model_traces.json'):
+        (product, company, period, mileage, price, deposit_rate, payment_type,
+         option_price, dealer_discount) = golden['case']
+        monthly, debug = calculator.calculate_monthly_payment(
+            price, product, company, period, mileage, deposit_rate, payment_type, option_price, dealer_discount,
+            trace=True)
+        assert monthly == golden['monthly_payment']
+        assert render_steps(debug) == golden['steps'], golden['case']
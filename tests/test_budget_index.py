@@ -0,0 +1,71 @@
+"""예산 검색 인덱스: 조건 검증, 정렬 구간 조회, 파라미터 교체 반영"""
+
+import os
+
+import pytest
+
+from budget_index import BudgetIndex
+from calculator import ModelBasedCalculator
+from data_loader import DataLoader
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ref')
+
+
+@pytest.fixture(scope='module')
+def index():
+    loader = DataLoader(DATA_DIR)
+    loader.load_carinfo()
+    return BudgetIndex(loader, ModelBasedCalculator())
+
+
+@pytest.mark.parametrize('condition', [
+    ('lease', 37, '2만km', 0, '무보증'),
+    ('lease', 36, '7만km', 0, '무보증'),
+    ('rent', 36, '4만km', 0, '무보증'),
+    ('lease', 36, '2만km', 15, '보증금'),
+    ('lease', 36, '2만km', 100, '선수금'),
+    ('lease', 36, '2만km', 10, '할부'),
+    ('truck', 36, '2만km', 0, '무보증'),
+])
+def test_key_rejects_unsupported_conditions(condition):
+    with pytest.raises(ValueError):
+        BudgetIndex._key(*condition)
+
+
+def test_key_normalizes_no_deposit_rate():
+    assert BudgetIndex._key('lease', 36, '2만km', 20, '무보증') == BudgetIndex._key('lease', 36, '2만km', 0, '무보증')
+
+
+def test_query_sorted_within_bounds(index):
+    matches = index.query(1_000_000, 'lease', 36, '2만km', min_payment=500_000)
+    payments = [match['monthly_payment'] for match in matches]
+    assert payments == sorted(payments)
+    assert all(500_000 <= payment <= 1_000_000 for payment in payments)
+    assert index.count(1_000_000, 'lease', 36, '2만km', min_payment=500_000) == len(matches)
+    assert len(index.query(1_000_000, 'lease', 36, '2만km', limit=3)) <= 3
+
+
+def test_query_matches_cheapest_company(index):
+    match = index.query(2_000_000, 'rent', 48, '1만km', 20, '보증금', min_payment=1_000_000, limit=1)[0]
+    companies, matrix = index.calculator.calculate_payment_matrix(
+        [match['price']], 'rent', 48, '1만km', deposit_rate=20, payment_type='보증금')
+    cheapest = matrix[:, 0].min()
+    assert match['monthly_payment'] == int(cheapest)
+    assert match['company'] == companies[int(matrix[:, 0].argmin())]
+
+
+@pytest.mark.parametrize('bounds', [(float('nan'), 0), (float('inf'), 0), (1_000_000, float('-inf'))])
+def test_query_rejects_non_finite_bounds(index, bounds):
+    with pytest.raises(ValueError):
+        index.query(bounds[0], 'lease', 36, '2만km', min_payment=bounds[1])
+
+
+def test_condition_rebuilt_after_params_swap(index):
+    key = BudgetIndex._key('lease', 36, '2만km', 0, '무보증')
+    index.count(1_000_000, *key)
+    before = index._conditions[key]
+    index.calculator.snapshots.check(force=True)
+    index.count(1_000_000, *key)
+    after = index._conditions[key]
+    assert after is not before
+    assert after.params is index.calculator.snapshots.current.params
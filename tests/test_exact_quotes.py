@@ -0,0 +1,96 @@
+"""정확 견적: 공시 월대여료 계산식, 시트 인덱스 조회, 모델 기반 대체"""
+
+import pandas as pd
+import pytest
+
+from calculator import ModelBasedCalculator
+from exact_quotes import SOURCE_EXACT, SOURCE_MODEL, ExactQuoteIndex, published_payment
+from quote_schema import VALUE_FIELDS
+
+
+def _quote(m0, m500=None, ref0=None, ref500=None, fee_1=0.0):
+    return {'monthly_0': m0, 'monthly_500': m500 if m500 is not None else m0 + 50_000,
+            'monthly_0_ref': ref0 if ref0 is not None else m0 - 100_000,
+            'monthly_500_ref': ref500 if ref500 is not None else m0 - 60_000,
+            'dealer_offset': float('nan'), 'acquisition_price': 0, 'fee_offset': None, 'fee_1': fee_1}
+
+
+class FakeLoader:
+    """견적 시트 대신 표를 돌려주는 로더 (lease.xlsx/rent.xlsx 없이 인덱스 검사)"""
+
+    def __init__(self, rows):
+        columns = ['id_cargrade', 'company', 'type'] + list(VALUE_FIELDS)
+        self.table = pd.DataFrame([[car, company, kind] + [quote[f] for f in VALUE_FIELDS]
+                                   for car, company, kind, quote in rows], columns=columns)
+        self.cleared = 0
+
+    def get_sheets(self, product_type):
+        if product_type != 'lease':
+            raise FileNotFoundError(product_type)
+        return {'36개월_2만km': None}
+
+    def parse_sheet_name(self, sheet_name):
+        return 36, '2만km'
+
+    def get_quote_table(self, product_type, period, mileage):
+        return self.table
+
+    def clear_sheets(self):
+        self.cleared += 1
+
+
+def test_published_payment_lease_no_deposit():
+    quote = _quote(800_000, m500=850_000, fee_1=200_000)
+    monthly = published_payment('lease', '무보증', quote, 50_000_000, option_price=5_000_000,
+                                dealer_discount=1_000_000, dealer_fee_rate=0.01)
+    expected = 800_000 + 50_000 / 5_000_000 * 4_000_000 + 200_000 * 0.01 * (54_000_000 / 50_000_000)
+    assert monthly == pytest.approx(expected)
+
+
+def test_published_payment_zero_deposit_matches_ref_formula():
+    quote = _quote(800_000)
+    deposit = published_payment('rent', '보증금', quote, 50_000_000, deposit_rate=30)
+    assert deposit == pytest.approx(quote['monthly_0'])  # 30% 보증금 = 무보증 월대여료 기준
+    assert published_payment('rent', '보증금', quote, 50_000_000, deposit_rate=0) == \
+        pytest.approx(quote['monthly_0_ref'])
+
+
+def test_published_payment_rejects_non_positive_price():
+    with pytest.raises(ValueError):
+        published_payment('lease', '무보증', _quote(800_000), 0)
+
+
+@pytest.fixture
+def index():
+    rows = [
+        (101, 'A캐피탈', '무보증', _quote(900_000)),
+        (101.0, 'B캐피탈', '무보증', _quote(850_000)),
+        (101, 'A캐피탈', '무보증', _quote(1)),            # 중복 행은 첫 행 사용
+        (101, 'C캐피탈', '무보증', _quote(-5_000_000)),   # 0 이하 결과는 제외
+        (float('nan'), 'D캐피탈', '무보증', _quote(700_000)),
+    ]
+    return ExactQuoteIndex(FakeLoader(rows), ModelBasedCalculator())
+
+
+def test_sheet_quotes(index):
+    assert index.has_quotes('lease', '101', 36, '2만km')
+    assert index.get_quote('lease', 101, 36, '2만km', 'A캐피탈')['monthly_0'] == 900_000
+    results = index.calculate_all_companies(101, 50_000_000, 'lease', 36, '2만km', trace=True)
+    assert [(r['company'], r['monthly_payment']) for r in results] == [('B캐피탈', 850_000), ('A캐피탈', 900_000)]
+    assert all(r['debug']['source'] == SOURCE_EXACT and 'trace' in r['debug'] for r in results)
+
+
+def test_fallback_to_model(index):
+    results = index.calculate_all_companies(999, 50_000_000, 'lease', 36, '2만km')
+    expected = index.calculator.calculate_all_companies(50_000_000, 'lease', 36, '2만km')
+    assert [r['monthly_payment'] for r in results] == [r['monthly_payment'] for r in expected]
+    assert all(r['debug']['source'] == SOURCE_MODEL for r in results)
+    assert all('source' not in r['debug'] for r in expected)  # 계산기 캐시 항목은 그대로
+
+
+def test_refresh_rebuilds(index):
+    index.calculate_all_companies(101, 50_000_000, 'lease', 36, '2만km')
+    index.data_loader.table = index.data_loader.table.iloc[:1]
+    index.refresh()
+    assert index.data_loader.cleared == 1
+    assert index.get_quote('lease', 101, 36, '2만km', 'B캐피탈') is None
@@ -0,0 +1,87 @@
+"""파라미터 이력: 기록·조회 왕복, 블록 공유, as_of 스냅샷 LRU, 계산기 생성 시 읽기 전용"""
+
+import datetime
+import os
+import types
+
+import pytest
+
+import param_history
+from bnk_calculator import BNKCalculator
+from calculator import ModelBasedCalculator
+from param_history import AsOfSnapshots, ParamHistory, content_id
+
+DAY = datetime.datetime(2025, 11, 1)
+
+
+def _params(rate):
+    return {'lease': {'A캐피탈': {'36_2만km': {'base_rate': rate}}, 'B캐피탈': {'36_2만km': {'base_rate': 0.02}}}}
+
+
+def _objects(root):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(root, 'objects')))
+
+
+def test_record_resolve_load_roundtrip(tmp_path):
+    history = ParamHistory(str(tmp_path))
+    first = history.record('model_params', _params(0.01), DAY)
+    second = history.record('model_params', _params(0.03), DAY + datetime.timedelta(days=30))
+
+    assert first.content_id == content_id('model_params', _params(0.01))
+    assert history.resolve('model_params', datetime.date(2025, 11, 15)) == first
+    assert history.resolve('model_params', datetime.date(2025, 12, 1)) == second
+    assert history.load(second) == _params(0.03)
+    with pytest.raises(ValueError):
+        history.resolve('model_params', datetime.date(2025, 10, 31))
+
+
+def test_record_same_content_is_noop_and_blocks_are_shared(tmp_path):
+    history = ParamHistory(str(tmp_path))
+    history.record('model_params', _params(0.01), DAY)
+    objects = _objects(str(tmp_path))
+    assert history.record('model_params', _params(0.01), DAY + datetime.timedelta(days=1)).effective_from == DAY
+    history.record('model_params', _params(0.03), DAY + datetime.timedelta(days=30))
+    assert len(history.versions('model_params')) == 2
+    assert _objects(str(tmp_path)) == objects + 1  # 바뀐 금융사 블록만 추가
+
+
+def test_as_of_snapshots_keep_recently_used(tmp_path):
+    history = ParamHistory(str(tmp_path))
+    days = [DAY + datetime.timedelta(days=30 * i) for i in range(4)]
+    for i, day in enumerate(days):
+        history.record('model_params', _params(0.01 * (i + 1)), day)
+
+    builds = []
+
+    def build(data):
+        builds.append(data)
+        return types.SimpleNamespace(content_id=content_id('model_params', data), data=data)
+
+    current = types.SimpleNamespace(content_id='current')
+    snapshots = AsOfSnapshots('model_params', types.SimpleNamespace(current=current), build, history, resident=2)
+    assert snapshots.at(None) is current
+
+    first = snapshots.at(days[0])
+    snapshots.at(days[1])
+    assert snapshots.at(days[0]) is first  # 적중 시 최근 사용으로 이동
+    snapshots.at(days[2])                   # days[1]이 밀려남
+    assert snapshots.at(days[0]) is first
+    assert len(builds) == 3
+    snapshots.at(days[1])
+    assert len(builds) == 4
+
+
+def test_calculators_do_not_write_history(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("스냅샷 생성은 이력을 기록하지 않아야 함")
+
+    monkeypatch.setattr(ParamHistory, 'record', fail)
+    ModelBasedCalculator().snapshots.check(force=True)
+    BNKCalculator().snapshots.check(force=True)
+
+
+def test_cli_record_requires_effective_from(monkeypatch, tmp_path):
+    monkeypatch.setattr('sys.argv', ['param_history.py', 'record', '--root', str(tmp_path)])
+    with pytest.raises(SystemExit):
+        param_history.main()
+    assert not os.path.exists(os.path.join(str(tmp_path), 'versions'))
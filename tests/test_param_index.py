@@ -0,0 +1,61 @@
+"""파라미터 조건 해석: 대체 규칙, 출처 표시, 메모 한도"""
+
+import math
+
+import pytest
+
+import param_index
+from param_index import (EXACT, NEAREST, NEAREST_PERIOD, SAME_PERIOD, ParamIndex, parse_condition_key,
+                         parse_mileage)
+
+
+def _p(rate):
+    return {'base_rate': rate, 'option_coefficient': 0.01, 'residual_rate': 0.5}
+
+
+PARAMS = {
+    'metadata': {'version': 1},
+    'lease': {
+        'A캐피탈': {'36_2만km': _p(1.0), '36_3만km': _p(1.1), '48_2만km': _p(1.2)},
+        'B캐피탈': {'24_1만km': _p(2.0)},
+    },
+}
+
+
+def test_parse_mileage():
+    assert parse_mileage('1만km') == 1.0
+    assert parse_mileage('1.5만') == 1.5
+    assert math.isinf(parse_mileage('무제한'))
+    assert parse_mileage('abc') is None
+    assert parse_condition_key('36_2만km') == (36, 2.0)
+
+
+@pytest.mark.parametrize('period, mileage, key, provenance', [
+    (36, '2만km', '36_2만km', EXACT),
+    (36, '4만km', '36_3만km', SAME_PERIOD),
+    (60, '2만km', '48_2만km', NEAREST_PERIOD),
+    (24, '1만km', '36_2만km', NEAREST),
+])
+def test_resolve_rules(period, mileage, key, provenance):
+    resolved = ParamIndex(PARAMS).resolve('lease', 'A캐피탈', period, mileage)
+    assert (resolved.key, resolved.provenance) == (key, provenance)
+    assert resolved.params is PARAMS['lease']['A캐피탈'][key]
+    assert resolved.substituted == (provenance != EXACT)
+
+
+def test_resolve_missing():
+    index = ParamIndex(PARAMS)
+    assert index.resolve('lease', '없는캐피탈', 36, '2만km') is None
+    assert index.resolve('rent', 'A캐피탈', 36, '2만km') is None
+    assert index.resolve('lease', 'A캐피탈', 36, ['2만km']).key.startswith('36_')  # 해시 불가 입력
+
+
+def test_grid_precomputed_and_memo_bounded(monkeypatch):
+    index = ParamIndex(PARAMS)
+    grid = len(index._resolved)
+    assert ('lease', 'B캐피탈', 48, '3만km') in index._resolved  # 상품의 기간 × 주행거리 격자
+
+    monkeypatch.setattr(param_index, 'MAX_MEMO_SIZE', grid + 3)
+    for i in range(20):
+        index.resolve('lease', 'A캐피탈', 36, f'{i}.7만km')
+    assert len(index._resolved) == grid + 3
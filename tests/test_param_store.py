@@ -0,0 +1,78 @@
+"""파라미터 저장소: ParamIndex와 같은 해석 결과, pack/gather, 조건 메모 한도와 on_full"""
+
+import param_store
+from calculator import ModelBasedCalculator
+from param_index import EXACT, NEAREST_PERIOD, ParamIndex
+from param_store import NO_ROW, ParamStore
+
+
+def _p(rate, residual=0.5):
+    return {'base_rate': rate, 'option_coefficient': rate / 100, 'residual_rate': residual}
+
+
+PARAMS = {
+    'lease': {
+        'A캐피탈': {'36_2만km': _p(1.0), '48_2만km': _p(1.2, 0.4)},
+        'B캐피탈': {'36_2만km': _p(2.0, 0.45)},
+    },
+    'rent': {'C캐피탈': {'36_무제한': _p(3.0)}},
+}
+
+
+def _store(on_full=None):
+    return ParamStore(PARAMS, ParamIndex(PARAMS).resolve, on_full)
+
+
+def test_lookup_matches_index():
+    store, index = _store(), ParamIndex(PARAMS)
+    for product_type, companies in PARAMS.items():
+        for company in companies:
+            for period, mileage in ((36, '2만km'), (48, '2만km'), (60, '2만km'), (36, '무제한'), (24, '1.5만km')):
+                row, provenance = store.lookup(product_type, company, period, mileage)
+                expected = index.resolve(product_type, company, period, mileage)
+                assert row != NO_ROW
+                assert store.resolved(row, provenance) == expected
+    assert store.lookup('lease', 'A캐피탈', 60, '2만km')[1] == NEAREST_PERIOD
+    assert store.lookup('lease', '없는캐피탈', 36, '2만km') == (NO_ROW, EXACT)
+
+
+def test_pack_and_gather():
+    store = _store()
+    companies, matrix = store.pack('lease', 36, '2만km')
+    assert companies == ['A캐피탈', 'B캐피탈']
+    assert matrix.tolist() == [[1.0, 0.01, 0.5], [2.0, 0.02, 0.45]]
+    assert store.pack('truck', 36, '2만km')[0] == []
+    matrix[0, 0] = 99.0  # 복사본
+    assert store.pack('lease', 36, '2만km')[1][0, 0] == 1.0
+
+
+def test_condition_memo_limit_calls_on_full(monkeypatch):
+    monkeypatch.setattr(param_store, 'MAX_MEMO_SIZE', 3)
+    full = []
+    store = _store(full.append)
+    base = len(store._condition_codes)
+    for i in range(6):
+        rows, _ = store.condition('lease', 36, f'{i}.3만km')
+        assert rows[0] != NO_ROW  # 한도를 넘어도 해석은 계속
+    assert len(store._condition_codes) == base + 3
+    assert store.full and full and full[0] is store
+
+
+def test_unhashable_condition_not_memoized():
+    store = _store()
+    before = len(store._condition_codes)
+    assert store.condition_code(36, ['2만km']) is None
+    assert len(store._condition_codes) == before
+
+
+def test_calculator_renews_full_store(monkeypatch):
+    monkeypatch.setattr(param_store, 'MAX_MEMO_SIZE', 4)
+    calculator = ModelBasedCalculator()
+    reference = ModelBasedCalculator()
+    first = calculator.param_store
+    for i in range(12):
+        mileage = f'{1 + i / 4:.2f}만km'
+        got = calculator.calculate_all_companies(50_000_000, 'lease', 36, mileage)
+        expected = reference.calculate_all_companies(50_000_000, 'lease', 36, mileage)
+        assert [r['monthly_payment'] for r in got] == [r['monthly_payment'] for r in expected]
+    assert calculator.param_store is not first
@@ -0,0 +1,100 @@
+"""파라미터 보간 곡면: 관측 조건 재현, 관측 범위 제한, 외삽 단조성, 메모 한도"""
+
+import json
+
+import numpy as np
+import pytest
+
+import param_surface
+from calculator import PARAMS_PATH, residual_adjustment
+from param_index import EXTRAPOLATED, INTERPOLATED, parse_condition_key
+from param_surface import SURFACE_PERIODS, ParamSurface
+
+
+@pytest.fixture(scope='module')
+def params():
+    with open(PARAMS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def surface(params):
+    return ParamSurface(params, residual_adjustment)
+
+
+def _companies(params):
+    for product_type in ('lease', 'rent'):
+        for company, conditions in params.get(product_type, {}).items():
+            yield product_type, company, conditions
+
+
+def _factor(values):
+    return values[0] * residual_adjustment(values[2])
+
+
+def test_observed_conditions_reproduced(params, surface):
+    for product_type, company, conditions in _companies(params):
+        for key, condition in conditions.items():
+            period, mileage = parse_condition_key(key)
+            if period is None or mileage is None or not np.isfinite(mileage):
+                continue
+            values = surface.lookup(product_type, company, period, mileage)
+            expected = [condition['base_rate'], condition['option_coefficient'], condition['residual_rate']]
+            assert values is not None and np.allclose(values, expected), (product_type, company, key)
+
+
+def test_values_within_observed_range(params, surface):
+    # 옵션계수·잔가율은 관측 범위로 제한 (기본요율은 외삽 제한에서 월납입금 계수에 맞춰 조정되므로 양수만 확인)
+    for product_type, company, conditions in _companies(params):
+        observed = np.array([[c['option_coefficient'], c['residual_rate']] for c in conditions.values()])
+        grid = surface._grids[(product_type, company)][0]
+        cells = grid[np.isfinite(grid).all(axis=2)]
+        assert (cells[:, 0] > 0).all()
+        assert (cells[:, 1:] >= observed.min(axis=0) - 1e-12).all()
+        assert (cells[:, 1:] <= observed.max(axis=0) + 1e-12).all()
+
+
+def test_period_extrapolation_monotone_within_one_step(params, surface):
+    # 금융사 최장 관측 기간 뒤의 월납입금 계수는 마지막 관측 구간 방향으로만, 그 1단계 변화량 이내로 변함
+    checked = 0
+    for product_type, company, conditions in _companies(params):
+        observed = {}
+        for key in conditions:
+            period, mileage = parse_condition_key(key)
+            if period is not None and mileage is not None and np.isfinite(mileage):
+                observed.setdefault(mileage, set()).add(period)
+        periods = sorted(set().union(*observed.values())) if observed else []
+        if len(periods) < 2:
+            continue
+        last, previous = periods[-1], periods[-2]
+        for mileage, mileage_periods in observed.items():
+            if not {last, previous} <= mileage_periods:
+                continue
+            start = _factor(surface.lookup(product_type, company, last, mileage))
+            step = start - _factor(surface.lookup(product_type, company, previous, mileage))
+            prior = start
+            for period in range(last + 1, int(SURFACE_PERIODS[-1]) + 1):
+                values = surface.lookup(product_type, company, period, mileage)
+                if values is None:
+                    continue
+                factor = _factor(values)
+                assert (factor - prior) * step >= -1e-12, (product_type, company, mileage, period)
+                assert abs(factor - start) <= abs(step) + 1e-12, (product_type, company, mileage, period)
+                prior = factor
+                checked += 1
+    assert checked > 0
+
+
+def test_resolve_provenance_and_memo(surface, monkeypatch):
+    company = next(c for p, c in surface._grids if p == 'lease')
+    inside = surface.resolve('lease', company, 36, '1.5만km')
+    assert inside.provenance == INTERPOLATED and inside.key == '36_1.5만km'
+    outside = surface.resolve('lease', company, 72, '2만km')
+    assert outside.provenance == EXTRAPOLATED
+    assert surface.resolve('lease', company, 90, '2만km') is None
+    assert surface.resolve('lease', company, 36, ['2만km']) is None
+
+    monkeypatch.setattr(param_surface, 'MAX_MEMO_SIZE', len(surface._resolved) + 2)
+    for i in range(10):
+        surface.resolve('lease', company, 36, f'{1 + i / 10:.2f}만km')
+    assert len(surface._resolved) <= param_surface.MAX_MEMO_SIZE
@@ -0,0 +1,62 @@
+"""견적 캐시: 키 정규화, LRU·TTL, 스냅샷 교체 시 무효화"""
+
+import time
+
+from bnk_calculator import BNKCalculator
+from calculator import ModelBasedCalculator
+from quote_cache import QuoteCache, normalize_quote_key
+
+
+def test_normalize_quote_key():
+    assert normalize_quote_key('lease', 10, 36) == normalize_quote_key('lease', 10.0, 36.0)
+    assert normalize_quote_key(1.3 / 100 * 100) == normalize_quote_key(1.3)
+    assert normalize_quote_key(True, None) != normalize_quote_key(1, 0)
+
+
+def test_lru_eviction():
+    cache = QuoteCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # a가 최근 사용
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry():
+    cache = QuoteCache(ttl=0.01)
+    cache.put('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_invalidated_on_snapshot_swap():
+    calculator = ModelBasedCalculator()
+    calculator.calculate_all_companies(50_000_000, 'lease', 36, '2만km')
+    assert calculator.quote_cache.stats()['size'] > 0
+    assert calculator.snapshots.check(force=True)
+    stats = calculator.quote_cache.stats()
+    assert stats['size'] == 0 and stats['invalidations'] == 1
+
+
+def test_calculator_cache_hits_equivalent_inputs():
+    calculator = ModelBasedCalculator()
+    first = calculator.calculate_all_companies(50_000_000, 'lease', 36, '2만km', 10, '보증금')
+    hits = calculator.quote_cache.stats()['hits']
+    second = calculator.calculate_all_companies(50_000_000.0, 'lease', 36, '2만km', 10.0, '보증금')
+    assert second == first and second[0] is first[0]  # 캐시 항목 공유 (목록만 복사)
+    assert calculator.quote_cache.stats()['hits'] == hits + 1
+
+    calculator.quote_cache.clear()
+    fresh = calculator.calculate_all_companies(50_000_000, 'lease', 36, '2만km', 10, '보증금')
+    assert [r['monthly_payment'] for r in fresh] == [r['monthly_payment'] for r in first]
+
+
+def test_bnk_cache_ignores_grade_for_best_rv():
+    bnk = BNKCalculator()
+    first = bnk.calculate_lease(50_000_000, 0, 36, grade='A')
+    assert bnk.calculate_lease(50_000_000, 0, 36, grade='B') is first
+    assert bnk.calculate_lease(50_000_000, 0, 36, rv_company='웨스트_통합', grade='B')[0] == \
+        bnk._compute_lease(50_000_000, 0, 36, rv_company='웨스트_통합', grade='B')[0]
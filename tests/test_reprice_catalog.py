@@ -0,0 +1,45 @@
+"""카탈로그 재계산: BNK 배열 계산이 스칼라 견적과 같은지, 이전 실행 샤드 정리"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import reprice_catalog
+from bnk_calculator import BNKCalculator
+
+
+def test_price_bnk_matches_scalar_quotes():
+    bnk = BNKCalculator()
+    cars = {
+        'id_cargrade': np.array([1, 2, 3, 4]),
+        'price': np.array([23_450_000.0, 51_234_567.0, 88_000_000.0, 154_990_000.0]),
+        'vehicle_type_eco': np.array(['일반', 'HEV', '전기', '일반'], dtype=object),
+        'is_domestic': np.array([True, True, False, False]),
+    }
+    df = pd.concat(reprice_catalog._price_bnk(bnk, cars), ignore_index=True)
+    assert len(df) == 2 * 4 * len(reprice_catalog.BNK_PERIODS) * len(reprice_catalog.BNK_MILEAGES) \
+        * len(reprice_catalog.DEPOSIT_OPTIONS)
+
+    for row in df.sample(200, random_state=0).itertuples():
+        i = int(np.flatnonzero(cars['id_cargrade'] == row.id_cargrade)[0])
+        calculate = bnk.calculate_lease if row.product == 'lease' else bnk.calculate_rental
+        monthly, debug = calculate(float(cars['price'][i]), 0, row.period, '최고잔가', 'A', row.mileage,
+                                   row.payment_type, row.deposit_rate, 0, cars['vehicle_type_eco'][i],
+                                   bool(cars['is_domestic'][i]))
+        assert row.monthly_payment == monthly
+        assert row.company == debug['rv_company']
+
+
+def test_clear_stale_shards_keeps_only_completed(tmp_path):
+    output_dir = str(tmp_path)
+    for name in ('part-00000.parquet', 'part-00001.parquet', 'part-00007.parquet', 'part-00002.csv',
+                 'part-00003.parquet.tmp', 'manifest.json'):
+        open(os.path.join(output_dir, name), 'w').close()
+
+    manifest = {'fingerprint': 'x', 'completed': {'0': {'rows': 1, 'seconds': 0.1}}}
+    assert reprice_catalog.clear_stale_shards(output_dir, manifest, 'parquet') == 4
+    assert sorted(os.listdir(output_dir)) == ['manifest.json', 'part-00000.parquet']
+
+    reprice_catalog.clear_stale_shards(output_dir, {'fingerprint': 'y', 'completed': {}}, 'parquet')
+    assert os.listdir(output_dir) == ['manifest.json']
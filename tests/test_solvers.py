@@ -0,0 +1,28 @@
+"""예산 역산: 구한 최대 차량 가격의 월납입금이 목표 이하인지"""
+
+import math
+
+import pytest
+
+from calculator import ModelBasedCalculator
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return ModelBasedCalculator()
+
+
+@pytest.mark.parametrize('condition', [('lease', 36, '2만km', 0, '무보증'), ('rent', 48, '1만km', 20, '보증금'),
+                                       ('lease', 60, '3만km', 30, '선수금')])
+def test_max_car_price_round_trip(calculator, condition):
+    product_type, period, mileage, deposit_rate, payment_type = condition
+    target = 900_000
+    companies, prices = calculator.solve_max_car_price(target, product_type, period, mileage,
+                                                       deposit_rate, payment_type)
+    assert not all(math.isnan(price) for price in prices)
+    for company, price in zip(companies, prices):
+        if math.isnan(price):
+            continue
+        payment, _ = calculator.calculate_monthly_payment(price, product_type, company, period, mileage,
+                                                          deposit_rate=deposit_rate, payment_type=payment_type)
+        assert payment <= target + 1  # 월납입금 반올림
@@ -0,0 +1,56 @@
+"""단계 그래프: 바뀐 입력의 하위 단계만 다시 계산하고 결과는 전체 계산과 같은지"""
+
+import pytest
+
+from bnk_calculator import BNKCalculator
+from calc_trace import render_steps
+from stage_graph import Stage, StageGraph
+
+
+def _graph():
+    return StageGraph('test', (
+        Stage('double', ('a',), ('a2',), lambda a: (a * 2,)),
+        Stage('add', ('a2', 'b'), ('total',), lambda a2, b: (a2 + b,)),
+        Stage('scale', ('c',), ('c10',), lambda c: (c * 10,)),
+    ))
+
+
+def test_downstream_and_rerun():
+    graph = _graph()
+    assert graph.input_names == ('a', 'b', 'c')
+    assert graph.downstream(['b']) == ['add']
+    assert graph.downstream(['a']) == ['double', 'add']
+
+    session = graph.session()
+    values, _ = session.run({'a': 1, 'b': 2, 'c': 3})
+    assert session.computed == ['double', 'add', 'scale'] and values['total'] == 4
+    values, _ = session.run({'a': 1, 'b': 5, 'c': 3})
+    assert session.computed == ['add'] and values['total'] == 7 and values['c10'] == 30
+    session.run({'a': 1, 'b': 5, 'c': 3.0})  # 타입이 바뀌면 다시 계산
+    assert session.computed == ['scale']
+
+
+def test_rejects_redefined_value():
+    with pytest.raises(ValueError):
+        StageGraph('test', (Stage('x', ('a',), ('a',), lambda a: (a,)),))
+
+
+@pytest.mark.parametrize('product', ['lease', 'rental'])
+def test_session_matches_fresh_quotes(product):
+    bnk = BNKCalculator()
+    compute = bnk._compute_lease if product == 'lease' else bnk._compute_rental
+    session = bnk.stage_session(product)
+    cases = [
+        dict(car_price=50_000_000, option_price=0, period=36),
+        dict(car_price=50_000_000, option_price=0, period=36, deposit_type='보증금', deposit_rate=20),
+        dict(car_price=50_000_000, option_price=0, period=36, deposit_type='보증금', deposit_rate=20, mileage='1만'),
+        dict(car_price=72_000_000, option_price=1_000_000, period=48, vehicle_type_eco='전기', is_domestic=False),
+    ]
+    computed = []
+    for case in cases:
+        reused = compute(**case, trace=True, session=session)
+        computed.append(len(session.computed))
+        fresh = compute(**case, trace=True, session=bnk.stage_session(product))
+        assert reused[0] == fresh[0]
+        assert render_steps(reused[1]) == render_steps(fresh[1])
+    assert computed[1] < computed[0] and computed[2] < computed[0]  # 보증금·주행거리만 바꾸면 일부만 계산